@@ -13,6 +13,16 @@ plm_output_name = "output.plumed"
 lmp_traj_name = "traj.dump"
 lmp_log_name = "log.lammps"
 lmp_model_devi_name = "model_devi.out"
+lmp_model_devi_npy_name = "model_devi.npy"
+lmp_traj_summary_name = "traj_summary.json"
+lmp_bundle_input_name = "in.bundle.lammps"
+lmp_bundle_log_name = "log.bundle.lammps"
+lmp_restart_name = "dpgen.restart"
+lmp_checkpoint_name = "checkpoint.json"
+lmp_stop_name = "stop.json"
+lmp_rescreen_name = "rescreen.lammpstrj"
+lmp_rescreen_ref_name = "rescreen.json"
+novelty_index_name = "novelty_index"
 fp_index_pattern = "%06d"
 fp_task_pattern = "task." + fp_index_pattern
 fp_default_log_name = "fp.log"
@@ -14,6 +14,9 @@ from dpgen2.constants import (
 from dpgen2.exploration.report import (
     conv_styles,
 )
+from dpgen2.exploration.selector import (
+    NoveltyIndex,
+)
 from dpgen2.fp import (
     fp_styles,
 )
@@ -125,6 +128,26 @@ def lmp_args():
         "Fatal when the number of iteration per stage reaches the `max_numb_iter`"
     )
     doc_output_nopbc = "Remove pbc of the output configurations"
+    doc_select_max_workers = "The maximal number of processes used to parse the model deviations and trajectories when selecting configurations. The trajectories are parsed serially if not set."
+    doc_select_chunk_size = "Select configurations in the streaming mode, processing the trajectories in chunks of this size. The memory of the selection does not grow with the number of trajectories. With the `adaptive-lower` convergence check, all the non-failed frames are kept in memory if `rate_candi_f` or `rate_candi_v` is set. All trajectories are processed at once if not set."
+    doc_select_sharded = "Select configurations in sharded steps: the partial reports of the trajectories are recorded by the sliced map steps, grouped by the `template_slice_config` of the select-confs step config, and merged by a reduce step, which selects the same configurations as one select-confs step. Not supported together with `select_chunk_size`."
+    doc_bundle_tasks = "Run the LAMMPS tasks grouped by the `template_slice_config` of the run_explore step config in one LAMMPS process, one task after another, which saves the start-up of LAMMPS for short explorations. The models are still loaded by each task, as the simulation is cleared between the tasks. One failed task fails the whole group, which is run again when retried. Requires the `group_size` and no `pool_size` in the `template_slice_config`."
+    doc_rescreen = "Re-screen the frames explored by the previous iteration with the newly trained models, which is much cheaper than the MD simulations. A pool of the frames, referred by the indexes of the trajectories and of the frames, is kept by the stage. The frames are read from the trajectories of the previous iteration by the prep_explore step, and their model deviations are evaluated by batches in the run_explore steps, so the candidates are selected from the pool as from the MD trajectories. The frames selected by the previous iteration and those pruned by `prune_traj` of the explore config are not kept. Not re-screened if not set."
+    doc_rescreen_max_frames = "The maximal number of frames in the pool. The frames are randomly sampled if more frames are explored."
+    doc_rescreen_frames_per_task = (
+        "The number of frames re-screened by each run_explore task."
+    )
+    doc_rescreen_only = "Only re-screen the pool, instead of running the MD simulations of the stage, in the iterations following an MD exploration, as long as the re-screening finds candidates. The convergence is not checked by the re-screened frames. The re-screening tasks are added to the MD tasks of each iteration if not set, and the convergence is checked only by the frames of the MD tasks."
+    doc_restart_confs = "Start the MD simulations of each iteration from the end frames of the trajectories explored by the same tasks in the previous iteration, rather than from the configurations sampled from the initial configurations, so the explorations go on from where they stopped. The tasks of which the trajectories are empty start from the sampled configurations. Started from the sampled configurations if not set."
+    doc_restart_confs_level_f = "Start from the last frame of which the max force model deviation is lower than this level, i.e. the last accurate frame. Start from the last frame if not set."
+    doc_select_diversity = "Pick a diverse subset of the candidate configurations by the farthest point sampling of their structural fingerprints, i.e. the distance histograms of the type pairs. Not supported together with `select_chunk_size`. All the candidates picked by the convergence check are labeled if not set."
+    doc_diversity_rcut = "The cutoff radius of the distance histograms."
+    doc_diversity_nbins = "The number of bins of the distance histograms."
+    doc_diversity_pool_size = "The number of candidates picked by the convergence check, from which the diverse subset of at most `fp/task_max` configurations is picked. `pool_multiple` times `fp/task_max` candidates are used if not set."
+    doc_diversity_pool_multiple = (
+        "The default `pool_size` in the multiple of `fp/task_max`."
+    )
+    doc_novelty_index = "Drop the selected configurations that are close to the labeled data in the space of their structural fingerprints. The index of the labeled data is stored in the iteration data, and searched by the locality sensitive hashing. All the selected configurations are labeled if not set."
     doc_convergence = "The method of convergence check."
     doc_configuration_prefix = "The path prefix of lmp initial configurations"
     doc_configuration = "A list of initial configurations."
@@ -148,6 +171,109 @@ def lmp_args():
         Argument(
             "output_nopbc", bool, optional=True, default=False, doc=doc_output_nopbc
         ),
+        Argument(
+            "select_max_workers",
+            int,
+            optional=True,
+            default=None,
+            doc=doc_select_max_workers,
+        ),
+        Argument(
+            "select_chunk_size",
+            int,
+            optional=True,
+            default=None,
+            doc=doc_select_chunk_size,
+        ),
+        Argument(
+            "select_sharded",
+            bool,
+            optional=True,
+            default=False,
+            doc=doc_select_sharded,
+        ),
+        Argument(
+            "bundle_tasks",
+            bool,
+            optional=True,
+            default=False,
+            doc=doc_bundle_tasks,
+        ),
+        Argument(
+            "rescreen",
+            dict,
+            [
+                Argument(
+                    "max_frames", int, optional=False, doc=doc_rescreen_max_frames
+                ),
+                Argument(
+                    "frames_per_task",
+                    int,
+                    optional=True,
+                    default=1000,
+                    doc=doc_rescreen_frames_per_task,
+                ),
+                Argument(
+                    "only", bool, optional=True, default=False, doc=doc_rescreen_only
+                ),
+            ],
+            optional=True,
+            default=None,
+            doc=doc_rescreen,
+        ),
+        Argument(
+            "restart_confs",
+            dict,
+            [
+                Argument(
+                    "level_f",
+                    float,
+                    optional=True,
+                    default=None,
+                    doc=doc_restart_confs_level_f,
+                ),
+            ],
+            optional=True,
+            default=None,
+            doc=doc_restart_confs,
+        ),
+        Argument(
+            "select_diversity",
+            dict,
+            [
+                Argument(
+                    "rcut", float, optional=True, default=6.0, doc=doc_diversity_rcut
+                ),
+                Argument(
+                    "nbins", int, optional=True, default=30, doc=doc_diversity_nbins
+                ),
+                Argument(
+                    "pool_size",
+                    int,
+                    optional=True,
+                    default=None,
+                    doc=doc_diversity_pool_size,
+                ),
+                Argument(
+                    "pool_multiple",
+                    int,
+                    optional=True,
+                    default=10,
+                    doc=doc_diversity_pool_multiple,
+                ),
+            ],
+            optional=True,
+            default=None,
+            doc=doc_select_diversity,
+        ),
+        Argument(
+            "novelty_index",
+            dict,
+            NoveltyIndex.args(),
+            optional=True,
+            default=None,
+            doc=doc_novelty_index,
+        ),
         Argument(
             "convergence",
             list,
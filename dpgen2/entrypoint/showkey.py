@@ -34,6 +34,6 @@ def showkey(
     all_step_keys = get_resubmit_keys(wf)
     prt_str = print_keys_in_nice_format(
         all_step_keys,
-        ["run-train", "run-lmp", "run-fp"],
+        ["run-train", "run-lmp", "select-confs-map", "run-fp"],
     )
     print(prt_str)
@@ -1,6 +1,7 @@
 import copy
 import glob
 import logging
+import math
 import os
 import pickle
 from pathlib import (
@@ -65,6 +66,7 @@ from dpgen2.exploration.scheduler import (
     ExplorationScheduler,
 )
 from dpgen2.exploration.selector import (
+    ConfDiversity,
     ConfSelectorFrames,
 )
 from dpgen2.exploration.task import (
@@ -72,6 +74,7 @@ from dpgen2.exploration.task import (
     ExplorationTask,
     LmpTemplateTaskGroup,
     NPTTaskGroup,
+    RescreenTaskGroup,
     make_task_group_from_config,
 )
 from dpgen2.flow import (
@@ -86,7 +89,10 @@ from dpgen2.op import (
     PrepLmp,
     RunDPTrain,
     RunLmp,
+    RunLmpBundle,
     SelectConfs,
+    SelectConfsMap,
+    SelectConfsReduce,
 )
 from dpgen2.superop import (
     ConcurrentLearningBlock,
@@ -130,6 +136,8 @@ def make_concurrent_learning_op(
     collect_data_config: dict = default_config,
     cl_step_config: dict = default_config,
     upload_python_packages: Optional[List[os.PathLike]] = None,
+    select_sharded: bool = False,
+    bundle_lmp: bool = False,
 ):
     if train_style in ("dp", "dp-dist"):
         prep_run_train_op = PrepRunDPTrain(
@@ -143,10 +151,20 @@ def make_concurrent_learning_op(
     else:
         raise RuntimeError(f"unknown train_style {train_style}")
     if explore_style == "lmp":
+        if bundle_lmp:
+            slice_config = run_explore_config.get("template_slice_config", {})
+            if (
+                slice_config.get("group_size") is None
+                or slice_config.get("pool_size") is not None
+            ):
+                raise RuntimeError(
+                    "bundled lmp tasks require the group_size and no pool_size "
+                    "in the template_slice_config of the run_explore_config"
+                )
         prep_run_explore_op = PrepRunLmp(
             "prep-run-lmp",
             PrepLmp,
-            RunLmp,
+            RunLmpBundle if bundle_lmp else RunLmp,
             prep_config=prep_explore_config,
             run_config=run_explore_config,
             upload_python_packages=upload_python_packages,
@@ -177,6 +195,8 @@ def make_concurrent_learning_op(
         select_confs_config=select_confs_config,
         collect_data_config=collect_data_config,
         upload_python_packages=upload_python_packages,
+        select_confs_map_op=SelectConfsMap if select_sharded else None,
+        select_confs_reduce_op=SelectConfsReduce if select_sharded else None,
     )
     # dpgen
     dpgen_op = ConcurrentLearning(
@@ -189,6 +209,46 @@ def make_concurrent_learning_op(
     return dpgen_op
 
 
+def set_lmp_trust_levels(
+    lmp_config: dict,
+    convergence: dict,
+):
+    r"""Set the trust levels of the `prune_traj`, the `watchdog` and the
+    `quota` of the LAMMPS config to those of the exploration report, so
+    the frames are classified by the LAMMPS tasks as by the report. The
+    levels given in the LAMMPS config should be the same as those of the
+    report. The lower trust levels are not supported with the
+    `adaptive-lower` report, which adjusts them by the explored frames,
+    and treats the frames at the higher trust levels as candidates.
+    """
+    adaptive = convergence["type"] == "adaptive-lower"
+    for key in ["prune_traj", "watchdog", "quota"]:
+        sub = lmp_config.get(key)
+        if sub is None:
+            continue
+        sub["fail_at_level_hi"] = not adaptive
+        levels = ["level_f_hi", "level_v_hi"]
+        if key != "watchdog":
+            levels += ["level_f_lo", "level_v_lo"]
+        for level in levels:
+            if adaptive and level.endswith("_lo"):
+                if sub.get(level) is not None:
+                    raise RuntimeError(
+                        f"the {level} of the {key} is not supported by the "
+                        "adaptive-lower convergence, of which the lower trust "
+                        "levels are adjusted by the explored frames"
+                    )
+                continue
+            ref = convergence.get(level)
+            if sub.get(level) is None:
+                sub[level] = ref
+            elif sub[level] != ref:
+                raise RuntimeError(
+                    f"the {level} of the {key} ({sub[level]}) is not the same "
+                    f"as that of the exploration report ({ref})"
+                )
+
+
 def make_naive_exploration_scheduler(
     config,
     old_style=False,
@@ -221,16 +281,29 @@ def make_naive_exploration_scheduler(
     )
     convergence = config["explore"]["convergence"]
     output_nopbc = False if old_style else config["explore"]["output_nopbc"]
+    select_max_workers = None if old_style else config["explore"]["select_max_workers"]
+    select_chunk_size = None if old_style else config["explore"]["select_chunk_size"]
+    select_diversity = None if old_style else config["explore"]["select_diversity"]
+    novelty_index = None if old_style else config["explore"]["novelty_index"]
+    rescreen = None if old_style else config["explore"]["rescreen"]
+    restart_confs = None if old_style else config["explore"]["restart_confs"]
     scheduler = ExplorationScheduler()
     # report
     conv_style = convergence.pop("type")
     report = conv_styles[conv_style](**convergence)
-    render = TrajRenderLammps(nopbc=output_nopbc)
+    render = TrajRenderLammps(nopbc=output_nopbc, max_workers=select_max_workers)
     # selector
     selector = ConfSelectorFrames(
         render,
         report,
         fp_task_max,
+        chunk_size=select_chunk_size,
+        conf_diversity=(
+            ConfDiversity(**select_diversity) if select_diversity is not None else None
+        ),
+        novelty_pool_multiple=(
+            novelty_index["pool_multiple"] if novelty_index is not None else None
+        ),
     )
 
     sys_configs_lmp = []
@@ -273,6 +346,16 @@ def make_naive_exploration_scheduler(
             selector,
             max_numb_iter=max_numb_iter,
             fatal_at_max=fatal_at_max,
+            rescreen=(
+                RescreenTaskGroup(rescreen["max_frames"], rescreen["frames_per_task"])
+                if rescreen is not None
+                else None
+            ),
+            rescreen_only=False if rescreen is None else rescreen["only"],
+            restart=restart_confs is not None,
+            restart_level_f=(
+                None if restart_confs is None else restart_confs["level_f"]
+            ),
         )
         # scheduler
         scheduler.add_stage_scheduler(stage_scheduler)
@@ -303,8 +386,9 @@ def get_kspacing_kgamma_from_incar(
 
 def make_optional_parameter(
     mixed_type=False,
+    novelty_index=None,
 ):
-    return {"data_mixed_type": mixed_type}
+    return {"data_mixed_type": mixed_type, "novelty_index": novelty_index}
 
 
 def workflow_concurrent_learning(
@@ -415,6 +499,13 @@ def workflow_concurrent_learning(
         collect_data_config=collect_data_config,
         cl_step_config=cl_step_config,
         upload_python_packages=upload_python_packages,
+        select_sharded=False if old_style else config["explore"]["select_sharded"],
+        bundle_lmp=False if old_style else config["explore"]["bundle_tasks"],
+    )
+    # before the type of the convergence is popped by the scheduler
+    set_lmp_trust_levels(
+        config.get("lmp_config", {}) if old_style else config["explore"]["config"],
+        config["explore"]["convergence"],
     )
     scheduler = make_naive_exploration_scheduler(config, old_style=old_style)
 
@@ -444,6 +535,13 @@ def workflow_concurrent_learning(
             lmp_config["teacher_model_path"], "pb"
         )
 
+    quota = lmp_config.get("quota")
+    if quota is not None and quota.get("max_candidates") is None:
+        fp_task_max = config["fp_task_max"] if old_style else config["fp"]["task_max"]
+        quota["max_candidates"] = int(
+            math.ceil(quota.get("multiple", 2.0) * fp_task_max)
+        )
+
     fp_config = config.get("fp_config", {}) if old_style else {}
     if old_style:
         potcar_names = config["fp_pp_files"]
@@ -493,6 +591,7 @@ def workflow_concurrent_learning(
 
     optional_parameter = make_optional_parameter(
         config["inputs"]["mixed_type"],
+        novelty_index=None if old_style else config["explore"]["novelty_index"],
     )
 
     # here the scheduler is passed as input parameter to the concurrent_learning_op
@@ -688,7 +787,7 @@ def get_resubmit_keys(
     )
     all_step_keys = sort_slice_ops(
         all_step_keys,
-        ["run-train", "run-lmp", "run-fp"],
+        ["run-train", "run-lmp", "select-confs-map", "run-fp"],
     )
     return all_step_keys
 
@@ -711,7 +810,7 @@ def resubmit_concurrent_learning(
     if list_steps:
         prt_str = print_keys_in_nice_format(
             all_step_keys,
-            ["run-train", "run-lmp", "run-fp"],
+            ["run-train", "run-lmp", "select-confs-map", "run-fp"],
         )
         print(prt_str)
 
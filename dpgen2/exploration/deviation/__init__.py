@@ -1,6 +1,13 @@
+from .deviation_columnar import (
+    DeviManagerColumnar,
+)
 from .deviation_manager import (
     DeviManager,
 )
 from .deviation_std import (
     DeviManagerStd,
 )
+from .model_devi import (
+    calc_model_devi_f,
+    calc_model_devi_v,
+)
@@ -0,0 +1,128 @@
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy as np
+
+from .deviation_manager import (
+    DeviManager,
+)
+
+
+class DeviManagerColumnar(DeviManager):
+    r"""The model deviation manager storing each deviation contiguously.
+
+    Each deviation (e.g. max_devi_f, max_devi_v in file `model_devi.out`)
+    of all trajectories is stored in one one-dimensional array, in which
+    the frames of the trajectories are concatenated in the order they
+    are added. The frames of the ii-th trajectory are found in the slice
+    `offsets[ii]:offsets[ii+1]` of the array, where `offsets` is returned
+    by `get_traj_offsets`.
+
+    The per-trajectory view returned by `get` is the same as that of
+    `DeviManagerStd`, while `get_concat` gives the whole-ensemble array
+    without any copy, so all frames can be processed in one numpy pass.
+
+    Parameters
+    ----------
+    use_float32 : bool
+        Store the deviations in single precision.
+
+    """
+
+    def __init__(
+        self,
+        use_float32: bool = False,
+    ):
+        super().__init__()
+        self.use_float32 = use_float32
+        self.dtype = np.float32 if use_float32 else np.float64
+        self._data: Dict[str, np.ndarray] = {}
+        self._size: Dict[str, int] = {}
+        self._traj_nframes: Dict[str, List[int]] = {}
+
+    def _add(self, name: str, deviation: np.ndarray) -> None:
+        assert isinstance(
+            deviation, np.ndarray
+        ), f"Error: deviation(type: {type(deviation)}) is not a np.ndarray"
+        assert len(deviation.shape) == 1, (
+            f"Error: deviation(shape: {deviation.shape}) is not a "
+            + f"one-dimensional array"
+        )
+
+        if name not in self._data:
+            self._data[name] = np.empty(0, dtype=self.dtype)
+            self._size[name] = 0
+            self._traj_nframes[name] = []
+        size = self._size[name]
+        new_size = size + deviation.shape[0]
+        if new_size > self._data[name].shape[0]:
+            # amortized growth of the buffer
+            capacity = max(new_size, 2 * self._data[name].shape[0])
+            buffer = np.empty(capacity, dtype=self.dtype)
+            buffer[:size] = self._data[name][:size]
+            self._data[name] = buffer
+        self._data[name][size:new_size] = deviation
+        self._size[name] = new_size
+        self._traj_nframes[name].append(deviation.shape[0])
+        self.ntraj = max(self.ntraj, len(self._traj_nframes[name]))
+
+    def _get(self, name: str) -> List[Optional[np.ndarray]]:
+        if self.ntraj == 0:
+            return []
+        elif name not in self._data:
+            return [None for _ in range(self.ntraj)]
+        else:
+            offsets = self._offsets(name)
+            data = self._data[name]
+            return [data[offsets[ii] : offsets[ii + 1]] for ii in range(self.ntraj)]
+
+    def _get_concat(self, name: str) -> Optional[np.ndarray]:
+        if self.ntraj == 0:
+            return np.zeros(0, dtype=self.dtype)
+        elif name not in self._data:
+            return None
+        return self._data[name][: self._size[name]]
+
+    def _get_traj_offsets(self) -> np.ndarray:
+        return self._offsets(DeviManager.MAX_DEVI_F)
+
+    def _offsets(self, name: str) -> np.ndarray:
+        traj_nframes = self._traj_nframes.get(name, [])
+        offsets = np.zeros(len(traj_nframes) + 1, dtype=np.int64)
+        np.cumsum(traj_nframes, out=offsets[1:])
+        return offsets
+
+    def clear(self) -> None:
+        self.__init__(use_float32=self.use_float32)
+        return None
+
+    def shrink(self) -> None:
+        r"""Release the unused capacity of the buffers."""
+        for name in self._data:
+            self._data[name] = self._data[name][: self._size[name]].copy()
+
+    def _check_data(self) -> None:
+        r"""Check if data is valid"""
+        # check if "max_devi_f" exists
+        ref_nframes = self._traj_nframes.get(DeviManager.MAX_DEVI_F, [])
+        assert (
+            len(ref_nframes) == self.ntraj
+        ), f"Error: cannot find model deviation {DeviManager.MAX_DEVI_F}"
+
+        # check if the length of the arrays corresponding to the same
+        # trajectory has the same number of frames
+        for name in self._data:
+            assert len(self._traj_nframes[name]) == self.ntraj, (
+                f"Error: the number of model deviation {name} "
+                + f"({len(self._traj_nframes[name])}) and trajectory files ({self.ntraj}) "
+                + f"are not equal."
+            )
+            assert self._traj_nframes[name] == ref_nframes, (
+                f"Error: the number of frames in {name} is different "
+                + f"with that in {DeviManager.MAX_DEVI_F}.\n"
+                + f"{name}: {self._traj_nframes[name]}\n"
+                + f"{DeviManager.MAX_DEVI_F}: {ref_nframes}\n"
+            )
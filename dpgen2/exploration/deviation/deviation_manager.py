@@ -73,6 +73,78 @@ class DeviManager(ABC):
     def _get(self, name: str) -> List[Optional[np.ndarray]]:
         pass
 
+    def extend(self, other: "DeviManager") -> None:
+        r"""Append the model deviations of the trajectories in another
+        manager, after the trajectories in this manager.
+
+        Parameters
+        ----------
+        other : DeviManager
+            The other manager.
+        """
+        for name in (
+            DeviManager.MAX_DEVI_V,
+            DeviManager.MIN_DEVI_V,
+            DeviManager.AVG_DEVI_V,
+            DeviManager.MAX_DEVI_F,
+            DeviManager.MIN_DEVI_F,
+            DeviManager.AVG_DEVI_F,
+        ):
+            for deviation in other.get(name):
+                if deviation is not None:
+                    self.add(name, deviation)
+
+    def get_concat(self, name: str) -> Optional[np.ndarray]:
+        r"""Get a model deviation of all trajectories as one array.
+
+        The frames of the trajectories are concatenated in the order of
+        the trajectories. The frames of the ii-th trajectory are found in
+        the slice `offsets[ii]:offsets[ii+1]`, where `offsets` is given by
+        `get_traj_offsets`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the deviation.
+
+        Returns
+        -------
+        deviation : np.ndarray or None
+            The concatenated model deviation. `None` if the model deviation
+            is not provided.
+        """
+        self._check_name(name)
+        self._check_data()
+        return self._get_concat(name)
+
+    def _get_concat(self, name: str) -> Optional[np.ndarray]:
+        devis = self._get(name)
+        if len(devis) == 0:
+            return np.zeros(0)
+        elif devis[0] is None:
+            return None
+        else:
+            return np.concatenate(devis)
+
+    def get_traj_offsets(self) -> np.ndarray:
+        r"""Get the offsets of the trajectories in the concatenated
+        model deviations.
+
+        Returns
+        -------
+        offsets : np.ndarray
+            An integer array of length `ntraj + 1`. The frames of the
+            ii-th trajectory are `offsets[ii]:offsets[ii+1]`.
+        """
+        self._check_data()
+        return self._get_traj_offsets()
+
+    def _get_traj_offsets(self) -> np.ndarray:
+        nframes = [ii.shape[0] for ii in self._get(DeviManager.MAX_DEVI_F)]
+        offsets = np.zeros(len(nframes) + 1, dtype=np.int64)
+        np.cumsum(nframes, out=offsets[1:])
+        return offsets
+
     @abstractmethod
     def clear(self) -> None:
         r"""Clear all data in this manager."""
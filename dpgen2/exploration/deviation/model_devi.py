@@ -0,0 +1,54 @@
+from typing import (
+    Tuple,
+)
+
+import numpy as np
+
+
+def calc_model_devi_f(
+    forces: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    r"""Calculate the force model deviation of the frames.
+
+    The model deviation of an atom is the norm of the standard deviation
+    of its force predicted by the models, as defined by deepmd-kit.
+
+    Parameters
+    ----------
+    forces : np.ndarray
+        The forces predicted by the models, of shape
+        `[nmodels, nframes, natoms, 3]`.
+
+    Returns
+    -------
+    max_devi_f, min_devi_f, avg_devi_f : np.ndarray
+        The max, min and average over the atoms of the model deviations,
+        of shape `[nframes]`.
+    """
+    devi = np.linalg.norm(np.std(forces, axis=0), axis=-1)
+    return devi.max(axis=-1), devi.min(axis=-1), devi.mean(axis=-1)
+
+
+def calc_model_devi_v(
+    virials: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    r"""Calculate the virial model deviation of the frames.
+
+    The model deviation of each component of the virial is the standard
+    deviation predicted by the models, as defined by deepmd-kit.
+
+    Parameters
+    ----------
+    virials : np.ndarray
+        The virials predicted by the models, of shape
+        `[nmodels, nframes, 9]`. Should be normalized by the number of
+        atoms to be consistent with the model deviation of LAMMPS.
+
+    Returns
+    -------
+    max_devi_v, min_devi_v, avg_devi_v : np.ndarray
+        The max, min and average of the model deviations of the
+        components, of shape `[nframes]`.
+    """
+    devi = np.std(virials, axis=0)
+    return devi.max(axis=-1), devi.min(axis=-1), np.linalg.norm(devi, axis=-1) / 3
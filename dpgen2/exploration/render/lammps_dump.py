@@ -0,0 +1,393 @@
+import mmap
+import os
+import tempfile
+from pathlib import (
+    Path,
+)
+from typing import (
+    List,
+    Optional,
+    Union,
+)
+
+import dpdata
+import numpy as np
+
+dump_frame_header = b"ITEM: TIMESTEP"
+# the leading columns of the dumps written by dpgen2 explorations,
+# see `make_lmp_input` and `revise_lmp_input_dump`
+dpgen_dump_keys = [b"id", b"type", b"x", b"y", b"z"]
+
+
+def index_lammps_dump(
+    fname: Union[str, Path],
+) -> np.ndarray:
+    r"""Build the byte-offset index of the frames in a LAMMPS dump file.
+
+    The file is scanned once for the `ITEM: TIMESTEP` lines without
+    parsing any frame.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+
+    Returns
+    -------
+    offsets : np.ndarray
+        An integer array of length `nframes + 1`. The ii-th frame is
+        stored in bytes `offsets[ii]:offsets[ii+1]` of the file.
+    """
+    offsets = []
+    with open(fname, "rb") as fp:
+        fsize = os.fstat(fp.fileno()).st_size
+        if fsize > 0:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = mm.find(dump_frame_header)
+                while pos != -1:
+                    # only count the header at the beginning of a line,
+                    # possibly indented as accepted by dpdata
+                    start = mm.rfind(b"\n", 0, pos) + 1
+                    if mm[start:pos].strip(b" \t") == b"":
+                        offsets.append(start)
+                    pos = mm.find(dump_frame_header, pos + len(dump_frame_header))
+    offsets.append(fsize)
+    return np.array(offsets, dtype=np.int64)
+
+
+def lammps_dump_timesteps(
+    fname: Union[str, Path],
+    offsets: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    r"""Read the timesteps of the frames in a LAMMPS dump file.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+    offsets : np.ndarray, optional
+        The byte-offset index of the file given by `index_lammps_dump`.
+        Built from the file if not provided.
+
+    Returns
+    -------
+    steps : np.ndarray
+        The timesteps of the frames.
+    """
+    if offsets is None:
+        offsets = index_lammps_dump(fname)
+    steps = []
+    with open(fname, "rb") as fp:
+        for pos in offsets[:-1]:
+            fp.seek(pos)
+            fp.readline()
+            steps.append(int(fp.readline()))
+    return np.array(steps, dtype=np.int64)
+
+
+def lammps_dump_natoms(
+    fname: Union[str, Path],
+    offsets: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    r"""Read the numbers of atoms of the frames in a LAMMPS dump file.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+    offsets : np.ndarray, optional
+        The byte-offset index of the file given by `index_lammps_dump`.
+        Built from the file if not provided.
+
+    Returns
+    -------
+    natoms : np.ndarray
+        The numbers of atoms of the frames.
+    """
+    if offsets is None:
+        offsets = index_lammps_dump(fname)
+    natoms = []
+    with open(fname, "rb") as fp:
+        for pos in offsets[:-1]:
+            fp.seek(pos)
+            for _ in range(3):
+                fp.readline()
+            natoms.append(int(fp.readline()))
+    return np.array(natoms, dtype=np.int64)
+
+
+def read_lammps_dump_frames(
+    fname: Union[str, Path],
+    frame_ids: List[int],
+    offsets: Optional[np.ndarray] = None,
+) -> bytes:
+    r"""Read the raw text of selected frames from a LAMMPS dump file.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+    frame_ids : List[int]
+        The indexes of the frames to read. The frames are returned
+        in this order.
+    offsets : np.ndarray, optional
+        The byte-offset index of the file given by `index_lammps_dump`.
+        Built from the file if not provided.
+
+    Returns
+    -------
+    text : bytes
+        The text of the selected frames, which is itself a valid
+        LAMMPS dump file.
+    """
+    if offsets is None:
+        offsets = index_lammps_dump(fname)
+    nframes = offsets.shape[0] - 1
+    buff = []
+    with open(fname, "rb") as fp:
+        for ii in frame_ids:
+            if ii < -nframes or ii >= nframes:
+                raise IndexError(
+                    f"frame {ii} is out of range of the {nframes} frames in {fname}"
+                )
+            ii = ii % nframes
+            fp.seek(offsets[ii])
+            frame = fp.read(offsets[ii + 1] - offsets[ii])
+            if not frame.endswith(b"\n"):
+                frame += b"\n"
+            buff.append(frame)
+    return b"".join(buff)
+
+
+def prune_lammps_dump(
+    fname: Union[str, Path],
+    keep: np.ndarray,
+    out_fname: Optional[Union[str, Path]] = None,
+    offsets: Optional[np.ndarray] = None,
+) -> Path:
+    r"""Prune the frames of a LAMMPS dump file.
+
+    The frames that are not kept are replaced by empty frames, i.e.
+    the headers of the frame with zero atoms. The number and the order
+    of the frames are not changed, so the frames are still consistent
+    with the model deviation file, while the size of the pruned frames
+    does not scale with the number of atoms. The kept frames can be
+    read by `read_lammps_dump_frames` and `load_lammps_dump_frames`.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+    keep : np.ndarray
+        Boolean array of length `nframes`, `True` for the kept frames.
+    out_fname : str or Path, optional
+        The pruned dump file. The input file is overwritten if not provided.
+    offsets : np.ndarray, optional
+        The byte-offset index of the file given by `index_lammps_dump`.
+
+    Returns
+    -------
+    out_fname : Path
+        The pruned dump file.
+    """
+    fname = Path(fname)
+    out_fname = Path(out_fname) if out_fname is not None else fname
+    if offsets is None:
+        offsets = index_lammps_dump(fname)
+    nframes = offsets.shape[0] - 1
+    keep = np.asarray(keep, dtype=bool)
+    if keep.shape != (nframes,):
+        raise RuntimeError(
+            f"the length of keep ({keep.shape[0]}) is not equal to "
+            f"the number of frames ({nframes}) in {fname}"
+        )
+    tmp_fname = out_fname.with_name(out_fname.name + ".prune.tmp")
+    with open(fname, "rb") as fin, open(tmp_fname, "wb") as fout:
+        for ii in range(nframes):
+            fin.seek(offsets[ii])
+            if keep[ii]:
+                frame = fin.read(offsets[ii + 1] - offsets[ii])
+                if not frame.endswith(b"\n"):
+                    frame += b"\n"
+            else:
+                # the 9 header lines of the frame, with zero atoms
+                head = []
+                for _ in range(9):
+                    head.append(fin.readline().rstrip(b"\n"))
+                head[3] = b"0"
+                frame = b"\n".join(head) + b"\n"
+            fout.write(frame)
+    os.replace(tmp_fname, out_fname)
+    return out_fname
+
+
+def parse_dpgen_lammps_dump(
+    text: bytes,
+    type_map: Optional[List[str]] = None,
+) -> Optional[dict]:
+    r"""Parse LAMMPS dump text written in the fixed layout of dpgen2.
+
+    The layout is the one of `dump ... custom ... id type x y z [...]`:
+    every frame has the same number of atoms, the same box and atom
+    headers, and the atom lines start with the columns `id type x y z`.
+    All frames are parsed at once with numpy, the atoms are sorted by
+    `id` and the cells are built from the box bounds and tilts in one
+    vectorized pass. The returned data is the same as that given by
+    the `lammps/dump` format of dpdata.
+
+    Parameters
+    ----------
+    text : bytes
+        The text of the dump file.
+    type_map : List[str], optional
+        The type map.
+
+    Returns
+    -------
+    data : dict or None
+        The dpdata system data, or `None` if the text is not in the
+        fixed layout. The caller should fall back to dpdata in this case.
+    """
+    lines = text.splitlines()
+    while len(lines) > 0 and lines[-1].strip() == b"":
+        lines.pop()
+    if len(lines) < 9:
+        return None
+    try:
+        natoms = int(lines[3])
+    except ValueError:
+        return None
+    nlines = natoms + 9
+    if natoms <= 0 or len(lines) % nlines != 0:
+        return None
+    nframes = len(lines) // nlines
+    frames = np.empty(len(lines), dtype=object)
+    frames[:] = lines
+    frames = frames.reshape(nframes, nlines)
+
+    # all frames share the same headers
+    heads = []
+    for ii in [0, 2, 3, 4, 8]:
+        head = {ll.strip() for ll in frames[:, ii].tolist()}
+        if len(head) != 1:
+            return None
+        heads.append(head.pop())
+    if (
+        heads[0] != dump_frame_header
+        or heads[1] != b"ITEM: NUMBER OF ATOMS"
+        or not heads[3].startswith(b"ITEM: BOX BOUNDS")
+        or not heads[4].startswith(b"ITEM: ATOMS")
+    ):
+        return None
+    keys = heads[4].split()[2:]
+    if keys[: len(dpgen_dump_keys)] != dpgen_dump_keys:
+        return None
+    has_tilt = b"xy xz yz" in heads[3]
+
+    try:
+        box = np.loadtxt(frames[:, 5:8].ravel().tolist(), ndmin=2)
+        atoms = np.loadtxt(
+            frames[:, 9:].ravel().tolist(),
+            usecols=range(len(dpgen_dump_keys)),
+            ndmin=2,
+        )
+    except ValueError:
+        return None
+    if box.shape[1] < (3 if has_tilt else 2):
+        return None
+    box = box.reshape(nframes, 3, -1)
+    atoms = atoms.reshape(nframes, natoms, len(dpgen_dump_keys))
+
+    # sort the atoms by id
+    order = np.argsort(atoms[:, :, 0], axis=1, kind="stable")
+    atoms = np.take_along_axis(atoms, order[:, :, None], axis=1)
+    atype = atoms[:, :, 1].astype(int)
+    if not (atype == atype[0]).all():
+        return None
+    atype = atype[0]
+    if atype.min() < 1:
+        return None
+    ntypes = atype.max()
+
+    # the cells, see `dumpbox2box` of dpdata
+    tilt = box[:, :, 2] if has_tilt else np.zeros((nframes, 3))
+    xy, xz, yz = tilt[:, 0], tilt[:, 1], tilt[:, 2]
+    zeros = np.zeros(nframes)
+    lo = box[:, :, 0].copy()
+    hi = box[:, :, 1].copy()
+    lo[:, 0] -= np.min([zeros, xy, xz, xy + xz], axis=0)
+    hi[:, 0] -= np.max([zeros, xy, xz, xy + xz], axis=0)
+    lo[:, 1] -= np.minimum(zeros, yz)
+    hi[:, 1] -= np.maximum(zeros, yz)
+    cells = np.zeros((nframes, 3, 3))
+    cells[:, [0, 1, 2], [0, 1, 2]] = hi - lo
+    cells[:, 1, 0] = xy
+    cells[:, 2, 0] = xz
+    cells[:, 2, 1] = yz
+    # wrap the atoms into the cells with the origins shifted to zero
+    scaled = (atoms[:, :, 2:5] - lo[:, None, :]) @ np.linalg.inv(cells)
+    coords = (scaled % 1) @ cells
+
+    atom_numbs = np.bincount(atype, minlength=ntypes + 1)[1:].tolist()
+    if type_map is None:
+        atom_names = ["TYPE_%d" % ii for ii in range(ntypes)]
+    else:
+        assert len(type_map) >= ntypes
+        atom_names = list(type_map[:ntypes])
+    return {
+        "atom_numbs": atom_numbs,
+        "atom_names": atom_names,
+        "atom_types": atype - 1,
+        "orig": np.zeros(3),
+        "cells": cells,
+        "coords": coords,
+    }
+
+
+def load_lammps_dump_frames(
+    fname: Union[str, Path],
+    frame_ids: List[int],
+    type_map: Optional[List[str]] = None,
+    offsets: Optional[np.ndarray] = None,
+    use_fast_parser: bool = True,
+) -> dpdata.System:
+    r"""Load selected frames from a LAMMPS dump file.
+
+    Only the selected frames are read and parsed, so the cost scales
+    with the number of selected frames rather than with the length of
+    the trajectory. The result is the same as
+    `dpdata.System(fname, fmt="lammps/dump", type_map=type_map).sub_system(frame_ids)`.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The LAMMPS dump file.
+    frame_ids : List[int]
+        The indexes of the frames to load.
+    type_map : List[str], optional
+        The type map.
+    offsets : np.ndarray, optional
+        The byte-offset index of the file given by `index_lammps_dump`.
+    use_fast_parser : bool
+        Parse the frames by `parse_dpgen_lammps_dump`. The generic
+        dpdata reader is used if the frames are not in the fixed
+        layout of dpgen2 or if this option is `False`.
+
+    Returns
+    -------
+    system : dpdata.System
+        The selected frames.
+    """
+    text = read_lammps_dump_frames(fname, frame_ids, offsets=offsets)
+    if use_fast_parser:
+        data = parse_dpgen_lammps_dump(text, type_map=type_map)
+        if data is not None:
+            ss = dpdata.System(data=data)
+            if type_map is not None:
+                ss.apply_type_map(type_map)
+            return ss
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp_fname = Path(tmpdir) / Path(fname).name
+        tmp_fname.write_bytes(text)
+        ss = dpdata.System(tmp_fname, fmt="lammps/dump", type_map=type_map)
+    return ss
@@ -64,6 +64,9 @@ class TrajRender(ABC):
             from the ii-th trajectory. id_selected[ii] may be an empty list.
         type_map : List[str]
             The type map.
+        conf_filters : ConfFilters, optional
+            The configuration filters. The selected frames that do not
+            pass the filters are dropped.
 
         Returns
         -------
@@ -71,3 +74,53 @@ class TrajRender(ABC):
             The configurations in dpdata.MultiSystems format
         """
         pass
+
+    def get_systems(
+        self,
+        traj: List[Path],
+        id_selected: List[List[int]],
+        type_map: Optional[List[str]] = None,
+        conf_filters: Optional["ConfFilters"] = None,
+    ) -> List[Tuple[Optional[dpdata.System], List[int]]]:
+        r"""Get the configurations of each trajectory by selection, and
+        the indexes of the frames that pass the filters.
+
+        Parameters
+        ----------
+        traj : List[Path]
+            Trajectory files
+        id_selected : List[List[int]]
+            The selected frames. id_selected[ii][jj] is the jj-th selected frame
+            from the ii-th trajectory. id_selected[ii] may be an empty list.
+        type_map : List[str]
+            The type map.
+        conf_filters : ConfFilters, optional
+            The configuration filters. The selected frames that do not
+            pass the filters are dropped.
+
+        Returns
+        -------
+        systems : List[Tuple[Optional[dpdata.System], List[int]]]
+            For each trajectory, the kept frames, or None if no frame is
+            selected, and their indexes in the trajectory.
+        """
+        ret = []
+        for tt, ids in zip(traj, id_selected):
+            if len(ids) == 0:
+                ret.append((None, []))
+                continue
+            ss = list(self.get_confs([tt], [ids], type_map).systems.values())[0]
+            ret.append(_check_frames(ss, ids, conf_filters))
+        return ret
+
+
+def _check_frames(
+    ss: dpdata.System,
+    ids: List[int],
+    conf_filters: Optional["ConfFilters"] = None,
+) -> Tuple[dpdata.System, List[int]]:
+    r"""Drop the frames that do not pass the filters."""
+    if conf_filters is None:
+        return ss, list(ids)
+    keep = np.flatnonzero(conf_filters.check_frames(ss))
+    return ss.sub_system(keep), np.asarray(ids)[keep].tolist()
@@ -1,8 +1,13 @@
+import warnings
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
 from pathlib import (
     Path,
 )
 from typing import (
     TYPE_CHECKING,
+    Dict,
     List,
     Optional,
     Tuple,
@@ -14,10 +19,15 @@ import numpy as np
 
 from ..deviation import (
     DeviManager,
+    DeviManagerColumnar,
     DeviManagerStd,
 )
+from .lammps_dump import (
+    load_lammps_dump_frames,
+)
 from .traj_render import (
     TrajRender,
+    _check_frames,
 )
 
 if TYPE_CHECKING:
@@ -25,34 +35,287 @@ if TYPE_CHECKING:
         ConfFilters,
     )
 
+# the column index of each model deviation in the LAMMPS `model_devi.out`
+model_devi_columns = {
+    DeviManager.MAX_DEVI_V: 1,
+    DeviManager.MIN_DEVI_V: 2,
+    DeviManager.AVG_DEVI_V: 3,
+    DeviManager.MAX_DEVI_F: 4,
+    DeviManager.MIN_DEVI_F: 5,
+    DeviManager.AVG_DEVI_F: 6,
+}
+
+
+def read_model_devi(
+    fname: Union[str, Path],
+    names: Optional[List[str]] = None,
+    dtype=np.float64,
+    chunk_size: int = 65536,
+) -> Dict[str, np.ndarray]:
+    r"""Read selected columns from a LAMMPS model deviation file.
+
+    The file is parsed in chunks of `chunk_size` rows, and only the
+    requested columns are kept, so the peak memory is bounded by
+    the chunk rather than by the full 7-column table.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The model deviation file.
+    names : List[str], optional
+        The names of the model deviations to read. Should be keys of
+        `model_devi_columns`. If `None`, all model deviations are read.
+    dtype
+        The data type of the returned arrays.
+    chunk_size : int
+        The number of rows parsed at a time.
+
+    Returns
+    -------
+    model_devis : Dict[str, np.ndarray]
+        The one-dimensional model deviation arrays keyed by the names.
+    """
+    if names is None:
+        names = list(model_devi_columns.keys())
+    dd = _read_model_devi_columns(
+        fname, [model_devi_columns[ii] for ii in names], dtype, chunk_size
+    )
+    return {name: np.ascontiguousarray(dd[:, ii]) for ii, name in enumerate(names)}
+
+
+def _read_model_devi_columns(
+    fname: Union[str, Path],
+    usecols: List[int],
+    dtype=np.float64,
+    chunk_size: int = 65536,
+) -> np.ndarray:
+    chunks = []
+    with open(fname) as fp, warnings.catch_warnings():
+        # numpy >= 1.23 warns about comment lines and on the empty
+        # trailing chunk, both are expected here.
+        warnings.simplefilter("ignore", UserWarning)
+        while True:
+            dd = np.loadtxt(
+                fp,
+                usecols=usecols,
+                dtype=dtype,
+                max_rows=chunk_size,
+                ndmin=2,
+            )
+            if dd.shape[0] == 0:
+                break
+            chunks.append(dd)
+    if len(chunks) == 0:
+        return np.zeros((0, len(usecols)), dtype=dtype)
+    return np.concatenate(chunks, axis=0)
+
+
+def write_model_devi_npy(
+    fname: Union[str, Path],
+    npy_fname: Union[str, Path],
+    names: Optional[List[str]] = None,
+) -> Path:
+    r"""Convert a LAMMPS model deviation file to a binary `.npy` file.
+
+    The `.npy` file stores a structured array of the step and the
+    model deviations `names` of each frame in double precision, so it
+    can be memory-mapped by `load_model_devi_npy` without changing any
+    value. With the default `names`, a frame takes 24 bytes, about a
+    fourth of a line of the text file.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The model deviation file.
+    npy_fname : str or Path
+        The `.npy` file to write.
+    names : List[str], optional
+        The names of the stored model deviations. Defaults to
+        `max_devi_v` and `max_devi_f`, the only ones used by the reports.
+
+    Returns
+    -------
+    npy_fname : Path
+        The written `.npy` file.
+    """
+    if names is None:
+        names = [DeviManager.MAX_DEVI_V, DeviManager.MAX_DEVI_F]
+    dd = _read_model_devi_columns(fname, [0] + [model_devi_columns[ii] for ii in names])
+    ret = np.zeros(
+        dd.shape[0], dtype=[("step", np.int64)] + [(ii, np.float64) for ii in names]
+    )
+    ret["step"] = dd[:, 0]
+    for ii, name in enumerate(names):
+        ret[name] = dd[:, ii + 1]
+    np.save(npy_fname, ret)
+    return Path(npy_fname)
+
+
+def find_model_devi_npy(
+    fname: Union[str, Path],
+) -> Optional[Path]:
+    r"""Find the binary `.npy` model deviation file of `fname`.
+
+    Returns `fname` itself if it is a `.npy` file, the `.npy` sidecar
+    next to `fname` if it exists, otherwise `None`.
+    """
+    fname = Path(fname)
+    if fname.suffix == ".npy":
+        return fname
+    npy_fname = fname.with_suffix(".npy")
+    if npy_fname.is_file():
+        return npy_fname
+    return None
+
+
+def load_model_devi_npy(
+    fname: Union[str, Path],
+    names: Optional[List[str]] = None,
+    dtype=np.float64,
+) -> Dict[str, np.ndarray]:
+    r"""Load selected columns from a binary `.npy` model deviation file.
+
+    The file is memory-mapped. The returned arrays are views of the
+    mapped file if `dtype` is the stored data type.
+
+    Parameters
+    ----------
+    fname : str or Path
+        The `.npy` file written by `write_model_devi_npy`.
+    names : List[str], optional
+        The names of the model deviations to load. If `None`, all the
+        stored model deviations are loaded.
+    dtype
+        The data type of the returned arrays.
+
+    Returns
+    -------
+    model_devis : Dict[str, np.ndarray]
+        The one-dimensional model deviation arrays keyed by the names.
+    """
+    dd = np.load(fname, mmap_mode="r")
+    if dd.dtype.names is None:
+        # the (nframes x 7) table written by the previous versions
+        if names is None:
+            names = list(model_devi_columns.keys())
+        return {
+            name: dd[:, model_devi_columns[name]].astype(dtype, copy=False)
+            for name in names
+        }
+    stored = [ii for ii in dd.dtype.names if ii != "step"]
+    if names is None:
+        names = stored
+    missing = [ii for ii in names if ii not in stored]
+    if len(missing) > 0:
+        raise RuntimeError(
+            f"the model deviations {missing} are not stored in {fname}, "
+            f"only {stored} are stored"
+        )
+    return {name: dd[name].astype(dtype, copy=False) for name in names}
+
 
 class TrajRenderLammps(TrajRender):
+    r"""Render the LAMMPS trajectories and model deviation files.
+
+    Parameters
+    ----------
+    nopbc : bool
+        If the output configurations have no periodic boundary condition.
+    use_fast_reader : bool
+        Read the model deviation files by the chunked, column-selective
+        reader `read_model_devi`. Otherwise the whole file is loaded
+        by `np.loadtxt`. In both cases a binary `.npy` model deviation
+        file (see `RunLmp`) is memory-mapped instead when present.
+    model_devi_names : List[str], optional
+        The model deviations read by the fast reader. Defaults to
+        `max_devi_v` and `max_devi_f`, the only ones used by the reports.
+    use_float32 : bool
+        Store the model deviations read by the fast reader in single precision.
+    columnar_devi : bool
+        Store the model deviations in a `DeviManagerColumnar`, in which
+        each deviation of all trajectories is one contiguous array, which
+        the reports classify in one pass without copying. Otherwise a
+        `DeviManagerStd` is used, of which the arrays are concatenated
+        by the reports.
+    use_dump_index : bool
+        Extract the selected frames by seeking to them through a
+        byte-offset index of the dump file, so only the selected frames
+        are parsed. Otherwise the whole trajectory is parsed.
+    use_fast_dump_parser : bool
+        Parse the selected frames by the vectorized parser of the fixed
+        dump layout written by dpgen2 (`id type x y z ...`). Dumps in
+        any other layout are parsed by dpdata. Only used with `use_dump_index`.
+    max_workers : int, optional
+        The maximal number of worker processes that parse the model
+        deviation files and extract the selected frames concurrently.
+        The trajectories are processed serially if `None` or 1. The
+        results are always merged in the order of the trajectories.
+    """
+
     def __init__(
         self,
         nopbc: bool = False,
+        use_fast_reader: bool = True,
+        model_devi_names: Optional[List[str]] = None,
+        use_float32: bool = False,
+        columnar_devi: bool = False,
+        use_dump_index: bool = True,
+        use_fast_dump_parser: bool = True,
+        max_workers: Optional[int] = None,
     ):
         self.nopbc = nopbc
+        self.use_fast_reader = use_fast_reader
+        if model_devi_names is None:
+            model_devi_names = [DeviManager.MAX_DEVI_V, DeviManager.MAX_DEVI_F]
+        self.model_devi_names = model_devi_names
+        self.use_float32 = use_float32
+        self.columnar_devi = columnar_devi
+        self.use_dump_index = use_dump_index
+        self.use_fast_dump_parser = use_fast_dump_parser
+        self.max_workers = max_workers
+
+    def _map(self, func, *iterables) -> list:
+        r"""Map `func` over the trajectories, in a process pool if
+        `max_workers` > 1. The results keep the order of the inputs."""
+        if self.max_workers is None or self.max_workers <= 1:
+            return list(map(func, *iterables))
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, *iterables))
 
     def get_model_devi(
         self,
         files: List[Path],
     ) -> DeviManager:
-        ntraj = len(files)
+        if self.use_fast_reader:
+            load_one = self._load_one_model_devi_fast
+        else:
+            load_one = self._load_one_model_devi
 
-        model_devi = DeviManagerStd()
-        for ii in range(ntraj):
-            self._load_one_model_devi(files[ii], model_devi)
+        if self.columnar_devi:
+            model_devi = DeviManagerColumnar(use_float32=self.use_float32)
+        else:
+            model_devi = DeviManagerStd()
+        for dd in self._map(load_one, files):
+            for name, value in dd.items():
+                model_devi.add(name, value)
+        if self.columnar_devi:
+            model_devi.shrink()
 
         return model_devi
 
-    def _load_one_model_devi(self, fname, model_devi):
+    def _load_one_model_devi(self, fname) -> Dict[str, np.ndarray]:
+        npy_fname = find_model_devi_npy(fname)
+        if npy_fname is not None:
+            return load_model_devi_npy(npy_fname)
         dd = np.loadtxt(fname)
-        model_devi.add(DeviManager.MAX_DEVI_V, dd[:, 1])
-        model_devi.add(DeviManager.MIN_DEVI_V, dd[:, 2])
-        model_devi.add(DeviManager.AVG_DEVI_V, dd[:, 3])
-        model_devi.add(DeviManager.MAX_DEVI_F, dd[:, 4])
-        model_devi.add(DeviManager.MIN_DEVI_F, dd[:, 5])
-        model_devi.add(DeviManager.AVG_DEVI_F, dd[:, 6])
+        return {name: dd[:, col] for name, col in model_devi_columns.items()}
+
+    def _load_one_model_devi_fast(self, fname) -> Dict[str, np.ndarray]:
+        dtype = np.float32 if self.use_float32 else np.float64
+        npy_fname = find_model_devi_npy(fname)
+        if npy_fname is not None:
+            return load_model_devi_npy(npy_fname, self.model_devi_names, dtype=dtype)
+        return read_model_devi(fname, self.model_devi_names, dtype=dtype)
 
     def get_confs(
         self,
@@ -61,14 +324,62 @@ class TrajRenderLammps(TrajRender):
         type_map: Optional[List[str]] = None,
         conf_filters: Optional["ConfFilters"] = None,
     ) -> dpdata.MultiSystems:
-        del conf_filters  # by far does not support conf filters
-        ntraj = len(trajs)
-        traj_fmt = "lammps/dump"
         ms = dpdata.MultiSystems(type_map=type_map)
-        for ii in range(ntraj):
-            if len(id_selected[ii]) > 0:
-                ss = dpdata.System(trajs[ii], fmt=traj_fmt, type_map=type_map)
-                ss.nopbc = self.nopbc
-                ss = ss.sub_system(id_selected[ii])
+        for ss, _ in self.get_systems(trajs, id_selected, type_map, conf_filters):
+            if ss is not None and ss.get_nframes() > 0:
                 ms.append(ss)
         return ms
+
+    def get_systems(
+        self,
+        trajs: List[Path],
+        id_selected: List[List[int]],
+        type_map: Optional[List[str]] = None,
+        conf_filters: Optional["ConfFilters"] = None,
+    ) -> List[Tuple[Optional[dpdata.System], List[int]]]:
+        ntraj = len(trajs)
+        sel_idx = [ii for ii in range(ntraj) if len(id_selected[ii]) > 0]
+        nsel = len(sel_idx)
+        ret = [(None, []) for _ in range(ntraj)]
+        for ii, rr in zip(
+            sel_idx,
+            self._map(
+                self._load_one_conf,
+                [trajs[ii] for ii in sel_idx],
+                [id_selected[ii] for ii in sel_idx],
+                [type_map] * nsel,
+                [conf_filters] * nsel,
+            ),
+        ):
+            ret[ii] = rr
+        return ret
+
+    def _load_one_conf(
+        self,
+        traj: Path,
+        id_selected: List[int],
+        type_map: Optional[List[str]] = None,
+        conf_filters: Optional["ConfFilters"] = None,
+    ) -> Tuple[dpdata.System, List[int]]:
+        ss = self._load_one_traj(traj, id_selected, type_map)
+        return _check_frames(ss, id_selected, conf_filters)
+
+    def _load_one_traj(
+        self,
+        traj: Path,
+        id_selected: List[int],
+        type_map: Optional[List[str]] = None,
+    ) -> dpdata.System:
+        if self.use_dump_index:
+            ss = load_lammps_dump_frames(
+                traj,
+                id_selected,
+                type_map=type_map,
+                use_fast_parser=self.use_fast_dump_parser,
+            )
+            ss.nopbc = self.nopbc
+            return ss
+        traj_fmt = "lammps/dump"
+        ss = dpdata.System(traj, fmt=traj_fmt, type_map=type_map)
+        ss.nopbc = self.nopbc
+        return ss.sub_system(id_selected)
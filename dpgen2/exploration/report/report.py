@@ -15,7 +15,59 @@ from ..deviation import (
 )
 
 
+def devi_histogram(
+    md: np.ndarray,
+    edges: np.ndarray,
+) -> np.ndarray:
+    r"""The histogram of the model deviations in fixed bins. The model
+    deviations larger than the last edge are counted in the last bin,
+    the nan values are not counted."""
+    md = md[~np.isnan(md)]
+    idx = np.searchsorted(edges, md, side="right") - 1
+    idx = np.clip(idx, 0, edges.size - 2)
+    return np.bincount(idx, minlength=edges.size - 1)
+
+
+def sample_candidates(
+    numb_cand: np.ndarray,
+    max_nframes: int,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    r"""Uniformly sample `max_nframes` candidates without replacement.
+
+    The candidates are only given by their numbers in the trajectories,
+    so the cost is O(`max_nframes`) rather than the total number of
+    candidates.
+
+    Parameters
+    ----------
+    numb_cand : np.ndarray
+        The number of candidates of each trajectory.
+    max_nframes : int
+        The number of sampled candidates.
+    rng : np.random.Generator
+        The random number generator.
+
+    Returns
+    -------
+    traj_idx : np.ndarray
+        The trajectory index of the sampled candidates.
+    cand_idx : np.ndarray
+        The index of the sampled candidates among the candidates of
+        the trajectory. The candidates are sorted by (traj_idx, cand_idx).
+    """
+    numb_cand = np.asarray(numb_cand, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(numb_cand)])
+    max_nframes = min(max_nframes, offsets[-1])
+    sel = np.sort(rng.choice(offsets[-1], size=max_nframes, replace=False))
+    traj_idx = np.searchsorted(offsets, sel, side="right") - 1
+    return traj_idx, sel - offsets[traj_idx]
+
+
 class ExplorationReport(ABC):
+    # the number of bins of the model deviation histograms
+    hist_nbins = 50
+
     @abstractmethod
     def clear(self):
         r"""Clear the report"""
@@ -41,6 +93,91 @@ class ExplorationReport(ABC):
         """
         pass
 
+    def record_chunk(
+        self,
+        model_devi: DeviManager,
+        max_nframes: Optional[int] = None,
+    ):
+        r"""Record the model deviations of a chunk of trajectories in
+        the streaming mode.
+
+        The chunks are recorded in the order of the trajectories. Only
+        the statistics of the frames and at most `max_nframes` candidates
+        are kept, so the memory does not grow with the number of
+        recorded frames. The candidates are given by `get_candidate_ids`
+        after all chunks are recorded.
+
+        Parameters
+        ----------
+        model_devi : DeviManager
+            The model deviations of the trajectories in the chunk.
+        max_nframes
+            The maximal number of frames of candidates.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the streaming mode"
+        )
+
+    def merge(
+        self,
+        reports: List["ExplorationReport"],
+        max_nframes: Optional[int] = None,
+    ):
+        r"""Record the partial reports of consecutive subsets of the
+        trajectories, as if the trajectories were recorded in chunks.
+
+        The partial reports are given by `record_chunk` on the subsets,
+        in the order of the trajectories. They keep only the statistics
+        of the frames and a bounded set of candidates, so only those are
+        merged. The candidates are given by `get_candidate_ids` after
+        merging.
+
+        Parameters
+        ----------
+        reports : List[ExplorationReport]
+            The partial reports.
+        max_nframes
+            The maximal number of frames of candidates.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support merging the reports"
+        )
+
+    def _merge_histograms(
+        self,
+        other: "ExplorationReport",
+    ):
+        r"""Add the model deviation histograms of another report."""
+        if other.hist_f is not None:
+            if self.hist_f is None:
+                self.hist_edges_f = other.hist_edges_f
+                self.hist_f = np.zeros_like(other.hist_f)
+            self.hist_f += other.hist_f
+        if other.hist_v is not None:
+            if self.hist_v is None:
+                self.hist_edges_v = other.hist_edges_v
+                self.hist_v = np.zeros_like(other.hist_v)
+            self.hist_v += other.hist_v
+
+    def compact(
+        self,
+        candidate_ids: List[List[int]],
+    ):
+        r"""Drop the per-frame data after the candidates are selected.
+
+        Only the statistics of the frames, the trust levels, the model
+        deviation histograms and the selected candidates are kept, so the
+        size of the report does not grow with the number of frames.
+        After compacting, `get_candidate_ids` returns `candidate_ids`.
+        By default nothing is dropped.
+
+        Parameters
+        ----------
+        candidate_ids : List[List[int]]
+            The selected candidates, as returned by `get_candidate_ids`.
+        """
+        pass
+
     @abstractmethod
     def converged(
         self,
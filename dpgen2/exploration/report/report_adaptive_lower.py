@@ -1,8 +1,8 @@
-import random
 import sys
 from typing import (
     List,
     Optional,
+    Set,
     Tuple,
 )
 
@@ -17,8 +17,10 @@ from dflow.python import (
 from ..deviation import (
     DeviManager,
 )
-from . import (
+from .report import (
     ExplorationReport,
+    devi_histogram,
+    sample_candidates,
 )
 
 
@@ -62,6 +64,8 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         The number of steps to check the convergence.
     conv_tolerance      float
         The convergence tolerance.
+    seed                int
+        The seed of the random selection of the candidates.
     """
 
     def __init__(
@@ -74,6 +78,7 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         rate_candi_v: float = 0.0,
         n_checked_steps: int = 2,
         conv_tolerance: float = 0.05,
+        seed: Optional[int] = None,
     ):
         self.level_f_hi = level_f_hi
         self.level_v_hi = level_v_hi
@@ -88,6 +93,7 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
             self.rate_candi_v = 0.0
         self.n_checked_steps = n_checked_steps
         self.conv_tolerance = conv_tolerance
+        self.seed = seed
         self.model_devi = None
         self.clear()
 
@@ -123,6 +129,11 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         doc_rate_candi_v = "The ratio of virial frames that has a model deviation lower than `level_v_hi` treated as candidate."
         doc_n_check_steps = "The number of steps to check the convergence."
         doc_conv_tolerance = "The convergence tolerance."
+        doc_seed = (
+            "The seed of the random selection of the candidates. "
+            "The same candidates are selected from the same trajectories "
+            "if the seed is given, so that the selection can be reproduced."
+        )
         return [
             Argument(
                 "level_f_hi", float, optional=True, default=0.5, doc=doc_level_f_hi
@@ -152,6 +163,7 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
                 default=0.05,
                 doc=doc_conv_tolerance,
             ),
+            Argument("seed", int, optional=True, default=None, doc=doc_seed),
         ]
 
     def clear(
@@ -160,10 +172,42 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         self.ntraj = 0
         self.nframes = 0
         self.candi = set()
-        self.accur = set()
-        self.failed = []
+        # the (traj_idx, frame_idx) of the non-failed and failed frames,
+        # one array for each recording
+        self.valid_ids = []
+        self.failed_ids = []
+        self.numb_valid = 0
+        self.numb_failed = 0
+        self.numb_candi = 0
         self.candi_picked = []
         self.model_devi = None
+        # the top frames of each chunk kept by `record_chunk`: the
+        # (traj_idx, frame_idx) and the force and virial model deviations
+        self.stream_ids = None
+        self.stream_f = None
+        self.stream_v = None
+        # the model deviation histograms, see `_add_histogram`
+        self.hist_f = None
+        self.hist_v = None
+        self.compacted = False
+        # the random number generator, created from the seed on demand
+        self.rng = None
+
+    @property
+    def accur(self) -> Set[Tuple[int, int]]:
+        r"""The accurate frames, i.e. the non-failed frames that are not candidates."""
+        ret = set()
+        for ids in self.valid_ids:
+            ret = ret.union(map(tuple, ids.tolist()))
+        return ret - self.candi
+
+    @property
+    def failed(self) -> List[Tuple[int, int]]:
+        r"""The failed frames."""
+        ret = []
+        for ids in self.failed_ids:
+            ret += list(map(tuple, ids.tolist()))
+        return ret
 
     def record(
         self,
@@ -171,26 +215,32 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
     ):
         ntraj = model_devi.ntraj
         self.ntraj += ntraj
-        md_f = model_devi.get(DeviManager.MAX_DEVI_F)
-        md_v = model_devi.get(DeviManager.MAX_DEVI_V)
-
-        # inits
-        coll_f = []
-        coll_v = []
-        # loop over trajs
-        for ii in range(ntraj):
-            add_nframes, add_accur, add_failed, add_f, add_v = self._record_one_traj(
-                ii, md_f[ii], md_v[ii]
-            )
-            self.nframes += add_nframes
-            self.accur = self.accur.union(add_accur)
-            self.failed += add_failed
-            coll_f += add_f
-            coll_v += add_v
-        # sort
-        coll_f.sort()
-        coll_v.sort()
-        assert len(coll_v) == len(coll_f)
+        # the frames of all the trajectories in one pass
+        coll_f = model_devi.get_concat(DeviManager.MAX_DEVI_F)
+        coll_v = model_devi.get_concat(DeviManager.MAX_DEVI_V)
+        offsets = model_devi.get_traj_offsets()
+        coll_f, coll_v = self._check_devi(coll_f, coll_v)
+        nframes = np.diff(offsets)
+        coll_ids = np.stack(
+            [
+                np.repeat(np.arange(ntraj, dtype=np.int64), nframes),
+                np.arange(coll_f.size, dtype=np.int64)
+                - np.repeat(offsets[:-1], nframes),
+            ],
+            axis=1,
+        )
+        failed = np.logical_or(coll_f > self.level_f_hi, coll_v > self.level_v_hi)
+        self.nframes += coll_f.size
+        self._add_histogram(coll_f, coll_v)
+        self.failed_ids.append(coll_ids[failed])
+        self.numb_failed += np.count_nonzero(failed)
+        # the non-failed frames, in the order of (traj_idx, frame_idx)
+        valid = np.logical_not(failed)
+        coll_f = coll_f[valid]
+        coll_v = coll_v[valid]
+        coll_ids = coll_ids[valid]
+        self.valid_ids.append(coll_ids)
+        self.numb_valid += coll_ids.shape[0]
         # calcuate numbers
         numb_candi_f = max(self.numb_candi_f, int(self.rate_candi_f * len(coll_f)))
         numb_candi_v = max(self.numb_candi_v, int(self.rate_candi_v * len(coll_v)))
@@ -199,36 +249,157 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
             numb_candi_f = len(coll_f)
         if len(coll_v) < numb_candi_v:
             numb_candi_v = len(coll_v)
+        top_f = _top_k(coll_f, numb_candi_f)
+        top_v = _top_k(coll_v, numb_candi_v)
         # compute trust lo
         if numb_candi_v == 0:
             self.level_v_lo = self.level_v_hi
         else:
-            self.level_v_lo = coll_v[-numb_candi_v][0]
+            self.level_v_lo = coll_v[top_v[0]]
         if not self.has_virial:
             self.level_v_lo = None
         if numb_candi_f == 0:
             self.level_f_lo = self.level_f_hi
         else:
-            self.level_f_lo = coll_f[-numb_candi_f][0]
+            self.level_f_lo = coll_f[top_f[0]]
         # add to candidate set
-        for ii in range(len(coll_f) - numb_candi_f, len(coll_f)):
-            self.candi.add(tuple(coll_f[ii][1:]))
-        for ii in range(len(coll_v) - numb_candi_v, len(coll_v)):
-            self.candi.add(tuple(coll_v[ii][1:]))
-        # accurate set is substracted by the candidate set
-        self.accur = self.accur - self.candi
+        for ii in coll_ids[top_f].tolist():
+            self.candi.add(tuple(ii))
+        for ii in coll_ids[top_v].tolist():
+            self.candi.add(tuple(ii))
+        self.numb_candi = len(self.candi)
         self.model_devi = model_devi
 
-    def _record_one_traj(
+    def record_chunk(
+        self,
+        model_devi: DeviManager,
+        max_nframes: Optional[int] = None,
+    ):
+        r"""Record the model deviations of a chunk of trajectories.
+
+        Only the statistics of the frames and the top candidates of the
+        chunk, i.e. the frames with the largest model deviations counted
+        as in `record`, are kept. If `rate_candi_f` or `rate_candi_v` is
+        set, the number of candidates depends on the number of the
+        non-failed frames of all the chunks, so all the non-failed frames
+        are kept. The candidates and the lower trust levels are the same
+        as those given by `record` on all the trajectories. `max_nframes`
+        is not used.
+        """
+        ntraj = model_devi.ntraj
+        md_f, md_v = self._check_devi(
+            model_devi.get_concat(DeviManager.MAX_DEVI_F),
+            model_devi.get_concat(DeviManager.MAX_DEVI_V),
+        )
+        offsets = model_devi.get_traj_offsets()
+        nframes = np.diff(offsets)
+        ids = np.stack(
+            [
+                np.repeat(np.arange(ntraj, dtype=np.int64), nframes) + self.ntraj,
+                np.arange(md_f.size, dtype=np.int64) - np.repeat(offsets[:-1], nframes),
+            ],
+            axis=1,
+        )
+        self.ntraj += ntraj
+        self.nframes += md_f.size
+        self._add_histogram(md_f, md_v)
+        valid = np.logical_and(md_f <= self.level_f_hi, md_v <= self.level_v_hi)
+        self.numb_failed += md_f.size - np.count_nonzero(valid)
+        self.numb_valid += np.count_nonzero(valid)
+        self._add_stream(ids[valid], md_f[valid], md_v[valid])
+        self._update_candidates()
+
+    def merge(
+        self,
+        reports: List[ExplorationReport],
+        max_nframes: Optional[int] = None,
+    ):
+        self._extend_stream(np.zeros((0, 2), dtype=np.int64), np.zeros(0), np.zeros(0))
+        for rr in reports:
+            if rr.compacted or rr.stream_ids is None:
+                raise RuntimeError(
+                    "only the reports given by `record_chunk` can be merged"
+                )
+            self.nframes += rr.nframes
+            self.numb_failed += rr.numb_failed
+            self.numb_valid += rr.numb_valid
+            self._merge_histograms(rr)
+            # the trajectory indexes of the candidates are shifted
+            self._extend_stream(
+                rr.stream_ids + [self.ntraj, 0], rr.stream_f, rr.stream_v
+            )
+            self.ntraj += rr.ntraj
+        self._update_candidates()
+
+    def _numb_candi(
+        self,
+        nvalid: int,
+    ) -> Tuple[int, int]:
+        r"""The numbers of the force and virial candidates among `nvalid`
+        non-failed frames."""
+        numb_candi_f = max(self.numb_candi_f, int(self.rate_candi_f * nvalid))
+        numb_candi_v = max(self.numb_candi_v, int(self.rate_candi_v * nvalid))
+        return min(numb_candi_f, nvalid), min(numb_candi_v, nvalid)
+
+    def _add_stream(
+        self,
+        ids: np.ndarray,
+        md_f: np.ndarray,
+        md_v: np.ndarray,
+    ):
+        r"""Keep the top candidates of the non-failed frames of a chunk."""
+        if self.rate_candi_f > 0.0 or self.rate_candi_v > 0.0:
+            # the numbers of candidates are only known after all the chunks
+            self._extend_stream(ids, md_f, md_v)
+            return
+        numb_candi_f, numb_candi_v = self._numb_candi(md_f.size)
+        keep = np.union1d(_top_k(md_f, numb_candi_f), _top_k(md_v, numb_candi_v))
+        self._extend_stream(ids[keep], md_f[keep], md_v[keep])
+
+    def _extend_stream(
+        self,
+        ids: np.ndarray,
+        md_f: np.ndarray,
+        md_v: np.ndarray,
+    ):
+        if self.stream_ids is None:
+            self.stream_ids = np.zeros((0, 2), dtype=np.int64)
+            self.stream_f = np.zeros(0)
+            self.stream_v = np.zeros(0)
+        self.stream_ids = np.concatenate([self.stream_ids, ids], axis=0)
+        self.stream_f = np.concatenate([self.stream_f, md_f])
+        self.stream_v = np.concatenate([self.stream_v, md_v])
+
+    def _update_candidates(self):
+        r"""Pick the candidates and the lower trust levels from the top
+        candidates kept by the chunks."""
+        numb_candi_f, numb_candi_v = self._numb_candi(self.numb_valid)
+        numb_candi_f = min(numb_candi_f, self.stream_f.size)
+        numb_candi_v = min(numb_candi_v, self.stream_v.size)
+        top_f = _top_k(self.stream_f, numb_candi_f)
+        top_v = _top_k(self.stream_v, numb_candi_v)
+        if numb_candi_v == 0:
+            self.level_v_lo = self.level_v_hi
+        else:
+            self.level_v_lo = self.stream_v[top_v[0]]
+        if not self.has_virial:
+            self.level_v_lo = None
+        if numb_candi_f == 0:
+            self.level_f_lo = self.level_f_hi
+        else:
+            self.level_f_lo = self.stream_f[top_f[0]]
+        self.candi = set(map(tuple, self.stream_ids[top_f].tolist()))
+        self.candi.update(map(tuple, self.stream_ids[top_v].tolist()))
+        self.numb_candi = len(self.candi)
+
+    def _check_devi(
         self,
-        tt,
         md_f,
         md_v,
     ):
         """
-        Record one trajctory.
+        Check the model deviations of the frames.
 
-        tt:             traj index
         md_f, md_v:     model deviations of force and virial
         """
         # check consistency
@@ -240,23 +411,46 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         # fake md_v as zeros if None is provided
         if md_v is None:
             md_v = np.zeros_like(md_f)
-        # loop over frames
         nframes = md_f.shape[0]
         assert nframes == md_v.shape[0]
-        failed = []
-        accur = set()
-        coll_f = []
-        coll_v = []
-        for ii in range(nframes):
-            if md_f[ii] > self.level_f_hi or md_v[ii] > self.level_v_hi:
-                failed.append((tt, ii))
-            else:
-                coll_f.append([md_f[ii], tt, ii])
-                coll_v.append([md_v[ii], tt, ii])
-                # now accur takes all non-failed frames,
-                # will be substracted by candidate later
-                accur.add((tt, ii))
-        return nframes, accur, failed, coll_f, coll_v
+        return md_f, md_v
+
+    def _add_histogram(
+        self,
+        md_f: np.ndarray,
+        md_v: np.ndarray,
+    ):
+        r"""Add the model deviations to the histograms. The bins are
+        fixed, spanning from zero to twice the higher trust levels."""
+        if self.hist_f is None:
+            self.hist_edges_f = np.linspace(
+                0.0, 2.0 * self.level_f_hi, self.hist_nbins + 1
+            )
+            self.hist_f = np.zeros(self.hist_nbins, dtype=np.int64)
+        self.hist_f += devi_histogram(md_f, self.hist_edges_f)
+        if self.has_virial:
+            if self.hist_v is None:
+                self.hist_edges_v = np.linspace(
+                    0.0, 2.0 * self.level_v_hi, self.hist_nbins + 1
+                )
+                self.hist_v = np.zeros(self.hist_nbins, dtype=np.int64)
+            self.hist_v += devi_histogram(md_v, self.hist_edges_v)
+
+    def compact(
+        self,
+        candidate_ids: List[List[int]],
+    ):
+        self.valid_ids = []
+        self.failed_ids = []
+        self.model_devi = None
+        self.stream_ids = None
+        self.stream_f = None
+        self.stream_v = None
+        self.candi_picked = [
+            (tidx, ff) for tidx, ids in enumerate(candidate_ids) for ff in ids
+        ]
+        self.candi = set(self.candi_picked)
+        self.compacted = True
 
     def _sequence_conv(
         self,
@@ -290,19 +484,20 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         self,
         tag=None,
     ):
-        return float(len(self.failed)) / float(self.nframes)
+        return float(self.numb_failed) / float(self.nframes)
 
     def accurate_ratio(
         self,
         tag=None,
     ):
-        return float(len(self.accur)) / float(self.nframes)
+        # the candidates are taken from the non-failed frames
+        return float(self.numb_valid - self.numb_candi) / float(self.nframes)
 
     def candidate_ratio(
         self,
         tag=None,
     ):
-        return float(len(self.candi)) / float(self.nframes)
+        return float(self.numb_candi) / float(self.nframes)
 
     def get_candidate_ids(
         self,
@@ -333,14 +528,25 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
         cand_frames   List[Tuple[int,int]]
             Candidate frames. A list of tuples: [(traj_idx, frame_idx), ...]
         """
+        if self.compacted:
+            return self.candi_picked[:max_nframes]
         self.candi_picked = [(ii[0], ii[1]) for ii in self.candi]
         if max_nframes is not None and max_nframes < len(self.candi_picked):
-            random.shuffle(self.candi_picked)
-            ret = sorted(self.candi_picked[:max_nframes])
+            # sorted, so the selection does not depend on the order of the set
+            self.candi_picked.sort()
+            _, cand_idx = sample_candidates(
+                [len(self.candi_picked)], max_nframes, self._get_rng()
+            )
+            ret = [self.candi_picked[ii] for ii in cand_idx.tolist()]
         else:
             ret = self.candi_picked
         return ret
 
+    def _get_rng(self) -> np.random.Generator:
+        if self.rng is None:
+            self.rng = np.random.default_rng(self.seed)
+        return self.rng
+
     def print_header(self) -> str:
         r"""Print the header of report"""
         return self.header_str
@@ -371,3 +577,23 @@ class ExplorationReportAdaptiveLower(ExplorationReport):
             )
         ret = " " + fmt_str % print_tuple
         return ret
+
+
+def _top_k(
+    md: np.ndarray,
+    kk: int,
+) -> np.ndarray:
+    r"""The indexes of the `kk` largest model deviations, in the ascending
+    order of (model deviation, index). Among the equal model deviations
+    the larger indexes are preferred. The result is the same as taking
+    the last `kk` items after sorting the (model deviation, index) pairs.
+    """
+    nn = md.size
+    if kk == 0:
+        return np.zeros(0, dtype=np.int64)
+    # the kk-th largest model deviation
+    thr = md[np.argpartition(md, nn - kk)[nn - kk]]
+    above = np.flatnonzero(md > thr)
+    equal = np.flatnonzero(md == thr)
+    sel = np.concatenate([above, equal[equal.size - (kk - above.size) :]])
+    return sel[np.lexsort((sel, md[sel]))]
@@ -5,6 +5,7 @@ from abc import (
 from typing import (
     List,
     Optional,
+    Set,
     Tuple,
 )
 
@@ -19,12 +20,19 @@ from dflow.python import (
 from ..deviation import (
     DeviManager,
 )
-from . import (
+from .report import (
     ExplorationReport,
+    devi_histogram,
 )
 
 
 class ExplorationReportTrustLevels(ExplorationReport):
+    # the classes of the frames
+    CLASS_NONE = -1
+    CLASS_ACCU = 0
+    CLASS_CAND = 1
+    CLASS_FAIL = 2
+
     def __init__(
         self,
         level_f_lo,
@@ -38,8 +46,8 @@ class ExplorationReportTrustLevels(ExplorationReport):
         self.level_v_lo = level_v_lo
         self.level_v_hi = level_v_hi
         self.conv_accuracy = conv_accuracy
-        self.clear()
         self.v_level = (self.level_v_lo is not None) and (self.level_v_hi is not None)
+        self.clear()
         self.model_devi = None
 
         print_tuple = (
@@ -94,104 +102,284 @@ class ExplorationReportTrustLevels(ExplorationReport):
         self,
     ):
         self.traj_nframes = []
-        self.traj_cand = []
-        self.traj_accu = []
-        self.traj_fail = []
+        self.traj_numb_cand = []
+        # the class of each frame, see CLASS_ACCU, CLASS_CAND and CLASS_FAIL
+        self.traj_class = []
         self.traj_cand_picked = []
         self.model_devi = None
+        self.numb_frames = 0
+        self.numb_accu = 0
+        self.numb_cand = 0
+        self.numb_fail = 0
+        # the candidates and their keys kept in the streaming mode
+        self.stream_cand = None
+        self.stream_keys = None
+        # the model deviation histograms, see `_add_histogram`
+        self.hist_f = None
+        self.hist_v = None
+        self.compacted = False
 
     def record(
         self,
         model_devi: DeviManager,
     ):
         ntraj = model_devi.ntraj
+        # the frames of all the trajectories are classified in one pass
+        md_f = model_devi.get_concat(DeviManager.MAX_DEVI_F)
+        md_v = model_devi.get_concat(DeviManager.MAX_DEVI_V)
+        offsets = model_devi.get_traj_offsets()
+
+        accu, cand, fail = self._get_masks(md_f, md_v)
+        # check consistency
+        nframes = _traj_sums(~np.isnan(md_f), offsets)
+        if self.v_level and md_v is not None:
+            if np.any(nframes != _traj_sums(~np.isnan(md_v), offsets)):
+                raise FatalError("number of frames by virial ")
+        # accu, cand, fail
+        naccu = _traj_sums(accu, offsets)
+        ncand = _traj_sums(cand, offsets)
+        nfail = _traj_sums(fail, offsets)
+        # check size
+        assert np.array_equal(nframes, naccu + ncand + nfail)
+        # record
+        traj_class = np.full(md_f.size, self.CLASS_NONE, dtype=np.int8)
+        traj_class[accu] = self.CLASS_ACCU
+        traj_class[cand] = self.CLASS_CAND
+        traj_class[fail] = self.CLASS_FAIL
+        self.traj_nframes += nframes.tolist()
+        self.traj_numb_cand += ncand.tolist()
+        self.numb_frames += int(nframes.sum())
+        self.numb_accu += int(naccu.sum())
+        self.numb_cand += int(ncand.sum())
+        self.numb_fail += int(nfail.sum())
+        self._add_histogram(md_f, md_v)
+        if ntraj > 0:
+            self.traj_class += np.split(traj_class, offsets[1:-1])
+        assert len(self.traj_nframes) == ntraj
+        assert len(self.traj_class) == ntraj
+        self.model_devi = model_devi
+
+    def record_chunk(
+        self,
+        model_devi: DeviManager,
+        max_nframes: Optional[int] = None,
+    ):
         md_f = model_devi.get(DeviManager.MAX_DEVI_F)
         md_v = model_devi.get(DeviManager.MAX_DEVI_V)
-
-        for ii in range(ntraj):
-            id_f_cand, id_f_accu, id_f_fail = self._get_indexes(
-                md_f[ii], self.level_f_lo, self.level_f_hi
+        if self.stream_cand is None:
+            self.stream_cand = np.zeros((0, 2), dtype=np.int64)
+            self.stream_keys = np.zeros(0)
+        cands = [self.stream_cand]
+        keys = [self.stream_keys]
+        for ii in range(model_devi.ntraj):
+            accu, cand, fail = self._get_masks(md_f[ii], md_v[ii])
+            id_cand = np.where(cand)[0]
+            self._count_one_traj(
+                np.count_nonzero(~np.isnan(md_f[ii])),
+                np.count_nonzero(accu),
+                id_cand.size,
+                np.count_nonzero(fail),
             )
-            id_v_cand, id_v_accu, id_v_fail = self._get_indexes(
-                md_v[ii], self.level_v_lo, self.level_v_hi
+            self._add_histogram(md_f[ii], md_v[ii])
+            tidx = len(self.traj_nframes) - 1
+            cands.append(
+                np.stack([np.full(id_cand.size, tidx, dtype=np.int64), id_cand], axis=1)
             )
-            self._record_one_traj(
-                id_f_accu,
-                id_f_cand,
-                id_f_fail,
-                id_v_accu,
-                id_v_cand,
-                id_v_fail,
-            )
-        assert len(self.traj_nframes) == ntraj
-        assert len(self.traj_cand) == ntraj
-        assert len(self.traj_accu) == ntraj
-        assert len(self.traj_fail) == ntraj
-        self.model_devi = model_devi
+            keys.append(self._get_candidate_keys(md_f[ii], md_v[ii], id_cand))
+        self._keep_stream_candidates(cands, keys, max_nframes)
 
-    def _get_indexes(
+    def _keep_stream_candidates(
         self,
-        md,
-        level_lo,
-        level_hi,
+        cands: List[np.ndarray],
+        keys: List[np.ndarray],
+        max_nframes: Optional[int] = None,
     ):
-        if (md is not None) and (level_hi is not None) and (level_lo is not None):
-            id_cand = np.where(np.logical_and(md >= level_lo, md < level_hi))[0]
-            id_accu = np.where(md < level_lo)[0]
-            id_fail = np.where(md >= level_hi)[0]
-        else:
-            id_cand = id_accu = id_fail = None
-        return id_cand, id_accu, id_fail
-
-    def _record_one_traj(
+        r"""Keep at most `max_nframes` candidates with the smallest keys."""
+        cand = np.concatenate(cands, axis=0)
+        key = np.concatenate(keys)
+        if max_nframes is not None and key.size > max_nframes:
+            order = np.lexsort((cand[:, 1], cand[:, 0], key))[:max_nframes]
+            cand = cand[order]
+            key = key[order]
+        self.stream_cand = cand
+        self.stream_keys = key
+
+    def merge(
         self,
-        id_f_accu,
-        id_f_cand,
-        id_f_fail,
-        id_v_accu,
-        id_v_cand,
-        id_v_fail,
+        reports: List[ExplorationReport],
+        max_nframes: Optional[int] = None,
     ):
-        """
-        Record one trajctory. inputs are the indexes of candidate, accurate and failed frames.
+        if self.stream_cand is None:
+            self.stream_cand = np.zeros((0, 2), dtype=np.int64)
+            self.stream_keys = np.zeros(0)
+        cands = [self.stream_cand]
+        keys = [self.stream_keys]
+        for rr in reports:
+            if rr.compacted or rr.stream_cand is None:
+                raise RuntimeError(
+                    "only the reports given by `record_chunk` can be merged"
+                )
+            # the trajectory indexes of the candidates are shifted
+            cands.append(rr.stream_cand + [len(self.traj_nframes), 0])
+            keys.append(rr.stream_keys)
+            self.traj_nframes += rr.traj_nframes
+            self.traj_numb_cand += rr.traj_numb_cand
+            self.numb_frames += rr.numb_frames
+            self.numb_accu += rr.numb_accu
+            self.numb_cand += rr.numb_cand
+            self.numb_fail += rr.numb_fail
+            self._merge_histograms(rr)
+        self._keep_stream_candidates(cands, keys, max_nframes)
 
-        """
-        # check consistency
-        novirial = id_v_cand is None
-        if novirial:
-            assert id_v_accu is None
-            assert id_v_fail is None
-        nframes = np.size(np.concatenate((id_f_cand, id_f_accu, id_f_fail)))
-        if (not novirial) and nframes != np.size(
-            np.concatenate((id_v_cand, id_v_accu, id_v_fail))
-        ):
-            raise FatalError("number of frames by virial ")
-        # nframes
-        # to sets
-        set_f_accu = set(id_f_accu)
-        set_f_cand = set(id_f_cand)
-        set_f_fail = set(id_f_fail)
-        set_v_accu = set([ii for ii in range(nframes)]) if novirial else set(id_v_accu)
-        set_v_cand = set([]) if novirial else set(id_v_cand)
-        set_v_fail = set([]) if novirial else set(id_v_fail)
-        # accu, cand, fail
-        set_accu = set_f_accu & set_v_accu
-        set_cand = (
-            (set_f_cand & set_v_accu)
-            | (set_f_cand & set_v_cand)
-            | (set_f_accu & set_v_cand)
+    def _get_masks(
+        self,
+        md_f: np.ndarray,
+        md_v: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        r"""The masks of the accurate, candidate and failed frames."""
+        f_cand = np.logical_and(md_f >= self.level_f_lo, md_f < self.level_f_hi)
+        f_accu = md_f < self.level_f_lo
+        f_fail = md_f >= self.level_f_hi
+        if md_v is None or self.level_v_lo is None or self.level_v_hi is None:
+            return f_accu, f_cand, f_fail
+        v_cand = np.logical_and(md_v >= self.level_v_lo, md_v < self.level_v_hi)
+        v_accu = md_v < self.level_v_lo
+        v_fail = md_v >= self.level_v_hi
+        accu = f_accu & v_accu
+        cand = (f_cand & v_accu) | (f_cand & v_cand) | (f_accu & v_cand)
+        fail = f_fail | v_fail
+        return accu, cand, fail
+
+    def _get_candidate_keys(
+        self,
+        md_f: np.ndarray,
+        md_v: Optional[np.ndarray],
+        id_cand: np.ndarray,
+    ) -> np.ndarray:
+        r"""The keys of the candidates in the streaming mode. The
+        candidates with the smallest keys are kept. By default the keys
+        are random, so the kept candidates are a uniform sample."""
+        return np.random.random(id_cand.size)
+
+    def _get_stream_candidates(
+        self,
+        max_nframes: Optional[int] = None,
+        by_key: bool = False,
+    ) -> List[Tuple[int, int]]:
+        r"""Get the candidates kept in the streaming mode. If the
+        candidates are truncated and `by_key`, they are ordered by the
+        keys, otherwise by the trajectory and frame indexes."""
+        return self._pick_candidates(
+            self.stream_cand, self.stream_keys, max_nframes, by_key
         )
-        set_fail = set_f_fail | set_v_fail
-        # check size
-        assert nframes == len(set_accu | set_cand | set_fail)
-        assert 0 == len(set_accu & set_cand)
-        assert 0 == len(set_accu & set_fail)
-        assert 0 == len(set_cand & set_fail)
-        # record
+
+    def _pick_candidates(
+        self,
+        cand: np.ndarray,
+        keys: np.ndarray,
+        max_nframes: Optional[int] = None,
+        by_key: bool = False,
+    ) -> List[Tuple[int, int]]:
+        r"""Pick at most `max_nframes` candidates of the smallest keys.
+        The (traj_idx, frame_idx) of the candidates are given by `cand`."""
+        order = np.lexsort((cand[:, 1], cand[:, 0], keys))
+        if max_nframes is not None:
+            order = order[:max_nframes]
+        truncated = order.size < self.numb_cand
+        if not (by_key and truncated):
+            order = order[np.lexsort((cand[order, 1], cand[order, 0]))]
+        self.traj_cand_picked = [tuple(ii) for ii in cand[order].tolist()]
+        return self.traj_cand_picked
+
+    def _count_one_traj(
+        self,
+        nframes: int,
+        naccu: int,
+        ncand: int,
+        nfail: int,
+    ):
         self.traj_nframes.append(nframes)
-        self.traj_cand.append(set_cand)
-        self.traj_accu.append(set_accu)
-        self.traj_fail.append(set_fail)
+        self.traj_numb_cand.append(ncand)
+        self.numb_frames += nframes
+        self.numb_accu += naccu
+        self.numb_cand += ncand
+        self.numb_fail += nfail
+
+    def _add_histogram(
+        self,
+        md_f: np.ndarray,
+        md_v: Optional[np.ndarray],
+    ):
+        r"""Add the model deviations to the histograms. The bins are
+        fixed, spanning from zero to twice the higher trust levels."""
+        if self.hist_f is None:
+            self.hist_edges_f = np.linspace(
+                0.0, 2.0 * self.level_f_hi, self.hist_nbins + 1
+            )
+            self.hist_f = np.zeros(self.hist_nbins, dtype=np.int64)
+        self.hist_f += devi_histogram(md_f, self.hist_edges_f)
+        if self.v_level and md_v is not None:
+            if self.hist_v is None:
+                self.hist_edges_v = np.linspace(
+                    0.0, 2.0 * self.level_v_hi, self.hist_nbins + 1
+                )
+                self.hist_v = np.zeros(self.hist_nbins, dtype=np.int64)
+            self.hist_v += devi_histogram(md_v, self.hist_edges_v)
+
+    def compact(
+        self,
+        candidate_ids: List[List[int]],
+    ):
+        self.traj_class = []
+        self.model_devi = None
+        self.stream_cand = None
+        self.stream_keys = None
+        self.traj_cand_picked = [
+            (tidx, ff) for tidx, ids in enumerate(candidate_ids) for ff in ids
+        ]
+        self.compacted = True
+
+    def _get_compact_candidates(
+        self,
+        max_nframes: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        r"""Get the candidates kept by `compact`."""
+        return self.traj_cand_picked[:max_nframes]
+
+    def _get_class_ids(
+        self,
+        class_id: int,
+    ) -> List[Set[int]]:
+        return [set(np.flatnonzero(cc == class_id).tolist()) for cc in self.traj_class]
+
+    @property
+    def traj_accu(self) -> List[Set[int]]:
+        r"""The indexes of the accurate frames of each trajectory."""
+        return self._get_class_ids(self.CLASS_ACCU)
+
+    @property
+    def traj_cand(self) -> List[Set[int]]:
+        r"""The indexes of the candidate frames of each trajectory."""
+        return self._get_class_ids(self.CLASS_CAND)
+
+    @property
+    def traj_fail(self) -> List[Set[int]]:
+        r"""The indexes of the failed frames of each trajectory."""
+        return self._get_class_ids(self.CLASS_FAIL)
+
+    def _get_traj_candidates(
+        self,
+        tidx: int,
+    ) -> np.ndarray:
+        r"""The frame indexes of the candidates of a trajectory."""
+        return np.flatnonzero(self.traj_class[tidx] == self.CLASS_CAND)
+
+    def _get_all_candidates(self) -> List[Tuple[int, int]]:
+        r"""All the candidates, ordered by the trajectory and frame indexes."""
+        ret = []
+        for tidx in range(len(self.traj_class)):
+            ret += [(tidx, ff) for ff in self._get_traj_candidates(tidx).tolist()]
+        return ret
 
     @abstractmethod
     def converged(
@@ -204,22 +392,19 @@ class ExplorationReportTrustLevels(ExplorationReport):
         self,
         tag=None,
     ):
-        traj_nf = [len(ii) for ii in self.traj_fail]
-        return float(sum(traj_nf)) / float(sum(self.traj_nframes))
+        return float(self.numb_fail) / float(self.numb_frames)
 
     def accurate_ratio(
         self,
         tag=None,
     ):
-        traj_nf = [len(ii) for ii in self.traj_accu]
-        return float(sum(traj_nf)) / float(sum(self.traj_nframes))
+        return float(self.numb_accu) / float(self.numb_frames)
 
     def candidate_ratio(
         self,
         tag=None,
     ):
-        traj_nf = [len(ii) for ii in self.traj_cand]
-        return float(sum(traj_nf)) / float(sum(self.traj_nframes))
+        return float(self.numb_cand) / float(self.numb_frames)
 
     @abstractmethod
     def get_candidate_ids(
@@ -259,3 +444,13 @@ class ExplorationReportTrustLevels(ExplorationReport):
         print_tuple += (str(self.converged()),)
         ret = " " + fmt_str % print_tuple
         return ret
+
+
+def _traj_sums(
+    mask: np.ndarray,
+    offsets: np.ndarray,
+) -> np.ndarray:
+    r"""The number of the true values of the mask in each trajectory."""
+    cumsum = np.zeros(mask.size + 1, dtype=np.int64)
+    np.cumsum(mask, out=cumsum[1:])
+    return np.diff(cumsum[offsets])
@@ -54,6 +54,15 @@ class ExplorationReportTrustLevelsMax(ExplorationReportTrustLevels):
             id_cand_list[ii[0]].append(ii[1])
         return id_cand_list
 
+    def _get_candidate_keys(
+        self,
+        md_f: np.ndarray,
+        md_v: Optional[np.ndarray],
+        id_cand: np.ndarray,
+    ) -> np.ndarray:
+        # the candidates with the largest max_devi_f are kept
+        return -md_f[id_cand]
+
     def _get_candidates(
         self,
         max_nframes: Optional[int] = None,
@@ -73,10 +82,11 @@ class ExplorationReportTrustLevelsMax(ExplorationReportTrustLevels):
         cand_frames   List[Tuple[int,int]]
             Candidate frames. A list of tuples: [(traj_idx, frame_idx), ...]
         """
-        self.traj_cand_picked = []
-        for tidx, tt in enumerate(self.traj_cand):
-            for ff in tt:
-                self.traj_cand_picked.append((tidx, ff))
+        if self.compacted:
+            return self._get_compact_candidates(max_nframes)
+        if self.stream_cand is not None:
+            return self._get_stream_candidates(max_nframes, by_key=True)
+        self.traj_cand_picked = self._get_all_candidates()
         if max_nframes is not None and max_nframes < len(self.traj_cand_picked):
             # select by maximum
             max_devi_f = self.model_devi.get(DeviManager.MAX_DEVI_F)  # type: ignore
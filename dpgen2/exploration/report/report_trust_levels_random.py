@@ -1,4 +1,3 @@
-import random
 from typing import (
     List,
     Optional,
@@ -16,15 +15,59 @@ from dflow.python import (
 from ..deviation import (
     DeviManager,
 )
-from . import (
+from .report import (
     ExplorationReport,
+    sample_candidates,
 )
 from .report_trust_levels_base import (
     ExplorationReportTrustLevels,
 )
 
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
 
 class ExplorationReportTrustLevelsRandom(ExplorationReportTrustLevels):
+    def __init__(
+        self,
+        level_f_lo,
+        level_f_hi,
+        level_v_lo=None,
+        level_v_hi=None,
+        conv_accuracy=0.9,
+        seed: Optional[int] = None,
+    ):
+        self.seed = seed
+        super().__init__(
+            level_f_lo,
+            level_f_hi,
+            level_v_lo=level_v_lo,
+            level_v_hi=level_v_hi,
+            conv_accuracy=conv_accuracy,
+        )
+
+    @staticmethod
+    def args() -> List[Argument]:
+        doc_seed = (
+            "The seed of the random selection of the candidates. "
+            "The same candidates are selected from the same trajectories "
+            "if the seed is given, so that the selection can be reproduced."
+        )
+        return ExplorationReportTrustLevels.args() + [
+            Argument("seed", int, optional=True, default=None, doc=doc_seed),
+        ]
+
+    def clear(
+        self,
+    ):
+        super().clear()
+        # the random number generator, created from the seed on demand
+        self.rng = None
+
+    def _get_rng(self) -> np.random.Generator:
+        if self.rng is None:
+            self.rng = np.random.default_rng(self.seed)
+        return self.rng
+
     def converged(
         self,
         reports: Optional[List[ExplorationReport]] = None,
@@ -43,6 +86,27 @@ class ExplorationReportTrustLevelsRandom(ExplorationReportTrustLevels):
         """
         return self.accurate_ratio() >= self.conv_accuracy
 
+    def _get_candidate_keys(
+        self,
+        md_f: np.ndarray,
+        md_v: Optional[np.ndarray],
+        id_cand: np.ndarray,
+    ) -> np.ndarray:
+        r"""The random keys of the candidates. If the seed is given, the
+        keys are hashed from the seed, the frame indexes and the model
+        deviations, so they are reproducible and do not depend on which
+        trajectories are recorded together."""
+        if self.seed is None:
+            return self._get_rng().random(id_cand.size)
+        bits = np.ascontiguousarray(md_f[id_cand], dtype=np.float64).view(np.uint64)
+        zz = bits ^ (np.asarray(id_cand, dtype=np.uint64) * _GOLDEN)
+        zz = zz ^ np.uint64(self.seed % 2**64)
+        # the finalizer of splitmix64, the overflows are intended
+        zz = (zz ^ (zz >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        zz = (zz ^ (zz >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        zz = zz ^ (zz >> np.uint64(31))
+        return (zz >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
     def get_candidate_ids(
         self,
         max_nframes: Optional[int] = None,
@@ -60,7 +124,9 @@ class ExplorationReportTrustLevelsRandom(ExplorationReportTrustLevels):
     ) -> List[Tuple[int, int]]:
         """
         Get candidates. If number of candidates is larger than `max_nframes`,
-        then randomly pick `max_nframes` frames from the candidates.
+        then randomly pick `max_nframes` frames from the candidates. If the
+        seed is given, the frames of the smallest random keys are picked,
+        as in the streaming mode.
 
         Parameters
         ----------
@@ -72,14 +138,45 @@ class ExplorationReportTrustLevelsRandom(ExplorationReportTrustLevels):
         cand_frames   List[Tuple[int,int]]
             Candidate frames. A list of tuples: [(traj_idx, frame_idx), ...]
         """
-        self.traj_cand_picked = []
-        for tidx, tt in enumerate(self.traj_cand):
-            for ff in tt:
-                self.traj_cand_picked.append((tidx, ff))
-        if max_nframes is not None and max_nframes < len(self.traj_cand_picked):
+        if self.compacted:
+            return self._get_compact_candidates(max_nframes)
+        if self.stream_cand is not None:
+            return self._get_stream_candidates(max_nframes, by_key=False)
+        if max_nframes is not None and max_nframes < self.numb_cand:
+            if self.seed is not None:
+                # the same candidates as those recorded in chunks
+                return self._get_keyed_candidates(max_nframes)
             # random selection
-            random.shuffle(self.traj_cand_picked)
-            ret = sorted(self.traj_cand_picked[:max_nframes])
+            traj_idx, cand_idx = sample_candidates(
+                self.traj_numb_cand, max_nframes, self._get_rng()
+            )
+            # the samples are sorted, so those of each trajectory are
+            # consecutive
+            starts = np.flatnonzero(np.diff(traj_idx, prepend=-1))
+            self.traj_cand_picked = []
+            for tidx, ids in zip(
+                traj_idx[starts].tolist(), np.split(cand_idx, starts[1:])
+            ):
+                frames = self._get_traj_candidates(tidx)[ids]
+                self.traj_cand_picked += [(tidx, ff) for ff in frames.tolist()]
         else:
-            ret = self.traj_cand_picked
-        return ret
+            self.traj_cand_picked = self._get_all_candidates()
+        return self.traj_cand_picked
+
+    def _get_keyed_candidates(
+        self,
+        max_nframes: int,
+    ) -> List[Tuple[int, int]]:
+        md_f = self.model_devi.get(DeviManager.MAX_DEVI_F)
+        md_v = self.model_devi.get(DeviManager.MAX_DEVI_V)
+        cands = [np.zeros((0, 2), dtype=np.int64)]
+        keys = [np.zeros(0)]
+        for tidx in range(len(self.traj_class)):
+            id_cand = self._get_traj_candidates(tidx)
+            cands.append(
+                np.stack([np.full(id_cand.size, tidx, dtype=np.int64), id_cand], axis=1)
+            )
+            keys.append(self._get_candidate_keys(md_f[tidx], md_v[tidx], id_cand))
+        return self._pick_candidates(
+            np.concatenate(cands, axis=0), np.concatenate(keys), max_nframes
+        )
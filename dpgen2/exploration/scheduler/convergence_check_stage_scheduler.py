@@ -2,15 +2,29 @@ from pathlib import (
     Path,
 )
 from typing import (
+    Dict,
     List,
     Optional,
     Tuple,
 )
 
+import numpy as np
 from dflow.python import (
     FatalError,
 )
 
+from dpgen2.exploration.deviation import (
+    DeviManager,
+)
+from dpgen2.exploration.render.lammps_dump import (
+    index_lammps_dump,
+    read_lammps_dump_frames,
+)
+from dpgen2.exploration.render.traj_render_lammps import (
+    find_model_devi_npy,
+    load_model_devi_npy,
+    read_model_devi,
+)
 from dpgen2.exploration.report import (
     ExplorationReport,
 )
@@ -18,8 +32,10 @@ from dpgen2.exploration.selector import (
     ConfSelector,
 )
 from dpgen2.exploration.task import (
+    ConfSamplingTaskGroup,
     ExplorationStage,
     ExplorationTaskGroup,
+    RescreenTaskGroup,
 )
 
 from .stage_scheduler import (
@@ -28,22 +44,89 @@ from .stage_scheduler import (
 
 
 class ConvergenceCheckStageScheduler(StageScheduler):
+    r"""The stage scheduler checking the convergence by the exploration
+    reports.
+
+    Parameters
+    ----------
+    stage : ExplorationStage
+        The exploration stage.
+    selector : ConfSelector
+        The configuration selector.
+    max_numb_iter : int, optional
+        The maximal number of iterations of the stage.
+    fatal_at_max : bool
+        Fatal when the stage is not converged at `max_numb_iter`.
+    rescreen : RescreenTaskGroup, optional
+        Re-screen the frames explored by the previous iteration with the
+        models of the next iteration. The re-screening tasks are added to
+        the tasks of the stage. The candidates are selected from the
+        re-screened frames, but the convergence is only checked by the
+        frames of the MD tasks, recorded again by the selector.
+    rescreen_only : bool
+        Only re-screen the frames in the iterations following an MD
+        exploration, as long as the re-screening finds candidates. The
+        convergence is not checked by the re-screened frames, and their
+        reports are not in the history of the convergence check.
+    restart : bool
+        Start the MD tasks of the configuration sampling task groups
+        from the end frames of the trajectories explored by the tasks in
+        the previous iteration, rather than from the sampled
+        configurations.
+    restart_level_f : float, optional
+        Start from the last frame of which the max force model deviation
+        is lower than this level. Start from the last frame if not set.
+
+    """
+
     def __init__(
         self,
         stage: ExplorationStage,
         selector: ConfSelector,
         max_numb_iter: Optional[int] = None,
         fatal_at_max: bool = True,
+        rescreen: Optional[RescreenTaskGroup] = None,
+        rescreen_only: bool = False,
+        restart: bool = False,
+        restart_level_f: Optional[float] = None,
     ):
         self.stage = stage
         self.selector = selector
         self.max_numb_iter = max_numb_iter
         self.fatal_at_max = fatal_at_max
+        self.rescreen = rescreen
+        self.rescreen_only = rescreen_only
+        # if the planned iteration only re-screens the frames
+        self.rescreened = False
+        # the number of re-screening tasks following the MD tasks of the
+        # planned iteration
+        self.numb_rescreen_tasks = 0
+        self.restart = restart
+        self.restart_level_f = restart_level_f
         self.nxt_iter = 0
         self.conv = False
         self.reached_max_iter = False
         self.complete_ = False
         self.reports = []
+        # the indexes of the reports of the iterations only re-screening
+        # the frames, which are not in the history of the convergence check
+        self.rescreen_reports = []
+
+    def __setstate__(self, state: Dict):
+        # the defaults of the attributes missing in the schedulers pickled
+        # by the previous versions
+        self.__dict__.update(
+            {
+                "rescreen": None,
+                "rescreen_only": False,
+                "rescreened": False,
+                "numb_rescreen_tasks": 0,
+                "rescreen_reports": [],
+                "restart": False,
+                "restart_level_f": None,
+            }
+        )
+        self.__dict__.update(state)
 
     def get_reports(self):
         return self.reports
@@ -67,6 +150,7 @@ class ConvergenceCheckStageScheduler(StageScheduler):
         self,
         report: Optional[ExplorationReport] = None,
         trajs: Optional[List[Path]] = None,
+        model_devis: Optional[List[Path]] = None,
     ) -> Tuple[bool, Optional[ExplorationTaskGroup], Optional[ConfSelector]]:
         if self.complete():
             raise FatalError("Cannot plan because the stage has completed.")
@@ -75,8 +159,36 @@ class ConvergenceCheckStageScheduler(StageScheduler):
             self.conv = stg_complete
             lmp_task_grp = self.stage.make_task()
             ret_selector = self.selector
+        elif self.rescreened:
+            # the convergence is not checked by the re-screened frames
+            stg_complete = False
+            self.conv = stg_complete
+            if self.max_numb_iter is not None and self.nxt_iter == self.max_numb_iter:
+                self.reached_max_iter = True
+                if self.fatal_at_max:
+                    raise FatalError("reached maximal number of iterations")
+                else:
+                    stg_complete = True
+            if stg_complete:
+                lmp_task_grp = None
+                ret_selector = None
+            else:
+                # explore by MD once no candidate is re-screened
+                lmp_task_grp = self._make_task(
+                    report, trajs, model_devis, not report.no_candidate()
+                )
+                ret_selector = self.selector
+            self.rescreen_reports.append(len(self.reports))
+            self.reports.append(report)
         else:
-            stg_complete = report.converged(self.reports)
+            md_report = self._md_report(report, model_devis)
+            stg_complete = md_report.converged(
+                [
+                    rr
+                    for ii, rr in enumerate(self.reports)
+                    if ii not in self.rescreen_reports
+                ]
+            )
             self.conv = stg_complete
             if not stg_complete:
                 # check if we have any candidate to improve the quality of the model
@@ -104,9 +216,109 @@ class ConvergenceCheckStageScheduler(StageScheduler):
                 lmp_task_grp = None
                 ret_selector = None
             else:
-                lmp_task_grp = self.stage.make_task()
+                lmp_task_grp = self._make_task(report, trajs, model_devis, True)
                 ret_selector = self.selector
-            self.reports.append(report)
+            self.reports.append(md_report)
         self.nxt_iter += 1
         self.complete_ = stg_complete
         return stg_complete, lmp_task_grp, ret_selector
+
+    def _md_report(
+        self,
+        report: ExplorationReport,
+        model_devis: Optional[List[Path]],
+    ) -> ExplorationReport:
+        r"""The report of the MD tasks, without the frames re-screened
+        together with them. The model deviations of the MD tasks are
+        recorded by the selector as a partial report, which keeps only
+        the statistics of the frames and a bounded number of candidates."""
+        if self.numb_rescreen_tasks == 0 or model_devis is None:
+            return report
+        nmd = len(model_devis) - self.numb_rescreen_tasks
+        if self.selector is None or nmd <= 0:
+            return report
+        return self.selector.record(model_devis[:nmd])
+
+    def _make_task(
+        self,
+        report: ExplorationReport,
+        trajs: Optional[List[Path]],
+        model_devis: Optional[List[Path]],
+        rescreen: bool,
+    ) -> ExplorationTaskGroup:
+        if self.restart and trajs is not None and not self.rescreened:
+            # the trajectories of the MD tasks are ahead of those of
+            # the re-screening tasks
+            self._set_restart_frames(trajs, model_devis)
+        self.rescreened = False
+        self.numb_rescreen_tasks = 0
+        if self.rescreen is None or not rescreen:
+            return self.stage.make_task()
+        # the selected frames, as the reports are compacted by the
+        # selected candidates, are labeled and not re-screened
+        self.rescreen.set_trajs(
+            trajs if trajs is not None else [],
+            report.get_candidate_ids() if trajs is not None else None,
+        )
+        rescreen_grp = self.rescreen.make_task()
+        if not self.rescreen_only:
+            self.numb_rescreen_tasks = len(rescreen_grp)
+            return self.stage.make_task().add_group(rescreen_grp)
+        if len(rescreen_grp) == 0:
+            return self.stage.make_task()
+        self.rescreened = True
+        return ExplorationTaskGroup().add_group(rescreen_grp)
+
+    def _set_restart_frames(
+        self,
+        trajs: List[Path],
+        model_devis: Optional[List[Path]],
+    ):
+        ntasks = [len(grp) for grp in self.stage.explor_groups]
+        if len(trajs) < sum(ntasks):
+            return
+        if model_devis is None or len(model_devis) != len(trajs):
+            model_devis = [None] * len(trajs)
+        offset = 0
+        for grp, nn in zip(self.stage.explor_groups, ntasks):
+            if isinstance(grp, ConfSamplingTaskGroup):
+                grp.set_restart_frames(
+                    [
+                        _restart_frame(tt, mm, self.restart_level_f)
+                        for tt, mm in zip(
+                            trajs[offset : offset + nn],
+                            model_devis[offset : offset + nn],
+                        )
+                    ]
+                )
+            offset += nn
+
+
+def _restart_frame(
+    traj: Optional[Path],
+    model_devi: Optional[Path],
+    level_f: Optional[float],
+) -> Optional[str]:
+    r"""The last frame of the trajectory, or the last frame of which the
+    max force model deviation is lower than `level_f`. The empty frames,
+    e.g. those pruned by `RunLmp`, are skipped."""
+    if traj is None or not Path(traj).is_file():
+        return None
+    offsets = index_lammps_dump(traj)
+    frame_ids = np.arange(offsets.size - 1)
+    if level_f is not None and model_devi is not None and Path(model_devi).is_file():
+        npy_fname = find_model_devi_npy(model_devi)
+        if npy_fname is not None:
+            md = load_model_devi_npy(npy_fname, [DeviManager.MAX_DEVI_F])
+        else:
+            md = read_model_devi(model_devi, [DeviManager.MAX_DEVI_F])
+        md_f = md[DeviManager.MAX_DEVI_F]
+        if md_f.size != frame_ids.size:
+            return None
+        frame_ids = frame_ids[md_f < level_f]
+    for ii in frame_ids[::-1]:
+        frame = read_lammps_dump_frames(traj, [int(ii)], offsets=offsets).decode()
+        lines = frame.split("\n", 4)
+        if len(lines) > 3 and int(lines[3]) > 0:
+            return frame
+    return None
@@ -111,6 +111,7 @@ class ExplorationScheduler:
         self,
         report: Optional[ExplorationReport] = None,
         trajs: Optional[List[Path]] = None,
+        model_devis: Optional[List[Path]] = None,
     ) -> Tuple[bool, Optional[ExplorationTaskGroup], Optional[ConfSelector]]:
         """
         Make the plan for the next DPGEN iteration.
@@ -121,6 +122,8 @@ class ExplorationScheduler:
             The exploration report of this iteration.
         trajs : List[Path]
             A list of configurations generated during the exploration. May be used to generate new configurations for the next iteration.
+        model_devis : List[Path], optional
+            The model deviations of the configurations.
 
         Returns
         -------
@@ -139,6 +142,7 @@ class ExplorationScheduler:
             ].plan_next_iteration(
                 report,
                 trajs,
+                model_devis,
             )
         except FatalError as e:
             raise FatalError(f"stage {self.cur_stage}: " + str(e))
@@ -7,6 +7,7 @@ from pathlib import (
 )
 from typing import (
     List,
+    Optional,
     Tuple,
 )
 
@@ -88,6 +89,7 @@ class StageScheduler(ABC):
         self,
         report: ExplorationReport,
         trajs: List[Path],
+        model_devis: Optional[List[Path]] = None,
     ) -> Tuple[bool, ExplorationTaskGroup, ConfSelector]:
         """
         Make the plan for the next iteration of the stage.
@@ -102,6 +104,8 @@ class StageScheduler(ABC):
             The exploration report of this iteration.
         confs : List[Path]
             A list of configurations generated during the exploration. May be used to generate new configurations for the next iteration.
+        model_devis : List[Path], optional
+            The model deviations of the configurations.
 
         Returns
         -------
@@ -1,4 +1,8 @@
+from .conf_diversity import (
+    ConfDiversity,
+)
 from .conf_filter import (
+    BatchedConfFilter,
     ConfFilter,
     ConfFilters,
 )
@@ -8,3 +12,9 @@ from .conf_selector import (
 from .conf_selector_frame import (
     ConfSelectorFrames,
 )
+from .distance_conf_filter import (
+    DistanceConfFilter,
+)
+from .novelty_index import (
+    NoveltyIndex,
+)
@@ -0,0 +1,262 @@
+from typing import (
+    List,
+    Optional,
+)
+
+import dpdata
+import numpy as np
+
+from .distance_conf_filter import (
+    neighbor_pairs,
+)
+
+
+class ConfDiversity:
+    """Pick a diverse subset of the selected configurations.
+
+    Each configuration is described by a fingerprint that is invariant
+    to the rotations and the permutations of the atoms: the histograms
+    of the distances between the atoms of each pair of atom types,
+    normalized by the number of atoms. The subset is picked by the
+    farthest point sampling in the space of the fingerprints, so the
+    nearly identical configurations, e.g. the consecutive frames of a
+    trajectory, are unlikely to be picked together. The configurations
+    with identical fingerprints are never picked more than once. The
+    distances are found by a linked-cell neighbor search, so the cost of
+    a fingerprint is linear in the number of atoms.
+
+    Parameters
+    ----------
+    rcut : float
+        The cutoff radius of the distance histograms.
+    nbins : int
+        The number of bins of the distance histograms.
+    pool_size : int, optional
+        The number of candidates taken from the exploration report, from
+        which the diverse subset is picked. Defaults to `pool_multiple`
+        times the number of picked configurations.
+    pool_multiple : int
+        The default `pool_size` in the multiple of the number of picked
+        configurations.
+
+    """
+
+    def __init__(
+        self,
+        rcut: float = 6.0,
+        nbins: int = 30,
+        pool_size: Optional[int] = None,
+        pool_multiple: int = 10,
+    ):
+        self.rcut = rcut
+        self.nbins = nbins
+        self.pool_size = pool_size
+        self.pool_multiple = pool_multiple
+
+    def get_pool_size(
+        self,
+        max_nframes: Optional[int] = None,
+    ) -> Optional[int]:
+        r"""The number of candidates from which at most `max_nframes`
+        configurations are picked. All the candidates if None."""
+        if self.pool_size is not None:
+            return self.pool_size
+        if max_nframes is None:
+            return None
+        return self.pool_multiple * max_nframes
+
+    def select(
+        self,
+        ms: dpdata.MultiSystems,
+        max_nframes: Optional[int] = None,
+    ) -> dpdata.MultiSystems:
+        r"""Pick at most `max_nframes` diverse configurations.
+
+        Parameters
+        ----------
+        ms : dpdata.MultiSystems
+            The configurations.
+        max_nframes : int, optional
+            The maximal number of picked configurations. If not set,
+            only the configurations with identical fingerprints are removed.
+
+        Returns
+        -------
+        ms : dpdata.MultiSystems
+            The picked configurations.
+        """
+        systems = [ss for ss in ms.systems.values() if ss.get_nframes() > 0]
+        if len(systems) == 0:
+            return ms
+        ret = dpdata.MultiSystems(type_map=ms.atom_names)
+        for ss, sel in zip(systems, self.pick(systems, max_nframes)):
+            if sel.size > 0:
+                ret.append(ss.sub_system(sel))
+        return ret
+
+    def pick(
+        self,
+        systems: List[dpdata.System],
+        max_nframes: Optional[int] = None,
+    ) -> List[np.ndarray]:
+        r"""Pick at most `max_nframes` diverse frames of the systems.
+
+        Parameters
+        ----------
+        systems : List[dpdata.System]
+            The systems. The atom types are matched by the atom names.
+        max_nframes : int, optional
+            The maximal number of picked frames. If not set, only the
+            frames with identical fingerprints are removed.
+
+        Returns
+        -------
+        picked : List[np.ndarray]
+            The sorted indexes of the picked frames of each system.
+        """
+        type_map = []
+        for ss in systems:
+            type_map += [nn for nn in ss["atom_names"] if nn not in type_map]
+        fps = [np.zeros((0, len(type_map) * (len(type_map) + 1) // 2 * self.nbins))]
+        for ss in systems:
+            if ss.get_nframes() == 0:
+                continue
+            type_idx = np.array([type_map.index(nn) for nn in ss["atom_names"]])
+            fps.append(
+                structure_fingerprint(
+                    ss["coords"],
+                    ss["cells"],
+                    type_idx[ss["atom_types"]],
+                    len(type_map),
+                    ss.nopbc,
+                    self.rcut,
+                    self.nbins,
+                )
+            )
+        fps = np.concatenate(fps, axis=0)
+        nframes = [ss.get_nframes() for ss in systems]
+        sys_idx = np.repeat(np.arange(len(systems)), nframes)
+        frame_idx = np.concatenate(
+            [np.zeros(0, dtype=int)] + [np.arange(nn) for nn in nframes]
+        )
+        picked = np.sort(farthest_point_sampling(fps, max_nframes))
+        return [frame_idx[picked[sys_idx[picked] == ii]] for ii in range(len(systems))]
+
+
+def structure_fingerprint(
+    coords: np.ndarray,
+    cells: np.ndarray,
+    atom_types: np.ndarray,
+    ntypes: int,
+    nopbc: bool,
+    rcut: float,
+    nbins: int,
+) -> np.ndarray:
+    r"""The fingerprints of the frames of a system.
+
+    The fingerprint is the concatenated histograms of the distances
+    between the atoms of each pair of atom types, normalized by the
+    number of atoms. The pairs within `rcut`, including those of the
+    periodic images, are found by the linked-cell search of
+    `neighbor_pairs`, so the cost is linear in the number of atoms.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        The coordinates, shape (nframes, natoms, 3).
+    cells : np.ndarray
+        The cells, shape (nframes, 3, 3).
+    atom_types : np.ndarray
+        The atom types, shape (natoms,).
+    ntypes : int
+        The number of atom types.
+    nopbc : bool
+        If the system is not periodic.
+    rcut : float
+        The cutoff radius of the histograms.
+    nbins : int
+        The number of bins of the histograms.
+
+    Returns
+    -------
+    fps : np.ndarray
+        The fingerprints, shape (nframes, ntypes * (ntypes + 1) // 2 * nbins).
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    cells = np.asarray(cells, dtype=np.float64)
+    atom_types = np.asarray(atom_types, dtype=int)
+    nframes, natoms = coords.shape[:2]
+    # the index of the unordered type pairs
+    ti, tj = np.triu_indices(ntypes)
+    pair_class = np.zeros((ntypes, ntypes), dtype=int)
+    pair_class[ti, tj] = np.arange(ti.size)
+    pair_class[tj, ti] = np.arange(ti.size)
+    nfeat = ti.size * nbins
+    fps = np.zeros((nframes, nfeat))
+    if natoms < 2:
+        return fps
+    rcut2 = rcut * rcut
+    for ff in range(nframes):
+        for ii, jj, dist2 in neighbor_pairs(coords[ff], cells[ff], rcut, nopbc):
+            mask = dist2 < rcut2
+            ii, jj = ii[mask], jj[mask]
+            bins = np.minimum(
+                (np.sqrt(dist2[mask]) * (nbins / rcut)).astype(int), nbins - 1
+            )
+            fps[ff] += np.bincount(
+                pair_class[atom_types[ii], atom_types[jj]] * nbins + bins,
+                minlength=nfeat,
+            )
+    return fps / natoms
+
+
+def farthest_point_sampling(
+    fps: np.ndarray,
+    max_nframes: Optional[int] = None,
+) -> np.ndarray:
+    r"""Pick the points by the farthest point sampling.
+
+    The first point is the farthest one from the centroid, then each
+    picked point is the farthest one from all the points picked before.
+    The sampling stops after `max_nframes` points or when the remaining
+    points all coincide with the picked ones.
+
+    Parameters
+    ----------
+    fps : np.ndarray
+        The points, shape (npoints, ndim).
+    max_nframes : int, optional
+        The maximal number of picked points.
+
+    Returns
+    -------
+    picked : np.ndarray
+        The indexes of the picked points, in the order of picking.
+    """
+    npoints = fps.shape[0]
+    if max_nframes is None:
+        max_nframes = npoints
+    max_nframes = min(max_nframes, npoints)
+    if max_nframes <= 0:
+        return np.zeros(0, dtype=int)
+    centroid = fps.mean(axis=0)
+    first = int(np.argmax(np.sum(np.square(fps - centroid), axis=1)))
+    norm2 = np.einsum("pd,pd->p", fps, fps)
+
+    def dist2(idx):
+        # the squared distances to a point by the matrix-vector product,
+        # the rounding errors of the coincident points are removed
+        d2 = norm2 + norm2[idx] - 2.0 * (fps @ fps[idx])
+        d2[d2 <= 1e-10 * (norm2 + norm2[idx])] = 0.0
+        return d2
+
+    picked = [first]
+    # the squared distances to the nearest picked point
+    min_d2 = dist2(first)
+    while len(picked) < max_nframes:
+        nxt = int(np.argmax(min_d2))
+        if min_d2[nxt] <= 0.0:
+            break
+        picked.append(nxt)
+        np.minimum(min_d2, dist2(nxt), out=min_d2)
+    return np.array(picked, dtype=int)
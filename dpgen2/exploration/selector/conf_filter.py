@@ -41,6 +41,74 @@ class ConfFilter(ABC):
         """
         pass
 
+    def batched_check(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: np.ndarray,
+        nopbc: bool,
+    ) -> np.ndarray:
+        """Check if the configurations are valid.
+
+        By default `check` is called frame by frame. Filters that can
+        be evaluated on all frames at once should derive from
+        `BatchedConfFilter` instead.
+
+        Parameters
+        ----------
+        coords : numpy.array
+            The coordinates, numpy array of shape nframes x natoms x 3
+        cells : numpy.array
+            The cell tensors. numpy array of shape nframes x 3 x 3
+        atom_types : numpy.array
+            The atom types. numpy array of shape natoms
+        nopbc : bool
+            If no periodic boundary condition.
+
+        Returns
+        -------
+        valid : numpy.array
+            Boolean array of shape nframes, `True` for the valid configurations.
+
+        """
+        return np.array(
+            [
+                self.check(coords[ii], cells[ii], atom_types, nopbc)
+                for ii in range(coords.shape[0])
+            ],
+            dtype=bool,
+        ).reshape(-1)
+
+
+class BatchedConfFilter(ConfFilter):
+    """The configuration filter evaluated on a batch of frames at once.
+
+    The derived classes implement `batched_check`, and the per-frame
+    `check` is given by checking a batch of one frame.
+
+    """
+
+    @abstractmethod
+    def batched_check(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: np.ndarray,
+        nopbc: bool,
+    ) -> np.ndarray:
+        pass
+
+    def check(
+        self,
+        coords: np.ndarray,
+        cell: np.ndarray,
+        atom_types: np.ndarray,
+        nopbc: bool,
+    ) -> bool:
+        return bool(
+            self.batched_check(coords[None, ...], cell[None, ...], atom_types, nopbc)[0]
+        )
+
 
 class ConfFilters:
     def __init__(
@@ -59,19 +127,18 @@ class ConfFilters:
         self,
         conf: dpdata.System,
     ) -> bool:
-        natoms = sum(conf["atom_numbs"])
-        selected_idx = np.arange(conf.get_nframes())
+        return conf.sub_system(np.where(self.check_frames(conf))[0])
+
+    def check_frames(
+        self,
+        conf: dpdata.System,
+    ) -> np.ndarray:
+        r"""The boolean array of shape nframes, `True` for the frames
+        that pass all the filters."""
+        nframes = conf.get_nframes()
+        coords = np.asarray(conf["coords"]).reshape(nframes, -1, 3)
+        cells = np.asarray(conf["cells"]).reshape(nframes, 3, 3)
+        valid = np.ones(nframes, dtype=bool)
         for ff in self._filters:
-            fsel = np.where(
-                [
-                    ff.check(
-                        conf["coords"][ii],
-                        conf["cells"][ii],
-                        conf["atom_types"],
-                        conf.nopbc,
-                    )
-                    for ii in range(conf.get_nframes())
-                ]
-            )[0]
-            selected_idx = np.intersect1d(selected_idx, fsel)
-        return conf.sub_system(selected_idx)
+            valid &= ff.batched_check(coords, cells, conf["atom_types"], conf.nopbc)
+        return valid
@@ -6,6 +6,7 @@ from pathlib import (
     Path,
 )
 from typing import (
+    Callable,
     List,
     Optional,
     Set,
@@ -13,6 +14,7 @@ from typing import (
 )
 
 import dpdata
+import numpy as np
 
 from dpgen2.exploration.report import (
     ExplorationReport,
@@ -32,5 +34,33 @@ class ConfSelector(ABC):
         trajs: List[Path],
         model_devis: List[Path],
         type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
     ) -> Tuple[List[Path], ExplorationReport]:
+        r"""Select configurations. If `conf_novelty` is given, it returns
+        the boolean array of the frames of a system to be kept, e.g. the
+        ones that are not labeled yet, and the other frames are not
+        selected."""
         pass
+
+    def record(
+        self,
+        model_devis: List[Path],
+    ) -> ExplorationReport:
+        r"""Record the partial exploration report of a subset of the
+        trajectories. The map step of the sharded selection."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the sharded selection"
+        )
+
+    def select_from_reports(
+        self,
+        trajs: List[Path],
+        reports: List[ExplorationReport],
+        type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
+    ) -> Tuple[List[Path], ExplorationReport]:
+        r"""Select configurations from the merged partial reports given
+        by `record`. The reduce step of the sharded selection."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the sharded selection"
+        )
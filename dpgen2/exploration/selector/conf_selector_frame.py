@@ -6,6 +6,7 @@ from pathlib import (
     Path,
 )
 from typing import (
+    Callable,
     List,
     Optional,
     Tuple,
@@ -22,10 +23,13 @@ from dpgen2.exploration.report import (
 )
 
 from . import (
+    ConfDiversity,
     ConfFilters,
     ConfSelector,
 )
 
+chunk_pattern = "chunk.%06d"
+
 
 class ConfSelectorFrames(ConfSelector):
     """Select frames from trajectories as confs.
@@ -35,6 +39,28 @@ class ConfSelectorFrames(ConfSelector):
         The trust level
     conf_filter: ConfFilters
         The configuration filter
+    chunk_size: int, optional
+        If set, select in the streaming mode: the trajectories are
+        processed in chunks of `chunk_size`. Only the statistics of the
+        frames and at most `max_numb_sel` candidates are kept by the
+        report, and the selected configurations are written chunk by
+        chunk, so the memory does not grow with the number of
+        trajectories. The report should support `record_chunk`.
+    conf_diversity: ConfDiversity, optional
+        If set, a diverse subset of at most `max_numb_sel` configurations
+        is picked from `conf_diversity.get_pool_size` candidates of the
+        report. Not supported in the streaming mode.
+    novelty_pool_multiple: int, optional
+        If set, the candidates known by `conf_novelty` are dropped from
+        `novelty_pool_multiple` times `max_numb_sel` candidates of the
+        report, and at most `max_numb_sel` of the others, the ones the
+        report picks first, are selected. Otherwise the known candidates
+        are dropped from the `max_numb_sel` candidates. Not used if
+        `conf_diversity` is set, the diversity picking takes its own pool.
+
+    The candidate ids kept by the returned report are the ones of the
+    selected configurations, after the filters, `conf_novelty` and the
+    diversity picking.
 
     """
 
@@ -44,17 +70,33 @@ class ConfSelectorFrames(ConfSelector):
         report: ExplorationReport,
         max_numb_sel: Optional[int] = None,
         conf_filters: Optional[ConfFilters] = None,
+        chunk_size: Optional[int] = None,
+        conf_diversity: Optional[ConfDiversity] = None,
+        novelty_pool_multiple: Optional[int] = None,
     ):
+        if chunk_size is not None and conf_diversity is not None:
+            raise RuntimeError(
+                "the diversity selection is not supported in the streaming mode"
+            )
         self.max_numb_sel = max_numb_sel
         self.conf_filters = conf_filters
         self.traj_render = traj_render
         self.report = report
+        self.chunk_size = chunk_size
+        self.conf_diversity = conf_diversity
+        self.novelty_pool_multiple = novelty_pool_multiple
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # the selectors pickled by the previous versions
+        self.__dict__.setdefault("novelty_pool_multiple", None)
 
     def select(
         self,
         trajs: List[Path],
         model_devis: List[Path],
         type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
     ) -> Tuple[List[Path], ExplorationReport]:
         """Select configurations
 
@@ -69,30 +111,262 @@ class ConfSelectorFrames(ConfSelector):
             where `md` stands for model deviation, v for virial and f for force
         type_map : List[str]
             The `type_map` of the systems
+        conf_novelty : Callable, optional
+            Returns the boolean array of the frames of a system to be
+            kept, e.g. the ones not labeled yet.
 
         Returns
         -------
         confs : List[Path]
-            The selected confgurations, stored in a folder in deepmd/npy format, can be parsed as dpdata.MultiSystems. The `list` only has one item.
+            The selected confgurations, stored in a folder in deepmd/npy format, can be parsed as dpdata.MultiSystems. The `list` only has one item, except in the streaming mode, in which the configurations selected from each chunk of trajectories are stored in one folder.
         report : ExplorationReport
             The exploration report recoding the status of the exploration.
 
         """
         ntraj = len(trajs)
         assert ntraj == len(model_devis)
+        if self.chunk_size is not None:
+            return self._select_streaming(trajs, model_devis, type_map, conf_novelty)
 
         md_model_devi = self.traj_render.get_model_devi(model_devis)
 
         self.report.clear()
         self.report.record(md_model_devi)
-        id_cand_list = self.report.get_candidate_ids(self.max_numb_sel)
+        return self._select_recorded(trajs, type_map, conf_novelty)
 
-        ms = self.traj_render.get_confs(
-            trajs, id_cand_list, type_map, self.conf_filters
+    def record(
+        self,
+        model_devis: List[Path],
+    ) -> ExplorationReport:
+        """Record the partial report of a subset of trajectories, the map
+        step of the sharded selection. The partial report keeps only the
+        statistics of the frames and at most the number of candidates
+        picked by `select_from_reports`, see `ExplorationReport.record_chunk`.
+
+        Parameters
+        ----------
+        model_devis : List[Path]
+            A `list` of `Path` to model deviation files of the subset.
+
+        Returns
+        -------
+        report : ExplorationReport
+            The partial report, which is merged by `select_from_reports`.
+
+        """
+        md_model_devi = self.traj_render.get_model_devi(model_devis)
+        self.report.clear()
+        self.report.record_chunk(md_model_devi, self._get_pool_size())
+        return copy.deepcopy(self.report)
+
+    def select_from_reports(
+        self,
+        trajs: List[Path],
+        reports: List[ExplorationReport],
+        type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
+    ) -> Tuple[List[Path], ExplorationReport]:
+        """Select configurations from the partial reports, the reduce step
+        of the sharded selection. The candidates are picked as in the
+        streaming mode of `select`. Not supported in the streaming mode.
+
+        Parameters
+        ----------
+        trajs : List[Path]
+            A `list` of `Path` to trajectory files generated by LAMMPS
+        reports : List[ExplorationReport]
+            The partial reports given by `record`, in the order of `trajs`.
+        type_map : List[str]
+            The `type_map` of the systems
+        conf_novelty : Callable, optional
+            Returns the boolean array of the frames of a system to be
+            kept, e.g. the ones not labeled yet.
+
+        Returns
+        -------
+        confs : List[Path]
+            The selected confgurations.
+        report : ExplorationReport
+            The merged exploration report.
+
+        """
+        if self.chunk_size is not None:
+            raise RuntimeError(
+                "the sharded selection is not supported in the streaming mode"
+            )
+        self.report.clear()
+        self.report.merge(reports, self._get_pool_size())
+        return self._select_recorded(trajs, type_map, conf_novelty)
+
+    def _get_pool_size(self) -> Optional[int]:
+        r"""The number of candidates taken from the report."""
+        if self.conf_diversity is not None:
+            return self.conf_diversity.get_pool_size(self.max_numb_sel)
+        if self.novelty_pool_multiple is not None and self.max_numb_sel is not None:
+            return self.novelty_pool_multiple * self.max_numb_sel
+        return self.max_numb_sel
+
+    def _truncate_selected(
+        self,
+        id_sel_list: List[List[int]],
+    ) -> List[List[int]]:
+        r"""Keep at most `max_numb_sel` of the selected frames of the
+        pool, the ones picked first by the report, i.e. the selected
+        frames among the fewest candidates of the report that include
+        `max_numb_sel` of them."""
+        if self.max_numb_sel is None:
+            return id_sel_list
+        if sum(len(ii) for ii in id_sel_list) <= self.max_numb_sel:
+            return id_sel_list
+        sel = [set(ii) for ii in id_sel_list]
+
+        def picked(nframes):
+            cand = self.report.get_candidate_ids(nframes)
+            return [[ff for ff in cc if ff in ss] for cc, ss in zip(cand, sel)]
+
+        lo, hi = self.max_numb_sel, self._get_pool_size()
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sum(len(ii) for ii in picked(mid)) >= self.max_numb_sel:
+                hi = mid
+            else:
+                lo = mid + 1
+        ret = picked(lo)
+        nkept = sum(len(ii) for ii in ret)
+        # the candidates of a randomly sampling report may not be nested
+        for ii, ids in enumerate(id_sel_list):
+            if nkept > self.max_numb_sel:
+                ndrop = min(nkept - self.max_numb_sel, len(ret[ii]))
+                ret[ii] = ret[ii][: len(ret[ii]) - ndrop]
+                nkept -= ndrop
+            elif nkept < self.max_numb_sel:
+                fill = [ff for ff in ids if ff not in set(ret[ii])]
+                ret[ii] += fill[: self.max_numb_sel - nkept]
+                nkept += len(fill[: self.max_numb_sel - nkept])
+            # in the order of the selected frames
+            kept = set(ret[ii])
+            ret[ii] = [ff for ff in ids if ff in kept]
+        return ret
+
+    def _load_selected(
+        self,
+        trajs: List[Path],
+        id_selected: List[List[int]],
+        type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
+    ) -> Tuple[List[Optional[dpdata.System]], List[List[int]]]:
+        r"""Load the selected frames that pass the filters and
+        `conf_novelty`, and their indexes in the trajectories."""
+        systems, ids = [], []
+        for ss, sel in self.traj_render.get_systems(
+            trajs, id_selected, type_map, self.conf_filters
+        ):
+            if ss is not None and conf_novelty is not None and len(sel) > 0:
+                keep = np.flatnonzero(conf_novelty(ss))
+                ss, sel = ss.sub_system(keep), np.asarray(sel)[keep].tolist()
+            systems.append(ss)
+            ids.append(sel)
+        return systems, ids
+
+    def _select_recorded(
+        self,
+        trajs: List[Path],
+        type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
+    ) -> Tuple[List[Path], ExplorationReport]:
+        id_cand_list = self.report.get_candidate_ids(self._get_pool_size())
+
+        systems, id_sel_list = self._load_selected(
+            trajs, id_cand_list, type_map, conf_novelty
         )
+        if self.conf_diversity is None:
+            truncated = self._truncate_selected(id_sel_list)
+            for ii, ss in enumerate(systems):
+                if len(truncated[ii]) < len(id_sel_list[ii]):
+                    keep = np.flatnonzero(np.isin(id_sel_list[ii], truncated[ii]))
+                    systems[ii] = ss.sub_system(keep)
+            id_sel_list = truncated
+        sel_idx = [ii for ii, ss in enumerate(systems) if len(id_sel_list[ii]) > 0]
+        if self.conf_diversity is not None:
+            picked = self.conf_diversity.pick(
+                [systems[ii] for ii in sel_idx], self.max_numb_sel
+            )
+            for ii, pp in zip(sel_idx, picked):
+                systems[ii] = systems[ii].sub_system(pp)
+                id_sel_list[ii] = np.asarray(id_sel_list[ii])[pp].tolist()
 
+        ms = dpdata.MultiSystems(type_map=type_map)
+        for ii in sel_idx:
+            if systems[ii].get_nframes() > 0:
+                ms.append(systems[ii])
         out_path = Path("confs")
         out_path.mkdir(exist_ok=True)
         ms.to_deepmd_npy(out_path)
+        self.report.compact(id_sel_list)
 
         return [out_path], copy.deepcopy(self.report)
+
+    def _select_streaming(
+        self,
+        trajs: List[Path],
+        model_devis: List[Path],
+        type_map: Optional[List[str]] = None,
+        conf_novelty: Optional[Callable[[dpdata.System], np.ndarray]] = None,
+    ) -> Tuple[List[Path], ExplorationReport]:
+        ntraj = len(trajs)
+        chunks = [
+            (ii, min(ii + self.chunk_size, ntraj))
+            for ii in range(0, ntraj, self.chunk_size)
+        ]
+
+        self.report.clear()
+        for start, end in chunks:
+            md_model_devi = self.traj_render.get_model_devi(model_devis[start:end])
+            self.report.record_chunk(md_model_devi, self._get_pool_size())
+            del md_model_devi
+        id_cand_list = self.report.get_candidate_ids(self._get_pool_size())
+        if self._get_pool_size() != self.max_numb_sel:
+            # the candidates are filtered chunk by chunk, and truncated
+            # before the selected configurations are written
+            for start, end in chunks:
+                if any([len(ii) > 0 for ii in id_cand_list[start:end]]):
+                    id_cand_list[start:end] = self._load_selected(
+                        trajs[start:end],
+                        id_cand_list[start:end],
+                        type_map,
+                        conf_novelty,
+                    )[1]
+            id_cand_list = self._truncate_selected(id_cand_list)
+            conf_novelty = None
+
+        # the selected configurations of each chunk are written to
+        # a sub-directory
+        out_path = Path("confs")
+        out_path.mkdir(exist_ok=True)
+        confs = []
+        id_sel_list = [[] for _ in range(ntraj)]
+        for start, end in chunks:
+            if all([len(ii) == 0 for ii in id_cand_list[start:end]]):
+                continue
+            systems, id_sel_list[start:end] = self._load_selected(
+                trajs[start:end],
+                id_cand_list[start:end],
+                type_map,
+                conf_novelty,
+            )
+            ms = dpdata.MultiSystems(type_map=type_map)
+            for ss in systems:
+                if ss is not None and ss.get_nframes() > 0:
+                    ms.append(ss)
+            del systems
+            if ms.get_nframes() == 0:
+                continue
+            chunk_path = out_path / (chunk_pattern % len(confs))
+            ms.to_deepmd_npy(chunk_path)
+            confs.append(chunk_path)
+            del ms
+        if len(confs) == 0:
+            confs = [out_path]
+        self.report.compact(id_sel_list)
+
+        return confs, copy.deepcopy(self.report)
@@ -0,0 +1,224 @@
+import itertools
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .conf_filter import (
+    BatchedConfFilter,
+)
+
+
+class DistanceConfFilter(BatchedConfFilter):
+    """Filter out the configurations with too close atoms.
+
+    A configuration is invalid if the distance between any pair of
+    atoms is smaller than the minimal distance of the pair. The pairs
+    are found by a linked-cell neighbor search, so the cost of each
+    frame is linear in the number of atoms. Triclinic periodic cells
+    and non-periodic configurations are supported.
+
+    Parameters
+    ----------
+    min_dist : float
+        The minimal distance between any two atoms.
+    min_dist_pair : Dict[Tuple, float], optional
+        The minimal distances of specific type pairs, overriding
+        `min_dist`. The keys are pairs of atom types, given by the type
+        indexes or, if `type_map` is provided, by the type names, e.g.
+        `{("H", "H"): 0.6, ("O", "H"): 0.8}`.
+    type_map : List[str], optional
+        The type map used to resolve the type names in `min_dist_pair`.
+
+    """
+
+    def __init__(
+        self,
+        min_dist: float,
+        min_dist_pair: Optional[
+            Dict[Tuple[Union[int, str], Union[int, str]], float]
+        ] = None,
+        type_map: Optional[List[str]] = None,
+    ):
+        self.min_dist = min_dist
+        self.min_dist_pair = {}
+        for (ti, tj), dd in (min_dist_pair or {}).items():
+            ti = self._type_index(ti, type_map)
+            tj = self._type_index(tj, type_map)
+            self.min_dist_pair[(ti, tj)] = dd
+            self.min_dist_pair[(tj, ti)] = dd
+
+    @staticmethod
+    def _type_index(
+        tt: Union[int, str],
+        type_map: Optional[List[str]],
+    ) -> int:
+        if isinstance(tt, str):
+            if type_map is None:
+                raise RuntimeError(
+                    f"type_map should be provided to resolve the type name {tt}"
+                )
+            return type_map.index(tt)
+        return int(tt)
+
+    def _cutoff_matrix(
+        self,
+        ntypes: int,
+    ) -> np.ndarray:
+        ntypes = max([ntypes] + [max(kk) + 1 for kk in self.min_dist_pair])
+        cutoffs = np.full((ntypes, ntypes), self.min_dist, dtype=np.float64)
+        for (ti, tj), dd in self.min_dist_pair.items():
+            cutoffs[ti, tj] = dd
+        return cutoffs
+
+    def batched_check(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: np.ndarray,
+        nopbc: bool,
+    ) -> np.ndarray:
+        coords = np.asarray(coords, dtype=np.float64)
+        cells = np.asarray(cells, dtype=np.float64)
+        atom_types = np.asarray(atom_types, dtype=int)
+        nframes = coords.shape[0]
+        valid = np.ones(nframes, dtype=bool)
+        if coords.shape[1] == 0:
+            return valid
+        cutoffs = self._cutoff_matrix(atom_types.max() + 1)
+        cutoffs2 = np.square(cutoffs)
+        rc = cutoffs.max()
+        if rc <= 0.0:
+            return valid
+        for ii in range(nframes):
+            valid[ii] = _check_min_dist(
+                coords[ii], cells[ii], atom_types, cutoffs2, rc, nopbc
+            )
+        return valid
+
+
+def _check_min_dist(
+    coords: np.ndarray,
+    cell: np.ndarray,
+    atom_types: np.ndarray,
+    cutoffs2: np.ndarray,
+    rc: float,
+    nopbc: bool,
+) -> bool:
+    r"""Check the minimal distances of one frame by a linked-cell search."""
+    for ii, jj, dist2 in neighbor_pairs(coords, cell, rc, nopbc):
+        if np.any(dist2 < cutoffs2[atom_types[ii], atom_types[jj]]):
+            return False
+    return True
+
+
+def neighbor_pairs(
+    coords: np.ndarray,
+    cell: np.ndarray,
+    rc: float,
+    nopbc: bool,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    r"""Find the pairs of atoms within `rc` in one frame by a linked-cell
+    search.
+
+    The atoms are binned in the fractional coordinates of the cell (or
+    of the bounding box if `nopbc`). The width of the bins is at least
+    `rc` in the direction perpendicular to each face, so all pairs within
+    `rc` are found in the neighboring bins. The bins are not narrower than
+    the mean atomic spacing, so the number of bins is bounded by the
+    number of atoms. Only half of the neighboring
+    bins are visited, each pair (including the periodic images) is
+    found once.
+
+    Parameters
+    ----------
+    coords : np.ndarray
+        The coordinates, shape (natoms, 3).
+    cell : np.ndarray
+        The cell, shape (3, 3). Not used if `nopbc`.
+    rc : float
+        The cutoff radius.
+    nopbc : bool
+        If the frame is not periodic.
+
+    Yields
+    ------
+    ii, jj : np.ndarray
+        The indexes of the atoms of the pairs, one batch of pairs for
+        each neighboring bin. Some pairs farther than `rc` are included.
+    dist2 : np.ndarray
+        The squared distances of the pairs.
+    """
+    natoms = coords.shape[0]
+    if natoms == 0:
+        return
+    if nopbc:
+        lo = coords.min(axis=0)
+        extent = coords.max(axis=0) - lo
+        width = max(rc, np.cbrt(np.prod(extent) / natoms))
+        nbins = np.maximum(np.floor(extent / width).astype(int), 1)
+        frac = (coords - lo) / np.where(extent > 0.0, extent, 1.0)
+        posi = coords
+        nshell = np.ones(3, dtype=int)
+    else:
+        frac = coords @ np.linalg.inv(cell)
+        frac -= np.floor(frac)
+        posi = frac @ cell
+        # the distances between the opposite faces of the cell
+        volume = np.abs(np.linalg.det(cell))
+        areas = np.linalg.norm(np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]]), axis=1)
+        heights = volume / areas
+        width = max(rc, np.cbrt(volume / natoms))
+        nbins = np.maximum(np.floor(heights / width).astype(int), 1)
+        # thin cells need more than one shell of periodic images
+        nshell = np.ceil(rc * nbins / heights - 1e-12).astype(int)
+    bins = np.minimum((frac * nbins).astype(int), nbins - 1)
+    bins = np.maximum(bins, 0)
+
+    # the atoms sorted by the bins
+    flat = np.ravel_multi_index(bins.T, nbins)
+    order = np.argsort(flat, kind="stable")
+    counts = np.bincount(flat, minlength=np.prod(nbins))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    atom_idx = np.arange(natoms)
+    offsets = itertools.product(*[range(-nn, nn + 1) for nn in nshell])
+    for offset in offsets:
+        offset = np.array(offset)
+        # half of the shell: the pair i-j at offset o is the pair j-i at -o
+        nonzero = offset[offset != 0]
+        if nonzero.size > 0 and nonzero[0] < 0:
+            continue
+        nb = bins + offset
+        if nopbc:
+            inside = np.all((nb >= 0) & (nb < nbins), axis=1)
+            image = np.zeros((natoms, 3), dtype=int)
+            nb = np.where(inside[:, None], nb, 0)
+        else:
+            inside = np.ones(natoms, dtype=bool)
+            image = np.floor_divide(nb, nbins)
+            nb = nb - image * nbins
+        nb_flat = np.ravel_multi_index(nb.T, nbins)
+        cnt = np.where(inside, counts[nb_flat], 0)
+        total = cnt.sum()
+        if total == 0:
+            continue
+        # all pairs of the atoms and the atoms in their neighboring bins
+        ii = np.repeat(atom_idx, cnt)
+        local = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        jj = order[starts[nb_flat[ii]] + local]
+        shift = image[ii] @ cell if not nopbc else 0.0
+        if not offset.any():
+            # same bin: each pair once, excluding the atom itself
+            keep = ii < jj
+            ii, jj = ii[keep], jj[keep]
+            if not nopbc:
+                shift = shift[keep]
+        dist2 = np.sum(np.square(posi[jj] + shift - posi[ii]), axis=1)
+        yield ii, jj, dist2
@@ -0,0 +1,403 @@
+import json
+from pathlib import (
+    Path,
+)
+from typing import (
+    List,
+    Optional,
+)
+
+import dpdata
+import numpy as np
+from dargs import (
+    Argument,
+)
+
+from dpgen2.constants import (
+    novelty_index_name,
+)
+
+from .conf_diversity import (
+    structure_fingerprint,
+)
+
+
+class NoveltyIndex:
+    """The fingerprint index of the labeled configurations.
+
+    The configurations are described by the structural fingerprints of
+    `ConfDiversity`. A new configuration is known if its fingerprint is
+    within `min_dist` of the fingerprint of a labeled configuration.
+
+    The nearest neighbors are approximately searched by the locality
+    sensitive hashing: the fingerprints are projected on `nproj` random
+    directions and quantized by `bucket_width` for each of the `ntables`
+    hash tables, and only the labeled configurations sharing a bucket
+    with the new configuration in any table are compared. The index is
+    stored in shards, one for each iteration of the labeled data. Each
+    shard keeps the fingerprints and the bucket keys sorted for each
+    table. The shards are memory-mapped when loaded, and a query
+    searches the sorted keys of each shard, so the cost of a query
+    grows logarithmically with the size of the dataset.
+
+    Parameters
+    ----------
+    type_map : List[str]
+        The type map.
+    min_dist : float
+        The configurations within this distance of a labeled
+        configuration in the space of fingerprints are known.
+    rcut : float
+        The cutoff radius of the distance histograms of the fingerprints.
+    nbins : int
+        The number of bins of the distance histograms of the fingerprints.
+    ntables : int
+        The number of hash tables.
+    nproj : int
+        The number of random projections of each hash table.
+    bucket_width : float, optional
+        The width of the buckets of the projections. Four times
+        `min_dist` if not set.
+    max_bucket_size : int
+        At most this number of labeled configurations in a bucket are
+        compared.
+    seed : int
+        The seed of the random projections.
+    pool_multiple : int
+        The candidates known by the index are dropped from this multiple
+        of the number of selected configurations, see `ConfSelectorFrames`.
+
+    """
+
+    def __init__(
+        self,
+        type_map: List[str],
+        min_dist: float,
+        rcut: float = 6.0,
+        nbins: int = 30,
+        ntables: int = 8,
+        nproj: int = 4,
+        bucket_width: Optional[float] = None,
+        max_bucket_size: int = 64,
+        seed: int = 0,
+        pool_multiple: int = 10,
+    ):
+        self.type_map = list(type_map)
+        self.min_dist = min_dist
+        self.rcut = rcut
+        self.nbins = nbins
+        self.ntables = ntables
+        self.nproj = nproj
+        self.bucket_width = bucket_width if bucket_width is not None else 4.0 * min_dist
+        self.max_bucket_size = max_bucket_size
+        self.seed = seed
+        self.pool_multiple = pool_multiple
+        ntypes = len(self.type_map)
+        self.dim = ntypes * (ntypes + 1) // 2 * nbins
+        rng = np.random.default_rng(seed)
+        self.proj = rng.normal(size=(ntables, nproj, self.dim))
+        self.shift = rng.uniform(0.0, self.bucket_width, size=(ntables, nproj))
+        self.mult = rng.integers(1, 2**62, size=nproj, dtype=np.int64)
+
+    @staticmethod
+    def args() -> List[Argument]:
+        doc_min_dist = "The candidate configurations within this distance of a labeled configuration in the space of the structural fingerprints are not labeled again."
+        doc_rcut = "The cutoff radius of the distance histograms of the fingerprints."
+        doc_nbins = "The number of bins of the distance histograms of the fingerprints."
+        doc_ntables = (
+            "The number of hash tables of the approximate nearest neighbor search."
+        )
+        doc_nproj = "The number of random projections of each hash table."
+        doc_bucket_width = "The width of the buckets of the random projections. Four times `min_dist` if not set."
+        doc_max_bucket_size = "At most this number of labeled configurations in a bucket are compared with a candidate."
+        doc_seed = "The seed of the random projections."
+        doc_pool_multiple = "The candidates known by the index are dropped from this multiple of the number of configurations to select, so the known candidates do not reduce the number of selected configurations. Not used if `select_diversity` is set, the candidates are dropped from its pool."
+        return [
+            Argument("min_dist", float, optional=False, doc=doc_min_dist),
+            Argument("rcut", float, optional=True, default=6.0, doc=doc_rcut),
+            Argument("nbins", int, optional=True, default=30, doc=doc_nbins),
+            Argument("ntables", int, optional=True, default=8, doc=doc_ntables),
+            Argument("nproj", int, optional=True, default=4, doc=doc_nproj),
+            Argument(
+                "bucket_width",
+                float,
+                optional=True,
+                default=None,
+                doc=doc_bucket_width,
+            ),
+            Argument(
+                "max_bucket_size",
+                int,
+                optional=True,
+                default=64,
+                doc=doc_max_bucket_size,
+            ),
+            Argument("seed", int, optional=True, default=0, doc=doc_seed),
+            Argument(
+                "pool_multiple",
+                int,
+                optional=True,
+                default=10,
+                doc=doc_pool_multiple,
+            ),
+        ]
+
+    def _meta(self) -> dict:
+        return {
+            "type_map": self.type_map,
+            "rcut": self.rcut,
+            "nbins": self.nbins,
+            "ntables": self.ntables,
+            "nproj": self.nproj,
+            "bucket_width": self.bucket_width,
+            "seed": self.seed,
+        }
+
+    def fingerprint(
+        self,
+        systems: List[dpdata.System],
+    ) -> np.ndarray:
+        r"""The fingerprints of the frames of the systems.
+
+        Parameters
+        ----------
+        systems : List[dpdata.System]
+            The systems. The atom names should be in the type map.
+
+        Returns
+        -------
+        fps : np.ndarray
+            The fingerprints, shape (nframes, dim).
+        """
+        fps = [np.zeros((0, self.dim), dtype=np.float32)]
+        for ss in systems:
+            if ss.get_nframes() == 0:
+                continue
+            type_idx = np.array([self.type_map.index(nn) for nn in ss["atom_names"]])
+            fps.append(
+                structure_fingerprint(
+                    ss["coords"],
+                    ss["cells"],
+                    type_idx[ss["atom_types"]],
+                    len(self.type_map),
+                    ss.nopbc,
+                    self.rcut,
+                    self.nbins,
+                ).astype(np.float32)
+            )
+        return np.concatenate(fps, axis=0)
+
+    def fingerprint_data(
+        self,
+        data: List[Path],
+        mixed_type: bool = False,
+    ) -> np.ndarray:
+        r"""The fingerprints of the frames of the data.
+
+        Parameters
+        ----------
+        data : List[Path]
+            The paths of the systems or the multi-systems in deepmd/npy
+            format.
+        mixed_type : bool
+            If the data are in the mixed type format.
+
+        Returns
+        -------
+        fps : np.ndarray
+            The fingerprints, shape (nframes, dim).
+        """
+        systems = []
+        for ii in data:
+            ii = Path(ii)
+            if mixed_type:
+                ms = dpdata.MultiSystems()
+                ms.load_systems_from_file(ii, fmt="deepmd/npy/mixed", labeled=False)
+                systems += list(ms.systems.values())
+            elif (ii / "type.raw").is_file():
+                systems.append(dpdata.System(ii, fmt="deepmd/npy"))
+            else:
+                ms = dpdata.MultiSystems()
+                ms.from_deepmd_npy(ii, labeled=False)
+                systems += list(ms.systems.values())
+        return self.fingerprint(systems)
+
+    def _hash(
+        self,
+        fps: np.ndarray,
+    ) -> np.ndarray:
+        r"""The bucket keys of the fingerprints, shape (ntables, nframes)."""
+        proj = np.einsum("tpd,nd->tnp", self.proj, fps.astype(np.float64))
+        buckets = np.floor((proj + self.shift[:, None, :]) / self.bucket_width)
+        # the integer overflows are intended
+        with np.errstate(over="ignore"):
+            return np.sum(buckets.astype(np.int64) * self.mult, axis=-1)
+
+    def write(
+        self,
+        fps: np.ndarray,
+        path: Path,
+    ):
+        r"""Write a shard of the index.
+
+        Parameters
+        ----------
+        fps : np.ndarray
+            The fingerprints of the labeled configurations.
+        path : Path
+            The directory of the labeled data. The shard is written as
+            the files prefixed by `novelty_index_name`, so the directory
+            is still loadable as a `dpdata.MultiSystems`.
+        """
+        fps = np.asarray(fps, dtype=np.float32).reshape(-1, self.dim)
+        keys = self._hash(fps)
+        order = np.argsort(keys, axis=1, kind="stable")
+        path = Path(path)
+        np.save(_shard_file(path, "fps"), fps)
+        np.save(_shard_file(path, "keys"), np.take_along_axis(keys, order, axis=1))
+        np.save(_shard_file(path, "order"), order)
+        # the meta is written last, it marks a complete shard
+        (path / (novelty_index_name + ".json")).write_text(json.dumps(self._meta()))
+
+    def shard_paths(
+        self,
+        paths: List[Path],
+    ) -> List[Path]:
+        r"""The directories with a shard built by the same parameters."""
+        ret = []
+        for pp in paths:
+            meta = Path(pp) / (novelty_index_name + ".json")
+            if meta.is_file() and json.loads(meta.read_text()) == self._meta():
+                ret.append(Path(pp))
+        return ret
+
+    def load(
+        self,
+        paths: List[Path],
+    ) -> Optional[dict]:
+        r"""Load the shards of the index from the directories of the
+        labeled data. The directories without a shard, or with a shard
+        built by different parameters, are skipped.
+
+        The fingerprints and the sorted bucket keys stay memory-mapped
+        in the shards, nothing is merged or sorted again when loaded.
+
+        Parameters
+        ----------
+        paths : List[Path]
+            The directories of the labeled data.
+
+        Returns
+        -------
+        index : dict, optional
+            The index of the shards. None if no shard is found.
+        """
+        shards = [
+            {
+                "fps": np.load(_shard_file(pp, "fps"), mmap_mode="r"),
+                "keys": np.load(_shard_file(pp, "keys"), mmap_mode="r"),
+                "order": np.load(_shard_file(pp, "order"), mmap_mode="r"),
+            }
+            for pp in self.shard_paths(paths)
+        ]
+        if len(shards) == 0:
+            return None
+        return {"shards": shards}
+
+    def query(
+        self,
+        fps: np.ndarray,
+        index: Optional[dict],
+    ) -> np.ndarray:
+        r"""Check if the configurations are known.
+
+        The bucket keys are searched in the sorted keys of each shard.
+        At most `max_bucket_size` labeled configurations of a bucket are
+        compared in each table, taken from the shards in their order.
+
+        Parameters
+        ----------
+        fps : np.ndarray
+            The fingerprints of the configurations.
+        index : dict, optional
+            The index returned by `load`.
+
+        Returns
+        -------
+        known : np.ndarray
+            If the configurations are within `min_dist` of a labeled
+            configuration found in the index.
+        """
+        fps = np.asarray(fps, dtype=np.float32).reshape(-1, self.dim)
+        known = np.zeros(fps.shape[0], dtype=bool)
+        if fps.shape[0] == 0 or index is None:
+            return known
+        qkeys = self._hash(fps)
+        for tt in range(self.ntables):
+            # only the configurations not known yet are queried
+            qidx = np.flatnonzero(~known)
+            if qidx.size == 0:
+                break
+            # the number of compared configurations in the bucket
+            ncomp = np.zeros(qidx.size, dtype=np.int64)
+            for shard in index["shards"]:
+                keys = shard["keys"][tt]
+                lo = np.searchsorted(keys, qkeys[tt, qidx], side="left")
+                hi = np.searchsorted(keys, qkeys[tt, qidx], side="right")
+                cnt = np.minimum(hi - lo, self.max_bucket_size - ncomp)
+                ncomp += cnt
+                if cnt.sum() == 0:
+                    continue
+                qq = np.repeat(qidx, cnt)
+                pos = np.repeat(lo, cnt) + (
+                    np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+                )
+                # sorted access to the memory-mapped fingerprints
+                uids, inv = np.unique(shard["order"][tt][pos], return_inverse=True)
+                ref = np.asarray(shard["fps"][uids], dtype=np.float64)[inv]
+                dist2 = np.sum(np.square(ref - fps[qq]), axis=1)
+                known[qq[dist2 <= self.min_dist**2]] = True
+        return known
+
+    def check(
+        self,
+        ss: dpdata.System,
+        index: Optional[dict],
+    ) -> np.ndarray:
+        r"""The boolean array of shape nframes, `True` for the frames of
+        the system that are not known by the index."""
+        if ss.get_nframes() == 0:
+            return np.zeros(0, dtype=bool)
+        return ~self.query(self.fingerprint([ss]), index)
+
+    def select(
+        self,
+        ms: dpdata.MultiSystems,
+        index: Optional[dict],
+    ) -> dpdata.MultiSystems:
+        r"""Drop the known configurations.
+
+        Parameters
+        ----------
+        ms : dpdata.MultiSystems
+            The configurations.
+        index : dict, optional
+            The index returned by `load`.
+
+        Returns
+        -------
+        ms : dpdata.MultiSystems
+            The configurations that are not known.
+        """
+        ret = dpdata.MultiSystems(type_map=self.type_map)
+        for ss in ms.systems.values():
+            if ss.get_nframes() == 0:
+                continue
+            novel = self.check(ss, index)
+            if novel.any():
+                ret.append(ss.sub_system(np.flatnonzero(novel)))
+        return ret
+
+
+def _shard_file(path: Path, key: str) -> Path:
+    return path / f"{novelty_index_name}.{key}.npy"
@@ -15,10 +15,15 @@ from .make_task_group_from_config import (
 from .npt_task_group import (
     NPTTaskGroup,
 )
+from .rescreen_task_group import (
+    RescreenTaskGroup,
+    read_rescreen_frames,
+)
 from .stage import (
     ExplorationStage,
 )
 from .task import (
     ExplorationTask,
     ExplorationTaskGroup,
+    ExplorationTaskProduct,
 )
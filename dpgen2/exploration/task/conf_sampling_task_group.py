@@ -1,15 +1,25 @@
 import itertools
 import random
+import re
+import tempfile
+from pathlib import (
+    Path,
+)
 from typing import (
     List,
     Optional,
 )
 
+import dpdata
+
 from dpgen2.constants import (
     lmp_conf_name,
     lmp_input_name,
     model_name_pattern,
 )
+from dpgen2.exploration.render.lammps_dump import (
+    parse_dpgen_lammps_dump,
+)
 
 from .task import (
     ExplorationTask,
@@ -18,11 +28,24 @@ from .task import (
 
 
 class ConfSamplingTaskGroup(ExplorationTaskGroup):
+    """The task group sampling the configurations.
+
+    Parameters
+    ----------
+    lazy : bool
+        If true, `make_task` only records the sampled configurations and
+        the conditions, and the tasks are made on access.
+
+    """
+
     def __init__(
         self,
+        lazy: bool = False,
     ):
         super().__init__()
         self.conf_set = False
+        self.lazy = lazy
+        self.restart_frames = None
 
     def set_conf(
         self,
@@ -66,3 +89,61 @@ class ConfSamplingTaskGroup(ExplorationTaskGroup):
                 self.conf_queue += add_list
             confs.append(self.conf_queue.pop(0))
         return confs
+
+    def set_restart_frames(
+        self,
+        frames: List[Optional[str]],
+    ):
+        """
+        Start the tasks made by the next `make_task` from the frames
+
+        Parameters
+        ----------
+        frames          List[Optional[str]]
+            The LAMMPS dump frame of each task, e.g. the last frame of
+            the trajectory explored by the task in the previous
+            iteration. The task starts from the sampled configuration
+            if the frame is None. The frames are ignored if they are not
+            as many as the tasks.
+        """
+        self.restart_frames = frames
+
+    def _restart_confs(
+        self,
+        confs: List[str],
+        ntask_per_conf: int,
+    ) -> Optional[List[str]]:
+        """The configuration of each task, with the restart frames in
+        place of the sampled configurations. None if the restart frames
+        are not set. The restart frames are used once."""
+        frames = getattr(self, "restart_frames", None)
+        self.restart_frames = None
+        ret = [cc for cc in confs for _ in range(ntask_per_conf)]
+        if frames is None or len(frames) != len(ret):
+            return None
+        for ii, ff in enumerate(frames):
+            if ff is not None:
+                ret[ii] = _dump_frame_to_lmp_conf(ff, ret[ii])
+        return ret
+
+
+def _dump_frame_to_lmp_conf(
+    frame: str,
+    conf: str,
+) -> str:
+    # the number of atom types is kept, some types may be absent in the frame
+    ntypes = re.search(r"(\d+)\s+atom\s+types", conf)
+    data = parse_dpgen_lammps_dump(frame.encode())
+    if data is None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_fname = Path(tmpdir) / "frame.dump"
+            tmp_fname.write_text(frame)
+            data = dpdata.System(tmp_fname, fmt="lammps/dump").data
+    if ntypes is not None:
+        for ii in range(len(data["atom_names"]), int(ntypes.group(1))):
+            data["atom_names"].append(f"TYPE_{ii}")
+            data["atom_numbs"].append(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp_fname = Path(tmpdir) / lmp_conf_name
+        dpdata.System(data=data).to("lammps/lmp", tmp_fname)
+        return tmp_fname.read_text()
@@ -1,3 +1,4 @@
 from .lmp_input import (
     make_lmp_input,
+    make_lmp_seed,
 )
@@ -12,6 +12,7 @@ from packaging.version import (
 )
 
 from dpgen2.constants import (
+    lmp_restart_name,
     lmp_traj_name,
 )
 
@@ -25,6 +26,13 @@ def _sample_sphere():
         return vv / vn
 
 
+def make_lmp_seed(
+    max_seed: int = 1000000,
+) -> int:
+    """The random seed of the initial velocities."""
+    return random.randrange(max_seed - 1) + 1
+
+
 def make_lmp_input(
     conf_file: str,
     ensemble: str,
@@ -48,6 +56,7 @@ def make_lmp_input(
     max_seed: int = 1000000,
     deepmd_version="2.0",
     trj_seperate_files=True,
+    seed: Optional[int] = None,
 ):
     if (ele_temp_f is not None or ele_temp_a is not None) and Version(
         deepmd_version
@@ -87,9 +96,9 @@ def make_lmp_input(
         ret += "neigh_modify    delay %d\n" % neidelay
     ret += "\n"
     ret += "box          tilt large\n"
-    ret += (
-        'if "${restart} > 0" then "read_restart dpgen.restart.*" else "read_data %s"\n'
-        % conf_file
+    ret += 'if "${restart} > 0" then "read_restart %s.*" else "read_data %s"\n' % (
+        lmp_restart_name,
+        conf_file,
     )
     ret += "change_box   all triclinic\n"
     for jj in range(len(mass_map)):
@@ -128,11 +137,13 @@ def make_lmp_input(
             "dump            1 all custom ${DUMP_FREQ} %s id type x y z fx fy fz\n"
             % lmp_traj_name
         )
-    ret += "restart         10000 dpgen.restart\n"
+    ret += "restart         10000 %s\n" % lmp_restart_name
     ret += "\n"
     if pka_e is None:
+        if seed is None:
+            seed = make_lmp_seed(max_seed)
         ret += 'if "${restart} == 0" then "velocity        all create ${TEMP} %d"' % (
-            random.randrange(max_seed - 1) + 1
+            seed
         )
     else:
         sys = dpdata.System(conf_file, fmt="lammps/lmp")
@@ -26,14 +26,16 @@ from .lmp import (
 from .task import (
     ExplorationTask,
     ExplorationTaskGroup,
+    ExplorationTaskProduct,
 )
 
 
 class LmpTemplateTaskGroup(ConfSamplingTaskGroup):
     def __init__(
         self,
+        lazy: bool = False,
     ):
-        super().__init__()
+        super().__init__(lazy=lazy)
         self.lmp_set = False
         self.plm_set = False
 
@@ -81,7 +83,15 @@ class LmpTemplateTaskGroup(ConfSamplingTaskGroup):
             templates.append(self.plm_template)
         conts = self.make_cont(templates, self.revisions)
         nconts = len(conts[0])
-        for cc, ii in itertools.product(confs, range(nconts)):
+        task_confs = self._restart_confs(confs, nconts)
+        if self.lazy and task_confs is None:
+            fnames = [lmp_input_name, plm_input_name][: len(conts)]
+            conds = [dict(zip(fnames, cc)) for cc in zip(*conts)]
+            self.add_lazy_tasks(ExplorationTaskProduct(lmp_conf_name, confs, conds))
+            return self
+        if task_confs is None:
+            task_confs = [cc for cc in confs for _ in range(nconts)]
+        for cc, ii in zip(task_confs, list(range(nconts)) * len(confs)):
             if not self.plm_set:
                 self.add_task(self._make_lmp_task(cc, conts[0][ii]))
             else:
@@ -27,6 +27,7 @@ def npt_task_group_args():
     doc_use_clusters = "Calculate atomic model deviation"
     doc_relative_f_epsilon = "Calculate relative force model deviation"
     doc_relative_v_epsilon = "Calculate relative virial model deviation"
+    doc_lazy = "Make the tasks on access instead of storing all of them. Only the sampled configurations and the conditions are stored in the task group."
 
     return [
         Argument("temps", list, optional=False, doc=doc_temps, alias=["Ts"]),
@@ -66,6 +67,7 @@ def npt_task_group_args():
             default=None,
             doc=doc_relative_v_epsilon,
         ),
+        Argument("lazy", bool, optional=True, default=False, doc=doc_lazy),
     ]
 
 
@@ -74,6 +76,7 @@ def lmp_template_task_group_args():
     doc_plm_template_fname = "The file name of plumed input template"
     doc_revisions = "The revisions. Should be a dict providing the key - list of desired values pair. Key is the word to be replaced in the templates, and it may appear in both the lammps and plumed input templates. All values in the value list will be enmerated."
     doc_traj_freq = "The frequency of dumping configurations and thermodynamic states"
+    doc_lazy = "Make the tasks on access instead of storing all of them. Only the sampled configurations and the conditions are stored in the task group."
 
     return [
         Argument(
@@ -100,6 +103,7 @@ def lmp_template_task_group_args():
             doc=doc_traj_freq,
             alias=["t_freq", "trj_freq", "trj_freq"],
         ),
+        Argument("lazy", bool, optional=True, default=False, doc=doc_lazy),
     ]
 
 
@@ -133,7 +137,7 @@ def make_task_group_from_config(
 ):
     config = normalize(config)
     if config["type"] == "lmp-md":
-        tgroup = NPTTaskGroup()
+        tgroup = NPTTaskGroup(lazy=config.pop("lazy"))
         config.pop("type")
         tgroup.set_md(
             numb_models,
@@ -141,7 +145,7 @@ def make_task_group_from_config(
             **config,
         )
     elif config["type"] == "lmp-template":
-        tgroup = LmpTemplateTaskGroup()
+        tgroup = LmpTemplateTaskGroup(lazy=config.pop("lazy"))
         config.pop("type")
         lmp_template = config.pop("lmp_template_fname")
         tgroup.set_lmp(
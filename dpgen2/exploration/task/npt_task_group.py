@@ -1,8 +1,10 @@
 import itertools
 import random
 from typing import (
+    Dict,
     List,
     Optional,
+    Tuple,
 )
 
 from dpgen2.constants import (
@@ -16,18 +18,21 @@ from .conf_sampling_task_group import (
 )
 from .lmp import (
     make_lmp_input,
+    make_lmp_seed,
 )
 from .task import (
     ExplorationTask,
     ExplorationTaskGroup,
+    ExplorationTaskProduct,
 )
 
 
 class NPTTaskGroup(ConfSamplingTaskGroup):
     def __init__(
         self,
+        lazy: bool = False,
     ):
-        super().__init__()
+        super().__init__(lazy=lazy)
         self.md_set = False
 
     def set_md(
@@ -95,10 +100,46 @@ class NPTTaskGroup(ConfSamplingTaskGroup):
         # clear all existing tasks
         self.clear()
         confs = self._sample_confs()
-        for cc, tt, pp in itertools.product(confs, self.temps, self.press):
-            self.add_task(self._make_lmp_task(cc, tt, pp))
+        conds = list(itertools.product(self.temps, self.press))
+        task_confs = self._restart_confs(confs, len(conds))
+        # the initial velocities of the PKA are sampled when the input is
+        # made, so the tasks are not made lazily
+        if self.lazy and self.pka_e is None and task_confs is None:
+            # the seeds are drawn in the same order as the eager tasks
+            seeds = [make_lmp_seed() for ii in range(len(confs) * len(conds))]
+            self.add_lazy_tasks(
+                NPTTaskProduct(confs, conds, seeds, self._lmp_input_args())
+            )
+        else:
+            if task_confs is None:
+                task_confs = [cc for cc in confs for _ in conds]
+            for cc, (tt, pp) in zip(task_confs, conds * len(confs)):
+                self.add_task(self._make_lmp_task(cc, tt, pp))
         return self
 
+    def _lmp_input_args(
+        self,
+    ) -> dict:
+        return {
+            "ensemble": self.ens,
+            "graphs": self.graphs,
+            "nsteps": self.nsteps,
+            "dt": self.dt,
+            "neidelay": self.neidelay,
+            "trj_freq": self.trj_freq,
+            "mass_map": self.mass_map,
+            "tau_t": self.tau_t,
+            "tau_p": self.tau_p,
+            "use_clusters": self.use_clusters,
+            "relative_f_epsilon": self.relative_f_epsilon,
+            "relative_v_epsilon": self.relative_v_epsilon,
+            "pka_e": self.pka_e,
+            "ele_temp_f": self.ele_temp_f,
+            "ele_temp_a": self.ele_temp_a,
+            "nopbc": self.no_pbc,
+            "trj_seperate_files": False,
+        }
+
     def _make_lmp_task(
         self,
         conf: str,
@@ -110,25 +151,56 @@ class NPTTaskGroup(ConfSamplingTaskGroup):
             lmp_input_name,
             make_lmp_input(
                 lmp_conf_name,
-                self.ens,
-                self.graphs,
-                self.nsteps,
-                self.dt,
-                self.neidelay,
-                self.trj_freq,
-                self.mass_map,
-                tt,
-                self.tau_t,
-                pp,
-                self.tau_p,
-                self.use_clusters,
-                self.relative_f_epsilon,
-                self.relative_v_epsilon,
-                self.pka_e,
-                self.ele_temp_f,
-                self.ele_temp_a,
-                self.no_pbc,
-                trj_seperate_files=False,
+                temp=tt,
+                pres=pp,
+                **self._lmp_input_args(),
             ),
         )
         return task
+
+
+class NPTTaskProduct(ExplorationTaskProduct):
+    """The lazy tasks of `NPTTaskGroup`. The input script is made on
+    access from the temperature and pressure of the condition, and the
+    velocity seed drawn for the task.
+
+    Parameters
+    ----------
+    confs : List[str]
+        The contents of the configurations.
+    conditions : List[Tuple[float, Optional[float]]]
+        The temperatures and pressures.
+    seeds : List[int]
+        The velocity seeds of the tasks.
+    lmp_input_args : dict
+        The other arguments of `make_lmp_input`.
+
+    """
+
+    def __init__(
+        self,
+        confs: List[str],
+        conditions: List[Tuple[float, Optional[float]]],
+        seeds: List[int],
+        lmp_input_args: dict,
+    ):
+        super().__init__(lmp_conf_name, confs, conditions)
+        assert len(seeds) == len(self)
+        self.seeds = list(seeds)
+        self.lmp_input_args = lmp_input_args
+
+    def _condition_files(
+        self,
+        ii: int,
+        icond: int,
+    ) -> Dict[str, str]:
+        tt, pp = self.conditions[icond]
+        return {
+            lmp_input_name: make_lmp_input(
+                lmp_conf_name,
+                temp=tt,
+                pres=pp,
+                seed=self.seeds[ii],
+                **self.lmp_input_args,
+            ),
+        }
@@ -0,0 +1,157 @@
+import json
+import random
+from pathlib import (
+    Path,
+)
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy as np
+
+from dpgen2.constants import (
+    lmp_rescreen_ref_name,
+)
+from dpgen2.exploration.render.lammps_dump import (
+    index_lammps_dump,
+    lammps_dump_natoms,
+    read_lammps_dump_frames,
+)
+
+from .task import (
+    ExplorationTask,
+    ExplorationTaskGroup,
+)
+
+
+class RescreenTaskGroup(ExplorationTaskGroup):
+    """The task group re-screening the frames of the previous
+    explorations by the models of the next iteration.
+
+    The group keeps a pool of the unselected frames explored by the
+    previous iteration. The pool only refers to the frames by the
+    indexes of the trajectories and of the frames, so the frames are
+    not carried by the scheduler. The tasks write the references in
+    the file `rescreen.json`, `PrepLmp` reads the frames from the
+    trajectories of the previous iteration into the LAMMPS dump file
+    `rescreen.lammpstrj`, and `RunLmp` evaluates their model deviation
+    by the models instead of running MD simulations. The outputs are the
+    same as those of an MD simulation, so the frames are selected by the
+    configuration selector as the MD frames are.
+
+    Parameters
+    ----------
+    max_frames : int
+        The maximal number of frames in the pool. The frames are
+        randomly sampled if more frames are explored.
+    frames_per_task : int
+        The number of frames re-screened by each task.
+
+    """
+
+    def __init__(
+        self,
+        max_frames: int,
+        frames_per_task: int = 1000,
+    ):
+        super().__init__()
+        self.max_frames = max_frames
+        self.frames_per_task = frames_per_task
+        # the (traj_idx, frame_idx) of the frames in the pool
+        self.frames = np.zeros((0, 2), dtype=np.int64)
+
+    def __setstate__(self, state: Dict):
+        super().__setstate__(state)
+        if isinstance(self.frames, list):
+            # the frames kept as text by the previous versions cannot be
+            # referred to the trajectories
+            self.frames = np.zeros((0, 2), dtype=np.int64)
+
+    def set_trajs(
+        self,
+        trajs: List[Optional[Path]],
+        id_selected: Optional[List[List[int]]] = None,
+    ):
+        """
+        Replace the pool by the frames of the trajectories
+
+        Parameters
+        ----------
+        trajs           List[Path]
+            The LAMMPS dump files explored by the previous iteration,
+            including the outputs of the re-screening tasks. The empty
+            frames, e.g. those pruned by `RunLmp`, are not kept.
+        id_selected     List[List[int]], optional
+            The indexes of the frames selected from each trajectory,
+            which are labeled and not kept.
+        """
+        frames = []
+        for tidx, traj in enumerate(trajs):
+            if traj is None or not Path(traj).is_file():
+                continue
+            natoms = lammps_dump_natoms(traj, index_lammps_dump(traj))
+            keep = natoms > 0
+            if id_selected is not None and tidx < len(id_selected):
+                keep[np.asarray(id_selected[tidx], dtype=np.int64)] = False
+            fidx = np.flatnonzero(keep)
+            frames.append(np.stack([np.full(fidx.size, tidx), fidx], axis=1))
+        frames = np.concatenate([np.zeros((0, 2), dtype=np.int64)] + frames, axis=0)
+        if frames.shape[0] > self.max_frames:
+            idx = sorted(random.sample(range(frames.shape[0]), self.max_frames))
+            frames = frames[idx]
+        self.frames = frames.astype(np.int64)
+
+    def make_task(
+        self,
+    ) -> ExplorationTaskGroup:
+        """
+        Make the re-screening task group.
+
+        Returns
+        -------
+        task_grp: ExplorationTaskGroup
+            The returned task group. Each task re-screens at most
+            `frames_per_task` frames of the pool. Empty if the pool is empty.
+
+        """
+        self.clear()
+        for ii in range(0, self.frames.shape[0], self.frames_per_task):
+            self.add_task(
+                ExplorationTask().add_file(
+                    lmp_rescreen_ref_name,
+                    json.dumps(self.frames[ii : ii + self.frames_per_task].tolist()),
+                )
+            )
+        return self
+
+
+def read_rescreen_frames(
+    refs: str,
+    trajs: List[Optional[Path]],
+) -> bytes:
+    r"""Read the frames referred by a re-screening task.
+
+    Parameters
+    ----------
+    refs : str
+        The content of `rescreen.json`, the (traj_idx, frame_idx) of the frames.
+    trajs : List[Path]
+        The trajectories explored by the previous iteration, in the same
+        order as those given to `RescreenTaskGroup.set_trajs`.
+
+    Returns
+    -------
+    text : bytes
+        The frames in the LAMMPS dump format.
+    """
+    refs = np.array(json.loads(refs), dtype=np.int64).reshape(-1, 2)
+    buff = []
+    # the frames of each trajectory are consecutive in the pool
+    starts = np.flatnonzero(np.diff(refs[:, 0], prepend=-1))
+    for tidx, fids in zip(refs[starts, 0].tolist(), np.split(refs[:, 1], starts[1:])):
+        if tidx >= len(trajs) or trajs[tidx] is None:
+            raise RuntimeError(f"the trajectory {tidx} to re-screen is not found")
+        buff.append(read_lammps_dump_frames(trajs[tidx], fids.tolist()))
+    return b"".join(buff)
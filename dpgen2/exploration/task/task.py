@@ -1,3 +1,5 @@
+import bisect
+import hashlib
 import os
 from abc import (
     ABC,
@@ -8,6 +10,7 @@ from collections.abc import (
 )
 from typing import (
     Dict,
+    Iterator,
     List,
     Tuple,
 )
@@ -61,31 +64,106 @@ class ExplorationTask:
 
 
 class ExplorationTaskGroup(Sequence):
-    """A group of exploration tasks. Implemented as a `list` of `ExplorationTask`."""
+    """A group of exploration tasks. Implemented as a `list` of `ExplorationTask`.
+
+    The file contents are stored only once in the group, keyed by their
+    digests, and each task refers to the contents of its files by the
+    digests. The tasks sharing the same configuration or the same input
+    script thus do not duplicate the contents, and the size of the
+    (pickled) group scales with the number of distinct contents rather
+    than the number of tasks. The `ExplorationTask`s are materialized on
+    access.
+
+    The tasks may also be added lazily by `add_lazy_tasks`, as a sequence
+    that makes the tasks on access, e.g. `ExplorationTaskProduct`. The
+    group is a chain of the segments of the materialized tasks and the
+    lazy sequences. Adding a group to the group appends its segments,
+    thus the lazy tasks are neither made nor copied.
+
+    """
 
     def __init__(self):
         super().__init__()
         self.clear()
 
-    def __getitem__(self, ii: int) -> ExplorationTask:
+    def __getitem__(self, ii):
         """Get the `ii`th task"""
-        return self.task_list[ii]
+        if isinstance(ii, slice):
+            return [self[jj] for jj in range(*ii.indices(len(self)))]
+        nn = len(self)
+        if ii < 0:
+            ii += nn
+        if not 0 <= ii < nn:
+            raise IndexError("task index out of range")
+        offsets = self._get_offsets()
+        iseg = bisect.bisect_right(offsets, ii) - 1
+        seg = self._segments[iseg]
+        if isinstance(seg, list):
+            return self._make_task(seg[ii - offsets[iseg]])
+        return seg[ii - offsets[iseg]]
+
+    def __iter__(self) -> Iterator[ExplorationTask]:
+        """Iterate over the tasks, made one at a time"""
+        for seg in self._segments:
+            if isinstance(seg, list):
+                for refs in seg:
+                    yield self._make_task(refs)
+            else:
+                yield from seg
 
     def __len__(self) -> int:
         """Get the number of tasks in the group"""
-        return len(self.task_list)
+        return self._get_offsets()[-1]
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        if "_task_refs" in state:
+            self._segments = [self.__dict__.pop("_task_refs")]
+            self._offsets = None
+        elif "_segments" not in state:
+            # the group pickled with the tasks holding the contents
+            task_list = self.__dict__.pop("_task_list", [])
+            self.clear()
+            for task in task_list:
+                self.add_task(task)
 
     def clear(self) -> None:
-        self._task_list = []
+        # the lists of the file names and content digests of the
+        # materialized tasks, and the sequences of the lazy tasks
+        self._segments = []
+        # the distinct file contents, keyed by the digests
+        self._blobs = {}
+        self._offsets = None
 
     @property
-    def task_list(self) -> List[ExplorationTask]:
-        """Get the `list` of `ExplorationTask`"""
-        return self._task_list
+    def task_list(self) -> Tuple[ExplorationTask, ...]:
+        """Get the `tuple` of `ExplorationTask`. The tasks are made from
+        the stored contents, so the tuple is a read-only snapshot of the
+        group. Use `add_task` to add tasks to the group."""
+        return tuple(self)
 
     def add_task(self, task: ExplorationTask):
         """Add one task to the group."""
-        self.task_list.append(task)
+        refs = {}
+        for fname, fcont in task.files().items():
+            key = hashlib.blake2b(fcont.encode(), digest_size=16).hexdigest()
+            refs[fname] = key
+            self._blobs.setdefault(key, fcont)
+        if len(self._segments) == 0 or not isinstance(self._segments[-1], list):
+            self._segments.append([])
+        self._segments[-1].append(refs)
+        self._offsets = None
+        return self
+
+    def add_lazy_tasks(
+        self,
+        tasks: Sequence,
+    ):
+        """Add a sequence of tasks that are made on access to the group.
+        The sequence should not be changed after added."""
+        if len(tasks) > 0:
+            self._segments.append(tasks)
+            self._offsets = None
         return self
 
     def add_group(
@@ -94,9 +172,34 @@ class ExplorationTaskGroup(Sequence):
     ):
         """Add another group to the group."""
         # see https://www.python.org/dev/peps/pep-0484/#forward-references for forward references
-        self._task_list = self._task_list + group._task_list
+        for seg in group._segments:
+            if not isinstance(seg, list):
+                self._segments.append(seg)
+            elif len(self._segments) > 0 and isinstance(self._segments[-1], list):
+                self._segments[-1].extend(seg)
+            else:
+                # copied, the group may be changed afterwards
+                self._segments.append(list(seg))
+        self._blobs.update(group._blobs)
+        self._offsets = None
         return self
 
+    def _get_offsets(self) -> List[int]:
+        if self._offsets is None:
+            self._offsets = [0]
+            for seg in self._segments:
+                self._offsets.append(self._offsets[-1] + len(seg))
+        return self._offsets
+
+    def _make_task(
+        self,
+        refs: Dict[str, str],
+    ) -> ExplorationTask:
+        task = ExplorationTask()
+        for fname, key in refs.items():
+            task.add_file(fname, self._blobs[key])
+        return task
+
     def __add__(
         self,
         group: "ExplorationTaskGroup",
@@ -105,6 +208,61 @@ class ExplorationTaskGroup(Sequence):
         return self.add_group(group)
 
 
+class ExplorationTaskProduct(Sequence):
+    """The tasks of the Cartesian product of the configurations and the
+    conditions, made on access.
+
+    The `ii`th task explores the configuration `ii // len(conditions)`
+    under the condition `ii % len(conditions)`, i.e. the conditions vary
+    fastest.
+
+    Parameters
+    ----------
+    conf_name : str
+        The file name of the configuration.
+    confs : List[str]
+        The contents of the configurations.
+    conditions : List
+        The conditions. By default each condition is a `dict` of the
+        other files of the task, mapping the file names to the contents.
+
+    """
+
+    def __init__(
+        self,
+        conf_name: str,
+        confs: List[str],
+        conditions: List,
+    ):
+        self.conf_name = conf_name
+        self.confs = list(confs)
+        self.conditions = list(conditions)
+
+    def __len__(self) -> int:
+        return len(self.confs) * len(self.conditions)
+
+    def __getitem__(self, ii: int) -> ExplorationTask:
+        nn = len(self)
+        if ii < 0:
+            ii += nn
+        if not 0 <= ii < nn:
+            raise IndexError("task index out of range")
+        iconf, icond = divmod(ii, len(self.conditions))
+        task = ExplorationTask().add_file(self.conf_name, self.confs[iconf])
+        for fname, fcont in self._condition_files(ii, icond).items():
+            task.add_file(fname, fcont)
+        return task
+
+    def _condition_files(
+        self,
+        ii: int,
+        icond: int,
+    ) -> Dict[str, str]:
+        """The files of the `ii`th task other than the configuration,
+        given the index of its condition."""
+        return self.conditions[icond]
+
+
 class FooTask(ExplorationTask):
     def __init__(
         self,
@@ -123,10 +281,8 @@ class FooTask(ExplorationTask):
 class FooTaskGroup(ExplorationTaskGroup):
     def __init__(self, numb_task):
         super().__init__()
-        # TODO: confirm the following is correct
-        self.tlist = ExplorationTaskGroup()
         for ii in range(numb_task):
-            self.tlist.add_task(
+            self.add_task(
                 FooTask(
                     f"conf.{ii}",
                     f"this is conf.{ii}",
@@ -135,10 +291,6 @@ class FooTaskGroup(ExplorationTaskGroup):
                 )
             )
 
-    @property
-    def task_list(self):
-        return self.tlist
-
 
 if __name__ == "__main__":
     grp = FooTaskGroup(3)
@@ -66,12 +66,14 @@ from dpgen2.utils.step_config import normalize as normalize_step_dict
 
 cl_default_optional_parameter = {
     "data_mixed_type": False,
+    "novelty_index": None,
 }
 
 
 def make_block_optional_parameter(cl_optional_parameter):
     return {
         "data_mixed_type": cl_optional_parameter["data_mixed_type"],
+        "novelty_index": cl_optional_parameter["novelty_index"],
     }
 
 
@@ -83,6 +85,7 @@ class SchedulerWrapper(OP):
                 "exploration_scheduler": BigParameter(ExplorationScheduler),
                 "exploration_report": BigParameter(ExplorationReport),
                 "trajs": Artifact(List[Path]),
+                "model_devis": Artifact(List[Path], optional=True),
             }
         )
 
@@ -105,8 +108,11 @@ class SchedulerWrapper(OP):
         scheduler = ip["exploration_scheduler"]
         report = ip["exploration_report"]
         trajs = ip["trajs"]
+        model_devis = ip["model_devis"]
 
-        conv, lmp_task_grp, selector = scheduler.plan_next_iteration(report, trajs)
+        conv, lmp_task_grp, selector = scheduler.plan_next_iteration(
+            report, trajs, model_devis
+        )
 
         return OPIO(
             {
@@ -177,6 +183,7 @@ class ConcurrentLearningLoop(Steps):
             "init_models": InputArtifact(optional=True),
             "init_data": InputArtifact(),
             "iter_data": InputArtifact(),
+            "rescreen_trajs": InputArtifact(optional=True),
         }
         self._output_parameters = {
             "exploration_scheduler": OutputParameter(),
@@ -363,6 +370,7 @@ def _loop(
             "init_models": steps.inputs.artifacts["init_models"],
             "init_data": steps.inputs.artifacts["init_data"],
             "iter_data": steps.inputs.artifacts["iter_data"],
+            "rescreen_trajs": steps.inputs.artifacts["rescreen_trajs"],
         },
         key=step_keys["block"],
     )
@@ -381,6 +389,7 @@ def _loop(
         },
         artifacts={
             "trajs": block_step.outputs.artifacts["trajs"],
+            "model_devis": block_step.outputs.artifacts["model_devis"],
         },
         key=step_keys["scheduler"],
         executor=step_executor,
@@ -432,6 +441,8 @@ def _loop(
             "init_models": block_step.outputs.artifacts["models"],
             "init_data": steps.inputs.artifacts["init_data"],
             "iter_data": block_step.outputs.artifacts["iter_data"],
+            # the frames re-screened by the next iteration are read from them
+            "rescreen_trajs": block_step.outputs.artifacts["trajs"],
         },
         when="%s == false" % (scheduler_step.outputs.parameters["converged"]),
     )
@@ -484,6 +495,7 @@ def _dpgen(
         },
         artifacts={
             "trajs": None,
+            "model_devis": None,
         },
         key=step_keys["scheduler"],
         executor=step_executor,
@@ -12,7 +12,10 @@ from .run_dp_train import (
 )
 from .run_lmp import (
     RunLmp,
+    RunLmpBundle,
 )
 from .select_confs import (
     SelectConfs,
+    SelectConfsMap,
+    SelectConfsReduce,
 )
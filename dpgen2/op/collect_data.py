@@ -5,11 +5,13 @@ from pathlib import (
 )
 from typing import (
     List,
+    Optional,
     Set,
     Tuple,
 )
 
 import dpdata
+import numpy as np
 from dflow.python import (
     OP,
     OPIO,
@@ -19,6 +21,10 @@ from dflow.python import (
     Parameter,
 )
 
+from dpgen2.exploration.selector import (
+    NoveltyIndex,
+)
+
 
 class CollectData(OP):
     """Collect labeled data and add to the iteration dataset.
@@ -29,10 +35,15 @@ class CollectData(OP):
     this iteration will be place in `ip["name"]` subdirectory of the
     iteration data directory.
 
+    If `optional_parameter["novelty_index"]` is set, a shard of the
+    `NoveltyIndex` of the collected data is written in the data
+    directory. The first shard also indexes the initial data.
+
     """
 
     default_optional_parameter = {
         "mixed_type": False,
+        "novelty_index": None,
     }
 
     @classmethod
@@ -47,6 +58,7 @@ class CollectData(OP):
                 ),
                 "labeled_data": Artifact(List[Path]),
                 "iter_data": Artifact(List[Path]),
+                "init_data": Artifact(List[Path], optional=True),
             }
         )
 
@@ -75,6 +87,7 @@ class CollectData(OP):
             - `name`: (`str`) The name of this iteration. The data generated by this iteration will be place in a sub-directory of `name`.
             - `labeled_data`: (`Artifact(List[Path])`) The paths of labeled data generated by FP tasks of the current iteration.
             - `iter_data`: (`Artifact(List[Path])`) The data paths previous iterations.
+            - `init_data`: (`Artifact(List[Path])`) The initial data. Optional, only used by the novelty index.
 
         Returns
         -------
@@ -86,6 +99,7 @@ class CollectData(OP):
         name = ip["name"]
         type_map = ip["type_map"]
         mixed_type = ip["optional_parameter"]["mixed_type"]
+        novelty_config = ip["optional_parameter"].get("novelty_index")
         labeled_data = ip["labeled_data"]
         iter_data = ip["iter_data"]
 
@@ -101,6 +115,15 @@ class CollectData(OP):
             ms.to_deepmd_npy_mixed(name)
         else:
             ms.to_deepmd_npy(name)
+        if novelty_config is not None:
+            CollectData.write_novelty_index(
+                NoveltyIndex(type_map, **novelty_config),
+                ms,
+                Path(name),
+                iter_data,
+                ip["init_data"],
+                mixed_type,
+            )
         iter_data.append(Path(name))
 
         return OPIO(
@@ -108,3 +131,18 @@ class CollectData(OP):
                 "iter_data": iter_data,
             }
         )
+
+    @staticmethod
+    def write_novelty_index(
+        novelty_index: NoveltyIndex,
+        ms: dpdata.MultiSystems,
+        path: Path,
+        iter_data: List[Path],
+        init_data: Optional[List[Path]],
+        mixed_type: bool = False,
+    ):
+        fps = [novelty_index.fingerprint(list(ms.systems.values()))]
+        # the initial data are indexed together with the first shard
+        if len(novelty_index.shard_paths(iter_data)) == 0 and init_data:
+            fps.append(novelty_index.fingerprint_data(init_data, mixed_type))
+        novelty_index.write(np.concatenate(fps, axis=0), path)
@@ -5,6 +5,7 @@ from pathlib import (
 )
 from typing import (
     List,
+    Optional,
     Tuple,
 )
 
@@ -13,14 +14,18 @@ from dflow.python import (
     OPIO,
     Artifact,
     BigParameter,
+    FatalError,
     OPIOSign,
 )
 
 from dpgen2.constants import (
+    lmp_rescreen_name,
+    lmp_rescreen_ref_name,
     lmp_task_pattern,
 )
 from dpgen2.exploration.task import (
     ExplorationTaskGroup,
+    read_rescreen_frames,
 )
 
 
@@ -40,6 +45,7 @@ class PrepLmp(OP):
         return OPIOSign(
             {
                 "lmp_task_grp": BigParameter(Path),
+                "rescreen_trajs": Artifact(List[Path], optional=True),
             }
         )
 
@@ -64,6 +70,7 @@ class PrepLmp(OP):
         ip : dict
             Input dict with components:
             - `lmp_task_grp` : (`Artifact(Path)`) Can be pickle loaded as a ExplorationTaskGroup. Definitions for LAMMPS tasks
+            - `rescreen_trajs` : (`Artifact(List[Path])`) The trajectories explored by the previous iteration. Optional, the frames referred by the re-screening tasks are read from them.
 
         Returns
         -------
@@ -79,7 +86,7 @@ class PrepLmp(OP):
         task_paths = []
         for tt in lmp_task_grp:
             ff = tt.files()
-            tname = _mk_task_from_files(cc, ff)
+            tname = _mk_task_from_files(cc, ff, ip["rescreen_trajs"])
             task_paths.append(tname)
             cc += 1
         task_names = [str(ii) for ii in task_paths]
@@ -94,9 +101,20 @@ class PrepLmp(OP):
 PrepExplorationTaskGroup = PrepLmp
 
 
-def _mk_task_from_files(cc, ff):
+def _mk_task_from_files(cc, ff, rescreen_trajs: Optional[List[Path]] = None):
     tname = Path(lmp_task_pattern % cc)
     tname.mkdir(exist_ok=True, parents=True)
     for nn in ff.keys():
-        (tname / nn).write_text(ff[nn])
+        if nn == lmp_rescreen_ref_name:
+            # the frames to re-screen are only referred by the task
+            if rescreen_trajs is None:
+                raise FatalError(
+                    "the trajectories of the previous iteration are not "
+                    "provided to read the frames to re-screen"
+                )
+            (tname / lmp_rescreen_name).write_bytes(
+                read_rescreen_frames(ff[nn], rescreen_trajs)
+            )
+        else:
+            (tname / nn).write_text(ff[nn])
     return tname
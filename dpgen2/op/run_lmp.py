@@ -1,7 +1,12 @@
+import hashlib
 import json
 import os
 import random
 import re
+import shutil
+from collections import (
+    deque,
+)
 from pathlib import (
     Path,
 )
@@ -12,6 +17,7 @@ from typing import (
     Tuple,
 )
 
+import numpy as np
 from dargs import (
     Argument,
     ArgumentEncoder,
@@ -29,20 +35,46 @@ from dflow.python import (
 )
 
 from dpgen2.constants import (
+    lmp_bundle_input_name,
+    lmp_bundle_log_name,
+    lmp_checkpoint_name,
     lmp_conf_name,
     lmp_input_name,
     lmp_log_name,
     lmp_model_devi_name,
+    lmp_model_devi_npy_name,
+    lmp_rescreen_name,
+    lmp_restart_name,
+    lmp_stop_name,
     lmp_traj_name,
+    lmp_traj_summary_name,
     model_name_match_pattern,
     model_name_pattern,
 )
+from dpgen2.exploration.deviation import (
+    DeviManager,
+    calc_model_devi_f,
+    calc_model_devi_v,
+)
+from dpgen2.exploration.render.lammps_dump import (
+    index_lammps_dump,
+    lammps_dump_timesteps,
+    load_lammps_dump_frames,
+    prune_lammps_dump,
+    read_lammps_dump_frames,
+)
+from dpgen2.exploration.render.traj_render_lammps import (
+    model_devi_columns,
+    read_model_devi,
+    write_model_devi_npy,
+)
 from dpgen2.utils import (
     BinaryFileInput,
     set_directory,
 )
 from dpgen2.utils.run_command import (
     run_command,
+    run_command_watched,
 )
 
 
@@ -76,6 +108,7 @@ class RunLmp(OP):
                 "traj": Artifact(Path),
                 "model_devi": Artifact(Path),
                 "plm_output": Artifact(Path, optional=True),
+                "traj_summary": Artifact(Path, optional=True),
             }
         )
 
@@ -93,7 +126,7 @@ class RunLmp(OP):
 
             - `config`: (`dict`) The config of lmp task. Check `RunLmp.lmp_args` for definitions.
             - `task_name`: (`str`) The name of the task.
-            - `task_path`: (`Artifact(Path)`) The path that contains all input files prepareed by `PrepLmp`.
+            - `task_path`: (`Artifact(Path)`) The path that contains all input files prepareed by `PrepLmp`. If it contains the frames to re-screen (`rescreen.lammpstrj`), their model deviation is evaluated by the models instead of running LAMMPS.
             - `models`: (`Artifact(List[Path])`) The frozen model to estimate the model deviation. The first model with be used to drive molecular dynamics simulation.
 
         Returns
@@ -102,7 +135,8 @@ class RunLmp(OP):
             Output dict with components:
             - `log`: (`Artifact(Path)`) The log file of LAMMPS.
             - `traj`: (`Artifact(Path)`) The output trajectory.
-            - `model_devi`: (`Artifact(Path)`) The model deviation. The order of recorded model deviations should be consistent with the order of frames in `traj`.
+            - `model_devi`: (`Artifact(Path)`) The model deviation. The order of recorded model deviations should be consistent with the order of frames in `traj`. If `binary_model_devi` is set in the config, it is the binary `.npy` model deviation file.
+            - `traj_summary`: (`Artifact(Path)`) The numbers of accurate, candidate and failed frames of the trajectory. Only provided if `prune_traj` is set in the config.
 
         Raises
         ------
@@ -111,61 +145,272 @@ class RunLmp(OP):
         """
         config = ip["config"] if ip["config"] is not None else {}
         config = RunLmp.normalize_config(config)
+        RunLmp._check_trust_levels(config)
         command = config["command"]
-        teacher_model: Optional[BinaryFileInput] = config["teacher_model_path"]
-        shuffle_models: Optional[bool] = config["shuffle_models"]
+        checkpoint: Optional[dict] = config["checkpoint"]
+        watchdog: Optional[dict] = config["watchdog"]
+        quota: Optional[dict] = config["quota"]
         task_name = ip["task_name"]
-        task_path = ip["task_path"]
-        models = ip["models"]
-        input_files = [lmp_conf_name, lmp_input_name]
-        input_files = [(Path(task_path) / ii).resolve() for ii in input_files]
-        model_files = [Path(ii).resolve() for ii in models]
+        task_path = Path(ip["task_path"]).resolve()
+        model_files = RunLmp._model_files(config, ip["models"])
         work_dir = Path(task_name)
 
+        if (task_path / lmp_rescreen_name).is_file():
+            # the frames are re-screened instead of running MD
+            with set_directory(work_dir):
+                rescreen_lmp_traj(
+                    task_path / lmp_rescreen_name,
+                    [_load_deep_pot(ii) for ii in model_files],
+                    batch_size=config["rescreen_batch_size"],
+                )
+                RunLmp._post_process(config)
+            return OPIO(RunLmp._task_outputs(config, work_dir))
+
+        if checkpoint is not None:
+            # the working directory is kept in the checkpoint directory,
+            # which is shared by the attempts of the task
+            ckpt_dir = self._checkpoint_dir(checkpoint["path"], task_name)
+            ckpt_dir.mkdir(parents=True, exist_ok=True)
+            if work_dir.is_symlink():
+                work_dir.unlink()
+            work_dir.symlink_to(ckpt_dir.resolve(), target_is_directory=True)
+
+        candidate_quota = None
+        if quota is not None:
+            candidate_quota = self._candidate_quota(quota, task_name)
+
+        with set_directory(work_dir):
+            restart_step = None
+            if checkpoint is not None:
+                restart_step = resume_checkpoint(task_path)
+            if restart_step is None:
+                RunLmp._prepare_task(config, task_path, model_files)
+                if checkpoint is not None:
+                    set_restart_freq(lmp_input_name, checkpoint["freq"])
+            else:
+                # the input script revised by the first attempt is kept
+                _force_symlink(Path(lmp_conf_name), task_path / lmp_conf_name)
+                RunLmp._link_models(model_files)
+                if candidate_quota is not None:
+                    # the counter of the previous attempt is overwritten, thus the
+                    # stashed frames are counted again
+                    candidate_quota.seed(lmp_model_devi_name + ".ckpt")
+
+            # run lmp
+            command = " ".join([command, "-i", lmp_input_name, "-log", lmp_log_name])
+            if checkpoint is not None:
+                command += " -v restart %d" % (0 if restart_step is None else 1)
+            checks = []
+            intervals = []
+            model_devi_watchdog = None
+            if watchdog is not None:
+                watchdog = watchdog.copy()
+                intervals.append(watchdog.pop("interval"))
+                model_devi_watchdog = ModelDeviWatchdog(lmp_model_devi_name, **watchdog)
+                checks.append(model_devi_watchdog)
+            if candidate_quota is not None:
+                intervals.append(quota["interval"])
+                checks.append(candidate_quota)
+
+            reason = None if candidate_quota is None else candidate_quota.check()
+            if reason is not None:
+                # the quota is met before the MD simulation starts
+                ret, out, err = 0, "", ""
+                write_skipped_outputs()
+            elif len(checks) == 0:
+                ret, out, err = run_command(command, shell=True)
+            else:
+                ret, out, err, reason = run_command_watched(
+                    command,
+                    lambda: next(
+                        (rr for rr in (cc() for cc in checks) if rr is not None),
+                        None,
+                    ),
+                    interval=min(intervals),
+                    shell=True,
+                )
+            if reason is None and ret != 0:
+                raise TransientError(
+                    "lmp failed\n", "out msg", out, "\n", "err msg", err, "\n"
+                )
+            if candidate_quota is not None:
+                # count the frames written after the last check
+                candidate_quota()
+
+            if reason is not None:
+                # the MD simulation is stopped by the checks
+                trim_stopped_outputs(lmp_traj_name, lmp_model_devi_name)
+                Path(lmp_stop_name).write_text(json.dumps({"reason": reason}))
+                with open(lmp_log_name, "a") as fp:
+                    fp.write(f"stopped: {reason}\n")
+            if restart_step is not None:
+                merge_checkpoint_outputs()
+            if (
+                model_devi_watchdog is not None
+                and model_devi_watchdog.reason is not None
+            ):
+                # the frames that are not run are counted as failed
+                pad_failed_outputs(lmp_input_name, lmp_traj_name, lmp_model_devi_name)
+            RunLmp._post_process(config)
+
+        return OPIO(RunLmp._task_outputs(config, work_dir))
+
+    def _candidate_quota(
+        self,
+        quota: dict,
+        task_name: str,
+    ) -> "CandidateQuota":
+        if quota["max_candidates"] is None:
+            raise FatalError("the max_candidates of the quota is not set")
+        if not self.key:
+            # the task names are repeated in the iterations
+            raise FatalError(
+                f"the step key of the task {task_name} is needed by the quota "
+                "to group the counters by the iteration"
+            )
+        # the counters of the tasks in the same iteration are summed
+        names = [self.workflow_name] + self.key.split("--", 1)
+        counter = Path(quota["path"]).resolve().joinpath(*[ii for ii in names if ii])
+        return CandidateQuota(
+            lmp_model_devi_name,
+            counter.with_name(counter.name + ".json"),
+            quota["max_candidates"],
+            level_f_hi=quota["level_f_hi"],
+            level_f_lo=quota["level_f_lo"],
+            level_v_hi=quota["level_v_hi"],
+            level_v_lo=quota["level_v_lo"],
+            fail_at_level_hi=quota["fail_at_level_hi"],
+        )
+
+    @staticmethod
+    def _check_trust_levels(
+        config: dict,
+    ):
+        for key in ["prune_traj", "watchdog", "quota"]:
+            if config[key] is not None and config[key]["level_f_hi"] is None:
+                raise FatalError(f"the level_f_hi of the {key} is not set")
+
+    def _checkpoint_dir(
+        self,
+        path: str,
+        task_name: str,
+    ) -> Path:
+        # the step key identifies the task across the iterations
+        names = [self.workflow_name, self.key if self.key else task_name]
+        return Path(path).joinpath(*[ii for ii in names if ii])
+
+    @staticmethod
+    def _model_files(
+        config: dict,
+        models: List[Path],
+    ) -> List[Path]:
+        teacher_model: Optional[BinaryFileInput] = config["teacher_model_path"]
+        model_files = [Path(ii).resolve() for ii in models]
         if teacher_model is not None:
             assert (
                 len(model_files) == 1
             ), "One model is enough in knowledge distillation"
             teacher_model.save_as_file("teacher_model.pb")
             model_files = [Path("teacher_model.pb").resolve()] + model_files
+        return model_files
 
-        with set_directory(work_dir):
-            # link input files
-            for ii in input_files:
-                iname = ii.name
-                Path(iname).symlink_to(ii)
-            # link models
-            for idx, mm in enumerate(model_files):
-                mname = model_name_pattern % (idx)
-                Path(mname).symlink_to(mm)
+    @staticmethod
+    def _prepare_task(
+        config: dict,
+        task_path: Path,
+        model_files: List[Path],
+    ):
+        r"""Link the input files and the models of a task to the current
+        working directory. The paths should be absolute."""
+        input_files = [lmp_conf_name, lmp_input_name]
+        input_files = [(task_path / ii).resolve() for ii in input_files]
+        # link input files
+        for ii in input_files:
+            iname = ii.name
+            Path(iname).symlink_to(ii)
+        RunLmp._link_models(model_files)
 
-            if teacher_model is not None:
-                add_teacher_model(lmp_input_name)
+        if config["teacher_model_path"] is not None:
+            add_teacher_model(lmp_input_name)
 
-            if shuffle_models:
-                randomly_shuffle_models(lmp_input_name)
+        if config["shuffle_models"]:
+            randomly_shuffle_models(lmp_input_name)
 
-            # run lmp
-            command = " ".join([command, "-i", lmp_input_name, "-log", lmp_log_name])
-            ret, out, err = run_command(command, shell=True)
-            if ret != 0:
-                raise TransientError(
-                    "lmp failed\n", "out msg", out, "\n", "err msg", err, "\n"
-                )
+    @staticmethod
+    def _link_models(
+        model_files: List[Path],
+    ):
+        for idx, mm in enumerate(model_files):
+            _force_symlink(Path(model_name_pattern % (idx)), mm)
 
-        return OPIO(
-            {
-                "log": work_dir / lmp_log_name,
-                "traj": work_dir / lmp_traj_name,
-                "model_devi": work_dir / lmp_model_devi_name,
-            }
+    @staticmethod
+    def _post_process(
+        config: dict,
+    ):
+        r"""Post-process the outputs of a task in the current working
+        directory."""
+        if config["binary_model_devi"]:
+            write_model_devi_npy(lmp_model_devi_name, lmp_model_devi_npy_name)
+
+        prune_traj: Optional[dict] = config["prune_traj"]
+        if prune_traj is not None:
+            summary = prune_lmp_traj(lmp_traj_name, lmp_model_devi_name, **prune_traj)
+            Path(lmp_traj_summary_name).write_text(json.dumps(summary))
+
+    @staticmethod
+    def _task_outputs(
+        config: dict,
+        work_dir: Path,
+    ) -> dict:
+        model_devi_name = (
+            lmp_model_devi_npy_name
+            if config["binary_model_devi"]
+            else lmp_model_devi_name
         )
+        ret_dict = {
+            "log": work_dir / lmp_log_name,
+            "traj": work_dir / lmp_traj_name,
+            "model_devi": work_dir / model_devi_name,
+        }
+        if config["prune_traj"] is not None:
+            ret_dict["traj_summary"] = work_dir / lmp_traj_summary_name
+        return ret_dict
 
     @staticmethod
     def lmp_args():
         doc_lmp_cmd = "The command of LAMMPS"
         doc_teacher_model = "The teacher model in `Knowledge Distillation`"
         doc_shuffle_models = "Randomly pick a model from the group of models to drive theexploration MD simulation"
+        doc_binary_model_devi = "Convert the model deviation file to a binary `.npy` file after the MD simulation and output it in place of the text file. The conversion is done in parallel by the exploration tasks, and the binary file is memory-mapped when selecting configurations. Only the step, `max_devi_v` and `max_devi_f` of the frames are stored, the model deviations used by the exploration reports."
+        doc_prune_traj = "Prune the trajectory after the MD simulation. The frames that cannot be candidates under the trust levels are replaced by empty frames (zero atoms) in the output trajectory, and the numbers of accurate, candidate and failed frames are output as the trajectory summary. The trust levels are set to those of the exploration report when submitted, and should be the same if given. The last frame is always kept. The pruned trajectory can only be rendered by the frame index of `TrajRenderLammps`."
+        doc_prune_level_f_lo = "The lower trust level of force model deviation. The accurate frames are kept if not set."
+        doc_prune_level_f_hi = "The higher trust level of force model deviation. Set to that of the exploration report when submitted if not set."
+        doc_prune_level_v_lo = "The lower trust level of virial model deviation."
+        doc_prune_level_v_hi = "The higher trust level of virial model deviation."
+        doc_fail_at_level_hi = "A frame is failed if its model deviation reaches the higher trust level, otherwise only if the model deviation exceeds the level. Set by the exploration report when submitted, i.e. false for the `adaptive-lower` report, which treats the frames at the higher trust level as candidates."
+        doc_checkpoint = "Checkpoint the MD simulation, so that a retried or preempted task resumes from the latest LAMMPS restart file instead of step 0. The working directory of the task is kept in a checkpoint directory shared by the attempts, where the restart files and the partial trajectory and model deviation are written. The input script should read the restart files if the variable `restart` is positive, as the inputs of the `lmp-md` task groups do. The tasks are rerun from the beginning otherwise."
+        doc_checkpoint_path = "The directory of the checkpoints, which should be persistent and accessible by all the attempts of the tasks, e.g. a mounted shared volume. The checkpoints are not removed after the tasks finish."
+        doc_checkpoint_freq = "The frequency of writing the restart files in MD steps."
+        doc_watchdog = "Watch the model deviation while the MD simulation runs, and stop the simulation once it is failed, i.e. the frames that follow would all be failed and never selected. The trajectory and the model deviation are kept up to the stop, and are padded with the frames that are not run, which are empty (zero atoms) in the trajectory and of infinite model deviations, thus counted as failed by the exploration reports. The frames are padded up to the `NSTEPS` steps at the `THERMO_FREQ` frequency given by the variables of the input script, and not padded if the variables are not defined. The reason of the stop is recorded in `stop.json` in the working directory of the task. The MD simulations run to the end if not set."
+        doc_watchdog_level_f_hi = "A frame is failed if its max force model deviation reaches this level. Set to the higher trust level of the exploration report when submitted if not set, and should be the same if given."
+        doc_watchdog_level_v_hi = "A frame is also failed if its max virial model deviation reaches this level."
+        doc_watchdog_max_consecutive = (
+            "Stop the simulation after this number of consecutive failed frames."
+        )
+        doc_watchdog_window = "Stop the simulation if the ratio of the failed frames among this number of the latest frames reaches `max_failed_ratio`."
+        doc_watchdog_max_failed_ratio = (
+            "The ratio of the failed frames in the window to stop the simulation."
+        )
+        doc_quota = "Stop the MD simulations of an iteration once the quota of candidates is met. The tasks count the candidates under the trust levels, set to those of the exploration report when submitted if not set, while they run, and record the numbers in the counter files of a directory shared by the tasks, e.g. a mounted shared volume. The running tasks are stopped, and the tasks that start afterwards are skipped, once the sum of the numbers reaches `max_candidates`. The trajectory and the model deviation are kept up to the stop, and the reason of the stop is recorded in `stop.json` in the working directory of the task. The MD simulations run to the end if not set."
+        doc_quota_path = "The directory of the counter files, which should be accessible by all the tasks. The counters are grouped by the workflow and the iteration given by the step key, which the task should have."
+        doc_quota_max_candidates = "The quota of candidates. Set to `multiple` times `fp/task_max` when submitted if not set."
+        doc_quota_multiple = "The quota of candidates in the multiple of `fp/task_max` if `max_candidates` is not set."
+        doc_quota_level_f_lo = "The lower trust level of force model deviation. All the frames that are not failed are candidates if not set."
+        doc_quota_interval = "The interval of counting the candidates in seconds."
+        doc_rescreen_batch_size = "The number of frames evaluated at once by the models when re-screening the frames of the previous explorations."
+        doc_watchdog_interval = (
+            "The interval of checking the model deviation in seconds."
+        )
         return [
             Argument("command", str, optional=True, default="lmp", doc=doc_lmp_cmd),
             Argument(
@@ -182,6 +427,205 @@ class RunLmp(OP):
                 default=False,
                 doc=doc_shuffle_models,
             ),
+            Argument(
+                "binary_model_devi",
+                bool,
+                optional=True,
+                default=False,
+                doc=doc_binary_model_devi,
+            ),
+            Argument(
+                "prune_traj",
+                dict,
+                [
+                    Argument(
+                        "level_f_lo",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_f_lo,
+                    ),
+                    Argument(
+                        "level_f_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_f_hi,
+                    ),
+                    Argument(
+                        "level_v_lo",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_v_lo,
+                    ),
+                    Argument(
+                        "level_v_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_v_hi,
+                    ),
+                    Argument(
+                        "fail_at_level_hi",
+                        bool,
+                        optional=True,
+                        default=True,
+                        doc=doc_fail_at_level_hi,
+                    ),
+                ],
+                optional=True,
+                default=None,
+                doc=doc_prune_traj,
+            ),
+            Argument(
+                "checkpoint",
+                dict,
+                [
+                    Argument("path", str, optional=False, doc=doc_checkpoint_path),
+                    Argument(
+                        "freq",
+                        int,
+                        optional=True,
+                        default=1000,
+                        doc=doc_checkpoint_freq,
+                    ),
+                ],
+                optional=True,
+                default=None,
+                doc=doc_checkpoint,
+            ),
+            Argument(
+                "watchdog",
+                dict,
+                [
+                    Argument(
+                        "level_f_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_watchdog_level_f_hi,
+                    ),
+                    Argument(
+                        "level_v_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_watchdog_level_v_hi,
+                    ),
+                    Argument(
+                        "fail_at_level_hi",
+                        bool,
+                        optional=True,
+                        default=True,
+                        doc=doc_fail_at_level_hi,
+                    ),
+                    Argument(
+                        "max_consecutive",
+                        int,
+                        optional=True,
+                        default=None,
+                        doc=doc_watchdog_max_consecutive,
+                    ),
+                    Argument(
+                        "window",
+                        int,
+                        optional=True,
+                        default=None,
+                        doc=doc_watchdog_window,
+                    ),
+                    Argument(
+                        "max_failed_ratio",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_watchdog_max_failed_ratio,
+                    ),
+                    Argument(
+                        "interval",
+                        float,
+                        optional=True,
+                        default=10.0,
+                        doc=doc_watchdog_interval,
+                    ),
+                ],
+                optional=True,
+                default=None,
+                doc=doc_watchdog,
+            ),
+            Argument(
+                "rescreen_batch_size",
+                int,
+                optional=True,
+                default=100,
+                doc=doc_rescreen_batch_size,
+            ),
+            Argument(
+                "quota",
+                dict,
+                [
+                    Argument("path", str, optional=False, doc=doc_quota_path),
+                    Argument(
+                        "max_candidates",
+                        int,
+                        optional=True,
+                        default=None,
+                        doc=doc_quota_max_candidates,
+                    ),
+                    Argument(
+                        "multiple",
+                        float,
+                        optional=True,
+                        default=2.0,
+                        doc=doc_quota_multiple,
+                    ),
+                    Argument(
+                        "level_f_lo",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_quota_level_f_lo,
+                    ),
+                    Argument(
+                        "level_f_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_f_hi,
+                    ),
+                    Argument(
+                        "level_v_lo",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_v_lo,
+                    ),
+                    Argument(
+                        "level_v_hi",
+                        float,
+                        optional=True,
+                        default=None,
+                        doc=doc_prune_level_v_hi,
+                    ),
+                    Argument(
+                        "interval",
+                        float,
+                        optional=True,
+                        default=10.0,
+                        doc=doc_quota_interval,
+                    ),
+                    Argument(
+                        "fail_at_level_hi",
+                        bool,
+                        optional=True,
+                        default=True,
+                        doc=doc_fail_at_level_hi,
+                    ),
+                ],
+                optional=True,
+                default=None,
+                doc=doc_quota,
+            ),
         ]
 
     @staticmethod
@@ -196,6 +640,869 @@ class RunLmp(OP):
 config_args = RunLmp.lmp_args
 
 
+class RunLmpBundle(RunLmp):
+    r"""Execute a bundle of LAMMPS tasks in one LAMMPS process.
+
+    The OP receives the lists of the tasks of a group of slices, i.e. it
+    is used with the `group_size` and without the `pool_size` of the
+    `template_slice_config`. The working directory of each task is
+    prepared as `RunLmp` does, and the tasks are run one after another
+    by a driver input script, which changes to the working directory of
+    each task, includes its input script and clears the simulation. The
+    start-up of the LAMMPS process is thus paid once for the bundle. The
+    `clear` command also deletes the pair style, so the models are still
+    loaded by each task. The variables defined by the input script of a
+    task survive `clear`, so they are deleted after the task. The log,
+    trajectory and model deviation of each task are output in the same
+    way as `RunLmp`, as lists in the order of the tasks. The tasks of a
+    bundle fail together: one failed task fails the bundle, and all its
+    tasks are run again when the step is retried.
+
+    """
+
+    @classmethod
+    def get_input_sign(cls):
+        return OPIOSign(
+            {
+                "config": BigParameter(dict),
+                "task_name": BigParameter(List[str]),
+                "task_path": Artifact(List[Path]),
+                "models": Artifact(List[Path]),
+            }
+        )
+
+    @classmethod
+    def get_output_sign(cls):
+        return OPIOSign(
+            {
+                "log": Artifact(List[Path]),
+                "traj": Artifact(List[Path]),
+                "model_devi": Artifact(List[Path]),
+                "plm_output": Artifact(List[Path], optional=True),
+                "traj_summary": Artifact(List[Path], optional=True),
+            }
+        )
+
+    @OP.exec_sign_check
+    def execute(
+        self,
+        ip: OPIO,
+    ) -> OPIO:
+        r"""Execute the OP.
+
+        Parameters
+        ----------
+        ip : dict
+            Input dict with components:
+
+            - `config`: (`dict`) The config of lmp task. Check `RunLmp.lmp_args` for definitions.
+            - `task_name`: (`List[str]`) The names of the tasks.
+            - `task_path`: (`Artifact(List[Path])`) The paths that contain all input files prepareed by `PrepLmp`, in the order of `task_name`.
+            - `models`: (`Artifact(List[Path])`) The frozen model to estimate the model deviation. The first model with be used to drive molecular dynamics simulation.
+
+        Returns
+        -------
+        Any
+            Output dict with components, in the order of the tasks:
+            - `log`: (`Artifact(List[Path])`) The log files of LAMMPS.
+            - `traj`: (`Artifact(List[Path])`) The output trajectories.
+            - `model_devi`: (`Artifact(List[Path])`) The model deviations.
+            - `traj_summary`: (`Artifact(List[Path])`) The trajectory summaries. Only provided if `prune_traj` is set in the config.
+
+        Raises
+        ------
+        TransientError
+            On the failure of LAMMPS execution. The whole bundle is failed.
+        """
+        config = ip["config"] if ip["config"] is not None else {}
+        config = RunLmp.normalize_config(config)
+        RunLmp._check_trust_levels(config)
+        command = config["command"]
+        if any(config[ii] is not None for ii in ["checkpoint", "watchdog", "quota"]):
+            raise FatalError(
+                "the checkpoint, the watchdog and the quota are not supported "
+                "by the bundled tasks"
+            )
+        task_names = ip["task_name"]
+        task_paths = [Path(ii).resolve() for ii in ip["task_path"]]
+        if len(task_names) != len(task_paths):
+            raise FatalError(
+                f"number of task names ({len(task_names)}) is not equal to "
+                f"the number of task paths ({len(task_paths)})"
+            )
+        model_files = RunLmp._model_files(config, ip["models"])
+        work_dirs = [Path(ii) for ii in task_names]
+
+        driver = []
+        dps = None
+        for work_dir, task_path in zip(work_dirs, task_paths):
+            with set_directory(work_dir):
+                if (task_path / lmp_rescreen_name).is_file():
+                    # the frames are re-screened instead of running MD
+                    if dps is None:
+                        dps = [_load_deep_pot(ii) for ii in model_files]
+                    rescreen_lmp_traj(
+                        task_path / lmp_rescreen_name,
+                        dps,
+                        batch_size=config["rescreen_batch_size"],
+                    )
+                    continue
+                RunLmp._prepare_task(config, task_path, model_files)
+            driver += make_bundle_input(work_dir.resolve(), Path.cwd())
+
+        if len(driver) > 0:
+            Path(lmp_bundle_input_name).write_text("\n".join(driver) + "\n")
+            # run lmp
+            command = " ".join(
+                [command, "-i", lmp_bundle_input_name, "-log", lmp_bundle_log_name]
+            )
+            ret, out, err = run_command(command, shell=True)
+            if ret != 0:
+                raise TransientError(
+                    "lmp failed\n", "out msg", out, "\n", "err msg", err, "\n"
+                )
+
+        ret_dict = {}
+        for work_dir in work_dirs:
+            with set_directory(work_dir):
+                RunLmp._post_process(config)
+            for kk, vv in RunLmp._task_outputs(config, work_dir).items():
+                ret_dict.setdefault(kk, []).append(vv)
+        return OPIO(ret_dict)
+
+
+def make_bundle_input(
+    work_dir: Path,
+    return_dir: Path,
+) -> List[str]:
+    r"""The lines of the driver input script running a task of a bundle.
+
+    The variables defined by the input script of the task are deleted
+    after the task, since they survive `clear`, and those of the index
+    style would not be redefined by the next task.
+
+    Parameters
+    ----------
+    work_dir : Path
+        The absolute path of the working directory of the task.
+    return_dir : Path
+        The absolute path of the directory to return to after the task.
+
+    Returns
+    -------
+    lines : List[str]
+        The lines of the driver input script.
+    """
+    variables = lmp_input_variables((work_dir / lmp_input_name).read_text())
+    return (
+        [
+            f"shell cd {work_dir}",
+            f"log {lmp_log_name}",
+            f"include {lmp_input_name}",
+            "clear",
+        ]
+        + [f"variable {ii} delete" for ii in variables]
+        + [f"shell cd {return_dir}"]
+    )
+
+
+def lmp_input_variables(
+    script: str,
+) -> List[str]:
+    r"""The names of the variables defined by a LAMMPS input script, in
+    the order of the definitions."""
+    ret = []
+    for line in script.split("\n"):
+        words = line.split("#", 1)[0].split()
+        if len(words) >= 3 and words[0] == "variable" and words[2] != "delete":
+            if words[1] not in ret:
+                ret.append(words[1])
+    return ret
+
+
+def prune_lmp_traj(
+    traj: str,
+    model_devi: str,
+    level_f_hi: float,
+    level_f_lo: Optional[float] = None,
+    level_v_hi: Optional[float] = None,
+    level_v_lo: Optional[float] = None,
+    fail_at_level_hi: bool = True,
+) -> dict:
+    r"""Prune the frames that cannot be candidates from the trajectory.
+
+    The frames are classified as the trust-level reports do: a frame
+    is failed if any model deviation reaches the higher level, or
+    exceeds it if not `fail_at_level_hi` as the `adaptive-lower`
+    report does, accurate
+    if all model deviations are below the lower levels, and candidate
+    otherwise. Only the candidates (and the last frame) are kept in the
+    trajectory. The accurate frames are all candidates if `level_f_lo`
+    is not set.
+
+    Returns
+    -------
+    summary : dict
+        The numbers of frames in each class and of the kept frames.
+    """
+    md = read_model_devi(model_devi, [DeviManager.MAX_DEVI_F, DeviManager.MAX_DEVI_V])
+    md_f = md[DeviManager.MAX_DEVI_F]
+    md_v = md[DeviManager.MAX_DEVI_V]
+    offsets = index_lammps_dump(traj)
+    nframes = offsets.shape[0] - 1
+    if nframes != md_f.shape[0]:
+        raise FatalError(
+            f"number of frames in {traj} ({nframes}) is not equal to that "
+            f"in {model_devi} ({md_f.shape[0]})"
+        )
+    fail = _failed(md_f, level_f_hi, fail_at_level_hi)
+    if level_v_hi is not None:
+        fail |= _failed(md_v, level_v_hi, fail_at_level_hi)
+    if level_f_lo is not None:
+        accu = md_f < level_f_lo
+        if level_v_lo is not None:
+            accu &= md_v < level_v_lo
+        accu &= ~fail
+    else:
+        accu = np.zeros(nframes, dtype=bool)
+    cand = ~(accu | fail)
+    keep = cand.copy()
+    if nframes > 0:
+        keep[-1] = True
+    prune_lammps_dump(traj, keep, offsets=offsets)
+    return {
+        "nframes": int(nframes),
+        "accurate": int(accu.sum()),
+        "candidate": int(cand.sum()),
+        "failed": int(fail.sum()),
+        "kept": int(keep.sum()),
+    }
+
+
+def _failed(
+    devi,
+    level_hi: float,
+    fail_at_level_hi: bool = True,
+):
+    r"""If the model deviations are failed under the higher trust level."""
+    return devi >= level_hi if fail_at_level_hi else devi > level_hi
+
+
+def _load_deep_pot(
+    model: Path,
+):
+    from deepmd.infer import DeepPot  # type: ignore
+
+    return DeepPot(str(model))
+
+
+def rescreen_lmp_traj(
+    fname: Path,
+    dps: list,
+    batch_size: int = 100,
+):
+    r"""Evaluate the model deviation of the frames in a LAMMPS dump file
+    by the models, and write the outputs as an MD simulation does.
+
+    The frames of the same atom types are evaluated by each model in
+    batches, and the model deviations of the batch are computed at once.
+    The trajectory is written with the timesteps renumbered by the frame
+    indexes, which are the steps of the model deviation.
+
+    Parameters
+    ----------
+    fname : Path
+        The LAMMPS dump file of the frames.
+    dps : list
+        The models, e.g. `deepmd.infer.DeepPot`. The types of LAMMPS
+        are mapped to the type map of the first model.
+    batch_size : int
+        The number of frames evaluated at once.
+    """
+    type_map = dps[0].get_type_map()
+    offsets = index_lammps_dump(fname)
+    nframes = offsets.size - 1
+    frames = [
+        load_lammps_dump_frames(fname, [ii], type_map=type_map, offsets=offsets)
+        for ii in range(nframes)
+    ]
+    groups = {}
+    for ii, ss in enumerate(frames):
+        groups.setdefault(ss["atom_types"].tobytes(), []).append(ii)
+    devi = np.zeros((nframes, 7))
+    devi[:, 0] = np.arange(nframes)
+    for ids in groups.values():
+        atype = frames[ids[0]]["atom_types"]
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            coords = np.concatenate([frames[ii]["coords"] for ii in batch])
+            cells = np.concatenate([frames[ii]["cells"] for ii in batch])
+            coords = coords.reshape(len(batch), -1)
+            cells = cells.reshape(len(batch), 9)
+            forces, virials = [], []
+            for dp in dps:
+                _, ff, vv = dp.eval(coords, cells, atype)[:3]
+                forces.append(np.reshape(ff, (len(batch), atype.size, 3)))
+                virials.append(np.reshape(vv, (len(batch), 9)))
+            # the virial is normalized by the number of atoms as LAMMPS does
+            devi[batch, 1:4] = np.stack(
+                calc_model_devi_v(np.array(virials) / atype.size), axis=1
+            )
+            devi[batch, 4:7] = np.stack(calc_model_devi_f(np.array(forces)), axis=1)
+
+    text = Path(fname).read_bytes()
+    with open(lmp_traj_name, "wb") as fp:
+        for ii in range(nframes):
+            lines = text[offsets[ii] : offsets[ii + 1]].split(b"\n", 2)
+            fp.write(b"\n".join([lines[0], b"%d" % ii, lines[2]]))
+    np.savetxt(
+        lmp_model_devi_name,
+        devi,
+        fmt=["%12d"] + ["%19.6e"] * 6,
+        header="%10s%19s%19s%19s%19s%19s%19s"
+        % (
+            "step",
+            "max_devi_v",
+            "min_devi_v",
+            "avg_devi_v",
+            "max_devi_f",
+            "min_devi_f",
+            "avg_devi_f",
+        ),
+    )
+    Path(lmp_log_name).write_text(
+        f"re-screened {nframes} frames by {len(dps)} models\n"
+    )
+
+
+class ModelDeviReader:
+    r"""Read the frames newly written to the model deviation file of a
+    running MD simulation. Only the completely written lines are read.
+
+    Parameters
+    ----------
+    fname : str
+        The model deviation file.
+
+    """
+
+    def __init__(
+        self,
+        fname: str,
+    ):
+        self.fname = Path(fname)
+        self.offset = 0
+
+    def __call__(self) -> List[Tuple[str, float, float]]:
+        r"""Read the new frames.
+
+        Returns
+        -------
+        frames : List[Tuple[str, float, float]]
+            The step, the max force and the max virial model deviation
+            of each new frame.
+        """
+        if not self.fname.is_file():
+            return []
+        with open(self.fname, "rb") as fp:
+            fp.seek(self.offset)
+            text = fp.read()
+        text = text[: text.rfind(b"\n") + 1]
+        self.offset += len(text)
+        ret = []
+        for line in text.decode().splitlines():
+            words = line.split()
+            if len(words) == 0 or words[0].startswith("#"):
+                continue
+            ret.append(
+                (
+                    words[0],
+                    float(words[model_devi_columns[DeviManager.MAX_DEVI_F]]),
+                    float(words[model_devi_columns[DeviManager.MAX_DEVI_V]]),
+                )
+            )
+        return ret
+
+
+class ModelDeviWatchdog:
+    r"""Check if a running MD simulation is failed by its model
+    deviation.
+
+    The model deviation file is read incrementally on each call, and
+    the simulation is failed once `max_consecutive` consecutive frames
+    are failed, or the ratio of the failed frames among the latest
+    `window` frames reaches `max_failed_ratio`. The frames are classified
+    as `prune_lmp_traj` does.
+
+    Parameters
+    ----------
+    fname : str
+        The model deviation file written by the simulation.
+    level_f_hi : float
+        The higher trust level of force model deviation.
+    level_v_hi : float, optional
+        The higher trust level of virial model deviation.
+    max_consecutive : int, optional
+        The number of consecutive failed frames.
+    window : int, optional
+        The number of the latest frames.
+    max_failed_ratio : float, optional
+        The ratio of the failed frames among the latest frames.
+    fail_at_level_hi : bool
+        A frame is failed if its model deviation reaches the higher
+        level, otherwise only if the model deviation exceeds the level.
+
+    """
+
+    def __init__(
+        self,
+        fname: str,
+        level_f_hi: float,
+        level_v_hi: Optional[float] = None,
+        max_consecutive: Optional[int] = None,
+        window: Optional[int] = None,
+        max_failed_ratio: Optional[float] = None,
+        fail_at_level_hi: bool = True,
+    ):
+        if max_consecutive is None and window is None:
+            raise RuntimeError(
+                "either max_consecutive or window should be set for the watchdog"
+            )
+        if (window is None) != (max_failed_ratio is None):
+            raise RuntimeError(
+                "window and max_failed_ratio should be set together for the watchdog"
+            )
+        self.reader = ModelDeviReader(fname)
+        self.level_f_hi = level_f_hi
+        self.level_v_hi = level_v_hi
+        self.max_consecutive = max_consecutive
+        self.window = window
+        self.max_failed_ratio = max_failed_ratio
+        self.fail_at_level_hi = fail_at_level_hi
+        self.nconsecutive = 0
+        self.latest = deque(maxlen=window)
+        self.reason = None
+
+    def __call__(self) -> Optional[str]:
+        r"""Read the new frames and check them.
+
+        Returns
+        -------
+        reason : str, optional
+            The reason why the simulation is failed, None if it is not.
+        """
+        for step, devi_f, devi_v in self.reader():
+            reason = self.update(devi_f, devi_v, step)
+            if reason is not None:
+                self.reason = reason
+                return reason
+        return None
+
+    def update(
+        self,
+        devi_f: float,
+        devi_v: float,
+        step: str,
+    ) -> Optional[str]:
+        r"""Check a new frame."""
+        fail = _failed(devi_f, self.level_f_hi, self.fail_at_level_hi)
+        if self.level_v_hi is not None:
+            fail = fail or _failed(devi_v, self.level_v_hi, self.fail_at_level_hi)
+        self.nconsecutive = self.nconsecutive + 1 if fail else 0
+        self.latest.append(fail)
+        if (
+            self.max_consecutive is not None
+            and self.nconsecutive >= self.max_consecutive
+        ):
+            return f"{self.nconsecutive} consecutive failed frames at step {step}"
+        if (
+            self.window is not None
+            and len(self.latest) == self.window
+            and sum(self.latest) >= self.max_failed_ratio * self.window
+        ):
+            return (
+                f"{sum(self.latest)} failed frames in the latest {self.window} "
+                f"frames at step {step}"
+            )
+        return None
+
+
+class CandidateQuota:
+    r"""Count the candidates of a running MD simulation, and check if
+    the quota of candidates is met by all the MD simulations sharing the
+    counter directory.
+
+    Each simulation records its number of candidates in its own counter
+    file in the directory, thus the counters are never written
+    concurrently, and the number of collected candidates is the sum of
+    the counters. The frames are classified as `prune_lmp_traj` does.
+
+    Parameters
+    ----------
+    fname : str
+        The model deviation file written by the simulation.
+    counter : Path
+        The counter file of the simulation.
+    max_candidates : int
+        The quota of candidates.
+    level_f_hi : float
+        The higher trust level of force model deviation.
+    level_f_lo : float, optional
+        The lower trust level of force model deviation.
+    level_v_hi : float, optional
+        The higher trust level of virial model deviation.
+    level_v_lo : float, optional
+        The lower trust level of virial model deviation.
+    fail_at_level_hi : bool
+        A frame is failed if its model deviation reaches the higher
+        level, otherwise only if the model deviation exceeds the level.
+
+    """
+
+    def __init__(
+        self,
+        fname: str,
+        counter: Path,
+        max_candidates: int,
+        level_f_hi: float,
+        level_f_lo: Optional[float] = None,
+        level_v_hi: Optional[float] = None,
+        level_v_lo: Optional[float] = None,
+        fail_at_level_hi: bool = True,
+    ):
+        self.reader = ModelDeviReader(fname)
+        self.counter = Path(counter)
+        self.max_candidates = max_candidates
+        self.level_f_hi = level_f_hi
+        self.level_f_lo = level_f_lo
+        self.level_v_hi = level_v_hi
+        self.level_v_lo = level_v_lo
+        self.fail_at_level_hi = fail_at_level_hi
+        self.ncandidates = 0
+
+    def __call__(self) -> Optional[str]:
+        r"""Count the new frames and check the quota.
+
+        Returns
+        -------
+        reason : str, optional
+            The reason why the simulation should stop, None if it should not.
+        """
+        self._count(self.reader())
+        return self.check()
+
+    def seed(
+        self,
+        fname: str,
+    ):
+        r"""Count the candidates of the frames written before the
+        simulation, e.g. those stashed by `resume_checkpoint`."""
+        self._count(ModelDeviReader(fname)())
+
+    def _count(
+        self,
+        frames: List[Tuple[str, float, float]],
+    ):
+        for _, devi_f, devi_v in frames:
+            if self.is_candidate(devi_f, devi_v):
+                self.ncandidates += 1
+        if len(frames) > 0:
+            self.counter.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.counter.with_name(self.counter.name + ".tmp")
+            tmp.write_text(json.dumps({"candidate": self.ncandidates}))
+            # the counter is replaced atomically
+            os.replace(tmp, self.counter)
+
+    def check(self) -> Optional[str]:
+        r"""Check the quota without reading the model deviation."""
+        total = self.collected()
+        if total >= self.max_candidates:
+            return (
+                f"{total} candidates are collected, "
+                f"the quota is {self.max_candidates}"
+            )
+        return None
+
+    def collected(self) -> int:
+        r"""The number of candidates collected by all the simulations."""
+        total = 0
+        if self.counter.parent.is_dir():
+            for ii in self.counter.parent.glob("*.json"):
+                try:
+                    total += json.loads(ii.read_text())["candidate"]
+                except (OSError, ValueError, KeyError):
+                    # the counter may be removed or replaced concurrently
+                    pass
+        return total
+
+    def is_candidate(
+        self,
+        devi_f: float,
+        devi_v: float,
+    ) -> bool:
+        if _failed(devi_f, self.level_f_hi, self.fail_at_level_hi):
+            return False
+        if self.level_v_hi is not None and _failed(
+            devi_v, self.level_v_hi, self.fail_at_level_hi
+        ):
+            return False
+        if self.level_f_lo is None:
+            return True
+        if devi_f >= self.level_f_lo:
+            return True
+        return self.level_v_lo is not None and devi_v >= self.level_v_lo
+
+
+def write_skipped_outputs():
+    r"""Write the empty outputs of an MD simulation that is not run."""
+    Path(lmp_traj_name).write_text("")
+    Path(lmp_model_devi_name).write_text(
+        "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+    )
+    Path(lmp_log_name).write_text("")
+
+
+def trim_stopped_outputs(
+    traj: str,
+    model_devi: str,
+):
+    r"""Make the trajectory and the model deviation of a stopped MD
+    simulation consistent. Only the frames that are completely written
+    in both files are kept."""
+    traj_steps = np.zeros(0, dtype=np.int64)
+    if Path(traj).is_file():
+        offsets = index_lammps_dump(traj)
+        traj_steps = lammps_dump_timesteps(traj, offsets)
+        if traj_steps.size > 0:
+            # the last frame may be partially written
+            with open(traj, "rb") as fp:
+                fp.seek(offsets[-2])
+                lines = fp.read().split(b"\n")
+            if len(lines) < 5 or len([ii for ii in lines[9:] if ii.strip()]) < int(
+                lines[3]
+            ):
+                traj_steps = traj_steps[:-1]
+    devi_lines = []
+    if Path(model_devi).is_file():
+        text = Path(model_devi).read_text()
+        # the last line may be partially written
+        devi_lines = text[: text.rfind("\n") + 1].splitlines()
+    devi_steps = [
+        int(float(ii.split()[0]))
+        for ii in devi_lines
+        if len(ii.split()) > 0 and not ii.startswith("#")
+    ]
+    steps = set(devi_steps)
+    if Path(traj).is_file():
+        steps &= set(traj_steps.tolist())
+        keep = [ii for ii, ss in enumerate(traj_steps) if ss in steps]
+        Path(traj).write_bytes(read_lammps_dump_frames(traj, keep, offsets=offsets))
+    if Path(model_devi).is_file():
+        Path(model_devi).write_text(
+            "".join(
+                ii + "\n"
+                for ii in devi_lines
+                if ii.startswith("#")
+                or (len(ii.split()) > 0 and int(float(ii.split()[0])) in steps)
+            )
+        )
+
+
+def pad_failed_outputs(
+    lmp_input: str,
+    traj: str,
+    model_devi: str,
+) -> int:
+    r"""Pad the outputs of an MD simulation stopped as failed with the
+    frames that are not run, so they are counted as failed frames
+    rather than dropped from the exploration reports.
+
+    The padded frames are empty frames (zero atoms) in the trajectory,
+    and have infinite model deviations. The number of steps and the
+    output frequency are given by the variables `NSTEPS` and
+    `THERMO_FREQ` of the input script, nothing is padded if they are
+    not defined.
+
+    Returns
+    -------
+    npadded : int
+        The number of padded frames.
+    """
+    variables = {}
+    for line in Path(lmp_input).read_text().splitlines():
+        words = line.split()
+        if len(words) >= 4 and words[0] == "variable" and words[2] == "equal":
+            variables[words[1]] = words[3]
+    try:
+        nsteps = int(variables["NSTEPS"])
+        freq = int(variables["THERMO_FREQ"])
+    except (KeyError, ValueError):
+        return 0
+    offsets = index_lammps_dump(traj)
+    traj_steps = lammps_dump_timesteps(traj, offsets)
+    if traj_steps.size == 0 or freq <= 0:
+        return 0
+    steps = np.arange(traj_steps[-1] + freq, nsteps + 1, freq)
+    # the empty frames take the header of the last frame
+    with open(traj, "rb") as fp:
+        fp.seek(offsets[-2])
+        head = [fp.readline().rstrip(b"\n") for _ in range(9)]
+    head[3] = b"0"
+    with open(traj, "ab") as fp:
+        for ss in steps:
+            head[1] = b"%d" % ss
+            fp.write(b"\n".join(head) + b"\n")
+    with open(model_devi, "a") as fp:
+        fp.write("".join(f"{ss} inf inf inf inf inf inf\n" for ss in steps))
+    return int(steps.size)
+
+
+def _force_symlink(
+    name: Path,
+    target: Path,
+):
+    # the links of a previous attempt are replaced
+    if name.is_symlink():
+        name.unlink()
+    name.symlink_to(target)
+
+
+def latest_restart_step() -> Optional[int]:
+    r"""The step of the latest restart file in the current working
+    directory. None if there is no restart file."""
+    steps = []
+    for ff in Path().glob(lmp_restart_name + ".*"):
+        suffix = ff.name[len(lmp_restart_name) + 1 :]
+        if suffix.isdigit():
+            steps.append(int(suffix))
+    return max(steps) if len(steps) > 0 else None
+
+
+def _input_digest(task_path: Path) -> str:
+    hh = hashlib.sha256()
+    for ii in [lmp_conf_name, lmp_input_name]:
+        hh.update((task_path / ii).read_bytes())
+    return hh.hexdigest()
+
+
+def resume_checkpoint(
+    task_path: Path,
+) -> Optional[int]:
+    r"""Prepare the current working directory, i.e. the checkpoint
+    directory of a task, for resuming the MD simulation.
+
+    The MD simulation is resumed from the latest restart file if the
+    checkpoint is written for the same inputs, and the input script
+    reads the restart files. The frames of the partial trajectory and
+    model deviation from the restart step on are dropped, since they
+    are output again by the resumed simulation, and the remaining
+    frames are stashed to be merged by `merge_checkpoint_outputs`.
+    Otherwise the checkpoint directory is cleaned for a new simulation.
+
+    Parameters
+    ----------
+    task_path : Path
+        The absolute path of the input files of the task.
+
+    Returns
+    -------
+    restart_step : int, optional
+        The step of the restart file, None if the simulation starts from
+        the beginning.
+    """
+    digest = _input_digest(task_path)
+    ckpt = Path(lmp_checkpoint_name)
+    restart_step = None
+    if ckpt.is_file() and json.loads(ckpt.read_text())["digest"] == digest:
+        restart_step = latest_restart_step()
+    if (
+        restart_step is not None
+        and "${restart}" not in Path(lmp_input_name).read_text()
+    ):
+        restart_step = None
+    if restart_step is None:
+        for ff in Path().iterdir():
+            if ff.is_dir() and not ff.is_symlink():
+                shutil.rmtree(ff)
+            else:
+                ff.unlink()
+        ckpt.write_text(json.dumps({"digest": digest}))
+        return None
+
+    # the stashed frames are before the previous restart step, and the
+    # frames in the outputs are from the previous restart step on
+    traj_stash = Path(lmp_traj_name + ".ckpt")
+    traj_text = b""
+    for ff in [traj_stash, Path(lmp_traj_name)]:
+        if ff.is_file():
+            offsets = index_lammps_dump(ff)
+            keep = np.flatnonzero(lammps_dump_timesteps(ff, offsets) < restart_step)
+            traj_text += read_lammps_dump_frames(ff, list(keep), offsets=offsets)
+    traj_stash.write_bytes(traj_text)
+    devi_stash = Path(lmp_model_devi_name + ".ckpt")
+    devi_lines = []
+    for ff in [devi_stash, Path(lmp_model_devi_name)]:
+        if ff.is_file():
+            for line in ff.read_text().splitlines():
+                if line.startswith("#"):
+                    if len(devi_lines) == 0:
+                        devi_lines.append(line)
+                elif (
+                    len(line.split()) > 0 and int(float(line.split()[0])) < restart_step
+                ):
+                    devi_lines.append(line)
+    devi_stash.write_text("".join(ii + "\n" for ii in devi_lines))
+    for ff in [lmp_traj_name, lmp_model_devi_name]:
+        if Path(ff).is_file():
+            os.remove(ff)
+    return restart_step
+
+
+def merge_checkpoint_outputs():
+    r"""Prepend the frames stashed by `resume_checkpoint` to the
+    trajectory and model deviation of the resumed MD simulation."""
+    traj_stash = Path(lmp_traj_name + ".ckpt")
+    traj = Path(lmp_traj_name)
+    traj.write_bytes(
+        traj_stash.read_bytes() + (traj.read_bytes() if traj.is_file() else b"")
+    )
+    devi_stash = Path(lmp_model_devi_name + ".ckpt")
+    devi = Path(lmp_model_devi_name)
+    lines = devi_stash.read_text().splitlines()
+    if devi.is_file():
+        new_lines = devi.read_text().splitlines()
+        if len(lines) == 0:
+            lines = new_lines
+        else:
+            lines += [ii for ii in new_lines if not ii.startswith("#")]
+    devi.write_text("".join(ii + "\n" for ii in lines))
+    traj_stash.unlink()
+    devi_stash.unlink()
+
+
+def set_restart_freq(
+    lmp_input_name: str,
+    freq: int,
+):
+    r"""Write the restart files every `freq` steps. The `restart`
+    command of the input script is revised, or added before the first
+    `run` command."""
+    with open(lmp_input_name, encoding="utf8") as f:
+        lmp_input_lines = f.readlines()
+    restart_line = f"restart         {freq} {lmp_restart_name}\n"
+    idx = [ii for ii, ll in enumerate(lmp_input_lines) if ll.split()[:1] == ["restart"]]
+    if len(idx) > 0:
+        for ii in idx:
+            lmp_input_lines[ii] = restart_line
+    else:
+        idx = [ii for ii, ll in enumerate(lmp_input_lines) if ll.split()[:1] == ["run"]]
+        lmp_input_lines.insert(idx[0] if len(idx) > 0 else 0, restart_line)
+    # the input file may be linked to the task path
+    os.remove(lmp_input_name)
+    with open(lmp_input_name, "w", encoding="utf8") as f:
+        f.write("".join(lmp_input_lines))
+
+
 def add_teacher_model(lmp_input_name: str):
     with open(lmp_input_name, encoding="utf8") as f:
         lmp_input_lines = f.readlines()
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 from pathlib import (
@@ -5,6 +6,7 @@ from pathlib import (
 )
 from typing import (
     List,
+    Optional,
     Set,
     Tuple,
 )
@@ -23,11 +25,25 @@ from dpgen2.exploration.report import (
 )
 from dpgen2.exploration.selector import (
     ConfSelector,
+    NoveltyIndex,
 )
 
 
 class SelectConfs(OP):
-    """Select configurations from exploration trajectories for labeling."""
+    """Select configurations from exploration trajectories for labeling.
+
+    If `optional_parameter["novelty_index"]` is set, the candidate
+    configurations that are known by the `NoveltyIndex` of the labeled
+    data are not selected. The index is loaded from the shards stored in
+    the iteration data. Before any shard is written, the index is built from
+    the initial data.
+
+    """
+
+    default_optional_parameter = {
+        "mixed_type": False,
+        "novelty_index": None,
+    }
 
     @classmethod
     def get_input_sign(cls):
@@ -35,8 +51,14 @@ class SelectConfs(OP):
             {
                 "conf_selector": ConfSelector,
                 "type_map": List[str],
+                "optional_parameter": BigParameter(
+                    dict,
+                    default=SelectConfs.default_optional_parameter,
+                ),
                 "trajs": Artifact(List[Path]),
                 "model_devis": Artifact(List[Path]),
+                "init_data": Artifact(List[Path], optional=True),
+                "iter_data": Artifact(List[Path], optional=True),
             }
         )
 
@@ -65,6 +87,8 @@ class SelectConfs(OP):
             - `type_map`: (`List[str]`) The type map.
             - `trajs`: (`Artifact(List[Path])`) The trajectories generated in the exploration.
             - `model_devis`: (`Artifact(List[Path])`) The file storing the model deviation of the trajectory. The order of model deviation storage is consistent with that of the trajectories. The order of frames of one model deviation storage is also consistent with tat of the corresponding trajectory.
+            - `init_data`: (`Artifact(List[Path])`) The initial data. Optional, only used by the novelty index.
+            - `iter_data`: (`Artifact(List[Path])`) The data of the previous iterations. Optional, only used by the novelty index.
 
         Returns
         -------
@@ -86,6 +110,7 @@ class SelectConfs(OP):
             trajs,
             model_devis,
             type_map=type_map,
+            **SelectConfs.novelty_kwargs(ip),
         )
 
         return OPIO(
@@ -95,6 +120,44 @@ class SelectConfs(OP):
             }
         )
 
+    @staticmethod
+    def novelty_kwargs(
+        ip: OPIO,
+    ) -> dict:
+        r"""The `conf_novelty` argument of the selector, empty if the
+        novelty index is not set or no labeled data is indexed."""
+        novelty_config = ip["optional_parameter"].get("novelty_index")
+        if novelty_config is None:
+            return {}
+        novelty_index = NoveltyIndex(ip["type_map"], **novelty_config)
+        index = SelectConfs.load_novelty_index(
+            novelty_index,
+            ip["init_data"],
+            ip["iter_data"],
+            ip["optional_parameter"].get("mixed_type", False),
+        )
+        if index is None:
+            return {}
+        return {"conf_novelty": functools.partial(novelty_index.check, index=index)}
+
+    @staticmethod
+    def load_novelty_index(
+        novelty_index: NoveltyIndex,
+        init_data: Optional[List[Path]],
+        iter_data: Optional[List[Path]],
+        mixed_type: bool = False,
+    ) -> Optional[dict]:
+        index = novelty_index.load(iter_data or [])
+        if index is None and init_data:
+            init_path = Path("novelty_index.init")
+            init_path.mkdir(exist_ok=True)
+            novelty_index.write(
+                novelty_index.fingerprint_data(init_data, mixed_type),
+                init_path,
+            )
+            index = novelty_index.load([init_path])
+        return index
+
     @staticmethod
     def validate_trajs(
         trajs,
@@ -114,3 +177,147 @@ class SelectConfs(OP):
                 rett.append(tt)
                 retm.append(mm)
         return rett, retm
+
+
+class SelectConfsMap(OP):
+    """The map step of the sharded selection of configurations.
+
+    Record the partial exploration report of the trajectories given to
+    one slice. The partial reports are merged by `SelectConfsReduce`.
+
+    """
+
+    @classmethod
+    def get_input_sign(cls):
+        return OPIOSign(
+            {
+                "conf_selector": ConfSelector,
+                "model_devi": Artifact(Path, optional=True),
+            }
+        )
+
+    @classmethod
+    def get_output_sign(cls):
+        return OPIOSign(
+            {
+                "report": BigParameter(ExplorationReport),
+            }
+        )
+
+    @OP.exec_sign_check
+    def execute(
+        self,
+        ip: OPIO,
+    ) -> OPIO:
+        r"""Execute the OP.
+
+        Parameters
+        ----------
+        ip : dict
+            Input dict with components:
+
+            - `conf_selector`: (`ConfSelector`) Configuration selector.
+            - `model_devi`: (`Artifact(Path)`) The model deviation of the trajectory. `None` if the exploration task failed.
+
+        Returns
+        -------
+        Any
+            Output dict with components:
+            - `report`: (`ExplorationReport`) The partial report. It records no trajectory if `model_devi` is `None`.
+
+        """
+        model_devi = ip["model_devi"]
+        report = ip["conf_selector"].record(
+            [model_devi] if model_devi is not None else []
+        )
+        return OPIO(
+            {
+                "report": report,
+            }
+        )
+
+
+class SelectConfsReduce(OP):
+    """The reduce step of the sharded selection of configurations.
+
+    Merge the partial reports given by `SelectConfsMap` and select the
+    configurations as `SelectConfs` would do on all the trajectories.
+
+    """
+
+    @classmethod
+    def get_input_sign(cls):
+        return OPIOSign(
+            {
+                "conf_selector": ConfSelector,
+                "type_map": List[str],
+                "optional_parameter": BigParameter(
+                    dict,
+                    default=SelectConfs.default_optional_parameter,
+                ),
+                "reports": BigParameter(List[ExplorationReport]),
+                "trajs": Artifact(List[Path]),
+                "model_devis": Artifact(List[Path]),
+                "init_data": Artifact(List[Path], optional=True),
+                "iter_data": Artifact(List[Path], optional=True),
+            }
+        )
+
+    @classmethod
+    def get_output_sign(cls):
+        return OPIOSign(
+            {
+                "report": BigParameter(ExplorationReport),
+                "confs": Artifact(List[Path]),
+            }
+        )
+
+    @OP.exec_sign_check
+    def execute(
+        self,
+        ip: OPIO,
+    ) -> OPIO:
+        r"""Execute the OP.
+
+        Parameters
+        ----------
+        ip : dict
+            Input dict with components:
+
+            - `conf_selector`: (`ConfSelector`) Configuration selector.
+            - `type_map`: (`List[str]`) The type map.
+            - `reports`: (`List[ExplorationReport]`) The partial reports, in the order of the trajectories.
+            - `trajs`: (`Artifact(List[Path])`) The trajectories generated in the exploration.
+            - `model_devis`: (`Artifact(List[Path])`) The model deviations of the trajectories.
+            - `init_data`: (`Artifact(List[Path])`) The initial data. Optional, only used by the novelty index.
+            - `iter_data`: (`Artifact(List[Path])`) The data of the previous iterations. Optional, only used by the novelty index.
+
+        Returns
+        -------
+        Any
+            Output dict with components:
+            - `report`: (`ExplorationReport`) The report on the exploration.
+            - `conf`: (`Artifact(List[Path])`) The selected configurations.
+
+        """
+        conf_selector = ip["conf_selector"]
+        type_map = ip["type_map"]
+        reports = ip["reports"]
+        if len(reports) != len(ip["trajs"]):
+            raise FatalError("length of reports list is not equal to the " "trajs list")
+        # the reports of the failed tasks record no trajectory
+        trajs, _ = SelectConfs.validate_trajs(ip["trajs"], ip["model_devis"])
+
+        confs, report = conf_selector.select_from_reports(
+            trajs,
+            reports,
+            type_map=type_map,
+            **SelectConfs.novelty_kwargs(ip),
+        )
+
+        return OPIO(
+            {
+                "report": report,
+                "confs": confs,
+            }
+        )
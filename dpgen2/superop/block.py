@@ -39,6 +39,9 @@ from dflow.python import (
     Slices,
 )
 
+from dpgen2.constants import (
+    lmp_index_pattern,
+)
 from dpgen2.op import (
     CollectData,
 )
@@ -49,12 +52,21 @@ from dpgen2.utils.step_config import normalize as normalize_step_dict
 
 block_default_optional_parameter = {
     "data_mixed_type": False,
+    "novelty_index": None,
 }
 
 
+def make_select_confs_optional_parameter(block_optional_parameter):
+    return {
+        "mixed_type": block_optional_parameter["data_mixed_type"],
+        "novelty_index": block_optional_parameter["novelty_index"],
+    }
+
+
 def make_collect_data_optional_parameter(block_optional_parameter):
     return {
         "mixed_type": block_optional_parameter["data_mixed_type"],
+        "novelty_index": block_optional_parameter["novelty_index"],
     }
 
 
@@ -76,7 +88,15 @@ class ConcurrentLearningBlock(Steps):
         select_confs_config: dict = normalize_step_dict({}),
         collect_data_config: dict = normalize_step_dict({}),
         upload_python_packages: Optional[List[os.PathLike]] = None,
+        select_confs_map_op: Optional[OP] = None,
+        select_confs_reduce_op: Optional[OP] = None,
     ):
+        # the configurations are selected by the sliced map steps and a
+        # reduce step if both the map and reduce ops are given, otherwise
+        # by one `select_confs_op` step.
+        sharded_select = (
+            select_confs_map_op is not None and select_confs_reduce_op is not None
+        )
         self._input_parameters = {
             "block_id": InputParameter(),
             "type_map": InputParameter(),
@@ -95,6 +115,7 @@ class ConcurrentLearningBlock(Steps):
             "init_models": InputArtifact(optional=True),
             "init_data": InputArtifact(),
             "iter_data": InputArtifact(),
+            "rescreen_trajs": InputArtifact(optional=True),
         }
         self._output_parameters = {
             "exploration_report": OutputParameter(),
@@ -103,6 +124,7 @@ class ConcurrentLearningBlock(Steps):
             "models": OutputArtifact(),
             "iter_data": OutputArtifact(),
             "trajs": OutputArtifact(),
+            "model_devis": OutputArtifact(),
         }
 
         super().__init__(
@@ -118,10 +140,13 @@ class ConcurrentLearningBlock(Steps):
         )
 
         self._my_keys = ["select-confs", "collect-data"]
+        select_keys = self._my_keys[:1]
+        if sharded_select:
+            select_keys = ["select-confs-map"] + select_keys
         self._keys = (
             prep_run_dp_train_op.keys
             + prep_run_lmp_op.keys
-            + self._my_keys[:1]
+            + select_keys
             + prep_run_fp_op.keys
             + self._my_keys[1:2]
         )
@@ -130,6 +155,10 @@ class ConcurrentLearningBlock(Steps):
             self.step_keys[ii] = "--".join(
                 ["%s" % self.inputs.parameters["block_id"], ii]
             )
+        ii = "select-confs-map"
+        self.step_keys[ii] = "--".join(
+            ["%s" % self.inputs.parameters["block_id"], ii + "-{{item}}"]
+        )
 
         self = _block_cl(
             self,
@@ -143,6 +172,8 @@ class ConcurrentLearningBlock(Steps):
             select_confs_config=select_confs_config,
             collect_data_config=collect_data_config,
             upload_python_packages=upload_python_packages,
+            select_confs_map_op=select_confs_map_op if sharded_select else None,
+            select_confs_reduce_op=select_confs_reduce_op if sharded_select else None,
         )
 
     @property
@@ -178,16 +209,22 @@ def _block_cl(
     select_confs_config: dict = normalize_step_dict({}),
     collect_data_config: dict = normalize_step_dict({}),
     upload_python_packages: Optional[List[os.PathLike]] = None,
+    select_confs_map_op: Optional[OP] = None,
+    select_confs_reduce_op: Optional[OP] = None,
 ):
     select_confs_config = deepcopy(select_confs_config)
     collect_data_config = deepcopy(collect_data_config)
     select_confs_template_config = select_confs_config.pop("template_config")
+    select_confs_slice_config = select_confs_config.pop("template_slice_config", {})
     collect_data_template_config = collect_data_config.pop("template_config")
     select_confs_executor = init_executor(select_confs_config.pop("executor"))
     collect_data_executor = init_executor(collect_data_config.pop("executor"))
     run_dp_train_optional_parameter = make_run_dp_train_optional_parameter(
         block_steps.inputs.parameters["optional_parameter"]
     )
+    select_confs_optional_parameter = make_select_confs_optional_parameter(
+        block_steps.inputs.parameters["optional_parameter"]
+    )
     collect_data_optional_parameter = make_collect_data_optional_parameter(
         block_steps.inputs.parameters["optional_parameter"]
     )
@@ -223,6 +260,7 @@ def _block_cl(
         },
         artifacts={
             "models": prep_run_dp_train.outputs.artifacts["models"],
+            "rescreen_trajs": block_steps.inputs.artifacts["rescreen_trajs"],
         },
         key="--".join(
             ["%s" % block_steps.inputs.parameters["block_id"], "prep-run-lmp"]
@@ -230,6 +268,47 @@ def _block_cl(
     )
     block_steps.add(prep_run_lmp)
 
+    select_confs_parameters = {
+        "conf_selector": block_steps.inputs.parameters["conf_selector"],
+        "type_map": block_steps.inputs.parameters["type_map"],
+        "optional_parameter": select_confs_optional_parameter,
+    }
+    if select_confs_map_op is not None:
+        # each slice records the partial report of one trajectory, the
+        # slices are grouped by the `template_slice_config`
+        select_confs_map = Step(
+            name=name + "-select-confs-map",
+            template=PythonOPTemplate(
+                select_confs_map_op,
+                slices=Slices(
+                    "int('{{item}}')",
+                    input_artifact=["model_devi"],
+                    output_parameter=["report"],
+                    **select_confs_slice_config,
+                ),
+                python_packages=upload_python_packages,
+                **select_confs_template_config,
+            ),
+            parameters={
+                "conf_selector": block_steps.inputs.parameters["conf_selector"],
+            },
+            artifacts={
+                "model_devi": prep_run_lmp.outputs.artifacts["model_devis"],
+            },
+            with_sequence=argo_sequence(
+                argo_len(prep_run_lmp.outputs.parameters["task_names"]),
+                format=lmp_index_pattern,
+            ),
+            key=step_keys["select-confs-map"],
+            executor=select_confs_executor,
+            **select_confs_config,
+        )
+        block_steps.add(select_confs_map)
+        select_confs_op = select_confs_reduce_op
+        select_confs_parameters["reports"] = select_confs_map.outputs.parameters[
+            "report"
+        ]
+
     select_confs = Step(
         name=name + "-select-confs",
         template=PythonOPTemplate(
@@ -238,13 +317,12 @@ def _block_cl(
             python_packages=upload_python_packages,
             **select_confs_template_config,
         ),
-        parameters={
-            "conf_selector": block_steps.inputs.parameters["conf_selector"],
-            "type_map": block_steps.inputs.parameters["type_map"],
-        },
+        parameters=select_confs_parameters,
         artifacts={
             "trajs": prep_run_lmp.outputs.artifacts["trajs"],
             "model_devis": prep_run_lmp.outputs.artifacts["model_devis"],
+            "init_data": block_steps.inputs.artifacts["init_data"],
+            "iter_data": block_steps.inputs.artifacts["iter_data"],
         },
         key=step_keys["select-confs"],
         executor=select_confs_executor,
@@ -285,6 +363,7 @@ def _block_cl(
         artifacts={
             "iter_data": block_steps.inputs.artifacts["iter_data"],
             "labeled_data": prep_run_fp.outputs.artifacts["labeled_data"],
+            "init_data": block_steps.inputs.artifacts["init_data"],
         },
         key=step_keys["collect-data"],
         executor=collect_data_executor,
@@ -304,5 +383,8 @@ def _block_cl(
     block_steps.outputs.artifacts["trajs"]._from = prep_run_lmp.outputs.artifacts[
         "trajs"
     ]
+    block_steps.outputs.artifacts["model_devis"]._from = prep_run_lmp.outputs.artifacts[
+        "model_devis"
+    ]
 
     return block_steps
@@ -62,6 +62,7 @@ class PrepRunLmp(Steps):
         }
         self._input_artifacts = {
             "models": InputArtifact(),
+            "rescreen_trajs": InputArtifact(optional=True),
         }
         self._output_parameters = {
             "task_names": OutputParameter(),
@@ -71,6 +72,7 @@ class PrepRunLmp(Steps):
             "trajs": OutputArtifact(),
             "model_devis": OutputArtifact(),
             "plm_output": OutputArtifact(),
+            "traj_summaries": OutputArtifact(),
         }
 
         super().__init__(
@@ -153,7 +155,9 @@ def _prep_run_lmp(
         parameters={
             "lmp_task_grp": prep_run_steps.inputs.parameters["lmp_task_grp"],
         },
-        artifacts={},
+        artifacts={
+            "rescreen_trajs": prep_run_steps.inputs.artifacts["rescreen_trajs"],
+        },
         key=step_keys["prep-lmp"],
         executor=prep_executor,
         **prep_config,
@@ -168,7 +172,13 @@ def _prep_run_lmp(
                 "int('{{item}}')",
                 input_parameter=["task_name"],
                 input_artifact=["task_path"],
-                output_artifact=["log", "traj", "model_devi", "plm_output"],
+                output_artifact=[
+                    "log",
+                    "traj",
+                    "model_devi",
+                    "plm_output",
+                    "traj_summary",
+                ],
                 **template_slice_config,
             ),
             python_packages=upload_python_packages,
@@ -203,5 +213,8 @@ def _prep_run_lmp(
     prep_run_steps.outputs.artifacts["plm_output"]._from = run_lmp.outputs.artifacts[
         "plm_output"
     ]
+    prep_run_steps.outputs.artifacts[
+        "traj_summaries"
+    ]._from = run_lmp.outputs.artifacts["traj_summary"]
 
     return prep_run_steps
@@ -29,6 +29,7 @@ from .obj_artifact import (
 )
 from .run_command import (
     run_command,
+    run_command_watched,
 )
 from .step_config import gen_doc as gen_doc_step_dict
 from .step_config import (
@@ -1,6 +1,10 @@
 import os
+import signal
+import subprocess
 from typing import (
+    Callable,
     List,
+    Optional,
     Tuple,
     Union,
 )
@@ -19,3 +23,67 @@ def run_command(
     return dflow_run_command(
         cmd, raise_error=False, try_bash=shell, interactive=interactive
     )
+
+
+def run_command_watched(
+    cmd: Union[str, List[str]],
+    check: Callable[[], Optional[str]],
+    interval: float = 10.0,
+    shell: bool = False,
+    kill_timeout: float = 60.0,
+) -> Tuple[int, str, str, Optional[str]]:
+    r"""Run a command and check it every `interval` seconds while it
+    runs. The command is stopped once the check returns a reason.
+
+    Parameters
+    ----------
+    cmd : str or List[str]
+        The command.
+    check : Callable[[], Optional[str]]
+        The check, returns the reason to stop the command, or None to
+        keep it running.
+    interval : float
+        The interval of the checks in seconds.
+    shell : bool
+        If the command is executed through the shell.
+    kill_timeout : float
+        The command, with all its child processes, is terminated when
+        stopped, and killed if it does not exit in this time in seconds.
+
+    Returns
+    -------
+    ret : int
+        The return code.
+    out : str
+        The standard output.
+    err : str
+        The standard error.
+    reason : str, optional
+        The reason why the command is stopped, None if it exits itself.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        shell=shell,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        # the child processes are stopped together
+        start_new_session=True,
+    )
+    reason = None
+    while True:
+        try:
+            out, err = proc.communicate(timeout=interval)
+            break
+        except subprocess.TimeoutExpired:
+            reason = check()
+            if reason is None:
+                continue
+            os.killpg(proc.pid, signal.SIGTERM)
+            try:
+                out, err = proc.communicate(timeout=kill_timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                out, err = proc.communicate()
+            break
+    return proc.returncode, out, err, reason
@@ -16,6 +16,13 @@ if os.getenv("SKIP_UT_WITH_DFLOW"):
 else:
     skip_ut_with_dflow = False
     skip_ut_with_dflow_reason = ""
+if os.getenv("RUN_BENCHMARK"):
+    run_benchmark = int(os.getenv("RUN_BENCHMARK")) != 0
+else:
+    run_benchmark = False
+run_benchmark_reason = (
+    "benchmarks only run when environment variable RUN_BENCHMARK is set to non-zero"
+)
 upload_python_packages = [os.path.join(dpgen_path, "dpgen2")]
 # one needs to set proper values for the following variable.
 default_image = "dptechnology/dpgen2:latest"
@@ -16,6 +16,7 @@ from dpgen2.entrypoint.submit import (
     copy_scheduler_plans,
     expand_idx,
     print_list_steps,
+    set_lmp_trust_levels,
     submit_concurrent_learning,
     update_reuse_step_scheduler,
 )
@@ -117,6 +118,59 @@ class TestSubmit(unittest.TestCase):
         expected_ostr = "       0    foo\n       1    bar"
         self.assertEqual(ostr, expected_ostr)
 
+    def test_set_lmp_trust_levels(self):
+        convergence = {
+            "type": "fixed-levels",
+            "level_f_lo": 0.1,
+            "level_f_hi": 0.3,
+            "level_v_lo": None,
+            "level_v_hi": None,
+        }
+        lmp_config = {
+            "prune_traj": {"level_f_lo": None, "level_f_hi": None},
+            "watchdog": {"level_f_hi": 0.3, "max_consecutive": 10},
+            "quota": None,
+        }
+        set_lmp_trust_levels(lmp_config, convergence)
+        self.assertEqual(
+            lmp_config["prune_traj"],
+            {
+                "level_f_lo": 0.1,
+                "level_f_hi": 0.3,
+                "level_v_lo": None,
+                "level_v_hi": None,
+                "fail_at_level_hi": True,
+            },
+        )
+        self.assertEqual(
+            lmp_config["watchdog"],
+            {
+                "level_f_hi": 0.3,
+                "level_v_hi": None,
+                "max_consecutive": 10,
+                "fail_at_level_hi": True,
+            },
+        )
+        self.assertIsNone(lmp_config["quota"])
+        # the mismatched levels
+        with self.assertRaises(RuntimeError):
+            set_lmp_trust_levels({"watchdog": {"level_f_hi": 0.5}}, convergence)
+        with self.assertRaises(RuntimeError):
+            set_lmp_trust_levels({"quota": {"level_f_lo": 0.2}}, convergence)
+        # the lower levels of the adaptive-lower report
+        convergence = {"type": "adaptive-lower", "level_f_hi": 0.5, "level_v_hi": None}
+        lmp_config = {"prune_traj": {"level_f_hi": None}}
+        set_lmp_trust_levels(lmp_config, convergence)
+        # the frames at the higher level are candidates
+        self.assertEqual(
+            lmp_config["prune_traj"],
+            {"level_f_hi": 0.5, "level_v_hi": None, "fail_at_level_hi": False},
+        )
+        with self.assertRaises(RuntimeError):
+            set_lmp_trust_levels(
+                {"prune_traj": {"level_f_lo": 0.1, "level_f_hi": None}}, convergence
+            )
+
     def test_update_reuse_step_scheduler(self):
         reuse_steps = [
             MockedStep(MockedScheduler(0)),
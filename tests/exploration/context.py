@@ -4,3 +4,11 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 import dpgen2
+
+if os.getenv("RUN_BENCHMARK"):
+    run_benchmark = int(os.getenv("RUN_BENCHMARK")) != 0
+else:
+    run_benchmark = False
+run_benchmark_reason = (
+    "benchmarks only run when environment variable RUN_BENCHMARK is set to non-zero"
+)
@@ -0,0 +1,192 @@
+import itertools
+import time
+import unittest
+
+import dpdata
+import numpy as np
+from context import (
+    dpgen2,
+    run_benchmark,
+    run_benchmark_reason,
+)
+
+from dpgen2.exploration.selector import (
+    ConfDiversity,
+)
+from dpgen2.exploration.selector.conf_diversity import (
+    farthest_point_sampling,
+    structure_fingerprint,
+)
+
+
+def random_rotation(rng):
+    qq, rr = np.linalg.qr(rng.normal(size=(3, 3)))
+    return qq * np.sign(np.diag(rr))
+
+
+def make_system(coords, cell, atom_types, type_map):
+    nframes = coords.shape[0]
+    return dpdata.System(
+        data={
+            "atom_names": list(type_map),
+            "atom_numbs": [
+                int(np.sum(atom_types == ii)) for ii in range(len(type_map))
+            ],
+            "atom_types": atom_types,
+            "orig": np.zeros(3),
+            "cells": np.tile(cell, (nframes, 1, 1)),
+            "coords": coords,
+        }
+    )
+
+
+class TestStructureFingerprint(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rng = rng
+        self.cell = np.array([[8.0, 0.0, 0.0], [1.0, 7.5, 0.0], [0.5, -0.8, 9.0]])
+        self.natoms = 12
+        self.coords = rng.uniform(0.0, 1.0, size=(4, self.natoms, 3)) @ self.cell
+        self.atom_types = np.arange(self.natoms) % 3
+
+    def _fp(self, coords, cell, atom_types, nopbc=False):
+        cells = np.tile(cell, (coords.shape[0], 1, 1))
+        return structure_fingerprint(coords, cells, atom_types, 3, nopbc, 3.5, 20)
+
+    def test_shape(self):
+        fps = self._fp(self.coords, self.cell, self.atom_types)
+        self.assertEqual(fps.shape, (4, 6 * 20))
+        # number of pairs within the cutoff, in the minimum image
+        diff = self.coords[0][None, :] - self.coords[0][:, None]
+        frac = diff @ np.linalg.inv(self.cell)
+        frac -= np.round(frac)
+        dist = np.linalg.norm(frac @ self.cell, axis=-1)
+        npairs = np.sum(np.triu(dist < 3.5, k=1))
+        self.assertAlmostEqual(fps[0].sum() * self.natoms, npairs)
+
+    def test_invariance(self):
+        ref = self._fp(self.coords, self.cell, self.atom_types)
+        # rotation
+        rot = random_rotation(self.rng)
+        fps = self._fp(self.coords @ rot, self.cell @ rot, self.atom_types)
+        np.testing.assert_allclose(fps, ref, atol=1e-12)
+        # permutation
+        perm = self.rng.permutation(self.natoms)
+        fps = self._fp(self.coords[:, perm], self.cell, self.atom_types[perm])
+        np.testing.assert_allclose(fps, ref, atol=1e-12)
+        # translation and the periodic images
+        shift = np.array([1.3, -2.1, 0.4]) + self.cell[0] * 2
+        fps = self._fp(self.coords + shift, self.cell, self.atom_types)
+        np.testing.assert_allclose(fps, ref, atol=1e-12)
+        # changing the types changes the fingerprint
+        fps = self._fp(self.coords, self.cell, self.atom_types[::-1].copy())
+        self.assertFalse(np.allclose(fps, ref))
+
+    def test_images(self):
+        # the cutoff is larger than half of the cell, the pairs of all the
+        # periodic images are counted
+        cell = np.eye(3) * 4.0
+        coords = self.coords[:, :6] / 2.0
+        atom_types = self.atom_types[:6]
+        fps = self._fp(coords, cell, atom_types)
+        images = np.array(list(itertools.product(range(-1, 2), repeat=3))) @ cell
+        for ff in range(coords.shape[0]):
+            diff = coords[ff][None, :, None] + images - coords[ff][:, None, None]
+            dist = np.linalg.norm(diff, axis=-1)
+            # the atom itself excluded, each pair counted once
+            dist[np.arange(6), np.arange(6), 13] = np.inf
+            npairs = np.sum(dist < 3.5) / 2
+            self.assertAlmostEqual(fps[ff].sum() * 6, npairs)
+
+    def test_nopbc(self):
+        ref = self._fp(self.coords, self.cell, self.atom_types, nopbc=True)
+        rot = random_rotation(self.rng)
+        fps = self._fp(self.coords @ rot, self.cell, self.atom_types, nopbc=True)
+        np.testing.assert_allclose(fps, ref, atol=1e-12)
+
+
+class TestFarthestPointSampling(unittest.TestCase):
+    def test_sampling(self):
+        fps = np.array([[0.0], [0.1], [1.0], [0.55], [0.9], [0.5]])
+        # the farthest from the centroid 0.508 is 0.0
+        picked = farthest_point_sampling(fps, 3)
+        np.testing.assert_array_equal(picked, [0, 2, 5])
+        np.testing.assert_array_equal(farthest_point_sampling(fps, 0), [])
+        self.assertEqual(farthest_point_sampling(fps, 100).size, 6)
+
+    def test_duplicates(self):
+        fps = np.array([[0.0, 1.0], [2.0, 0.0], [0.0, 1.0], [2.0, 0.0]])
+        picked = farthest_point_sampling(fps, 4)
+        self.assertEqual(sorted(fps[picked].tolist()), [[0.0, 1.0], [2.0, 0.0]])
+        self.assertEqual(farthest_point_sampling(fps).size, 2)
+
+
+class TestConfDiversity(unittest.TestCase):
+    def test_select(self):
+        rng = np.random.default_rng(1)
+        cell = np.eye(3) * 6.0
+        type_map = ["O", "H"]
+        # the frames are small displacements of two structures
+        base = rng.uniform(0.0, 6.0, size=(2, 8, 3))
+        coords = np.concatenate(
+            [
+                base[0] + rng.normal(scale=0.01, size=(10, 8, 3)),
+                base[1] + rng.normal(scale=0.01, size=(10, 8, 3)),
+            ]
+        )
+        atom_types = np.array([0, 0, 1, 1, 1, 1, 1, 1])
+        ms = dpdata.MultiSystems(type_map=type_map)
+        ms.append(make_system(coords[:5], cell, atom_types, type_map))
+        ms.append(make_system(coords[5:], cell, atom_types[::-1].copy(), type_map))
+        self.assertEqual(len(ms), 1)
+        # another formula
+        ms.append(make_system(coords[:3, :6], cell, atom_types[:6], type_map))
+        self.assertEqual(len(ms), 2)
+        ret = ConfDiversity(rcut=3.0, nbins=10).select(ms, 3)
+        self.assertEqual(ret.get_nframes(), 3)
+        self.assertEqual(ret.atom_names, type_map)
+        # the frames are picked from different structures
+        fps = []
+        for ss in ret.systems.values():
+            fps.append(
+                structure_fingerprint(
+                    ss["coords"], ss["cells"], ss["atom_types"], 2, False, 3.0, 10
+                )
+            )
+        fps = np.concatenate(fps)
+        for ii in range(3):
+            for jj in range(ii + 1, 3):
+                self.assertGreater(np.linalg.norm(fps[ii] - fps[jj]), 0.1)
+        # the frames with the same fingerprints are picked only once
+        self.assertLess(ConfDiversity(rcut=3.0, nbins=10).select(ms).get_nframes(), 23)
+        # no more frames than the input
+        ret = ConfDiversity(rcut=3.0, nbins=3000).select(ms, 100)
+        self.assertEqual(ret.get_nframes(), 23)
+
+    def test_pool_size(self):
+        self.assertEqual(ConfDiversity().get_pool_size(5), 50)
+        self.assertEqual(ConfDiversity(pool_multiple=4).get_pool_size(5), 20)
+        self.assertEqual(ConfDiversity(pool_size=7).get_pool_size(5), 7)
+        self.assertIsNone(ConfDiversity().get_pool_size())
+
+
+@unittest.skipIf(not run_benchmark, run_benchmark_reason)
+class BenchmarkConfDiversity(unittest.TestCase):
+    def test_benchmark(self):
+        rng = np.random.default_rng(0)
+        nframes = 100000
+        natoms = 32
+        cell = np.eye(3) * 10.0
+        coords = rng.uniform(0.0, 10.0, size=(nframes, natoms, 3))
+        cells = np.tile(cell, (nframes, 1, 1))
+        atom_types = np.arange(natoms) % 2
+        tic = time.perf_counter()
+        fps = structure_fingerprint(coords, cells, atom_types, 2, False, 5.0, 30)
+        toc = time.perf_counter()
+        picked = farthest_point_sampling(fps, 500)
+        tac = time.perf_counter()
+        self.assertEqual(picked.size, 500)
+        print(
+            f"fingerprint: {toc - tic:8.3f} s, farthest point sampling: {tac - toc:8.3f} s "
+            f"for {nframes} frames of {natoms} atoms"
+        )
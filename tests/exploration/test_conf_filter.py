@@ -11,6 +11,7 @@ from mock import (
 )
 
 from dpgen2.exploration.selector import (
+    BatchedConfFilter,
     ConfFilter,
     ConfFilters,
 )
@@ -31,6 +32,28 @@ class FooFilter(ConfFilter):
         return True
 
 
+class BarFilter(BatchedConfFilter):
+    def batched_check(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: np.ndarray,
+        nopbc: bool,
+    ) -> np.ndarray:
+        return coords[:, 0, 0] < 2.5
+
+
+class BazFilter(ConfFilter):
+    def check(
+        self,
+        coords: np.array,
+        cell: np.array,
+        atom_types: np.array,
+        nopbc: bool,
+    ) -> bool:
+        return coords[0][0] > 0.7
+
+
 class faked_filter:
     myiter = -1
     myret = [True]
@@ -135,3 +158,46 @@ class TestConfFilter(unittest.TestCase):
         filters.add(FooFilter()).add(FooFilter()).add(FooFilter())
         sel_sys = filters.check(faked_sys)
         self.assertEqual(sel_sys.get_nframes(), 0)
+
+    def test_batched_filter(self):
+        faked_sys = fake_system(4, 3)
+        faked_sys["coords"][0][0][0] = 0.5
+        faked_sys["coords"][1][0][0] = 1.0
+        faked_sys["coords"][2][0][0] = 2.0
+        faked_sys["coords"][3][0][0] = 3.0
+        bar = BarFilter()
+        np.testing.assert_array_equal(
+            bar.batched_check(
+                faked_sys["coords"], faked_sys["cells"], faked_sys["atom_types"], False
+            ),
+            [True, True, True, False],
+        )
+        self.assertTrue(
+            bar.check(
+                faked_sys["coords"][0],
+                faked_sys["cells"][0],
+                faked_sys["atom_types"],
+                False,
+            )
+        )
+        self.assertFalse(
+            bar.check(
+                faked_sys["coords"][3],
+                faked_sys["cells"][3],
+                faked_sys["atom_types"],
+                False,
+            )
+        )
+        # the per-frame filter through the batched interface
+        np.testing.assert_array_equal(
+            BazFilter().batched_check(
+                faked_sys["coords"], faked_sys["cells"], faked_sys["atom_types"], False
+            ),
+            [False, True, True, True],
+        )
+        filters = ConfFilters()
+        filters.add(BarFilter()).add(BazFilter())
+        sel_sys = filters.check(faked_sys)
+        self.assertEqual(sel_sys.get_nframes(), 2)
+        self.assertAlmostEqual(sel_sys["coords"][0][0][0], 1)
+        self.assertAlmostEqual(sel_sys["coords"][1][0][0], 2)
@@ -1,3 +1,4 @@
+import copy
 import os
 import shutil
 import textwrap
@@ -16,11 +17,24 @@ from dpgen2.exploration.render import (
     TrajRenderLammps,
 )
 from dpgen2.exploration.report import (
+    ExplorationReportAdaptiveLower,
+    ExplorationReportTrustLevelsMax,
     ExplorationReportTrustLevelsRandom,
 )
 from dpgen2.exploration.selector import (
+    BatchedConfFilter,
+    ConfDiversity,
+    ConfFilters,
     ConfSelectorFrames,
 )
+from dpgen2.op.run_lmp import (
+    prune_lmp_traj,
+)
+
+
+class MaxYFilter(BatchedConfFilter):
+    def batched_check(self, coords, cells, atom_types, nopbc):
+        return np.max(coords[:, :, 1], axis=1) < 5.0
 
 
 class TestConfSelectorFrames(unittest.TestCase):
@@ -116,6 +130,38 @@ class TestConfSelectorFrames(unittest.TestCase):
         self.assertAlmostEqual(report.candidate_ratio(), 1.0)
         self.assertAlmostEqual(report.accurate_ratio(), 0.0)
         self.assertAlmostEqual(report.failed_ratio(), 0.0)
+        # the per-frame data are dropped from the returned report
+        self.assertIsNone(report.model_devi)
+        self.assertEqual(report.traj_cand, [])
+        self.assertEqual(report.get_candidate_ids(), [[0, 1, 2], [0, 1, 2]])
+        self.assertFalse(report.no_candidate())
+
+    def test_f_0_diversity(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9)
+        traj_render = TrajRenderLammps()
+        conf_selector = ConfSelectorFrames(
+            traj_render,
+            report,
+            max_numb_sel=4,
+            conf_diversity=ConfDiversity(rcut=3.0),
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        # the frames are translations of each other, so only one is kept
+        self.assertEqual(ms.get_nframes(), 1)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0)
+        # the report keeps the id of the picked frame
+        self.assertEqual(sum([len(ii) for ii in report.get_candidate_ids()]), 1)
+        with self.assertRaises(RuntimeError):
+            ConfSelectorFrames(
+                traj_render,
+                report,
+                chunk_size=1,
+                conf_diversity=ConfDiversity(),
+            )
 
     def test_f_1(self):
         report = ExplorationReportTrustLevelsRandom(0.25, 0.35, conv_accuracy=0.9)
@@ -189,3 +235,259 @@ class TestConfSelectorFrames(unittest.TestCase):
         self.assertAlmostEqual(report.candidate_ratio(), 1.0 / 3.0)
         self.assertAlmostEqual(report.accurate_ratio(), 0.0 / 3.0)
         self.assertAlmostEqual(report.failed_ratio(), 2.0 / 3.0)
+
+    def test_f_1_parallel(self):
+        report = ExplorationReportTrustLevelsRandom(0.25, 0.35, conv_accuracy=0.9)
+        traj_render = TrajRenderLammps(max_workers=2)
+        conf_selector = ConfSelectorFrames(traj_render, report)
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        self.assertEqual(len(ms), 1)
+        ss = ms[0]
+        self.assertEqual(ss.get_nframes(), 2)
+        self.assertAlmostEqual(ss["coords"][0][0][1], 3.87, places=2)
+        self.assertAlmostEqual(ss["coords"][1][0][1], 3.87, places=2)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0 / 3.0)
+        self.assertAlmostEqual(report.accurate_ratio(), 1.0 / 3.0)
+        self.assertAlmostEqual(report.failed_ratio(), 1.0 / 3.0)
+
+    def test_f_0_filter(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9)
+        traj_render = TrajRenderLammps()
+        conf_selector = ConfSelectorFrames(
+            traj_render,
+            report,
+            conf_filters=ConfFilters().add(MaxYFilter()),
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        self.assertEqual(len(ms), 1)
+        ss = ms[0]
+        # the frames with y = 5.32 are dropped
+        self.assertEqual(ss.get_nframes(), 4)
+        self.assertAlmostEqual(ss["coords"][0][0][1], 2.87, places=2)
+        self.assertAlmostEqual(ss["coords"][1][0][1], 3.87, places=2)
+        self.assertAlmostEqual(ss["coords"][2][0][1], 2.87, places=2)
+        self.assertAlmostEqual(ss["coords"][3][0][1], 3.87, places=2)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0)
+        # the report keeps the ids of the frames that pass the filters
+        self.assertEqual(report.get_candidate_ids(), [[0, 1], [0, 1]])
+
+    def test_f_0_novelty(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9)
+        conf_selector = ConfSelectorFrames(TrajRenderLammps(), report)
+
+        def conf_novelty(ss):
+            # the frames with y = 3.87 are labeled
+            return np.abs(ss["coords"][:, 0, 1] - 3.87) > 0.01
+
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map, conf_novelty=conf_novelty
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        self.assertEqual(ms.get_nframes(), 4)
+        self.assertEqual(report.get_candidate_ids(), [[0, 2], [0, 2]])
+        # the streaming mode
+        conf_selector = ConfSelectorFrames(
+            TrajRenderLammps(),
+            report,
+            chunk_size=1,
+            conf_filters=ConfFilters().add(MaxYFilter()),
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map, conf_novelty=conf_novelty
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        for cc in confs:
+            ms.from_deepmd_npy(cc, labeled=False)
+        self.assertEqual(ms.get_nframes(), 2)
+        self.assertEqual(report.get_candidate_ids(), [[0], [0]])
+
+    def test_f_0_novelty_pool(self):
+        def conf_novelty(ss):
+            # the frames of the largest model deviation are labeled
+            return np.abs(ss["coords"][:, 0, 1] - 4.87) > 0.01
+
+        for chunk_size in [None, 1]:
+            for novelty_pool_multiple, ref in [(None, []), (2, [[1], [1]])]:
+                report = ExplorationReportTrustLevelsMax(0.1, 0.5, conv_accuracy=0.9)
+                conf_selector = ConfSelectorFrames(
+                    TrajRenderLammps(),
+                    report,
+                    max_numb_sel=2,
+                    chunk_size=chunk_size,
+                    novelty_pool_multiple=novelty_pool_multiple,
+                )
+                confs, report = conf_selector.select(
+                    self.trajs,
+                    self.model_devis,
+                    self.type_map,
+                    conf_novelty=conf_novelty,
+                )
+                ms = dpdata.MultiSystems(type_map=self.type_map)
+                for cc in confs:
+                    ms.from_deepmd_npy(cc, labeled=False)
+                self.assertEqual(ms.get_nframes(), len(ref))
+                self.assertEqual(
+                    [ii for ii in report.get_candidate_ids() if len(ii) > 0], ref
+                )
+                shutil.rmtree("confs")
+        # at most max_numb_sel of the novel candidates are selected
+        report = ExplorationReportTrustLevelsMax(0.1, 0.5, conv_accuracy=0.9)
+        conf_selector = ConfSelectorFrames(
+            TrajRenderLammps(), report, max_numb_sel=1, novelty_pool_multiple=4
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map, conf_novelty=conf_novelty
+        )
+        self.assertEqual(sum(len(ii) for ii in report.get_candidate_ids()), 1)
+        self.assertEqual(
+            report.get_candidate_ids()[0] + report.get_candidate_ids()[1], [1]
+        )
+
+    def test_f_1_pruned(self):
+        for traj, md in zip(self.trajs, self.model_devis):
+            summary = prune_lmp_traj(traj, md, level_f_lo=0.25, level_f_hi=0.35)
+            self.assertEqual(summary["candidate"], 1)
+            self.assertEqual(summary["kept"], 2)
+        report = ExplorationReportTrustLevelsRandom(0.25, 0.35, conv_accuracy=0.9)
+        traj_render = TrajRenderLammps()
+        conf_selector = ConfSelectorFrames(traj_render, report)
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        self.assertEqual(len(ms), 1)
+        ss = ms[0]
+        self.assertEqual(ss.get_nframes(), 2)
+        self.assertAlmostEqual(ss["coords"][0][0][1], 3.87, places=2)
+        self.assertAlmostEqual(ss["coords"][1][0][1], 3.87, places=2)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0 / 3.0)
+        self.assertAlmostEqual(report.accurate_ratio(), 1.0 / 3.0)
+        self.assertAlmostEqual(report.failed_ratio(), 1.0 / 3.0)
+
+    def test_sharded(self):
+        self.model_devis[1].write_text(
+            textwrap.dedent(
+                """ #
+                0 0.1 0.0 0.0 0.45 0.0 0.0
+                0 0.2 0.0 0.0 0.35 0.0 0.0
+                0 0.3 0.0 0.0 0.25 0.0 0.0
+                """
+            )
+        )
+        reports = [
+            ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9, seed=1),
+            ExplorationReportTrustLevelsMax(0.25, 0.45, conv_accuracy=0.9),
+            ExplorationReportAdaptiveLower(numb_candi_f=3, rate_candi_f=0.0, seed=1),
+        ]
+        for report in reports:
+            conf_selector = ConfSelectorFrames(
+                TrajRenderLammps(),
+                report,
+                max_numb_sel=2,
+            )
+            confs, ref_report = copy.deepcopy(conf_selector).select(
+                self.trajs, self.model_devis, self.type_map
+            )
+            shutil.rmtree("confs")
+            # the candidates are picked as in the streaming mode
+            confs, stream_report = ConfSelectorFrames(
+                TrajRenderLammps(),
+                copy.deepcopy(report),
+                max_numb_sel=2,
+                chunk_size=1,
+            ).select(self.trajs, self.model_devis, self.type_map)
+            ref_ms = dpdata.MultiSystems(type_map=self.type_map)
+            for cc in confs:
+                ref_ms.from_deepmd_npy(cc, labeled=False)
+            shutil.rmtree("confs")
+            # one partial report for each trajectory
+            partial = [
+                copy.deepcopy(conf_selector).record([ii]) for ii in self.model_devis
+            ]
+            confs, report = copy.deepcopy(conf_selector).select_from_reports(
+                self.trajs, partial, self.type_map
+            )
+            ms = dpdata.MultiSystems(type_map=self.type_map)
+            ms.from_deepmd_npy(confs[0], labeled=False)
+            self.assertEqual(ms.get_nframes(), 2)
+            np.testing.assert_allclose(ms[0]["coords"], ref_ms[0]["coords"])
+            self.assertEqual(
+                report.get_candidate_ids(), stream_report.get_candidate_ids()
+            )
+            self.assertEqual(report.get_candidate_ids(), ref_report.get_candidate_ids())
+            # the partial reports keep no per-frame data
+            for rr in partial:
+                self.assertIsNone(rr.model_devi)
+            self.assertAlmostEqual(
+                report.candidate_ratio(), ref_report.candidate_ratio()
+            )
+            self.assertAlmostEqual(report.accurate_ratio(), ref_report.accurate_ratio())
+            self.assertAlmostEqual(report.failed_ratio(), ref_report.failed_ratio())
+            shutil.rmtree("confs")
+
+    def test_sharded_streaming(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9)
+        conf_selector = ConfSelectorFrames(
+            TrajRenderLammps(),
+            report,
+            chunk_size=1,
+        )
+        partial = [conf_selector.record(self.model_devis)]
+        with self.assertRaises(RuntimeError):
+            conf_selector.select_from_reports(self.trajs, partial, self.type_map)
+
+    def test_f_0_streaming(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.5, conv_accuracy=0.9)
+        traj_render = TrajRenderLammps()
+        conf_selector = ConfSelectorFrames(
+            traj_render,
+            report,
+            max_numb_sel=4,
+            chunk_size=1,
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        self.assertEqual(len(confs), 2)
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        for cc in confs:
+            ms.from_deepmd_npy(cc, labeled=False)
+        self.assertEqual(ms.get_nframes(), 4)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0)
+        self.assertAlmostEqual(report.accurate_ratio(), 0.0)
+        self.assertAlmostEqual(report.failed_ratio(), 0.0)
+
+    def test_fv_1_streaming(self):
+        report = ExplorationReportTrustLevelsRandom(
+            0.25, 0.35, 0.05, 0.15, conv_accuracy=0.9
+        )
+        traj_render = TrajRenderLammps()
+        conf_selector = ConfSelectorFrames(
+            traj_render,
+            report,
+            max_numb_sel=1,
+            chunk_size=1,
+        )
+        confs, report = conf_selector.select(
+            self.trajs, self.model_devis, self.type_map
+        )
+        self.assertEqual(len(confs), 1)
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(confs[0], labeled=False)
+        self.assertEqual(len(ms), 1)
+        ss = ms[0]
+        self.assertEqual(ss.get_nframes(), 1)
+        self.assertAlmostEqual(ss["coords"][0][0][1], 2.87, places=2)
+        self.assertAlmostEqual(report.candidate_ratio(), 1.0 / 3.0)
+        self.assertAlmostEqual(report.accurate_ratio(), 0.0 / 3.0)
+        self.assertAlmostEqual(report.failed_ratio(), 2.0 / 3.0)
@@ -11,7 +11,10 @@ from context import (
 
 from dpgen2.exploration.deviation import (
     DeviManager,
+    DeviManagerColumnar,
     DeviManagerStd,
+    calc_model_devi_f,
+    calc_model_devi_v,
 )
 
 
@@ -34,6 +37,25 @@ class TestDeviManagerStd(unittest.TestCase):
         self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_F), [])
         self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_V), [])
 
+    def test_extend(self):
+        model_devi = DeviManagerStd()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([1, 2, 3]))
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([1, 2, 3]))
+        other = DeviManagerColumnar()
+        other.add(DeviManager.MAX_DEVI_F, np.array([4, 5]))
+        other.add(DeviManager.MAX_DEVI_V, np.array([6, 7]))
+        model_devi.extend(other)
+        model_devi.extend(DeviManagerStd())
+
+        self.assertEqual(model_devi.ntraj, 2)
+        np.testing.assert_array_equal(
+            model_devi.get_concat(DeviManager.MAX_DEVI_F), [1, 2, 3, 4, 5]
+        )
+        np.testing.assert_array_equal(
+            model_devi.get_concat(DeviManager.MAX_DEVI_V), [1, 2, 3, 6, 7]
+        )
+        self.assertEqual(model_devi.get(DeviManager.AVG_DEVI_F), [None, None])
+
     def test_add_invalid_name(self):
         model_devi = DeviManagerStd()
 
@@ -106,3 +128,132 @@ class TestDeviManagerStd(unittest.TestCase):
             model_devi.get,
             DeviManager.MAX_DEVI_V,
         )
+
+
+class TestDeviManagerColumnar(unittest.TestCase):
+    def test_success(self):
+        model_devi = DeviManagerColumnar()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([1, 2, 3]))
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([4, 5]))
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([6, 7, 8, 9]))
+
+        self.assertEqual(model_devi.ntraj, 3)
+        md_f = model_devi.get(DeviManager.MAX_DEVI_F)
+        self.assertEqual(len(md_f), 3)
+        np.testing.assert_array_equal(md_f[0], [1, 2, 3])
+        np.testing.assert_array_equal(md_f[1], [4, 5])
+        np.testing.assert_array_equal(md_f[2], [6, 7, 8, 9])
+        self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_V), [None, None, None])
+        np.testing.assert_array_equal(
+            model_devi.get_concat(DeviManager.MAX_DEVI_F), np.arange(1, 10)
+        )
+        self.assertTrue(model_devi.get_concat(DeviManager.MAX_DEVI_V) is None)
+        np.testing.assert_array_equal(model_devi.get_traj_offsets(), [0, 3, 5, 9])
+        # the per-trajectory arrays are views of the concatenated array
+        self.assertTrue(
+            np.shares_memory(md_f[1], model_devi.get_concat(DeviManager.MAX_DEVI_F))
+        )
+
+        model_devi.clear()
+        self.assertEqual(model_devi.ntraj, 0)
+        self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_F), [])
+        self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_V), [])
+        self.assertEqual(model_devi.get_concat(DeviManager.MAX_DEVI_F).shape, (0,))
+        np.testing.assert_array_equal(model_devi.get_traj_offsets(), [0])
+
+    def test_consistent_with_std(self):
+        std = DeviManagerStd()
+        col = DeviManagerColumnar()
+        for nn in [5, 0, 7, 1]:
+            for name in [DeviManager.MAX_DEVI_F, DeviManager.MAX_DEVI_V]:
+                dd = np.random.random(nn)
+                std.add(name, dd)
+                col.add(name, dd)
+        col.shrink()
+        self.assertEqual(std.ntraj, col.ntraj)
+        for name in [DeviManager.MAX_DEVI_F, DeviManager.MAX_DEVI_V]:
+            for ii, jj in zip(std.get(name), col.get(name)):
+                np.testing.assert_array_equal(ii, jj)
+            np.testing.assert_array_equal(std.get_concat(name), col.get_concat(name))
+        np.testing.assert_array_equal(std.get_traj_offsets(), col.get_traj_offsets())
+
+    def test_float32(self):
+        model_devi = DeviManagerColumnar(use_float32=True)
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([0.1, 0.2]))
+        self.assertEqual(
+            model_devi.get_concat(DeviManager.MAX_DEVI_F).dtype, np.float32
+        )
+        model_devi.clear()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([0.1, 0.2]))
+        self.assertEqual(model_devi.get(DeviManager.MAX_DEVI_F)[0].dtype, np.float32)
+
+    def test_add_invalid_deviation(self):
+        model_devi = DeviManagerColumnar()
+
+        self.assertRaisesRegex(
+            AssertionError,
+            "Error: deviation\\(shape: ",
+            model_devi.add,
+            DeviManager.MAX_DEVI_F,
+            np.array([[1], [2], [3]]),
+        )
+
+    def test_check_data(self):
+        model_devi = DeviManagerColumnar()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([1, 2, 3]))
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([4, 5, 6]))
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([4, 5, 6]))
+        self.assertRaisesRegex(
+            AssertionError,
+            "Error: the number of model deviation",
+            model_devi.get,
+            DeviManager.MAX_DEVI_V,
+        )
+
+        model_devi = DeviManagerColumnar()
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([1, 2, 3]))
+        self.assertRaisesRegex(
+            AssertionError,
+            f"Error: cannot find model deviation {DeviManager.MAX_DEVI_F}",
+            model_devi.get,
+            DeviManager.MAX_DEVI_V,
+        )
+
+        model_devi = DeviManagerColumnar()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([1, 2, 3]))
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([4, 5, 6]))
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([1, 2, 3]))
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([4, 5]))
+        self.assertRaisesRegex(
+            AssertionError,
+            f"Error: the number of frames in",
+            model_devi.get_concat,
+            DeviManager.MAX_DEVI_F,
+        )
+
+
+class TestCalcModelDevi(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.forces = rng.normal(size=(4, 3, 5, 3))
+        self.virials = rng.normal(size=(4, 3, 9))
+
+    def test_force(self):
+        max_devi, min_devi, avg_devi = calc_model_devi_f(self.forces)
+        for ff in range(3):
+            devi = []
+            for ii in range(5):
+                fs = self.forces[:, ff, ii, :]
+                mean = fs.mean(axis=0)
+                devi.append(np.sqrt(np.mean(np.sum((fs - mean) ** 2, axis=1))))
+            self.assertAlmostEqual(max_devi[ff], max(devi))
+            self.assertAlmostEqual(min_devi[ff], min(devi))
+            self.assertAlmostEqual(avg_devi[ff], np.mean(devi))
+
+    def test_virial(self):
+        max_devi, min_devi, avg_devi = calc_model_devi_v(self.virials)
+        for ff in range(3):
+            devi = [np.std(self.virials[:, ff, ii]) for ii in range(9)]
+            self.assertAlmostEqual(max_devi[ff], max(devi))
+            self.assertAlmostEqual(min_devi[ff], min(devi))
+            self.assertAlmostEqual(avg_devi[ff], np.linalg.norm(devi) / 3)
@@ -0,0 +1,143 @@
+import itertools
+import time
+import unittest
+
+import numpy as np
+from context import (
+    dpgen2,
+    run_benchmark,
+    run_benchmark_reason,
+)
+
+from dpgen2.exploration.selector import (
+    DistanceConfFilter,
+)
+
+
+def brute_force_check(coords, cell, atom_types, cutoffs, nopbc, nimage=2):
+    natoms = coords.shape[0]
+    if nopbc:
+        shifts = np.zeros((1, 3))
+    else:
+        shifts = np.array(
+            list(itertools.product(range(-nimage, nimage + 1), repeat=3))
+        ) @ np.asarray(cell)
+    cut = cutoffs[atom_types][:, atom_types]
+    for ss in shifts:
+        dd = np.linalg.norm(coords[None, :, :] + ss - coords[:, None, :], axis=-1)
+        if not ss.any():
+            dd[np.arange(natoms), np.arange(natoms)] = np.inf
+        if np.any(dd < cut):
+            return False
+    return True
+
+
+def random_frames(nframes, natoms, cell, seed=0):
+    rng = np.random.default_rng(seed)
+    frac = rng.uniform(-0.2, 1.2, size=(nframes, natoms, 3))
+    return frac @ cell
+
+
+class TestDistanceConfFilter(unittest.TestCase):
+    def setUp(self):
+        self.cell = np.array([[6.0, 0.0, 0.0], [1.5, 5.0, 0.0], [-1.2, 0.8, 4.5]])
+        self.natoms = 10
+        self.nframes = 40
+        self.atom_types = np.arange(self.natoms) % 2
+
+    def _check_consistent(self, ff, cutoffs, coords, cells, nopbc):
+        valid = ff.batched_check(coords, cells, self.atom_types, nopbc)
+        ref = [
+            brute_force_check(coords[ii], cells[ii], self.atom_types, cutoffs, nopbc)
+            for ii in range(coords.shape[0])
+        ]
+        np.testing.assert_array_equal(valid, ref)
+        # not a trivial test
+        self.assertTrue(0 < np.sum(valid) < coords.shape[0])
+
+    def test_triclinic(self):
+        coords = random_frames(self.nframes, self.natoms, self.cell)
+        cells = np.tile(self.cell, (self.nframes, 1, 1))
+        ff = DistanceConfFilter(0.8)
+        self._check_consistent(ff, np.full((2, 2), 0.8), coords, cells, False)
+
+    def test_type_pairs(self):
+        coords = random_frames(self.nframes, self.natoms, self.cell, seed=1)
+        cells = np.tile(self.cell, (self.nframes, 1, 1))
+        ff = DistanceConfFilter(
+            0.5, {("O", "H"): 1.0, ("H", "H"): 0.7}, type_map=["O", "H"]
+        )
+        cutoffs = np.array([[0.5, 1.0], [1.0, 0.7]])
+        self._check_consistent(ff, cutoffs, coords, cells, False)
+        ff = DistanceConfFilter(0.5, {(0, 1): 1.0, (1, 1): 0.7})
+        self._check_consistent(ff, cutoffs, coords, cells, False)
+        with self.assertRaises(RuntimeError):
+            DistanceConfFilter(0.5, {("O", "H"): 1.0})
+
+    def test_thin_cell(self):
+        # the cutoff is larger than the cell heights, the atoms
+        # interact with their own images
+        cell = np.array([[1.6, 0.0, 0.0], [0.5, 1.4, 0.0], [0.3, 0.2, 8.0]])
+        coords = random_frames(self.nframes, 4, cell, seed=2)
+        cells = np.tile(cell, (self.nframes, 1, 1))
+        atom_types = np.array([0, 1, 0, 1])
+        cutoffs = np.array([[1.45, 0.3], [0.3, 0.3]])
+        ff = DistanceConfFilter(0.3, {(0, 0): 1.45})
+        valid = ff.batched_check(coords, cells, atom_types, False)
+        ref = [
+            brute_force_check(coords[ii], cell, atom_types, cutoffs, False, nimage=3)
+            for ii in range(self.nframes)
+        ]
+        np.testing.assert_array_equal(valid, ref)
+        self.assertTrue(0 < np.sum(valid) < self.nframes)
+
+    def test_varying_cells(self):
+        rng = np.random.default_rng(3)
+        cells = self.cell * rng.uniform(0.9, 1.1, size=(self.nframes, 1, 1))
+        coords = np.stack(
+            [
+                random_frames(1, self.natoms, cc, seed=ii)[0]
+                for ii, cc in enumerate(cells)
+            ]
+        )
+        ff = DistanceConfFilter(0.8)
+        self._check_consistent(ff, np.full((2, 2), 0.8), coords, cells, False)
+
+    def test_nopbc(self):
+        coords = random_frames(self.nframes, self.natoms, self.cell, seed=4)
+        cells = np.zeros((self.nframes, 3, 3))
+        ff = DistanceConfFilter(0.7)
+        self._check_consistent(ff, np.full((2, 2), 0.7), coords, cells, True)
+
+    def test_check(self):
+        coords = random_frames(self.nframes, self.natoms, self.cell)
+        cells = np.tile(self.cell, (self.nframes, 1, 1))
+        ff = DistanceConfFilter(0.8)
+        valid = ff.batched_check(coords, cells, self.atom_types, False)
+        for ii in range(self.nframes):
+            self.assertEqual(
+                ff.check(coords[ii], cells[ii], self.atom_types, False), valid[ii]
+            )
+
+
+@unittest.skipIf(not run_benchmark, run_benchmark_reason)
+class BenchmarkDistanceConfFilter(unittest.TestCase):
+    def test_benchmark(self):
+        # 10^4 atoms at the density of water
+        natoms = 10000
+        nframes = 10
+        length = (natoms / 0.1) ** (1.0 / 3.0)
+        cell = np.array(
+            [[length, 0.0, 0.0], [0.1 * length, length, 0.0], [0.0, 0.0, length]]
+        )
+        rng = np.random.default_rng(0)
+        coords = rng.uniform(0.0, 1.0, size=(nframes, natoms, 3)) @ cell
+        cells = np.tile(cell, (nframes, 1, 1))
+        atom_types = np.arange(natoms) % 2
+        # small enough cutoff so all pairs are checked
+        ff = DistanceConfFilter(1e-3)
+        tic = time.perf_counter()
+        valid = ff.batched_check(coords, cells, atom_types, False)
+        toc = time.perf_counter()
+        self.assertTrue(valid.all())
+        print(f"cell list: {(toc - tic) / nframes:8.3f} s per frame of {natoms} atoms")
@@ -1,4 +1,6 @@
 import os
+import pickle
+import random
 import textwrap
 import unittest
 from pathlib import (
@@ -29,6 +31,9 @@ from dpgen2.constants import (
 )
 from dpgen2.exploration.task import (
     ExplorationStage,
+    ExplorationTask,
+    ExplorationTaskGroup,
+    ExplorationTaskProduct,
     NPTTaskGroup,
 )
 
@@ -103,6 +108,53 @@ run             ${NSTEPS} upto
 )
 
 
+class TestExplorationTaskGroup(unittest.TestCase):
+    def test_add_group(self):
+        grp0 = ExplorationTaskGroup()
+        grp0.add_task(ExplorationTask().add_file("conf", "foo").add_file("in", "x"))
+        grp0.add_task(ExplorationTask().add_file("conf", "bar").add_file("in", "x"))
+        grp1 = ExplorationTaskGroup()
+        grp1.add_task(ExplorationTask().add_file("conf", "foo").add_file("in", "y"))
+        grp = grp0 + grp1
+        self.assertEqual(len(grp), 3)
+        self.assertEqual(len(grp._blobs), 4)
+        self.assertEqual(grp[1].files(), {"conf": "bar", "in": "x"})
+        self.assertEqual(grp[2].files(), {"conf": "foo", "in": "y"})
+        self.assertEqual(grp[-1].files(), grp1[0].files())
+
+    def test_lazy(self):
+        prod = ExplorationTaskProduct(
+            "conf", ["foo", "bar"], [{"in": "x"}, {"in": "y"}, {"in": "z"}]
+        )
+        self.assertEqual(len(prod), 6)
+        self.assertEqual(prod[4].files(), {"conf": "bar", "in": "y"})
+        self.assertEqual(prod[-1].files(), {"conf": "bar", "in": "z"})
+        with self.assertRaises(IndexError):
+            prod[6]
+        grp0 = ExplorationTaskGroup()
+        grp0.add_task(ExplorationTask().add_file("conf", "baz").add_file("in", "x"))
+        grp1 = ExplorationTaskGroup().add_lazy_tasks(prod)
+        grp = ExplorationTaskGroup()
+        grp += grp0
+        grp += grp1
+        grp.add_task(ExplorationTask().add_file("conf", "foo").add_file("in", "w"))
+        # the lazy tasks are not copied
+        self.assertIs(grp._segments[1], prod)
+        self.assertEqual(len(grp), 8)
+        files = [tt.files() for tt in grp]
+        self.assertEqual(files[0], {"conf": "baz", "in": "x"})
+        self.assertEqual(files[1:7], [tt.files() for tt in prod])
+        self.assertEqual(files[7], {"conf": "foo", "in": "w"})
+        self.assertEqual([grp[ii].files() for ii in range(-8, 8)], files + files)
+        self.assertEqual([tt.files() for tt in grp[2:5]], files[2:5])
+        with self.assertRaises(IndexError):
+            grp[8]
+        # the group added before is not changed
+        self.assertEqual(len(grp0), 1)
+        grp = pickle.loads(pickle.dumps(grp))
+        self.assertEqual([tt.files() for tt in grp], files)
+
+
 def swap_element(arg):
     bk = arg.copy()
     arg[1] = bk[0]
@@ -149,6 +201,79 @@ class TestCPTGroup(unittest.TestCase):
                 in_template_npt % (self.tt[j_idx], self.pp[k_idx]),
             )
 
+    @patch("dpgen2.exploration.task.lmp.lmp_input.random")
+    def test_npt_dedup(self, mock_random):
+        mock_random.randrange.return_value = 1110
+        confs = ["foo", "bar", "baz"]
+        tt = [100, 200]
+        pp = [1, 10, 100]
+        cpt_group = NPTTaskGroup()
+        cpt_group.set_md(3, [10, 20], tt, pp)
+        cpt_group.set_conf(confs)
+        task_group = cpt_group.make_task()
+        self.assertEqual(len(task_group), len(confs) * len(tt) * len(pp))
+        # each conf is stored once, and so is each input script given the
+        # mocked velocity seed
+        self.assertEqual(len(task_group._blobs), len(confs) + len(tt) * len(pp))
+        files = [tt.files() for tt in task_group]
+        self.assertEqual(files, [tt.files() for tt in task_group.task_list])
+        # the snapshot of the tasks is read-only
+        with self.assertRaises(AttributeError):
+            task_group.task_list.append(ExplorationTask())
+        # the old groups holding the task list are loaded
+        old = ExplorationTaskGroup.__new__(ExplorationTaskGroup)
+        old.__setstate__({"_task_list": task_group.task_list})
+        self.assertEqual([tt.files() for tt in old], files)
+        self.assertEqual(len(old._blobs), len(task_group._blobs))
+
+    def test_npt_lazy(self):
+        groups = []
+        for lazy in [False, True]:
+            random.seed(1)
+            cpt_group = NPTTaskGroup(lazy=lazy)
+            cpt_group.set_md(3, [10, 20], [100, 200], [1, 10, 100])
+            cpt_group.set_conf(["foo", "bar", "baz"], n_sample=2)
+            groups.append(cpt_group.make_task())
+        self.assertEqual(len(groups[1]), 2 * 2 * 3)
+        self.assertEqual(len(groups[1]._blobs), 0)
+        self.assertEqual(
+            [tt.files() for tt in groups[1]],
+            [tt.files() for tt in groups[0]],
+        )
+        # the tasks are the same on each access
+        self.assertEqual(groups[1][5].files(), groups[1][5].files())
+
+    def test_npt_restart(self):
+        conf = "\n2 atoms\n3 atom types\n0 10 xlo xhi\n0 10 ylo yhi\n0 10 zlo zhi\n0 0 0 xy xz yz\n\nAtoms # atomic\n\n1 1 0 0 0\n2 2 1 0 0\n"
+        frame = (
+            "ITEM: TIMESTEP\n10\nITEM: NUMBER OF ATOMS\n2\n"
+            "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+            "ITEM: ATOMS id type x y z\n1 2 1.0 2.0 3.0\n2 1 4.0 5.0 6.0\n"
+        )
+        cpt_group = NPTTaskGroup(lazy=True)
+        cpt_group.set_md(3, [10, 20], [100], [1, 10])
+        cpt_group.set_conf([conf])
+        # ignored, not as many as the tasks
+        cpt_group.set_restart_frames([frame])
+        self.assertEqual(len(cpt_group.make_task()._blobs), 0)
+        cpt_group.set_restart_frames([None, frame])
+        task_group = cpt_group.make_task()
+        self.assertEqual(task_group[0].files()[lmp_conf_name], conf)
+        restart_conf = task_group[1].files()[lmp_conf_name]
+        self.assertIn("3 atom types", restart_conf)
+        self.assertEqual(
+            [ll.split()[1:] for ll in restart_conf.strip().split("\n")[-2:]],
+            [
+                ["2", "1.0000000000", "2.0000000000", "3.0000000000"],
+                ["1", "4.0000000000", "5.0000000000", "6.0000000000"],
+            ],
+        )
+        # the conditions are kept
+        self.assertIn(
+            "PRES            equal 10.000000",
+            task_group[1].files()[lmp_input_name],
+        )
+
     @patch("dpgen2.exploration.task.lmp.lmp_input.random")
     def test_nvt(self, mock_random):
         mock_random.randrange.return_value = 1110
@@ -1,4 +1,5 @@
 import os
+import pickle
 import textwrap
 import unittest
 from pathlib import (
@@ -42,6 +43,7 @@ from dpgen2.exploration.selector import (
 from dpgen2.exploration.task import (
     ExplorationStage,
     ExplorationTaskGroup,
+    NPTTaskGroup,
 )
 
 # isort: off
@@ -166,6 +168,136 @@ class TestConvergenceCheckStageScheduler(unittest.TestCase):
         with self.assertRaisesRegex(FatalError, "reached maximal number of iterations"):
             conv, ltg, sel = self.scheduler.plan_next_iteration(foo_report, [])
 
+    def test_old_pickle(self):
+        report = ExplorationReportTrustLevelsRandom(0.1, 0.3, conv_accuracy=0.9)
+        scheduler = ConvergenceCheckStageScheduler(
+            MockedStage(),
+            ConfSelectorFrames(TrajRenderLammps(), report),
+        )
+        foo_report = MockedExplorationReport()
+        foo_report.accurate = 0.5
+        foo_report.failed = 0.5
+        conv, ltg, sel = scheduler.plan_next_iteration()
+        # the scheduler pickled before the re-screening and restart options
+        for ii in [
+            "rescreen",
+            "rescreen_only",
+            "rescreened",
+            "restart",
+            "restart_level_f",
+        ]:
+            delattr(scheduler, ii)
+        scheduler = pickle.loads(pickle.dumps(scheduler))
+        conv, ltg, sel = scheduler.plan_next_iteration(foo_report, [])
+        self.assertEqual(conv, False)
+        self.assertTrue(isinstance(ltg, MockedExplorationTaskGroup))
+        conv, ltg, sel = scheduler.plan_next_iteration(foo_report, [])
+        self.assertEqual(conv, False)
+
+
+class TestConvergenceCheckStageSchedulerRestart(unittest.TestCase):
+    conf = textwrap.dedent(
+        """
+        2 atoms
+        2 atom types
+        0 10 xlo xhi
+        0 10 ylo yhi
+        0 10 zlo zhi
+        0 0 0 xy xz yz
+
+        Atoms # atomic
+
+        1 1 0 0 0
+        2 2 1 0 0
+        """
+    )
+
+    def setUp(self):
+        self.trajs = [Path("traj.0.dump"), Path("traj.1.dump")]
+        self.model_devis = [Path("model_devi.0.out"), Path("model_devi.1.out")]
+        frames = []
+        for ii, natoms in enumerate([2, 2, 0]):
+            frames.append(
+                f"ITEM: TIMESTEP\n{ii}\nITEM: NUMBER OF ATOMS\n{natoms}\n"
+                "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+                "ITEM: ATOMS id type x y z\n"
+                + "".join(f"{jj + 1} 1 {ii}.0 {jj}.0 0\n" for jj in range(natoms))
+            )
+        # the last frame is pruned
+        self.trajs[0].write_text("".join(frames))
+        self.trajs[1].write_text("")
+        np.savetxt(
+            self.model_devis[0],
+            np.array(
+                [[ii, 0, 0, 0, ff, 0, 0] for ii, ff in enumerate([0.1, 0.5, 0.5])]
+            ),
+        )
+        np.savetxt(self.model_devis[1], np.zeros((0, 7)))
+        stage = ExplorationStage()
+        self.grp = NPTTaskGroup()
+        self.grp.set_md(3, [10, 20], [100], [1, 10])
+        self.grp.set_conf([self.conf])
+        stage.add_task_group(self.grp)
+        self.stage = stage
+
+    def tearDown(self):
+        for ii in [
+            "traj.0.dump",
+            "traj.1.dump",
+            "model_devi.0.out",
+            "model_devi.1.out",
+        ]:
+            if Path(ii).is_file():
+                os.remove(ii)
+
+    def _plan(self, **kwargs):
+        scheduler = ConvergenceCheckStageScheduler(
+            self.stage,
+            None,
+            restart=True,
+            **kwargs,
+        )
+        foo_report = MockedExplorationReport()
+        foo_report.accurate = 0.5
+        foo_report.failed = 0.5
+        conv, ltg, sel = scheduler.plan_next_iteration()
+        self.assertEqual([tt.files()["conf.lmp"] for tt in ltg], [self.conf] * len(ltg))
+        return scheduler.plan_next_iteration(foo_report, self.trajs, self.model_devis)
+
+    def test_last_frame(self):
+        conv, ltg, sel = self._plan()
+        self.assertEqual(len(ltg), 2)
+        confs = [tt.files()["conf.lmp"] for tt in ltg]
+        # the task of the empty trajectory starts from the sampled conf
+        self.assertEqual(confs[1], self.conf)
+        self.assertIn("2 atom types", confs[0])
+        self.assertEqual(
+            [ll.split()[2:5] for ll in confs[0].strip().split("\n")[-2:]],
+            [["1.0000000000", "0.0000000000", "0.0000000000"]]
+            + [["1.0000000000", "1.0000000000", "0.0000000000"]],
+        )
+        # the restart frames are used once
+        self.assertEqual(
+            [tt.files()["conf.lmp"] for tt in self.grp.make_task()],
+            [self.conf] * 2,
+        )
+
+    def test_level_f(self):
+        conv, ltg, sel = self._plan(restart_level_f=0.3)
+        confs = [tt.files()["conf.lmp"] for tt in ltg]
+        self.assertEqual(confs[1], self.conf)
+        self.assertEqual(
+            [ll.split()[2:5] for ll in confs[0].strip().split("\n")[-2:]],
+            [["0.0000000000", "0.0000000000", "0.0000000000"]]
+            + [["0.0000000000", "1.0000000000", "0.0000000000"]],
+        )
+
+    def test_fewer_trajs(self):
+        # the trajectories do not match the tasks
+        self.trajs = self.trajs[:1]
+        conv, ltg, sel = self._plan()
+        self.assertEqual([tt.files()["conf.lmp"] for tt in ltg], [self.conf] * 2)
+
 
 class TestExplorationScheduler(unittest.TestCase):
     def test_success(self):
@@ -0,0 +1,256 @@
+import os
+import time
+import unittest
+from pathlib import (
+    Path,
+)
+
+import dpdata
+import numpy as np
+from context import (
+    dpgen2,
+    run_benchmark,
+    run_benchmark_reason,
+)
+
+from dpgen2.exploration.render import (
+    TrajRenderLammps,
+)
+from dpgen2.exploration.render.lammps_dump import (
+    index_lammps_dump,
+    lammps_dump_timesteps,
+    load_lammps_dump_frames,
+    parse_dpgen_lammps_dump,
+    prune_lammps_dump,
+    read_lammps_dump_frames,
+)
+
+
+def make_dump(nframes, natoms, ntypes=2, seed=0, tilt=True, keys="id type x y z"):
+    rng = np.random.default_rng(seed)
+    atype = rng.integers(1, ntypes + 1, size=natoms)
+    atype[:ntypes] = np.arange(1, ntypes + 1)
+    ret = []
+    for ff in range(nframes):
+        xy, xz, yz = rng.uniform(-1.0, 1.0, size=3) if tilt else (0.0, 0.0, 0.0)
+        lo = rng.uniform(-0.5, 0.5, size=3)
+        hi = lo + rng.uniform(8.0, 10.0, size=3)
+        xlo_bound = lo[0] + min(0.0, xy, xz, xy + xz)
+        xhi_bound = hi[0] + max(0.0, xy, xz, xy + xz)
+        ylo_bound = lo[1] + min(0.0, yz)
+        yhi_bound = hi[1] + max(0.0, yz)
+        ret.append("ITEM: TIMESTEP")
+        ret.append(f"{ff * 10}")
+        ret.append("ITEM: NUMBER OF ATOMS")
+        ret.append(f"{natoms}")
+        if tilt:
+            ret.append("ITEM: BOX BOUNDS xy xz yz pp pp pp")
+            ret.append(f"{xlo_bound:.10e} {xhi_bound:.10e} {xy:.10e}")
+            ret.append(f"{ylo_bound:.10e} {yhi_bound:.10e} {xz:.10e}")
+            ret.append(f"{lo[2]:.10e} {hi[2]:.10e} {yz:.10e}")
+        else:
+            ret.append("ITEM: BOX BOUNDS pp pp pp")
+            for dd in range(3):
+                ret.append(f"{lo[dd]:.10e} {hi[dd]:.10e}")
+        ret.append(f"ITEM: ATOMS {keys}")
+        # some atoms are out of the box to check the wrapping
+        coords = rng.uniform(-1.0, 9.0, size=(natoms, 3)) + lo
+        nextra = len(keys.split()) - 5
+        for ii in rng.permutation(natoms):
+            ret.append(
+                f"{ii + 1} {atype[ii]} "
+                f"{coords[ii][0]:.8f} {coords[ii][1]:.8f} {coords[ii][2]:.8f}"
+                + " 0.1" * nextra
+            )
+    return "\n".join(ret) + "\n"
+
+
+class TestLammpsDumpIndex(unittest.TestCase):
+    def setUp(self):
+        self.nframes = 7
+        self.natoms = 5
+        self.fname = Path("traj.dump")
+        self.fname.write_text(make_dump(self.nframes, self.natoms))
+        self.type_map = ["O", "H"]
+
+    def tearDown(self):
+        if self.fname.is_file():
+            os.remove(self.fname)
+
+    def test_index(self):
+        offsets = index_lammps_dump(self.fname)
+        self.assertEqual(offsets.shape, (self.nframes + 1,))
+        text = self.fname.read_bytes()
+        self.assertEqual(offsets[-1], len(text))
+        for ii in range(self.nframes):
+            self.assertTrue(text[offsets[ii] :].startswith(b"ITEM: TIMESTEP\n"))
+            self.assertTrue(
+                text[offsets[ii] :].startswith(f"ITEM: TIMESTEP\n{ii * 10}\n".encode())
+            )
+
+    def test_index_indented(self):
+        text = self.fname.read_text()
+        self.fname.write_text(text.replace("\n", "\n  "))
+        offsets = index_lammps_dump(self.fname)
+        self.assertEqual(offsets.shape, (self.nframes + 1,))
+        ss = load_lammps_dump_frames(self.fname, [5], type_map=self.type_map)
+        ref = dpdata.System(self.fname, fmt="lammps/dump", type_map=self.type_map)
+        np.testing.assert_allclose(ss["coords"], ref.sub_system([5])["coords"])
+
+    def test_timesteps(self):
+        np.testing.assert_array_equal(
+            lammps_dump_timesteps(self.fname), np.arange(self.nframes) * 10
+        )
+
+    def test_index_empty(self):
+        self.fname.write_text("")
+        offsets = index_lammps_dump(self.fname)
+        np.testing.assert_array_equal(offsets, [0])
+
+    def test_read_frames(self):
+        text = read_lammps_dump_frames(self.fname, [3, 1])
+        lines = text.decode().split("\n")
+        self.assertEqual(lines[1], "30")
+        self.assertEqual(lines[9 + self.natoms + 1], "10")
+        with self.assertRaises(IndexError):
+            read_lammps_dump_frames(self.fname, [self.nframes])
+
+    def test_consistent_with_dpdata(self):
+        ref = dpdata.System(self.fname, fmt="lammps/dump", type_map=self.type_map)
+        for sel in [[0], [6, 2, 3], [1, 5], list(range(self.nframes))]:
+            ss = load_lammps_dump_frames(self.fname, sel, type_map=self.type_map)
+            rr = ref.sub_system(sel)
+            self.assertEqual(ss.get_nframes(), len(sel))
+            self.assertEqual(ss["atom_names"], rr["atom_names"])
+            self.assertEqual(ss["atom_numbs"], rr["atom_numbs"])
+            np.testing.assert_array_equal(ss["atom_types"], rr["atom_types"])
+            np.testing.assert_allclose(ss["cells"], rr["cells"])
+            np.testing.assert_allclose(ss["coords"], rr["coords"])
+
+    def test_prune(self):
+        keep = np.array([False, True, False, False, True, True, False])
+        ref = dpdata.System(self.fname, fmt="lammps/dump", type_map=self.type_map)
+        out_fname = Path("traj.pruned.dump")
+        prune_lammps_dump(self.fname, keep, out_fname=out_fname)
+        offsets = index_lammps_dump(out_fname)
+        self.assertEqual(offsets.shape, (self.nframes + 1,))
+        self.assertLess(offsets[-1], self.fname.stat().st_size)
+        # the kept frames are not changed
+        ss = load_lammps_dump_frames(out_fname, [5, 1, 4], type_map=self.type_map)
+        np.testing.assert_allclose(ss["coords"], ref.sub_system([5, 1, 4])["coords"])
+        np.testing.assert_allclose(ss["cells"], ref.sub_system([5, 1, 4])["cells"])
+        # the pruned frames are empty
+        text = read_lammps_dump_frames(out_fname, [2]).decode().split("\n")
+        self.assertEqual(
+            text[:4], ["ITEM: TIMESTEP", "20", "ITEM: NUMBER OF ATOMS", "0"]
+        )
+        self.assertEqual(len(text), 10)
+        # in place
+        prune_lammps_dump(self.fname, keep)
+        self.assertEqual(self.fname.read_bytes(), out_fname.read_bytes())
+        with self.assertRaises(RuntimeError):
+            prune_lammps_dump(self.fname, keep[:3])
+        os.remove(out_fname)
+
+    def test_render(self):
+        sel = [[4, 0], [], [2]]
+        trajs = [self.fname, self.fname, self.fname]
+        ms_idx = TrajRenderLammps().get_confs(trajs, sel, self.type_map)
+        ms_ref = TrajRenderLammps(use_dump_index=False).get_confs(
+            trajs, sel, self.type_map
+        )
+        self.assertEqual(ms_idx.get_nframes(), 3)
+        self.assertEqual(ms_idx.get_nframes(), ms_ref.get_nframes())
+        for kk in ms_ref.systems:
+            np.testing.assert_allclose(
+                ms_idx.systems[kk]["coords"], ms_ref.systems[kk]["coords"]
+            )
+            np.testing.assert_allclose(
+                ms_idx.systems[kk]["cells"], ms_ref.systems[kk]["cells"]
+            )
+
+
+class TestParseDpgenLammpsDump(unittest.TestCase):
+    def setUp(self):
+        self.fname = Path("traj.dump")
+        self.type_map = ["H", "C", "O"]
+
+    def tearDown(self):
+        if self.fname.is_file():
+            os.remove(self.fname)
+
+    def _check_consistent(self, text, type_map, sel=[0, 3, 2]):
+        self.fname.write_text(text)
+        data = parse_dpgen_lammps_dump(self.fname.read_bytes(), type_map=type_map)
+        self.assertIsNotNone(data)
+        ref = dpdata.System(self.fname, fmt="lammps/dump", type_map=type_map)
+        ss = dpdata.System(data=data)
+        if type_map is not None:
+            ss.apply_type_map(type_map)
+        for key in ["atom_names", "atom_numbs"]:
+            self.assertEqual(ss[key], ref[key])
+        np.testing.assert_array_equal(ss["atom_types"], ref["atom_types"])
+        np.testing.assert_array_equal(ss["orig"], ref["orig"])
+        np.testing.assert_allclose(ss["cells"], ref["cells"], rtol=0, atol=1e-12)
+        np.testing.assert_allclose(ss["coords"], ref["coords"], rtol=0, atol=1e-10)
+        # through the frame index
+        ss = load_lammps_dump_frames(self.fname, sel, type_map=type_map)
+        rr = ref.sub_system(sel)
+        np.testing.assert_array_equal(ss["atom_types"], rr["atom_types"])
+        np.testing.assert_allclose(ss["coords"], rr["coords"], rtol=0, atol=1e-10)
+
+    def test_tilt(self):
+        self._check_consistent(make_dump(4, 11, ntypes=3), self.type_map)
+
+    def test_orthogonal(self):
+        self._check_consistent(make_dump(4, 11, tilt=False), self.type_map)
+
+    def test_extra_columns(self):
+        text = make_dump(4, 6, keys="id type x y z fx fy fz")
+        self._check_consistent(text, self.type_map)
+
+    def test_no_type_map(self):
+        self._check_consistent(make_dump(4, 6), None)
+
+    def test_indented(self):
+        text = make_dump(4, 6).replace("\n", "\n    ")
+        self._check_consistent(text, self.type_map)
+
+    def test_fallback(self):
+        # scaled coordinates are not in the fixed layout
+        text = make_dump(4, 6, keys="id type xs ys zs")
+        self.assertIsNone(parse_dpgen_lammps_dump(text.encode()))
+        # different number of atoms in the frames
+        text = make_dump(1, 6, seed=1) + make_dump(1, 5, seed=2)
+        self.assertIsNone(parse_dpgen_lammps_dump(text.encode()))
+        self.assertIsNone(parse_dpgen_lammps_dump(b""))
+        # the generic reader is used
+        text = make_dump(4, 6, keys="id type xs ys zs")
+        self.fname.write_text(text)
+        ss = load_lammps_dump_frames(self.fname, [1], type_map=self.type_map)
+        ref = dpdata.System(self.fname, fmt="lammps/dump", type_map=self.type_map)
+        np.testing.assert_allclose(ss["coords"], ref.sub_system([1])["coords"])
+
+
+@unittest.skipIf(not run_benchmark, run_benchmark_reason)
+class BenchmarkParseDpgenLammpsDump(unittest.TestCase):
+    def setUp(self):
+        self.nframes = 20
+        self.natoms = 20000
+        self.fname = Path("traj.bench.dump")
+        self.fname.write_text(make_dump(self.nframes, self.natoms))
+
+    def tearDown(self):
+        if self.fname.is_file():
+            os.remove(self.fname)
+
+    def test_benchmark(self):
+        sel = list(range(self.nframes))
+        for name, fast in [("dpdata", False), ("fast", True)]:
+            tic = time.perf_counter()
+            load_lammps_dump_frames(self.fname, sel, use_fast_parser=fast)
+            toc = time.perf_counter()
+            print(
+                f"{name:>8s}: {toc - tic:8.3f} s "
+                f"for {self.nframes} x {self.natoms} atoms"
+            )
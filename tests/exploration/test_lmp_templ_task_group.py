@@ -306,6 +306,27 @@ class TestLmpTemplateTaskGroup(unittest.TestCase):
             )
             idx += 1
 
+    def test_lmp_plm_lazy(self):
+        groups = []
+        for lazy in [False, True]:
+            task_group = LmpTemplateTaskGroup(lazy=lazy)
+            task_group.set_conf(self.confs)
+            task_group.set_lmp(
+                self.numb_models,
+                self.lmp_plm_template_fname,
+                plm_template_fname=self.plm_template_fname,
+                revisions=self.lmp_plm_rev_mat,
+                traj_freq=self.traj_freq,
+            )
+            task_group.make_task()
+            groups.append(task_group)
+        self.assertEqual(len(groups[1]), len(groups[0]))
+        self.assertEqual(len(groups[1]._blobs), 0)
+        self.assertEqual(
+            [tt.files() for tt in groups[1]],
+            [tt.files() for tt in groups[0]],
+        )
+
     def test_lmp_empty(self):
         task_group = LmpTemplateTaskGroup()
         task_group.set_conf(self.confs)
@@ -0,0 +1,155 @@
+import os
+import shutil
+import unittest
+from pathlib import (
+    Path,
+)
+
+import dpdata
+import numpy as np
+from context import (
+    dpgen2,
+)
+
+from dpgen2.constants import (
+    novelty_index_name,
+)
+from dpgen2.exploration.selector import (
+    NoveltyIndex,
+)
+from dpgen2.exploration.selector.conf_diversity import (
+    structure_fingerprint,
+)
+
+
+def make_system(coords, atom_names=["H", "O"]):
+    nframes, natoms = coords.shape[:2]
+    ss = dpdata.System()
+    ss.data["atom_names"] = list(atom_names)
+    ss.data["atom_numbs"] = [natoms // 2, natoms - natoms // 2]
+    ss.data["atom_types"] = np.array([0] * (natoms // 2) + [1] * (natoms - natoms // 2))
+    ss.data["orig"] = np.zeros(3)
+    ss.data["cells"] = np.tile(8.0 * np.eye(3), [nframes, 1, 1])
+    ss.data["coords"] = coords
+    return ss
+
+
+class TestNoveltyIndex(unittest.TestCase):
+    def setUp(self):
+        self.type_map = ["H", "O"]
+        rng = np.random.default_rng(1)
+        self.known = rng.uniform(0.0, 8.0, size=(20, 8, 3))
+        self.novel = rng.uniform(0.0, 8.0, size=(20, 8, 3))
+        self.index = NoveltyIndex(self.type_map, min_dist=0.05, nbins=20)
+        self.path = Path("novelty_index_test")
+        self.path.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+
+    def test_fingerprint(self):
+        ss = make_system(self.known, ["O", "H"])
+        fps = self.index.fingerprint([ss])
+        # the types are mapped to the type map
+        ref = structure_fingerprint(
+            ss["coords"],
+            ss["cells"],
+            1 - ss["atom_types"],
+            2,
+            False,
+            6.0,
+            20,
+        )
+        self.assertEqual(fps.shape, (20, self.index.dim))
+        self.assertEqual(fps.dtype, np.float32)
+        np.testing.assert_allclose(fps, ref, atol=1e-6)
+
+    def test_query(self):
+        self.index.write(self.index.fingerprint([make_system(self.known)]), self.path)
+        for kk in ["fps", "keys", "order"]:
+            self.assertTrue((self.path / f"{novelty_index_name}.{kk}.npy").is_file())
+        # the shard does not break the loading of the data directory
+        ms = dpdata.MultiSystems()
+        ms.from_deepmd_npy(self.path, labeled=False)
+        self.assertEqual(ms.get_nframes(), 0)
+
+        index = self.index.load([self.path, Path("not_exist")])
+        self.assertEqual(len(index["shards"]), 1)
+        self.assertEqual(index["shards"][0]["keys"].shape, (self.index.ntables, 20))
+        fps = self.index.fingerprint(
+            [make_system(np.concatenate([self.known, self.novel]))]
+        )
+        known = self.index.query(fps, index)
+        np.testing.assert_equal(known[:20], True)
+        # no false positive
+        ref = self.index.fingerprint([make_system(self.known)])
+        dist = np.linalg.norm(fps[:, None, :] - ref[None, :, :], axis=-1)
+        np.testing.assert_equal(known[dist.min(axis=1) > 0.05], False)
+        self.assertFalse(known[20:].all())
+
+    def test_select(self):
+        self.index.write(self.index.fingerprint([make_system(self.known)]), self.path)
+        index = self.index.load([self.path])
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.append(make_system(np.concatenate([self.known[:5], self.novel[:5]])))
+        ret = self.index.select(ms, index)
+        self.assertEqual(ret.get_nframes(), 5)
+        np.testing.assert_allclose(
+            list(ret.systems.values())[0]["coords"], self.novel[:5]
+        )
+
+    def test_load_other_params(self):
+        self.index.write(self.index.fingerprint([make_system(self.known)]), self.path)
+        other = NoveltyIndex(self.type_map, min_dist=0.05, nbins=20, seed=1)
+        self.assertIsNone(other.load([self.path]))
+        self.assertIsNotNone(self.index.load([self.path]))
+
+    def test_empty(self):
+        self.index.write(np.zeros((0, self.index.dim)), self.path)
+        index = self.index.load([self.path])
+        fps = self.index.fingerprint([make_system(self.known)])
+        np.testing.assert_equal(self.index.query(fps, index), False)
+        np.testing.assert_equal(self.index.query(fps, None), False)
+
+    def test_shards(self):
+        # the shards, including an empty one, are queried together
+        paths = [self.path / f"shard.{ii}" for ii in range(3)]
+        for pp in paths:
+            pp.mkdir()
+        self.index.write(self.index.fingerprint([make_system(self.known)]), paths[0])
+        self.index.write(np.zeros((0, self.index.dim)), paths[1])
+        self.index.write(self.index.fingerprint([make_system(self.novel)]), paths[2])
+        index = self.index.load(paths)
+        self.assertEqual(len(index["shards"]), 3)
+        for shard in index["shards"]:
+            self.assertIsInstance(shard["keys"], np.memmap)
+            self.assertTrue(np.all(np.diff(shard["keys"], axis=1) >= 0))
+        fps = self.index.fingerprint(
+            [make_system(np.concatenate([self.known, self.novel]))]
+        )
+        np.testing.assert_equal(self.index.query(fps, index), True)
+
+    def test_shards_bucket_size(self):
+        # the buckets are bounded across the shards as in one shard
+        index = NoveltyIndex(
+            self.type_map,
+            min_dist=0.05,
+            nbins=20,
+            ntables=2,
+            bucket_width=100.0,
+            max_bucket_size=5,
+        )
+        known = self.known[:, None] + np.linspace(0.0, 0.5, 4)[None, :, None, None]
+        known = known.reshape(-1, 8, 3)
+        fps = index.fingerprint([make_system(known)])
+        paths = [self.path / f"shard.{ii}" for ii in range(3)]
+        for pp in paths:
+            pp.mkdir()
+        index.write(fps[:30], paths[0])
+        index.write(fps[30:], paths[1])
+        index.write(fps, paths[2])
+        sharded = index.query(fps, index.load(paths[:2]))
+        ref = index.query(fps, index.load(paths[2:]))
+        np.testing.assert_array_equal(sharded, ref)
+        self.assertFalse(ref.all())
@@ -1,3 +1,4 @@
+import itertools
 import os
 import textwrap
 import unittest
@@ -15,6 +16,7 @@ from dargs import (
 
 from dpgen2.exploration.deviation import (
     DeviManager,
+    DeviManagerColumnar,
     DeviManagerStd,
 )
 from dpgen2.exploration.report import (
@@ -248,3 +250,204 @@ class TestTrajsExplorationReport(unittest.TestCase):
         self.assertEqual(data["n_checked_steps"], 2)
         self.assertAlmostEqual(data["conv_tolerance"], 0.01)
         ExplorationReportAdaptiveLower(*data)
+
+
+def sort_based_selection(md_f, md_v, level_f_hi, level_v_hi, numb_f, numb_v):
+    # the reference selection by fully sorting the frames
+    coll_f = []
+    coll_v = []
+    for tt in range(len(md_f)):
+        for ii in range(md_f[tt].shape[0]):
+            if not (md_f[tt][ii] > level_f_hi or md_v[tt][ii] > level_v_hi):
+                coll_f.append([md_f[tt][ii], tt, ii])
+                coll_v.append([md_v[tt][ii], tt, ii])
+    coll_f.sort()
+    coll_v.sort()
+    numb_f = min(numb_f, len(coll_f))
+    numb_v = min(numb_v, len(coll_v))
+    level_f_lo = coll_f[-numb_f][0] if numb_f > 0 else level_f_hi
+    level_v_lo = coll_v[-numb_v][0] if numb_v > 0 else level_v_hi
+    candi = set()
+    for ii in range(len(coll_f) - numb_f, len(coll_f)):
+        candi.add(tuple(coll_f[ii][1:]))
+    for ii in range(len(coll_v) - numb_v, len(coll_v)):
+        candi.add(tuple(coll_v[ii][1:]))
+    return level_f_lo, level_v_lo, candi
+
+
+class TestAdaptiveLowerTopK(unittest.TestCase):
+    def test_consistent_with_sort(self):
+        rng = np.random.default_rng(0)
+        # rounded model deviations, so there are many ties
+        md_f = [
+            np.round(rng.uniform(0.0, 1.0, size=nn), 2)
+            for nn in rng.integers(0, 200, 6)
+        ]
+        md_v = [np.round(rng.uniform(0.0, 1.0, size=ii.size), 2) for ii in md_f]
+        for manager, (numb_f, numb_v) in itertools.product(
+            [DeviManagerStd, DeviManagerColumnar],
+            [(0, 5), (17, 0), (30, 31), (100000, 3)],
+        ):
+            model_devi = manager()
+            for ff, vv in zip(md_f, md_v):
+                model_devi.add(DeviManager.MAX_DEVI_F, ff)
+                model_devi.add(DeviManager.MAX_DEVI_V, vv)
+            ter = ExplorationReportAdaptiveLower(
+                level_f_hi=0.8,
+                numb_candi_f=numb_f,
+                rate_candi_f=0.0,
+                level_v_hi=0.9,
+                numb_candi_v=numb_v,
+                rate_candi_v=0.0,
+            )
+            ter.record(model_devi)
+            level_f_lo, level_v_lo, candi = sort_based_selection(
+                md_f, md_v, 0.8, 0.9, numb_f, numb_v
+            )
+            self.assertEqual(ter.level_f_lo, level_f_lo)
+            self.assertEqual(ter.level_v_lo, level_v_lo)
+            self.assertEqual(ter.candi, candi)
+            # the same insertion order, so the same order of picking
+            self.assertEqual(list(ter.candi), list(candi))
+            nframes = sum([ii.size for ii in md_f])
+            nfailed = sum(
+                [
+                    np.count_nonzero((ff > 0.8) | (vv > 0.9))
+                    for ff, vv in zip(md_f, md_v)
+                ]
+            )
+            self.assertEqual(len(ter.failed), nfailed)
+            self.assertEqual(len(ter.accur), nframes - nfailed - len(candi))
+            self.assertEqual(ter.accurate_ratio(), len(ter.accur) / nframes)
+
+    def test_compact(self):
+        rng = np.random.default_rng(0)
+        model_devi = DeviManagerStd()
+        for ii in range(3):
+            model_devi.add(DeviManager.MAX_DEVI_F, rng.uniform(0.0, 1.0, 100))
+            model_devi.add(DeviManager.MAX_DEVI_V, rng.uniform(0.0, 1.0, 100))
+        ter = ExplorationReportAdaptiveLower(
+            level_f_hi=0.8,
+            numb_candi_f=10,
+            level_v_hi=0.9,
+            numb_candi_v=10,
+        )
+        ter.record(model_devi)
+        self.assertEqual(ter.hist_f.sum(), 300)
+        self.assertEqual(ter.hist_v.sum(), 300)
+        picked = ter.get_candidate_ids(5)
+        ratios = (ter.accurate_ratio(), ter.candidate_ratio(), ter.failed_ratio())
+        levels = (ter.level_f_lo, ter.level_v_lo)
+        ter.compact(picked)
+        self.assertIsNone(ter.model_devi)
+        self.assertEqual(ter.failed, [])
+        self.assertEqual(ter.get_candidate_ids(), picked)
+        self.assertEqual(
+            (ter.accurate_ratio(), ter.candidate_ratio(), ter.failed_ratio()), ratios
+        )
+        self.assertEqual((ter.level_f_lo, ter.level_v_lo), levels)
+
+    def test_merge(self):
+        rng = np.random.default_rng(0)
+        md_f = [rng.uniform(0.0, 1.0, size=nn) for nn in rng.integers(0, 100, 8)]
+        md_v = [rng.uniform(0.0, 1.0, size=ii.size) for ii in md_f]
+
+        def make_devi(start, end):
+            model_devi = DeviManagerStd()
+            for ff, vv in zip(md_f[start:end], md_v[start:end]):
+                model_devi.add(DeviManager.MAX_DEVI_F, ff)
+                model_devi.add(DeviManager.MAX_DEVI_V, vv)
+            return model_devi
+
+        def make_report():
+            return ExplorationReportAdaptiveLower(
+                level_f_hi=0.8,
+                numb_candi_f=10,
+                rate_candi_f=0.0,
+                level_v_hi=0.9,
+                numb_candi_v=5,
+            )
+
+        ref = make_report()
+        ref.record(make_devi(0, 8))
+        # the partial reports of two trajectories each
+        partial = []
+        for ii in range(0, 8, 2):
+            rr = make_report()
+            rr.record_chunk(make_devi(ii, ii + 2))
+            self.assertIsNone(rr.model_devi)
+            self.assertEqual(rr.valid_ids, [])
+            # only the top candidates are kept without the rates
+            self.assertLessEqual(rr.stream_f.size, 15)
+            partial.append(rr)
+        ter = make_report()
+        ter.merge(partial)
+        # each partial report keeps enough top candidates
+        self.assertEqual(ter.candi, ref.candi)
+        self.assertEqual(
+            (ter.level_f_lo, ter.level_v_lo), (ref.level_f_lo, ref.level_v_lo)
+        )
+        self.assertEqual(
+            (ter.accurate_ratio(), ter.candidate_ratio(), ter.failed_ratio()),
+            (ref.accurate_ratio(), ref.candidate_ratio(), ref.failed_ratio()),
+        )
+        np.testing.assert_array_equal(ter.hist_f, ref.hist_f)
+        self.assertEqual(ter.ntraj, 8)
+        with self.assertRaises(RuntimeError):
+            make_report().merge([ref])
+
+    def test_merge_rate(self):
+        # the first shard holds all the top frames
+        md_f = [np.linspace(0.3, 0.5, 10), np.linspace(0.0, 0.02, 10)]
+        md_f += [np.linspace(0.01, 0.02, 10)]
+
+        def make_devi(trajs):
+            model_devi = DeviManagerStd()
+            for ff in trajs:
+                model_devi.add(DeviManager.MAX_DEVI_F, ff)
+            return model_devi
+
+        def make_report():
+            return ExplorationReportAdaptiveLower(
+                level_f_hi=1.0, numb_candi_f=2, rate_candi_f=0.34
+            )
+
+        ref = make_report()
+        ref.record(make_devi(md_f))
+        # rate_candi_f * nvalid > numb_candi_f
+        self.assertEqual(ref.candi, {(0, ii) for ii in range(10)})
+        for chunks in [[md_f[:1], md_f[1:]], [md_f[:1], md_f[1:2], md_f[2:]]]:
+            partial = []
+            for cc in chunks:
+                rr = make_report()
+                rr.record_chunk(make_devi(cc))
+                partial.append(rr)
+            ter = make_report()
+            ter.merge(partial)
+            self.assertEqual(ter.candi, ref.candi)
+            self.assertEqual(ter.level_f_lo, ref.level_f_lo)
+            # the streaming mode
+            ter = make_report()
+            for cc in chunks:
+                ter.record_chunk(make_devi(cc))
+            self.assertEqual(ter.candi, ref.candi)
+            self.assertEqual(ter.level_f_lo, ref.level_f_lo)
+
+    def test_seed(self):
+        rng = np.random.default_rng(0)
+        model_devi = DeviManagerStd()
+        for ii in range(3):
+            model_devi.add(DeviManager.MAX_DEVI_F, rng.uniform(0.0, 1.0, 100))
+        picked = []
+        for seed in [1, 1, 2]:
+            ter = ExplorationReportAdaptiveLower(
+                level_f_hi=0.8, numb_candi_f=30, seed=seed
+            )
+            ter.record(model_devi)
+            picked.append(ter.get_candidate_ids(10))
+            self.assertEqual(sum([len(ii) for ii in picked[-1]]), 10)
+            for tt, ids in enumerate(picked[-1]):
+                for ff in ids:
+                    self.assertIn((tt, ff), ter.candi)
+        self.assertEqual(picked[0], picked[1])
+        self.assertNotEqual(picked[0], picked[2])
@@ -1,4 +1,6 @@
+import itertools
 import os
+import pickle
 import textwrap
 import unittest
 from collections import (
@@ -12,15 +14,22 @@ from context import (
 from dargs import (
     Argument,
 )
+from dflow.python import (
+    FatalError,
+)
 
 from dpgen2.exploration.deviation import (
     DeviManager,
+    DeviManagerColumnar,
     DeviManagerStd,
 )
 from dpgen2.exploration.report import (
     ExplorationReportTrustLevelsMax,
     ExplorationReportTrustLevelsRandom,
 )
+from dpgen2.exploration.report.report import (
+    sample_candidates,
+)
 from dpgen2.exploration.report.report_trust_levels_base import (
     ExplorationReportTrustLevels,
 )
@@ -281,3 +290,302 @@ class TestTrajsExplorationReport(unittest.TestCase):
         ter = ExplorationReportTrustLevelsRandom(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.2)
         ter.record(model_devi)
         self.assertTrue(ter.converged())
+
+
+class TestTrajsExplorationReportStreaming(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ntraj = 7
+        self.md_f = [rng.uniform(0.0, 1.0, size=nn) for nn in rng.integers(0, 30, 7)]
+        self.md_v = [rng.uniform(0.0, 1.0, size=len(ii)) for ii in self.md_f]
+
+    def _model_devi(self, start, end, virial):
+        model_devi = DeviManagerStd()
+        for ii in range(start, end):
+            model_devi.add(DeviManager.MAX_DEVI_F, self.md_f[ii])
+            if virial:
+                model_devi.add(DeviManager.MAX_DEVI_V, self.md_v[ii])
+        return model_devi
+
+    def _record_streaming(self, ter, chunk_size, max_nframes, virial):
+        ter.clear()
+        for start in range(0, self.ntraj, chunk_size):
+            end = min(start + chunk_size, self.ntraj)
+            ter.record_chunk(self._model_devi(start, end, virial), max_nframes)
+
+    def test_counts(self):
+        for virial in [True, False]:
+            for report in [
+                ExplorationReportTrustLevelsRandom,
+                ExplorationReportTrustLevelsMax,
+            ]:
+                ref = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9)
+                ref.record(self._model_devi(0, self.ntraj, virial))
+                ter = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9)
+                self._record_streaming(ter, 3, 5, virial)
+                self.assertEqual(ter.traj_nframes, ref.traj_nframes)
+                self.assertEqual(ter.accurate_ratio(), ref.accurate_ratio())
+                self.assertEqual(ter.candidate_ratio(), ref.candidate_ratio())
+                self.assertEqual(ter.failed_ratio(), ref.failed_ratio())
+                self.assertEqual(ter.converged(), ref.converged())
+                self.assertEqual(ter.print(0, 1, 2), ref.print(0, 1, 2))
+
+    def test_all_candidates(self):
+        for report in [
+            ExplorationReportTrustLevelsRandom,
+            ExplorationReportTrustLevelsMax,
+        ]:
+            ref = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9)
+            ref.record(self._model_devi(0, self.ntraj, True))
+            ter = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9)
+            self._record_streaming(ter, 2, None, True)
+            self.assertEqual(
+                ter.get_candidate_ids(),
+                [sorted(ii) for ii in ref.get_candidate_ids()],
+            )
+            self.assertFalse(ter.no_candidate())
+
+    def test_max_selection(self):
+        ref = ExplorationReportTrustLevelsMax(0.3, 0.6, conv_accuracy=0.9)
+        ref.record(self._model_devi(0, self.ntraj, False))
+        for chunk_size in [1, 3, self.ntraj]:
+            ter = ExplorationReportTrustLevelsMax(0.3, 0.6, conv_accuracy=0.9)
+            self._record_streaming(ter, chunk_size, 5, False)
+            self.assertEqual(ter.get_candidate_ids(5), ref.get_candidate_ids(5))
+
+    def test_random_selection(self):
+        ref = ExplorationReportTrustLevelsRandom(0.3, 0.6, conv_accuracy=0.9)
+        ref.record(self._model_devi(0, self.ntraj, False))
+        all_cand = ref.get_candidate_ids()
+        ter = ExplorationReportTrustLevelsRandom(0.3, 0.6, conv_accuracy=0.9)
+        self._record_streaming(ter, 3, 5, False)
+        self.assertEqual(len(ter.stream_keys), 5)
+        picked = ter.get_candidate_ids(5)
+        self.assertEqual(sum([len(ii) for ii in picked]), 5)
+        for ii in range(self.ntraj):
+            self.assertEqual(picked[ii], sorted(picked[ii]))
+            for jj in picked[ii]:
+                self.assertIn(jj, all_cand[ii])
+
+    def test_merge(self):
+        for report, kwargs in [
+            (ExplorationReportTrustLevelsRandom, {"seed": 1}),
+            (ExplorationReportTrustLevelsMax, {}),
+        ]:
+            ref = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9, **kwargs)
+            self._record_streaming(ref, 1, 5, True)
+            # one partial report for each trajectory
+            partial = []
+            for ii in range(self.ntraj):
+                rr = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9, **kwargs)
+                rr.record_chunk(self._model_devi(ii, ii + 1, True), 5)
+                self.assertIsNone(rr.model_devi)
+                self.assertEqual(rr.traj_class, [])
+                self.assertLessEqual(rr.stream_keys.size, 5)
+                partial.append(rr)
+            ter = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9, **kwargs)
+            ter.merge(partial, 5)
+            self.assertEqual(ter.traj_nframes, ref.traj_nframes)
+            self.assertEqual(ter.print(0, 1, 2), ref.print(0, 1, 2))
+            np.testing.assert_array_equal(ter.hist_f, ref.hist_f)
+            self.assertEqual(ter.get_candidate_ids(5), ref.get_candidate_ids(5))
+            # the reports given by `record` or compacted are not merged
+            ter = report(0.3, 0.6, 0.3, 0.6, conv_accuracy=0.9)
+            ref.compact(ref.get_candidate_ids(5))
+            with self.assertRaises(RuntimeError):
+                ter.merge([ref])
+            ref.clear()
+            ref.record(self._model_devi(0, self.ntraj, True))
+            with self.assertRaises(RuntimeError):
+                ter.merge([ref])
+
+
+def set_based_classification(
+    md_f, md_v, level_f_lo, level_f_hi, level_v_lo, level_v_hi
+):
+    # the reference classification by the sets of frame indexes
+    def get_indexes(md, lo, hi):
+        if md is None or lo is None or hi is None:
+            return None, None, None
+        return (
+            np.where(np.logical_and(md >= lo, md < hi))[0],
+            np.where(md < lo)[0],
+            np.where(md >= hi)[0],
+        )
+
+    id_f_cand, id_f_accu, id_f_fail = get_indexes(md_f, level_f_lo, level_f_hi)
+    id_v_cand, id_v_accu, id_v_fail = get_indexes(md_v, level_v_lo, level_v_hi)
+    novirial = id_v_cand is None
+    nframes = np.size(np.concatenate((id_f_cand, id_f_accu, id_f_fail)))
+    set_f_accu, set_f_cand, set_f_fail = set(id_f_accu), set(id_f_cand), set(id_f_fail)
+    set_v_accu = set(range(nframes)) if novirial else set(id_v_accu)
+    set_v_cand = set() if novirial else set(id_v_cand)
+    set_v_fail = set() if novirial else set(id_v_fail)
+    set_accu = set_f_accu & set_v_accu
+    set_cand = (
+        (set_f_cand & set_v_accu)
+        | (set_f_cand & set_v_cand)
+        | (set_f_accu & set_v_cand)
+    )
+    set_fail = set_f_fail | set_v_fail
+    return nframes, set_accu, set_cand, set_fail
+
+
+class TestTrajsExplorationReportClassification(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.md_f = [rng.uniform(0.0, 1.0, size=nn) for nn in rng.integers(1, 300, 9)]
+        self.md_v = [rng.uniform(0.0, 1.0, size=len(ii)) for ii in self.md_f]
+
+    def _model_devi(self, virial, manager=DeviManagerStd):
+        model_devi = manager()
+        for ii in range(len(self.md_f)):
+            model_devi.add(DeviManager.MAX_DEVI_F, self.md_f[ii])
+            if virial:
+                model_devi.add(DeviManager.MAX_DEVI_V, self.md_v[ii])
+        return model_devi
+
+    def test_consistent_with_sets(self):
+        for virial in [True, False]:
+            levels = (0.3, 0.6, 0.2, 0.7) if virial else (0.3, 0.6, None, None)
+            ref = [
+                set_based_classification(
+                    self.md_f[ii], self.md_v[ii] if virial else None, *levels
+                )
+                for ii in range(len(self.md_f))
+            ]
+            nframes = sum([rr[0] for rr in ref])
+            for report, manager in itertools.product(
+                [ExplorationReportTrustLevelsRandom, ExplorationReportTrustLevelsMax],
+                [DeviManagerStd, DeviManagerColumnar],
+            ):
+                ter = report(*levels, conv_accuracy=0.9)
+                ter.record(self._model_devi(virial, manager))
+                self.assertEqual(ter.traj_nframes, [rr[0] for rr in ref])
+                self.assertEqual(ter.traj_accu, [rr[1] for rr in ref])
+                self.assertEqual(ter.traj_cand, [rr[2] for rr in ref])
+                self.assertEqual(ter.traj_fail, [rr[3] for rr in ref])
+                self.assertEqual(
+                    ter.accurate_ratio(),
+                    float(sum([len(rr[1]) for rr in ref])) / float(nframes),
+                )
+                self.assertEqual(
+                    ter.candidate_ratio(),
+                    float(sum([len(rr[2]) for rr in ref])) / float(nframes),
+                )
+                self.assertEqual(
+                    ter.failed_ratio(),
+                    float(sum([len(rr[3]) for rr in ref])) / float(nframes),
+                )
+                self.assertEqual(
+                    ter.get_candidate_ids(),
+                    [sorted(rr[2]) for rr in ref],
+                )
+
+    def test_virial_inconsistent(self):
+        model_devi = DeviManagerStd()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([0.1, 0.4, 0.7]))
+        model_devi.add(DeviManager.MAX_DEVI_V, np.array([0.1, np.nan, 0.7]))
+        ter = ExplorationReportTrustLevelsRandom(0.3, 0.6, 0.3, 0.6)
+        with self.assertRaises(FatalError):
+            ter.record(model_devi)
+
+
+class TestTrajsExplorationReportCompact(unittest.TestCase):
+    def _model_devi(self, nframes, seed=0):
+        rng = np.random.default_rng(seed)
+        model_devi = DeviManagerStd()
+        for ii in range(3):
+            model_devi.add(DeviManager.MAX_DEVI_F, rng.uniform(0.0, 1.0, nframes))
+            model_devi.add(DeviManager.MAX_DEVI_V, rng.uniform(0.0, 1.0, nframes))
+        return model_devi
+
+    def test_compact(self):
+        for report in [
+            ExplorationReportTrustLevelsRandom,
+            ExplorationReportTrustLevelsMax,
+        ]:
+            ter = report(0.3, 0.6, 0.2, 0.7, conv_accuracy=0.9)
+            ter.record(self._model_devi(100))
+            picked = ter.get_candidate_ids(5)
+            ratios = (ter.accurate_ratio(), ter.candidate_ratio(), ter.failed_ratio())
+            hist_f = ter.hist_f.copy()
+            self.assertEqual(hist_f.sum(), 300)
+            self.assertEqual(ter.hist_v.sum(), 300)
+            ter.compact(picked)
+            self.assertIsNone(ter.model_devi)
+            self.assertEqual(ter.traj_cand, [])
+            self.assertEqual(ter.get_candidate_ids(), picked)
+            self.assertEqual(ter.get_candidate_ids(5), picked)
+            self.assertFalse(ter.no_candidate())
+            self.assertEqual(
+                (ter.accurate_ratio(), ter.candidate_ratio(), ter.failed_ratio()),
+                ratios,
+            )
+            np.testing.assert_array_equal(ter.hist_f, hist_f)
+            self.assertEqual(ter.converged(), ratios[0] >= 0.9)
+
+    def test_histogram(self):
+        model_devi = DeviManagerStd()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([0.0, 0.05, 0.59, 1.19, 3.0]))
+        ter = ExplorationReportTrustLevelsRandom(0.3, 0.6)
+        ter.record(model_devi)
+        self.assertEqual(ter.hist_edges_f[-1], 1.2)
+        self.assertEqual(ter.hist_f.sum(), 5)
+        self.assertEqual(ter.hist_f[0], 1)
+        self.assertEqual(ter.hist_f[2], 1)
+        self.assertEqual(ter.hist_f[-1], 2)
+        self.assertIsNone(ter.hist_v)
+
+    def test_size_bounded(self):
+        sizes = []
+        for nframes in [100, 10000]:
+            ter = ExplorationReportTrustLevelsRandom(0.3, 0.6, 0.2, 0.7)
+            ter.record(self._model_devi(nframes))
+            ter.compact(ter.get_candidate_ids(10))
+            sizes.append(len(pickle.dumps(ter)))
+        self.assertLess(abs(sizes[1] - sizes[0]), 100)
+
+
+class TestSampleCandidates(unittest.TestCase):
+    def test_sample(self):
+        numb_cand = np.array([3, 0, 5, 1, 0, 7])
+        rng = np.random.default_rng(0)
+        counts = Counter()
+        for _ in range(2000):
+            traj_idx, cand_idx = sample_candidates(numb_cand, 4, rng)
+            picked = list(zip(traj_idx.tolist(), cand_idx.tolist()))
+            self.assertEqual(len(set(picked)), 4)
+            self.assertEqual(picked, sorted(picked))
+            for tt, cc in picked:
+                self.assertLess(cc, numb_cand[tt])
+            counts.update(picked)
+        # all the 16 candidates are picked with the same probability 1/4
+        self.assertEqual(len(counts), 16)
+        for vv in counts.values():
+            self.assertLess(abs(vv / 2000.0 - 0.25), 0.05)
+        # not enough candidates
+        traj_idx, cand_idx = sample_candidates(numb_cand, 100, rng)
+        self.assertEqual(traj_idx.size, 16)
+
+    def test_seed(self):
+        rng = np.random.default_rng(0)
+        model_devi = DeviManagerStd()
+        for nn in [100, 0, 300, 50]:
+            model_devi.add(DeviManager.MAX_DEVI_F, rng.uniform(0.0, 1.0, nn))
+        picked = []
+        for seed in [1, 1, 2]:
+            ter = ExplorationReportTrustLevelsRandom(0.3, 0.6, seed=seed)
+            ter.record(model_devi)
+            picked.append(ter.get_candidate_ids(20))
+            self.assertEqual(sum([len(ii) for ii in picked[-1]]), 20)
+            for tt, ids in enumerate(picked[-1]):
+                self.assertEqual(ids, sorted(ids))
+                self.assertTrue(set(ids) <= ter.traj_cand[tt])
+        # the selection is reproduced with the same seed
+        self.assertEqual(picked[0], picked[1])
+        self.assertNotEqual(picked[0], picked[2])
+        # the generator is reset by clearing the report
+        ter.clear()
+        ter.record(model_devi)
+        self.assertEqual(ter.get_candidate_ids(20), picked[2])
@@ -0,0 +1,225 @@
+import os
+import pickle
+import unittest
+from pathlib import (
+    Path,
+)
+
+try:
+    from exploration.context import (
+        dpgen2,
+    )
+except ModuleNotFoundError:
+    # case of upload everything to argo, no context needed
+    pass
+
+from dpgen2.constants import (
+    lmp_rescreen_ref_name,
+)
+from dpgen2.exploration.scheduler import (
+    ConvergenceCheckStageScheduler,
+)
+from dpgen2.exploration.task import (
+    RescreenTaskGroup,
+    read_rescreen_frames,
+)
+
+# isort: off
+import exploration.context
+from mocked_ops import (
+    MockedExplorationReport,
+    MockedExplorationTaskGroup,
+    MockedStage,
+)
+
+# isort: on
+
+
+def make_frames(steps, natoms=2):
+    ret = []
+    for ii in steps:
+        ret.append(
+            f"ITEM: TIMESTEP\n{ii}\nITEM: NUMBER OF ATOMS\n{natoms}\n"
+            "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+            "ITEM: ATOMS id type x y z\n"
+            + "".join(f"{jj + 1} 1 {ii}.0 {jj}.0 0\n" for jj in range(natoms))
+        )
+    return ret
+
+
+class TestRescreenTaskGroup(unittest.TestCase):
+    def setUp(self):
+        self.trajs = [Path("traj.0.dump"), Path("traj.1.dump")]
+        self.frames = make_frames(range(5)) + make_frames(range(10, 13))
+        self.trajs[0].write_text("".join(self.frames[:5]))
+        # a pruned frame
+        self.trajs[1].write_text(
+            "".join(self.frames[5:7] + make_frames([20], natoms=0) + self.frames[7:])
+        )
+
+    def tearDown(self):
+        for ii in self.trajs:
+            if ii.is_file():
+                os.remove(ii)
+
+    def test_make_task(self):
+        grp = RescreenTaskGroup(10, frames_per_task=3)
+        self.assertEqual(len(grp.make_task()), 0)
+        grp.set_trajs(self.trajs + [None])
+        # the pruned frame is not kept
+        self.assertEqual(
+            grp.frames.tolist(),
+            [[0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [1, 0], [1, 1], [1, 3]],
+        )
+        tasks = grp.make_task()
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(
+            [list(tt.files().keys()) for tt in tasks], [[lmp_rescreen_ref_name]] * 3
+        )
+        self.assertEqual(
+            b"".join(
+                read_rescreen_frames(tt.files()[lmp_rescreen_ref_name], self.trajs)
+                for tt in tasks
+            ).decode(),
+            "".join(self.frames),
+        )
+
+    def test_selected(self):
+        grp = RescreenTaskGroup(10)
+        grp.set_trajs(self.trajs, [[1, 3], [3]])
+        self.assertEqual(
+            grp.frames.tolist(),
+            [[0, 0], [0, 2], [0, 4], [1, 0], [1, 1]],
+        )
+
+    def test_max_frames(self):
+        grp = RescreenTaskGroup(4)
+        grp.set_trajs(self.trajs)
+        self.assertEqual(grp.frames.shape, (4, 2))
+        # the order of the frames is kept
+        idx = [tuple(ii) for ii in grp.frames.tolist()]
+        self.assertEqual(idx, sorted(idx))
+
+    def test_pickle(self):
+        grp = RescreenTaskGroup(10)
+        grp.set_trajs(self.trajs)
+        # the pool only refers to the frames
+        self.assertLess(len(pickle.dumps(grp)), len("".join(self.frames)))
+        # the pool kept as text by the previous versions is dropped
+        grp.__dict__["frames"] = self.frames
+        grp = pickle.loads(pickle.dumps(grp))
+        self.assertEqual(len(grp.make_task()), 0)
+
+
+class MockedRecordSelector:
+    def __init__(self, accurate):
+        self.accurate = accurate
+        self.recorded = None
+
+    def record(self, model_devis):
+        self.recorded = model_devis
+        report = MockedExplorationReport()
+        report.accurate = self.accurate
+        return report
+
+
+class MockedHistoryReport(MockedExplorationReport):
+    def __init__(self):
+        super().__init__()
+        self.accurate = 0.5
+
+    def converged(self, reports):
+        self.history = list(reports)
+        return super().converged(reports)
+
+
+class TestConvergenceCheckStageSchedulerRescreen(unittest.TestCase):
+    def setUp(self):
+        self.traj = Path("traj.dump")
+        self.traj.write_text("".join(make_frames(range(4))))
+        self.report = MockedExplorationReport()
+        self.report.accurate = 0.5
+
+    def tearDown(self):
+        if self.traj.is_file():
+            os.remove(self.traj)
+
+    def test_with_md(self):
+        scheduler = ConvergenceCheckStageScheduler(
+            MockedStage(),
+            None,
+            rescreen=RescreenTaskGroup(10, frames_per_task=3),
+        )
+        conv, ltg, sel = scheduler.plan_next_iteration()
+        self.assertEqual(len(ltg), 6)
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(conv, False)
+        self.assertEqual(len(ltg), 8)
+        self.assertIn(lmp_rescreen_ref_name, ltg[6].files())
+
+    def test_with_md_convergence(self):
+        selector = MockedRecordSelector(1.0)
+        scheduler = ConvergenceCheckStageScheduler(
+            MockedStage(),
+            selector,
+            rescreen=RescreenTaskGroup(10, frames_per_task=3),
+        )
+        scheduler.plan_next_iteration()
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(len(ltg), 8)
+        # the convergence is checked only by the MD tasks
+        model_devis = [Path(f"model_devi.{ii}.out") for ii in range(8)]
+        conv, ltg, sel = scheduler.plan_next_iteration(
+            self.report, [self.traj], model_devis
+        )
+        self.assertEqual(conv, True)
+        self.assertEqual(selector.recorded, model_devis[:6])
+        self.assertEqual(scheduler.get_reports()[-1].accurate, 1.0)
+
+    def test_only(self):
+        scheduler = ConvergenceCheckStageScheduler(
+            MockedStage(),
+            None,
+            rescreen=RescreenTaskGroup(10, frames_per_task=3),
+            rescreen_only=True,
+        )
+        scheduler.plan_next_iteration()
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(len(ltg), 2)
+        self.assertIn(lmp_rescreen_ref_name, ltg[0].files())
+        # the convergence is not checked by the re-screened frames
+        self.report.accurate = 1.0
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(conv, False)
+        self.assertEqual(len(ltg), 2)
+        # explore by MD once no candidate is found
+        self.report.candidate = 0.0
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(conv, False)
+        self.assertTrue(isinstance(ltg, MockedExplorationTaskGroup))
+        conv, ltg, sel = scheduler.plan_next_iteration(self.report, [self.traj])
+        self.assertEqual(conv, True)
+        self.assertEqual(len(scheduler.get_reports()), 4)
+
+    def test_only_history(self):
+        # the history of the convergence check is of the MD reports
+        md_report = MockedHistoryReport()
+        rescreen_report = MockedHistoryReport()
+        scheduler = ConvergenceCheckStageScheduler(
+            MockedStage(),
+            None,
+            rescreen=RescreenTaskGroup(10, frames_per_task=3),
+            rescreen_only=True,
+        )
+        scheduler.plan_next_iteration()
+        conv, ltg, sel = scheduler.plan_next_iteration(md_report, [self.traj])
+        self.assertEqual(md_report.history, [])
+        self.assertEqual(len(ltg), 2)
+        rescreen_report.candidate = 0.0
+        conv, ltg, sel = scheduler.plan_next_iteration(rescreen_report, [self.traj])
+        self.assertTrue(isinstance(ltg, MockedExplorationTaskGroup))
+        conv, ltg, sel = scheduler.plan_next_iteration(md_report, [self.traj])
+        self.assertEqual(md_report.history, [md_report])
+        self.assertEqual(
+            scheduler.get_reports(), [md_report, rescreen_report, md_report]
+        )
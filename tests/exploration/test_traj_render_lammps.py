@@ -0,0 +1,236 @@
+import os
+import textwrap
+import time
+import unittest
+import warnings
+from pathlib import (
+    Path,
+)
+
+import numpy as np
+from context import (
+    dpgen2,
+    run_benchmark,
+    run_benchmark_reason,
+)
+
+from dpgen2.exploration.deviation import (
+    DeviManager,
+    DeviManagerColumnar,
+)
+from dpgen2.exploration.render import (
+    TrajRenderLammps,
+)
+from dpgen2.exploration.render.traj_render_lammps import (
+    find_model_devi_npy,
+    load_model_devi_npy,
+    read_model_devi,
+    write_model_devi_npy,
+)
+
+all_names = [
+    DeviManager.MAX_DEVI_V,
+    DeviManager.MIN_DEVI_V,
+    DeviManager.AVG_DEVI_V,
+    DeviManager.MAX_DEVI_F,
+    DeviManager.MIN_DEVI_F,
+    DeviManager.AVG_DEVI_F,
+]
+
+
+class TestReadModelDevi(unittest.TestCase):
+    def setUp(self):
+        self.model_devi_file = textwrap.dedent(
+            """#       step         max_devi_v         min_devi_v         avg_devi_v         max_devi_f         min_devi_f         avg_devi_f
+            0 0.1 0.01 0.05 0.2 0.02 0.1
+            10 0.2 0.02 0.06 0.3 0.03 0.2
+            20 0.3 0.03 0.07 0.4 0.04 0.3
+            #       step         max_devi_v         min_devi_v         avg_devi_v         max_devi_f         min_devi_f         avg_devi_f
+            30 0.4 0.04 0.08 0.5 0.05 0.4
+            40 0.5 0.05 0.09 0.6 0.06 0.5
+            """
+        )
+        self.fname = Path("model_devi.out")
+        self.fname.write_text(self.model_devi_file)
+
+    def tearDown(self):
+        if self.fname.is_file():
+            os.remove(self.fname)
+
+    def test_all_columns(self):
+        dd = read_model_devi(self.fname)
+        self.assertEqual(len(dd), 6)
+        np.testing.assert_allclose(
+            dd[DeviManager.MAX_DEVI_V], [0.1, 0.2, 0.3, 0.4, 0.5]
+        )
+        np.testing.assert_allclose(
+            dd[DeviManager.AVG_DEVI_F], [0.1, 0.2, 0.3, 0.4, 0.5]
+        )
+
+    def test_chunks(self):
+        for chunk_size in [1, 2, 3, 100]:
+            dd = read_model_devi(
+                self.fname,
+                [DeviManager.MAX_DEVI_F, DeviManager.MIN_DEVI_V],
+                chunk_size=chunk_size,
+            )
+            self.assertEqual(
+                list(dd.keys()), [DeviManager.MAX_DEVI_F, DeviManager.MIN_DEVI_V]
+            )
+            np.testing.assert_allclose(
+                dd[DeviManager.MAX_DEVI_F], [0.2, 0.3, 0.4, 0.5, 0.6]
+            )
+            np.testing.assert_allclose(
+                dd[DeviManager.MIN_DEVI_V], [0.01, 0.02, 0.03, 0.04, 0.05]
+            )
+
+    def test_float32(self):
+        dd = read_model_devi(self.fname, [DeviManager.MAX_DEVI_F], dtype=np.float32)
+        self.assertEqual(dd[DeviManager.MAX_DEVI_F].dtype, np.float32)
+        np.testing.assert_allclose(
+            dd[DeviManager.MAX_DEVI_F], [0.2, 0.3, 0.4, 0.5, 0.6], rtol=1e-6
+        )
+
+    def test_empty(self):
+        self.fname.write_text("# step max_devi_v\n")
+        dd = read_model_devi(self.fname, [DeviManager.MAX_DEVI_F])
+        self.assertEqual(dd[DeviManager.MAX_DEVI_F].shape, (0,))
+
+    def test_render(self):
+        render = TrajRenderLammps()
+        model_devi = render.get_model_devi([self.fname, self.fname])
+        self.assertEqual(model_devi.ntraj, 2)
+        md_f = model_devi.get(DeviManager.MAX_DEVI_F)
+        np.testing.assert_allclose(md_f[1], [0.2, 0.3, 0.4, 0.5, 0.6])
+        self.assertEqual(model_devi.get(DeviManager.AVG_DEVI_F), [None, None])
+
+    def test_render_columnar(self):
+        render = TrajRenderLammps(columnar_devi=True, use_float32=True)
+        model_devi = render.get_model_devi([self.fname, self.fname])
+        self.assertTrue(isinstance(model_devi, DeviManagerColumnar))
+        md_f = model_devi.get_concat(DeviManager.MAX_DEVI_F)
+        self.assertEqual(md_f.dtype, np.float32)
+        np.testing.assert_allclose(md_f, [0.2, 0.3, 0.4, 0.5, 0.6] * 2, rtol=1e-6)
+        np.testing.assert_array_equal(model_devi.get_traj_offsets(), [0, 5, 10])
+
+    def test_render_parallel(self):
+        files = [self.fname] * 5
+        serial = TrajRenderLammps().get_model_devi(files)
+        parallel = TrajRenderLammps(max_workers=2).get_model_devi(files)
+        self.assertEqual(parallel.ntraj, 5)
+        for name in [DeviManager.MAX_DEVI_V, DeviManager.MAX_DEVI_F]:
+            for ii, jj in zip(serial.get(name), parallel.get(name)):
+                np.testing.assert_array_equal(ii, jj)
+
+    def test_npy(self):
+        npy_fname = Path("foo.npy")
+        write_model_devi_npy(self.fname, npy_fname)
+        self.assertEqual(find_model_devi_npy(npy_fname), npy_fname)
+        self.assertEqual(find_model_devi_npy(self.fname), None)
+        dd = load_model_devi_npy(npy_fname)
+        ref = read_model_devi(self.fname)
+        # only the step and the used model deviations are stored
+        self.assertEqual(
+            list(dd.keys()), [DeviManager.MAX_DEVI_V, DeviManager.MAX_DEVI_F]
+        )
+        for name in dd.keys():
+            np.testing.assert_array_equal(dd[name], ref[name])
+        np.testing.assert_array_equal(np.load(npy_fname)["step"], np.arange(5) * 10)
+        with self.assertRaisesRegex(RuntimeError, "not stored"):
+            load_model_devi_npy(npy_fname, [DeviManager.AVG_DEVI_F])
+        # loaded from npy by the render
+        for use_fast_reader in [True, False]:
+            render = TrajRenderLammps(use_fast_reader=use_fast_reader)
+            model_devi = render.get_model_devi([npy_fname])
+            np.testing.assert_array_equal(
+                model_devi.get(DeviManager.MAX_DEVI_F)[0],
+                ref[DeviManager.MAX_DEVI_F],
+            )
+        os.remove(npy_fname)
+
+    def test_npy_all_names(self):
+        npy_fname = Path("foo.npy")
+        write_model_devi_npy(self.fname, npy_fname, all_names)
+        dd = load_model_devi_npy(npy_fname)
+        ref = read_model_devi(self.fname)
+        for name in all_names:
+            np.testing.assert_array_equal(dd[name], ref[name])
+        # the table written by the previous versions
+        np.save(npy_fname, np.loadtxt(self.fname))
+        dd = load_model_devi_npy(npy_fname)
+        for name in all_names:
+            np.testing.assert_array_equal(dd[name], ref[name])
+        os.remove(npy_fname)
+
+    def test_npy_empty(self):
+        npy_fname = Path("foo.npy")
+        self.fname.write_text(
+            "#       step         max_devi_v         min_devi_v         avg_devi_v         max_devi_f         min_devi_f         avg_devi_f\n"
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            write_model_devi_npy(self.fname, npy_fname)
+        dd = load_model_devi_npy(npy_fname)
+        self.assertEqual(dd[DeviManager.MAX_DEVI_F].shape, (0,))
+        os.remove(npy_fname)
+
+    def test_npy_sidecar(self):
+        npy_fname = self.fname.with_suffix(".npy")
+        write_model_devi_npy(self.fname, npy_fname)
+        self.assertEqual(find_model_devi_npy(self.fname), npy_fname)
+        # the text file is not parsed if the sidecar exists
+        self.fname.write_text("foo")
+        render = TrajRenderLammps(use_float32=True)
+        model_devi = render.get_model_devi([self.fname])
+        md_f = model_devi.get(DeviManager.MAX_DEVI_F)[0]
+        self.assertEqual(md_f.dtype, np.float32)
+        np.testing.assert_allclose(md_f, [0.2, 0.3, 0.4, 0.5, 0.6], rtol=1e-6)
+        os.remove(npy_fname)
+
+    def test_render_consistent_with_loadtxt(self):
+        fast = TrajRenderLammps(model_devi_names=all_names)
+        slow = TrajRenderLammps(use_fast_reader=False)
+        fast_devi = fast.get_model_devi([self.fname])
+        slow_devi = slow.get_model_devi([self.fname])
+        for name in all_names:
+            np.testing.assert_array_equal(
+                fast_devi.get(name)[0], slow_devi.get(name)[0]
+            )
+
+
+@unittest.skipIf(not run_benchmark, run_benchmark_reason)
+class BenchmarkReadModelDevi(unittest.TestCase):
+    def setUp(self):
+        self.nframes = 100000
+        self.ntraj = 10
+        dd = np.random.random((self.nframes, 7))
+        dd[:, 0] = np.arange(self.nframes) * 10
+        self.fname = Path("model_devi.bench.out")
+        with open(self.fname, "w") as fp:
+            fp.write("#       step         max_devi_v         min_devi_v\n")
+            np.savetxt(fp, dd, fmt=["%12d"] + ["%18.6e"] * 6)
+
+    def tearDown(self):
+        if self.fname.is_file():
+            os.remove(self.fname)
+
+    def test_benchmark(self):
+        files = [self.fname] * self.ntraj
+        renders = {
+            "np.loadtxt": TrajRenderLammps(use_fast_reader=False),
+            "fast": TrajRenderLammps(),
+            "fast float32": TrajRenderLammps(use_float32=True),
+        }
+        for name, render in renders.items():
+            tic = time.perf_counter()
+            model_devi = render.get_model_devi(files)
+            toc = time.perf_counter()
+            nbytes = 0
+            for kk in all_names:
+                nbytes += sum(
+                    [jj.nbytes for jj in model_devi.get(kk) if jj is not None]
+                )
+            print(
+                f"{name:>16s}: {toc - tic:8.3f} s   {nbytes / 1024**2:8.1f} MiB "
+                f"for {self.ntraj} x {self.nframes} frames"
+            )
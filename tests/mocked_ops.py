@@ -749,8 +749,8 @@ class MockedExplorationReport(ExplorationReport):
     def no_candidate(self):
         return self.candidate_ratio() == 0.0
 
-    def get_candidate_ids(self, max_nframes):
-        raise NotImplementedError
+    def get_candidate_ids(self, max_nframes=None):
+        return []
 
     def failed_ratio(
         self,
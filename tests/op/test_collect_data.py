@@ -33,6 +33,7 @@ from dpgen2.constants import (
     lmp_log_name,
     lmp_model_devi_name,
     lmp_traj_name,
+    novelty_index_name,
 )
 from dpgen2.op.collect_data import (
     CollectData,
@@ -121,6 +122,33 @@ class TestRunLmp(unittest.TestCase):
         self.assertEqual(ms.systems["foo1bar0"].get_nframes(), 3)
         self.assertEqual(ms.systems["foo2bar0"].get_nframes(), 4)
 
+    def test_novelty_index(self):
+        op = CollectData()
+        self.type_map = ["bar", "foo"]
+        novelty_index = {"min_dist": 0.1, "nbins": 10}
+        out = op.execute(
+            OPIO(
+                {
+                    "name": "iter1",
+                    "type_map": self.type_map,
+                    "optional_parameter": {
+                        "mixed_type": False,
+                        "novelty_index": novelty_index,
+                    },
+                    "iter_data": [],
+                    "labeled_data": self.labeled_data,
+                    "init_data": self.iter_data,
+                }
+            )
+        )
+        self.assertEqual(out["iter_data"], [Path("iter1")])
+        # the first shard indexes the initial data
+        fps = np.load(Path("iter1") / f"{novelty_index_name}.fps.npy")
+        self.assertEqual(fps.shape[0], 6 + 5 + 3 + 4)
+        ms = dpdata.MultiSystems(type_map=self.type_map)
+        ms.from_deepmd_npy(out["iter_data"][0])
+        self.assertEqual(ms.get_nframes(), 11)
+
 
 class TestRunLmpEmpty(unittest.TestCase):
     def setUp(self):
@@ -11,6 +11,7 @@ from dflow.python import (
     OP,
     OPIO,
     Artifact,
+    FatalError,
     OPIOSign,
     TransientError,
 )
@@ -24,16 +25,47 @@ from op.context import (
 )
 
 from dpgen2.constants import (
+    lmp_bundle_input_name,
+    lmp_bundle_log_name,
     lmp_conf_name,
     lmp_input_name,
     lmp_log_name,
     lmp_model_devi_name,
+    lmp_model_devi_npy_name,
+    lmp_rescreen_name,
+    lmp_restart_name,
+    lmp_stop_name,
     lmp_traj_name,
+    lmp_traj_summary_name,
     model_name_pattern,
 )
+from dpgen2.exploration.deviation import (
+    DeviManager,
+    DeviManagerStd,
+)
+from dpgen2.exploration.render.lammps_dump import (
+    index_lammps_dump,
+    lammps_dump_natoms,
+    lammps_dump_timesteps,
+)
+from dpgen2.exploration.render.traj_render_lammps import (
+    read_model_devi,
+)
+from dpgen2.exploration.report import (
+    ExplorationReportAdaptiveLower,
+    ExplorationReportTrustLevelsRandom,
+)
 from dpgen2.op.run_lmp import (
+    CandidateQuota,
+    ModelDeviWatchdog,
     RunLmp,
+    RunLmpBundle,
+    pad_failed_outputs,
+    prune_lmp_traj,
     randomly_shuffle_models,
+    rescreen_lmp_traj,
+    set_restart_freq,
+    trim_stopped_outputs,
 )
 from dpgen2.utils import (
     BinaryFileInput,
@@ -96,6 +128,90 @@ class TestRunLmp(unittest.TestCase):
                 (work_dir / (model_name_pattern % ii)).read_text(), f"model{ii}"
             )
 
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_binary_model_devi(self, mocked_run):
+        def run_lmp(*args, **kwargs):
+            Path(lmp_model_devi_name).write_text(
+                "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+                "0 0.1 0.01 0.05 0.2 0.02 0.1\n"
+                "10 0.2 0.02 0.06 0.3 0.03 0.2\n"
+            )
+            return (0, "foo\n", "")
+
+        mocked_run.side_effect = run_lmp
+        op = RunLmp()
+        out = op.execute(
+            OPIO(
+                {
+                    "config": {"command": "mylmp", "binary_model_devi": True},
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+        work_dir = Path(self.task_name)
+        self.assertEqual(out["model_devi"], work_dir / lmp_model_devi_npy_name)
+        dd = np.load(out["model_devi"])
+        np.testing.assert_array_equal(dd["step"], [0, 10])
+        np.testing.assert_allclose(dd["max_devi_v"], [0.1, 0.2])
+        np.testing.assert_allclose(dd["max_devi_f"], [0.2, 0.3])
+        self.assertTrue((work_dir / lmp_model_devi_name).is_file())
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_prune_traj(self, mocked_run):
+        def run_lmp(*args, **kwargs):
+            Path(lmp_model_devi_name).write_text(
+                "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+                "0 0.1 0.01 0.05 0.05 0.02 0.1\n"
+                "10 0.2 0.02 0.06 0.15 0.03 0.2\n"
+                "20 0.2 0.02 0.06 0.35 0.03 0.2\n"
+                "30 0.2 0.02 0.06 0.05 0.03 0.2\n"
+            )
+            frames = []
+            for ii in range(4):
+                frames.append(
+                    f"ITEM: TIMESTEP\n{ii * 10}\nITEM: NUMBER OF ATOMS\n2\n"
+                    "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+                    f"ITEM: ATOMS id type x y z\n1 1 {ii}.0 0 0\n2 1 0 {ii}.0 0\n"
+                )
+            Path(lmp_traj_name).write_text("".join(frames))
+            return (0, "foo\n", "")
+
+        mocked_run.side_effect = run_lmp
+        op = RunLmp()
+        out = op.execute(
+            OPIO(
+                {
+                    "config": {
+                        "command": "mylmp",
+                        "prune_traj": {"level_f_lo": 0.1, "level_f_hi": 0.3},
+                    },
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+        work_dir = Path(self.task_name)
+        self.assertEqual(out["traj_summary"], work_dir / lmp_traj_summary_name)
+        summary = json.loads(out["traj_summary"].read_text())
+        self.assertEqual(
+            summary,
+            {"nframes": 4, "accurate": 2, "candidate": 1, "failed": 1, "kept": 2},
+        )
+        lines = out["traj"].read_text().split("\n")
+        self.assertEqual(
+            [
+                lines[ii + 1]
+                for ii, ll in enumerate(lines)
+                if ll == "ITEM: NUMBER OF ATOMS"
+            ],
+            ["0", "2", "0", "2"],
+        )
+        # the model deviation is not pruned
+        self.assertEqual(len(np.loadtxt(out["model_devi"])), 4)
+
     @patch("dpgen2.op.run_lmp.run_command")
     def test_error(self, mocked_run):
         mocked_run.side_effect = [(1, "foo\n", "")]
@@ -121,6 +237,800 @@ class TestRunLmp(unittest.TestCase):
         mocked_run.assert_has_calls(calls)
 
 
+def write_lmp_outputs(steps):
+    frames = []
+    for ii in steps:
+        frames.append(
+            f"ITEM: TIMESTEP\n{ii}\nITEM: NUMBER OF ATOMS\n1\n"
+            "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+            f"ITEM: ATOMS id type x y z\n1 1 {ii}.0 0 0\n"
+        )
+    Path(lmp_traj_name).write_text("".join(frames))
+    Path(lmp_model_devi_name).write_text(
+        "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+        + "".join(f"{ii} 0.1 0.01 0.05 0.2 0.02 0.1\n" for ii in steps)
+    )
+
+
+class TestRunLmpCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.task_path = Path("task/path")
+        self.task_path.mkdir(parents=True, exist_ok=True)
+        self.model_path = Path("models/path")
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        (self.task_path / lmp_conf_name).write_text("foo")
+        self.lmp_input = (
+            'if "${restart} > 0" then "read_restart dpgen.restart.*" else "read_data conf.lmp"\n'
+            "restart         10000 dpgen.restart\n"
+            "run             40 upto\n"
+        )
+        (self.task_path / lmp_input_name).write_text(self.lmp_input)
+        self.task_name = "task_000"
+        self.models = [self.model_path / Path(f"model_{ii}.pb") for ii in range(4)]
+        for idx, ii in enumerate(self.models):
+            ii.write_text(f"model{idx}")
+        self.config = {
+            "command": "mylmp",
+            "checkpoint": {"path": "ckpt", "freq": 20},
+        }
+
+    def tearDown(self):
+        for ii in ["task", "models", "ckpt"]:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+        if Path(self.task_name).is_symlink():
+            os.remove(self.task_name)
+
+    def execute(self, key=None):
+        # each attempt runs in a new pod
+        if Path(self.task_name).is_symlink():
+            os.remove(self.task_name)
+        op = RunLmp()
+        op.key = key
+        return op.execute(
+            OPIO(
+                {
+                    "config": self.config,
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_resume(self, mocked_run):
+        def preempted(*args, **kwargs):
+            self.assertIn(
+                "restart         20 dpgen.restart", Path(lmp_input_name).read_text()
+            )
+            write_lmp_outputs([0, 10, 20, 30])
+            Path(f"{lmp_restart_name}.20").write_text("restart")
+            return (1, "", "preempted")
+
+        def preempted_again(*args, **kwargs):
+            self.assertEqual(Path(lmp_traj_name).is_file(), False)
+            write_lmp_outputs([20])
+            Path(f"{lmp_restart_name}.30").write_text("restart")
+            return (1, "", "preempted")
+
+        def resumed(*args, **kwargs):
+            write_lmp_outputs([30, 40])
+            return (0, "", "")
+
+        mocked_run.side_effect = preempted
+        with self.assertRaises(TransientError):
+            self.execute()
+        mocked_run.side_effect = preempted_again
+        with self.assertRaises(TransientError):
+            self.execute()
+        mocked_run.side_effect = resumed
+        out = self.execute()
+        commands = [
+            " ".join(
+                ["mylmp", "-i", lmp_input_name, "-log", lmp_log_name, "-v restart", ii]
+            )
+            for ii in ["0", "1", "1"]
+        ]
+        mocked_run.assert_has_calls([call(ii, shell=True) for ii in commands])
+        # the outputs are kept in the checkpoint directory
+        self.assertEqual(
+            Path(self.task_name).resolve(), (Path("ckpt") / self.task_name).resolve()
+        )
+        text = out["traj"].read_text()
+        self.assertEqual(text.count("ITEM: TIMESTEP"), 5)
+        for ii in [0, 10, 20, 30, 40]:
+            self.assertIn(f"ITEM: TIMESTEP\n{ii}\n", text)
+        md = np.loadtxt(out["model_devi"])
+        np.testing.assert_array_equal(md[:, 0], [0, 10, 20, 30, 40])
+        self.assertEqual(out["model_devi"].read_text().count("#"), 1)
+        self.assertEqual((Path(self.task_name) / lmp_conf_name).read_text(), "foo")
+        # the input of the task is not revised
+        self.assertEqual((self.task_path / lmp_input_name).read_text(), self.lmp_input)
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_resume_quota(self, mocked_run):
+        counter_dir = Path("ckpt/counters").absolute()
+        self.config["quota"] = {
+            "path": str(counter_dir),
+            "max_candidates": 100,
+            "level_f_lo": 0.1,
+            "level_f_hi": 0.3,
+        }
+
+        def preempted(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([0, 10, 20, 30])
+            Path(f"{lmp_restart_name}.20").write_text("restart")
+            return (1, "", "preempted", check())
+
+        def resumed(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([20, 30, 40])
+            return (0, "", "", check())
+
+        key = "iter-000001--run-lmp-000000"
+        mocked_run.side_effect = preempted
+        with self.assertRaises(TransientError):
+            self.execute(key)
+        mocked_run.side_effect = resumed
+        self.execute(key)
+        # the stashed frames are counted
+        counters = list(counter_dir.glob("**/*.json"))
+        self.assertEqual(len(counters), 1)
+        self.assertEqual(json.loads(counters[0].read_text()), {"candidate": 5})
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_changed_input(self, mocked_run):
+        def preempted(*args, **kwargs):
+            write_lmp_outputs([0, 10])
+            Path(f"{lmp_restart_name}.10").write_text("restart")
+            return (1, "", "preempted")
+
+        def rerun(*args, **kwargs):
+            self.assertEqual(Path(f"{lmp_restart_name}.10").exists(), False)
+            write_lmp_outputs([0, 10, 20])
+            return (0, "", "")
+
+        mocked_run.side_effect = preempted
+        with self.assertRaises(TransientError):
+            self.execute()
+        # the checkpoint of other inputs is not resumed
+        (self.task_path / lmp_conf_name).write_text("bar")
+        mocked_run.side_effect = rerun
+        out = self.execute()
+        self.assertTrue(mocked_run.call_args[0][0].endswith("-v restart 0"))
+        np.testing.assert_array_equal(np.loadtxt(out["model_devi"])[:, 0], [0, 10, 20])
+
+    def test_set_restart_freq(self):
+        Path(lmp_input_name).write_text("units metal\nrun 100\nrun 200\n")
+        set_restart_freq(lmp_input_name, 50)
+        self.assertEqual(
+            Path(lmp_input_name).read_text(),
+            f"units metal\nrestart         50 {lmp_restart_name}\nrun 100\nrun 200\n",
+        )
+        os.remove(lmp_input_name)
+
+
+class TestRunLmpWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.task_path = Path("task/path")
+        self.task_path.mkdir(parents=True, exist_ok=True)
+        self.model_path = Path("models/path")
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        (self.task_path / lmp_conf_name).write_text("foo")
+        (self.task_path / lmp_input_name).write_text("bar")
+        self.task_name = "task_000"
+        self.models = [self.model_path / Path(f"model_{ii}.pb") for ii in range(4)]
+        for idx, ii in enumerate(self.models):
+            ii.write_text(f"model{idx}")
+        self.header = (
+            "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+        )
+
+    def tearDown(self):
+        for ii in ["task", "models", self.task_name]:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+        for ii in [lmp_model_devi_name, lmp_traj_name]:
+            if Path(ii).is_file():
+                os.remove(ii)
+
+    def devi_line(self, step, devi_f, devi_v=0.0):
+        return f"{step} {devi_v} 0 0 {devi_f} 0 0\n"
+
+    def test_consecutive(self):
+        Path(lmp_model_devi_name).write_text(self.header)
+        watchdog = ModelDeviWatchdog(lmp_model_devi_name, 0.3, max_consecutive=2)
+        self.assertIsNone(watchdog())
+        with open(lmp_model_devi_name, "a") as fp:
+            fp.write(self.devi_line(0, 0.4) + self.devi_line(10, 0.1))
+            # partially written
+            fp.write("20 0.0 0 0 0.5")
+        self.assertIsNone(watchdog())
+        with open(lmp_model_devi_name, "a") as fp:
+            fp.write(" 0 0\n")
+        self.assertIsNone(watchdog())
+        with open(lmp_model_devi_name, "a") as fp:
+            fp.write(self.devi_line(30, 0.6))
+        self.assertEqual(watchdog(), "2 consecutive failed frames at step 30")
+
+    def test_window(self):
+        watchdog = ModelDeviWatchdog(
+            lmp_model_devi_name,
+            0.3,
+            level_v_hi=0.2,
+            window=4,
+            max_failed_ratio=0.5,
+        )
+        # the file is not written yet
+        self.assertIsNone(watchdog())
+        Path(lmp_model_devi_name).write_text(
+            self.header
+            + self.devi_line(0, 0.4)
+            + self.devi_line(10, 0.1)
+            + self.devi_line(20, 0.1)
+        )
+        self.assertIsNone(watchdog())
+        with open(lmp_model_devi_name, "a") as fp:
+            fp.write(self.devi_line(30, 0.1, devi_v=0.3))
+        self.assertEqual(
+            watchdog(), "2 failed frames in the latest 4 frames at step 30"
+        )
+
+    def test_level_hi(self):
+        # the frames at the higher level are failed as the reports count
+        write_lmp_outputs([0, 10, 20])
+        Path(lmp_model_devi_name).write_text(
+            self.header
+            + self.devi_line(0, 0.1)
+            + self.devi_line(10, 0.3)
+            + self.devi_line(20, 0.5)
+        )
+        model_devi = DeviManagerStd()
+        model_devi.add(DeviManager.MAX_DEVI_F, np.array([0.1, 0.3, 0.5]))
+        for fail_at_level_hi, report in [
+            (True, ExplorationReportTrustLevelsRandom(0.05, 0.3)),
+            (False, ExplorationReportAdaptiveLower(level_f_hi=0.3)),
+        ]:
+            report.record(model_devi)
+            nfailed = round(report.failed_ratio() * 3)
+            watchdog = ModelDeviWatchdog(
+                lmp_model_devi_name,
+                0.3,
+                window=3,
+                max_failed_ratio=0.5,
+                fail_at_level_hi=fail_at_level_hi,
+            )
+            self.assertEqual(watchdog() is not None, nfailed >= 2)
+            quota = CandidateQuota(
+                lmp_model_devi_name,
+                Path("counters") / "task_000.json",
+                10,
+                level_f_hi=0.3,
+                fail_at_level_hi=fail_at_level_hi,
+            )
+            quota()
+            self.assertEqual(quota.ncandidates, 3 - nfailed)
+            shutil.rmtree("counters")
+            summary = prune_lmp_traj(
+                lmp_traj_name,
+                lmp_model_devi_name,
+                level_f_hi=0.3,
+                fail_at_level_hi=fail_at_level_hi,
+            )
+            self.assertEqual(summary["failed"], nfailed)
+        self.assertEqual(summary["failed"], 1)
+
+    def test_config(self):
+        with self.assertRaises(RuntimeError):
+            ModelDeviWatchdog(lmp_model_devi_name, 0.3)
+        with self.assertRaises(RuntimeError):
+            ModelDeviWatchdog(lmp_model_devi_name, 0.3, window=10)
+
+    def test_trim(self):
+        write_lmp_outputs([0, 10, 20, 30])
+        # the last frame of the trajectory is partially written
+        text = Path(lmp_traj_name).read_text()
+        Path(lmp_traj_name).write_text(text[: text.rfind("\n", 0, -1) + 1])
+        # the model deviation is ahead of the trajectory
+        with open(lmp_model_devi_name, "a") as fp:
+            fp.write("40 0.1 0.01")
+        trim_stopped_outputs(lmp_traj_name, lmp_model_devi_name)
+        text = Path(lmp_traj_name).read_text()
+        self.assertEqual(text.count("ITEM: TIMESTEP"), 3)
+        self.assertNotIn("ITEM: TIMESTEP\n30\n", text)
+        md = np.loadtxt(lmp_model_devi_name)
+        np.testing.assert_array_equal(md[:, 0], [0, 10, 20])
+        self.assertEqual(Path(lmp_model_devi_name).read_text().count("#"), 1)
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_stopped(self, mocked_run):
+        def run_lmp(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([0, 10, 20])
+            with open(lmp_model_devi_name, "a") as fp:
+                fp.write(self.devi_line(30, 0.5))
+            Path(lmp_log_name).write_text("log\n")
+            return (-15, "", "", check())
+
+        mocked_run.side_effect = run_lmp
+        out = RunLmp().execute(
+            OPIO(
+                {
+                    "config": {
+                        "command": "mylmp",
+                        "watchdog": {
+                            "level_f_hi": 0.3,
+                            "max_consecutive": 1,
+                            "interval": 5.0,
+                        },
+                    },
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+        self.assertEqual(mocked_run.call_args[1], {"interval": 5.0, "shell": True})
+        work_dir = Path(self.task_name)
+        reason = "1 consecutive failed frames at step 30"
+        self.assertEqual(
+            json.loads((work_dir / lmp_stop_name).read_text()), {"reason": reason}
+        )
+        self.assertIn(reason, out["log"].read_text())
+        self.assertEqual(out["traj"].read_text().count("ITEM: TIMESTEP"), 3)
+        np.testing.assert_array_equal(np.loadtxt(out["model_devi"])[:, 0], [0, 10, 20])
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_stopped_padded(self, mocked_run):
+        (self.task_path / lmp_input_name).write_text(
+            "variable        NSTEPS          equal 50\n"
+            "variable        THERMO_FREQ     equal 10\n"
+            "run             ${NSTEPS} upto\n"
+        )
+
+        def run_lmp(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([0, 10, 20])
+            with open(lmp_model_devi_name, "a") as fp:
+                fp.write(self.devi_line(30, 0.5))
+            Path(lmp_log_name).write_text("log\n")
+            return (-15, "", "", check())
+
+        mocked_run.side_effect = run_lmp
+        out = RunLmp().execute(
+            OPIO(
+                {
+                    "config": {
+                        "command": "mylmp",
+                        "watchdog": {"level_f_hi": 0.3, "max_consecutive": 1},
+                    },
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+        # the steps that are not run are counted as failed frames
+        md = read_model_devi(out["model_devi"])
+        md_f = md[DeviManager.MAX_DEVI_F]
+        np.testing.assert_array_equal(
+            np.loadtxt(out["model_devi"])[:, 0], [0, 10, 20, 30, 40, 50]
+        )
+        np.testing.assert_array_equal(md_f >= 0.3, [False] * 3 + [True] * 3)
+        offsets = index_lammps_dump(out["traj"])
+        np.testing.assert_array_equal(
+            lammps_dump_timesteps(out["traj"], offsets), [0, 10, 20, 30, 40, 50]
+        )
+        np.testing.assert_array_equal(
+            lammps_dump_natoms(out["traj"], offsets), [1, 1, 1, 0, 0, 0]
+        )
+
+    def test_pad_undefined(self):
+        write_lmp_outputs([0, 10, 20])
+        Path(lmp_input_name).write_text("run 50\n")
+        try:
+            self.assertEqual(
+                pad_failed_outputs(lmp_input_name, lmp_traj_name, lmp_model_devi_name),
+                0,
+            )
+        finally:
+            os.remove(lmp_input_name)
+        np.testing.assert_array_equal(
+            np.loadtxt(lmp_model_devi_name)[:, 0], [0, 10, 20]
+        )
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_error(self, mocked_run):
+        mocked_run.side_effect = [(1, "", "", None)]
+        with self.assertRaises(TransientError):
+            RunLmp().execute(
+                OPIO(
+                    {
+                        "config": {
+                            "command": "mylmp",
+                            "watchdog": {"level_f_hi": 0.3, "max_consecutive": 1},
+                        },
+                        "task_name": self.task_name,
+                        "task_path": self.task_path,
+                        "models": self.models,
+                    }
+                )
+            )
+
+
+class TestRunLmpQuota(unittest.TestCase):
+    def setUp(self):
+        self.task_path = Path("task/path")
+        self.task_path.mkdir(parents=True, exist_ok=True)
+        self.model_path = Path("models/path")
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        (self.task_path / lmp_conf_name).write_text("foo")
+        (self.task_path / lmp_input_name).write_text("bar")
+        self.task_name = "task_000"
+        self.models = [self.model_path / Path(f"model_{ii}.pb") for ii in range(4)]
+        for idx, ii in enumerate(self.models):
+            ii.write_text(f"model{idx}")
+        self.counter_dir = Path("counters").absolute()
+        # the counters are grouped by the iteration of the step key
+        self.key = "iter-000001--run-lmp-000000"
+        self.iter_dir = self.counter_dir / "iter-000001"
+        self.config = {
+            "command": "mylmp",
+            "quota": {
+                "path": str(self.counter_dir),
+                "max_candidates": 3,
+                "level_f_lo": 0.1,
+                "level_f_hi": 0.3,
+                "interval": 5.0,
+            },
+        }
+
+    def tearDown(self):
+        for ii in ["task", "models", self.task_name, self.counter_dir]:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+        if Path(lmp_model_devi_name).is_file():
+            os.remove(lmp_model_devi_name)
+
+    def execute(self, key="iter-000001--run-lmp-000000"):
+        op = RunLmp()
+        op.key = key
+        return op.execute(
+            OPIO(
+                {
+                    "config": self.config,
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+
+    def test_count(self):
+        Path(lmp_model_devi_name).write_text(
+            "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+            "0 0.1 0 0 0.05 0 0\n"
+            "10 0.1 0 0 0.2 0 0\n"
+            "20 0.1 0 0 0.4 0 0\n"
+            "30 0.3 0 0 0.05 0 0\n"
+        )
+        quota = CandidateQuota(
+            lmp_model_devi_name,
+            self.counter_dir / "task_000.json",
+            4,
+            level_f_hi=0.3,
+            level_f_lo=0.1,
+            level_v_lo=0.2,
+        )
+        self.assertIsNone(quota())
+        self.assertEqual(quota.ncandidates, 2)
+        self.assertEqual(
+            json.loads((self.counter_dir / "task_000.json").read_text()),
+            {"candidate": 2},
+        )
+        # the candidates counted by another task
+        (self.counter_dir / "task_001.json").write_text(json.dumps({"candidate": 2}))
+        self.assertEqual(quota(), "4 candidates are collected, the quota is 4")
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_stopped(self, mocked_run):
+        def run_lmp(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([0, 10])
+            self.assertIsNone(check())
+            (self.iter_dir / "run-lmp-000001.json").write_text(
+                json.dumps({"candidate": 1})
+            )
+            write_lmp_outputs([0, 10, 20])
+            return (-15, "", "", check())
+
+        mocked_run.side_effect = run_lmp
+        out = self.execute()
+        self.assertEqual(mocked_run.call_args[1], {"interval": 5.0, "shell": True})
+        self.assertEqual(
+            json.loads((self.iter_dir / "run-lmp-000000.json").read_text()),
+            {"candidate": 3},
+        )
+        reason = "4 candidates are collected, the quota is 3"
+        self.assertEqual(
+            json.loads((Path(self.task_name) / lmp_stop_name).read_text()),
+            {"reason": reason},
+        )
+        np.testing.assert_array_equal(np.loadtxt(out["model_devi"])[:, 0], [0, 10, 20])
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_skipped(self, mocked_run):
+        self.iter_dir.mkdir(parents=True)
+        (self.iter_dir / "run-lmp-000001.json").write_text(json.dumps({"candidate": 3}))
+        self.config["binary_model_devi"] = True
+        out = self.execute()
+        mocked_run.assert_not_called()
+        self.assertEqual(out["traj"].read_text(), "")
+        self.assertEqual(np.load(out["model_devi"]).shape[0], 0)
+        self.assertIn("the quota is 3", out["log"].read_text())
+
+    @patch("dpgen2.op.run_lmp.run_command_watched")
+    def test_iterations(self, mocked_run):
+        # the counters of the previous iteration are not summed
+        (self.counter_dir / "iter-000000").mkdir(parents=True)
+        (self.counter_dir / "iter-000000" / "run-lmp-000000.json").write_text(
+            json.dumps({"candidate": 3})
+        )
+
+        def run_lmp(cmd, check, interval=10.0, shell=False):
+            write_lmp_outputs([0])
+            return (0, "", "", check())
+
+        mocked_run.side_effect = run_lmp
+        self.execute()
+        mocked_run.assert_called_once()
+        self.assertFalse((Path(self.task_name) / lmp_stop_name).is_file())
+        self.assertEqual(
+            json.loads((self.iter_dir / "run-lmp-000000.json").read_text()),
+            {"candidate": 1},
+        )
+
+    def test_no_key(self):
+        # the task names are repeated in the iterations
+        with self.assertRaisesRegex(FatalError, "step key"):
+            self.execute(key=None)
+
+    def test_max_candidates(self):
+        self.config["quota"]["max_candidates"] = None
+        with self.assertRaises(FatalError):
+            self.execute()
+
+    def test_level_f_hi(self):
+        self.config["quota"]["level_f_hi"] = None
+        with self.assertRaises(FatalError):
+            self.execute()
+
+
+class FakeDeepPot:
+    def __init__(self, scale):
+        self.scale = scale
+
+    def get_type_map(self):
+        return ["H", "O"]
+
+    def eval(self, coords, cells, atype):
+        nframes = coords.shape[0]
+        ff = (
+            self.scale * coords.reshape(nframes, -1, 3) * (1 + np.array(atype))[:, None]
+        )
+        vv = self.scale * cells.reshape(nframes, 9)
+        return np.zeros((nframes, 1)), ff, vv
+
+
+class TestRunLmpRescreen(unittest.TestCase):
+    def setUp(self):
+        self.task_path = Path("task/path")
+        self.task_path.mkdir(parents=True, exist_ok=True)
+        self.model_path = Path("models/path")
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        self.task_name = "task_000"
+        self.models = [self.model_path / Path(f"model_{ii}.pb") for ii in range(3)]
+        for idx, ii in enumerate(self.models):
+            ii.write_text(f"model{idx}")
+        frames = []
+        # frames of two systems
+        for ii, types in enumerate([[1, 2], [1, 2], [2, 2, 1], [1, 2]]):
+            frames.append(
+                f"ITEM: TIMESTEP\n{ii * 100}\nITEM: NUMBER OF ATOMS\n{len(types)}\n"
+                f"ITEM: BOX BOUNDS pp pp pp\n0 {10 + ii}\n0 10\n0 10\n"
+                "ITEM: ATOMS id type x y z\n"
+                + "".join(
+                    f"{jj + 1} {tt} {ii + jj}.0 {jj}.0 1.0\n"
+                    for jj, tt in enumerate(types)
+                )
+            )
+        self.frames = frames
+        (self.task_path / lmp_rescreen_name).write_text("".join(frames))
+
+    def tearDown(self):
+        for ii in ["task", "models", self.task_name]:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+
+    def check_outputs(self, traj, model_devi):
+        text = traj.read_text()
+        for ii, ff in enumerate(self.frames):
+            lines = ff.split("\n")
+            lines[1] = str(ii)
+            self.assertIn("\n".join(lines), text)
+        md = np.loadtxt(model_devi)
+        self.assertEqual(md.shape, (4, 7))
+        np.testing.assert_array_equal(md[:, 0], np.arange(4))
+        # the deviations of the frame of three atoms
+        scales = np.array([1.0, 2.0, 4.0])
+        coords = np.array([[2.0, 0.0, 1.0], [3.0, 1.0, 1.0], [4.0, 2.0, 1.0]])
+        coef = np.array([2.0, 2.0, 1.0])
+        devi_f = np.std(scales) * np.linalg.norm(coords, axis=1) * coef
+        np.testing.assert_allclose(
+            md[2, 4:], [devi_f.max(), devi_f.min(), devi_f.mean()], rtol=1e-6
+        )
+        devi_v = np.std(scales) * np.array([12.0, 0, 0, 0, 10.0, 0, 0, 0, 10.0]) / 3
+        np.testing.assert_allclose(
+            md[2, 1:4],
+            [devi_v.max(), devi_v.min(), np.linalg.norm(devi_v) / 3],
+            rtol=1e-6,
+        )
+
+    def test_rescreen(self):
+        Path(self.task_name).mkdir()
+        cwd = os.getcwd()
+        os.chdir(self.task_name)
+        try:
+            rescreen_lmp_traj(
+                Path(cwd) / self.task_path / lmp_rescreen_name,
+                [FakeDeepPot(ii) for ii in [1.0, 2.0, 4.0]],
+                batch_size=1,
+            )
+        finally:
+            os.chdir(cwd)
+        work_dir = Path(self.task_name)
+        self.check_outputs(work_dir / lmp_traj_name, work_dir / lmp_model_devi_name)
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    @patch("dpgen2.op.run_lmp._load_deep_pot")
+    def test_execute(self, mocked_load, mocked_run):
+        mocked_load.side_effect = [FakeDeepPot(ii) for ii in [1.0, 2.0, 4.0]]
+        out = RunLmp().execute(
+            OPIO(
+                {
+                    "config": {"command": "mylmp"},
+                    "task_name": self.task_name,
+                    "task_path": self.task_path,
+                    "models": self.models,
+                }
+            )
+        )
+        mocked_run.assert_not_called()
+        self.assertEqual(
+            [Path(ii[0][0]).name for ii in mocked_load.call_args_list],
+            [ii.name for ii in self.models],
+        )
+        self.check_outputs(out["traj"], out["model_devi"])
+        self.assertIn("re-screened 4 frames", out["log"].read_text())
+
+
+class TestRunLmpBundle(unittest.TestCase):
+    def setUp(self):
+        self.task_names = ["task_000", "task_001", "task_002"]
+        self.task_paths = []
+        for ii in range(3):
+            task_path = Path(f"task/path.{ii}")
+            task_path.mkdir(parents=True, exist_ok=True)
+            (task_path / lmp_conf_name).write_text(f"foo{ii}")
+            (task_path / lmp_input_name).write_text(self.make_input(ii))
+            self.task_paths.append(task_path)
+        self.model_path = Path("models/path")
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        self.models = [self.model_path / Path(f"model_{ii}.pb") for ii in range(4)]
+        for idx, ii in enumerate(self.models):
+            ii.write_text(f"model{idx}")
+
+    @staticmethod
+    def make_input(ii):
+        return (
+            f"variable NSTEPS equal {ii}\n"
+            "variable TEMP index 300 # K\n"
+            "variable TEMP delete\n"
+            f"bar{ii}"
+        )
+
+    def tearDown(self):
+        for ii in ["task", "models"] + self.task_names:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+        for ii in [lmp_bundle_input_name, lmp_bundle_log_name]:
+            if Path(ii).is_file():
+                os.remove(ii)
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_success(self, mocked_run):
+        def run_lmp(*args, **kwargs):
+            # run the driver input script
+            cwd = os.getcwd()
+            for line in Path(lmp_bundle_input_name).read_text().split("\n"):
+                words = line.split()
+                if words[:2] == ["shell", "cd"]:
+                    os.chdir(words[2])
+                elif words[:1] == ["include"]:
+                    conf = Path(lmp_conf_name).read_text()
+                    Path(lmp_model_devi_name).write_text(
+                        "# step max_devi_v min_devi_v avg_devi_v max_devi_f min_devi_f avg_devi_f\n"
+                        f"0 0.1 0.01 0.05 0.{conf[-1]} 0.02 0.1\n"
+                    )
+            self.assertEqual(os.getcwd(), cwd)
+            return (0, "foo\n", "")
+
+        mocked_run.side_effect = run_lmp
+        op = RunLmpBundle()
+        out = op.execute(
+            OPIO(
+                {
+                    "config": {"command": "mylmp", "binary_model_devi": True},
+                    "task_name": self.task_names,
+                    "task_path": self.task_paths,
+                    "models": self.models,
+                }
+            )
+        )
+        # one lmp process for all the tasks
+        mocked_run.assert_called_once_with(
+            " ".join(
+                ["mylmp", "-i", lmp_bundle_input_name, "-log", lmp_bundle_log_name]
+            ),
+            shell=True,
+        )
+        work_dirs = [Path(ii) for ii in self.task_names]
+        self.assertEqual(out["log"], [ii / lmp_log_name for ii in work_dirs])
+        self.assertEqual(out["traj"], [ii / lmp_traj_name for ii in work_dirs])
+        self.assertEqual(
+            out["model_devi"], [ii / lmp_model_devi_npy_name for ii in work_dirs]
+        )
+        for ii, work_dir in enumerate(work_dirs):
+            self.assertEqual((work_dir / lmp_conf_name).read_text(), f"foo{ii}")
+            self.assertEqual(
+                (work_dir / lmp_input_name).read_text(), self.make_input(ii)
+            )
+            for jj in range(4):
+                self.assertEqual(
+                    (work_dir / (model_name_pattern % jj)).read_text(), f"model{jj}"
+                )
+            np.testing.assert_allclose(
+                np.load(out["model_devi"][ii])["max_devi_f"][0], 0.1 * ii
+            )
+        lines = Path(lmp_bundle_input_name).read_text().split("\n")
+        # the variables survive clear
+        self.assertEqual(
+            lines[:7],
+            [
+                f"shell cd {work_dirs[0].resolve()}",
+                f"log {lmp_log_name}",
+                f"include {lmp_input_name}",
+                "clear",
+                "variable NSTEPS delete",
+                "variable TEMP delete",
+                f"shell cd {Path.cwd()}",
+            ],
+        )
+
+    @patch("dpgen2.op.run_lmp.run_command")
+    def test_error(self, mocked_run):
+        mocked_run.side_effect = [(1, "foo\n", "")]
+        op = RunLmpBundle()
+        with self.assertRaises(TransientError):
+            op.execute(
+                OPIO(
+                    {
+                        "config": {"command": "mylmp"},
+                        "task_name": self.task_names,
+                        "task_path": self.task_paths,
+                        "models": self.models,
+                    }
+                )
+            )
+
+
 class TestRunLmpDist(unittest.TestCase):
     lmp_config = """variable        NSTEPS          equal 1000
 
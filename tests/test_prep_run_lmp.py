@@ -33,6 +33,7 @@ from dflow.python import (
     OP,
     OPIO,
     Artifact,
+    FatalError,
     OPIOSign,
     PythonOPTemplate,
 )
@@ -61,6 +62,8 @@ from dpgen2.constants import (
     lmp_input_name,
     lmp_log_name,
     lmp_model_devi_name,
+    lmp_rescreen_name,
+    lmp_rescreen_ref_name,
     lmp_task_pattern,
     lmp_traj_name,
     model_name_pattern,
@@ -71,6 +74,7 @@ from dpgen2.constants import (
 from dpgen2.exploration.task import (
     ExplorationTask,
     ExplorationTaskGroup,
+    RescreenTaskGroup,
 )
 from dpgen2.op.prep_lmp import (
     PrepLmp,
@@ -146,6 +150,31 @@ class TestPrepLmp(unittest.TestCase):
         self.assertEqual(tdirs, out["task_names"])
         self.assertEqual(tdirs, [str(ii) for ii in out["task_paths"]])
 
+    def test_rescreen(self):
+        traj = Path("rescreen.traj.dump")
+        frames = [
+            f"ITEM: TIMESTEP\n{ii}\nITEM: NUMBER OF ATOMS\n1\n"
+            "ITEM: BOX BOUNDS pp pp pp\n0 10\n0 10\n0 10\n"
+            f"ITEM: ATOMS id type x y z\n1 1 {ii}.0 0 0\n"
+            for ii in range(4)
+        ]
+        traj.write_text("".join(frames))
+        grp = RescreenTaskGroup(10, frames_per_task=3)
+        grp.set_trajs([None, traj], [[], [1]])
+        op = PrepLmp()
+        with self.assertRaises(FatalError):
+            op.execute(OPIO({"lmp_task_grp": grp.make_task()}))
+        op.execute(
+            OPIO({"lmp_task_grp": grp.make_task(), "rescreen_trajs": [None, traj]})
+        )
+        os.remove(traj)
+        # the frames are read from the trajectories
+        self.assertEqual(
+            (Path(lmp_task_pattern % 0) / lmp_rescreen_name).read_text(),
+            frames[0] + frames[2] + frames[3],
+        )
+        self.assertFalse((Path(lmp_task_pattern % 0) / lmp_rescreen_ref_name).exists())
+
 
 class TestMockedRunLmp(unittest.TestCase):
     def setUp(self):
@@ -12,6 +12,7 @@ from typing import (
     Tuple,
 )
 
+import dpdata
 import jsonpickle
 import numpy as np
 from dflow import (
@@ -51,8 +52,13 @@ from mocked_ops import (
     MockedSelectConfs,
 )
 
+from dpgen2.exploration.selector import (
+    NoveltyIndex,
+)
 from dpgen2.op.select_confs import (
     SelectConfs,
+    SelectConfsMap,
+    SelectConfsReduce,
 )
 
 
@@ -147,3 +153,152 @@ class TestSelectConfs(unittest.TestCase):
         model_devis = ["zar", "par"]
         with self.assertRaises(FatalError) as context:
             trajs, model_devis = SelectConfs.validate_trajs(trajs, model_devis)
+
+
+class ShardedConfSelector(MockedConfSelector):
+    def record(self, model_devis):
+        report = MockedExplorationReport()
+        report.model_devis = model_devis
+        return report
+
+    def select_from_reports(self, trajs, reports, type_map=None):
+        self.selected = (trajs, [rr.model_devis for rr in reports])
+        return [Path("conf.0")], reports[0]
+
+
+class TestSelectConfsSharded(unittest.TestCase):
+    def setUp(self):
+        self.conf_selector = ShardedConfSelector()
+        self.trajs = [Path("traj.foo"), None, Path("traj.bar")]
+        self.model_devis = [Path("md.foo"), None, Path("md.bar")]
+
+    def test_map(self):
+        op = SelectConfsMap()
+        out = op.execute(
+            OPIO(
+                {
+                    "conf_selector": self.conf_selector,
+                    "model_devi": self.model_devis[0],
+                }
+            )
+        )
+        self.assertEqual(out["report"].model_devis, [Path("md.foo")])
+        # the failed task
+        out = op.execute(
+            OPIO(
+                {
+                    "conf_selector": self.conf_selector,
+                    "model_devi": None,
+                }
+            )
+        )
+        self.assertEqual(out["report"].model_devis, [])
+
+    def test_reduce(self):
+        reports = [
+            self.conf_selector.record([ii] if ii else []) for ii in self.model_devis
+        ]
+        op = SelectConfsReduce()
+        out = op.execute(
+            OPIO(
+                {
+                    "conf_selector": self.conf_selector,
+                    "type_map": [],
+                    "reports": reports,
+                    "trajs": self.trajs,
+                    "model_devis": self.model_devis,
+                }
+            )
+        )
+        self.assertEqual(out["confs"], [Path("conf.0")])
+        self.assertEqual(
+            self.conf_selector.selected,
+            (
+                [Path("traj.foo"), Path("traj.bar")],
+                [[Path("md.foo")], [], [Path("md.bar")]],
+            ),
+        )
+        with self.assertRaises(FatalError):
+            op.execute(
+                OPIO(
+                    {
+                        "conf_selector": self.conf_selector,
+                        "type_map": [],
+                        "reports": reports[:2],
+                        "trajs": self.trajs,
+                        "model_devis": self.model_devis,
+                    }
+                )
+            )
+
+
+class TestSelectConfsNoveltyIndex(unittest.TestCase):
+    def setUp(self):
+        self.type_map = ["H", "O"]
+        rng = np.random.default_rng(0)
+        self.systems = []
+        for ii in range(3):
+            ss = dpdata.System()
+            ss.data["atom_names"] = self.type_map
+            ss.data["atom_numbs"] = [2, 2]
+            ss.data["atom_types"] = np.array([0, 0, 1, 1])
+            ss.data["orig"] = np.zeros(3)
+            ss.data["cells"] = np.tile(6.0 * np.eye(3), [4, 1, 1])
+            ss.data["coords"] = rng.uniform(0.0, 6.0, size=(4, 4, 3))
+            self.systems.append(ss)
+        self.systems[0].to_deepmd_npy("init.0")
+        self.systems[1].to_deepmd_npy("init.1")
+        self.confs = self.systems[0].sub_system([0, 1])
+        self.confs.append(self.systems[1].sub_system([3]))
+        self.confs.append(self.systems[2])
+        self.index = NoveltyIndex(self.type_map, min_dist=1e-3, nbins=10)
+
+    def tearDown(self):
+        for ii in ["init.0", "init.1", "iter.0", "iter.1", "novelty_index.init"]:
+            if Path(ii).is_dir():
+                shutil.rmtree(ii)
+
+    def test_init_data(self):
+        index = SelectConfs.load_novelty_index(
+            self.index, [Path("init.0"), Path("init.1")], []
+        )
+        novel = self.index.check(self.confs, index)
+        np.testing.assert_array_equal(novel, [False] * 3 + [True] * 4)
+
+    def test_iter_data(self):
+        Path("iter.0").mkdir()
+        self.index.write(self.index.fingerprint([self.systems[2]]), Path("iter.0"))
+        # the initial data are not used once the shards are written
+        index = SelectConfs.load_novelty_index(
+            self.index, [Path("init.0")], [Path("iter.0")]
+        )
+        novel = self.index.check(self.confs, index)
+        np.testing.assert_array_equal(novel, [True] * 3 + [False] * 4)
+        self.assertFalse(Path("novelty_index.init").exists())
+
+    def test_no_index(self):
+        self.assertIsNone(SelectConfs.load_novelty_index(self.index, [], []))
+        op_in = {
+            "type_map": self.type_map,
+            "optional_parameter": {"novelty_index": {"min_dist": 1e-3}},
+            "init_data": None,
+            "iter_data": [],
+        }
+        self.assertEqual(SelectConfs.novelty_kwargs(op_in), {})
+        op_in["init_data"] = [Path("init.0")]
+        kwargs = SelectConfs.novelty_kwargs(op_in)
+        self.assertEqual(kwargs["conf_novelty"](self.systems[0]).tolist(), [False] * 4)
+        op_in["optional_parameter"] = {}
+        self.assertEqual(SelectConfs.novelty_kwargs(op_in), {})
+
+    def test_shards(self):
+        # the shards of the iterations are merged
+        Path("iter.0").mkdir()
+        Path("iter.1").mkdir()
+        self.index.write(self.index.fingerprint([self.systems[0]]), Path("iter.0"))
+        self.index.write(self.index.fingerprint([self.systems[2]]), Path("iter.1"))
+        index = SelectConfs.load_novelty_index(
+            self.index, [], [Path("iter.0"), Path("iter.1")]
+        )
+        novel = self.index.check(self.confs, index)
+        np.testing.assert_array_equal(novel, [False] * 2 + [True] + [False] * 4)
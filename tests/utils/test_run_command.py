@@ -13,6 +13,7 @@ from utils.context import (
 
 from dpgen2.utils.run_command import (
     run_command,
+    run_command_watched,
 )
 
 
@@ -60,3 +61,21 @@ class TestRunCommand(unittest.TestCase):
         # self.assertEqual(err, "ls: cannot access 'tar': No such file or directory\n")
         self.assertNotEqual(err, "")
         os.chdir("..")
+
+
+class TestRunCommandWatched(unittest.TestCase):
+    def test_exit(self):
+        ret, out, err, reason = run_command_watched(
+            "echo foo", lambda: "stop", interval=5.0, shell=True
+        )
+        self.assertEqual(ret, 0)
+        self.assertEqual(out, "foo\n")
+        self.assertIsNone(reason)
+
+    def test_stopped(self):
+        checks = iter([None, "stop"])
+        ret, out, err, reason = run_command_watched(
+            "sleep 60", lambda: next(checks), interval=0.1, shell=True
+        )
+        self.assertNotEqual(ret, 0)
+        self.assertEqual(reason, "stop")